@@ -1,12 +1,13 @@
+import json
 from datetime import date, datetime
-from typing import List
+from typing import AsyncIterator, List, Optional
 from urllib.parse import quote
 
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
 from io import BytesIO
 from docx import Document
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, load_only, selectinload
 
 from .config import settings
 from .db import get_db
@@ -20,12 +21,35 @@ from .schemas import (
     Novel as NovelSchema,
     NovelCreate,
     Chapter as ChapterSchema,
+    ChapterPage,
     CreationLog as CreationLogSchema,
+    DailyLLMUsage,
+    NovelLLMUsage,
+    StageLLMStats,
 )
+from .services.context_cache import context_cache
+from .services.deepseek_client import client as deepseek_client
+from .services.event_bus import event_bus, publish_metric_delta
+from .services.fact_compaction import compact_novel_facts
+from .services.lease import (
+    claim_novel_lease,
+    keep_novel_lease,
+    new_lease_token,
+)
+from .services.llm_stages import lanes
 from .services.novel_service import (
     generate_next_chapter_for_novel,
     get_dashboard_summary,
 )
+from .services.preview import preview_hub
+from .services.read_cache import read_cache
+from .services.progress_counters import (
+    delete_novel as delete_novel_with_counters,
+    note_novel_created,
+)
+from .services.response_cache import response_cache
+from .services.retrieval import retrieval_registry
+from .services.usage_service import daily_usage, novel_usage, stage_stats
 
 
 router = APIRouter(prefix="/api")
@@ -63,34 +87,51 @@ def create_novel(
             updated_at=datetime.utcnow(),
         )
         db.add(chapter)
+    note_novel_created(db, novel_in.target_chapter_count)
 
     db.commit()
     db.refresh(novel)
+    publish_metric_delta(
+        "novel-created",
+        novels=1,
+        chapters=novel.target_chapter_count,
+        novel_id=novel.id,
+    )
     return novel
 
 
 @router.get("/dashboard", response_model=DashboardSummary)
-def get_dashboard(db: Session = Depends(get_db)) -> DashboardSummary:
+def get_dashboard(request: Request, db: Session = Depends(get_db)) -> Response:
     """
     获取仪表盘所需的创作进度与统计数据。
     """
 
-    return get_dashboard_summary(db)
+    return read_cache.respond(
+        request,
+        "dashboard",
+        lambda: get_dashboard_summary(db).model_dump(mode="json"),
+    )
 
 
 @router.get("/novels", response_model=List[NovelSchema])
-def list_novels(db: Session = Depends(get_db)) -> List[NovelSchema]:
+def list_novels(request: Request, db: Session = Depends(get_db)) -> Response:
     """
     获取最近的小说列表及其基本信息。
     """
 
-    novels: List[Novel] = (
-        db.query(Novel)
-        .order_by(Novel.created_at.desc())
-        .limit(100)
-        .all()
-    )
-    return novels
+    def _compute() -> list:
+        novels: List[Novel] = (
+            db.query(Novel)
+            .order_by(Novel.created_at.desc())
+            .limit(100)
+            .all()
+        )
+        return [
+            NovelSchema.model_validate(n, from_attributes=True).model_dump(mode="json")
+            for n in novels
+        ]
+
+    return read_cache.respond(request, "novels", _compute)
 
 
 @router.delete("/novels/{novel_id}", response_model=dict)
@@ -106,30 +147,80 @@ def delete_novel(
     if novel is None:
         raise HTTPException(status_code=404, detail="小说不存在")
 
-    db.delete(novel)
+    chapters, words = delete_novel_with_counters(db, novel)
     db.commit()
+    publish_metric_delta(
+        "novel-deleted",
+        novels=-1,
+        chapters=-chapters,
+        words=-words,
+        novel_id=novel_id,
+    )
+    context_cache.invalidate(novel_id)
+    retrieval_registry.invalidate(novel_id)
     return {"success": True}
 
 
 @router.get(
     "/novels/{novel_id}/chapters",
-    response_model=List[ChapterSchema],
+    response_model=ChapterPage,
 )
 def list_chapters_for_novel(
     novel_id: int,
+    request: Request,
+    after_index: int = 0,
+    limit: int = 100,
     db: Session = Depends(get_db),
-) -> List[ChapterSchema]:
+) -> Response:
     """
-    获取指定小说已生成的章节列表（按章节顺序）。
+    分页获取指定小说已生成章节的摘要（按章节顺序，不含正文）。
+
+    以章节序号做键集分页：下一页传入上一页返回的 next_after_index，
+    为空表示已到末尾。正文通过 /chapters/{chapter_id} 按需获取。
     """
 
-    chapters: List[Chapter] = (
-        db.query(Chapter)
-        .filter(Chapter.novel_id == novel_id, Chapter.content.isnot(None))
-        .order_by(Chapter.index.asc())
-        .all()
+    limit = max(1, min(limit, 500))
+
+    def _compute() -> dict:
+        chapters: List[Chapter] = (
+            db.query(Chapter)
+            .options(
+                load_only(
+                    Chapter.id,
+                    Chapter.index,
+                    Chapter.title,
+                    Chapter.status,
+                    Chapter.word_count,
+                    Chapter.created_at,
+                    Chapter.updated_at,
+                )
+            )
+            .filter(
+                Chapter.novel_id == novel_id,
+                Chapter.status == ChapterStatus.COMPLETED,
+                Chapter.index > after_index,
+            )
+            .order_by(Chapter.index.asc())
+            .limit(limit + 1)
+            .all()
+        )
+        page = ChapterPage.model_validate(
+            {
+                "items": chapters[:limit],
+                "next_after_index": chapters[limit - 1].index
+                if len(chapters) > limit
+                else None,
+            },
+            from_attributes=True,
+        )
+        return page.model_dump(mode="json")
+
+    return read_cache.respond(
+        request,
+        f"novels/{novel_id}/chapters?after_index={after_index}&limit={limit}",
+        _compute,
+        novel_id=novel_id,
     )
-    return chapters
 
 
 @router.post("/novels/{novel_id}/generate")
@@ -141,44 +232,190 @@ def manual_generate_chapter(
     手动为指定小说生成下一章内容。
     """
 
-    ok = generate_next_chapter_for_novel(db, novel_id)
+    if db.query(Novel.id).filter(Novel.id == novel_id).one_or_none() is None:
+        raise HTTPException(status_code=404, detail="小说不存在")
+
+    token = new_lease_token()
+    if not claim_novel_lease(db, novel_id, token):
+        raise HTTPException(status_code=409, detail="该小说正在由其他任务创作")
+
+    with keep_novel_lease(novel_id, token):
+        ok = generate_next_chapter_for_novel(db, novel_id, lease_token=token)
     if not ok:
         raise HTTPException(status_code=400, detail="无法生成新的章节")
     return {"success": True}
 
 
+@router.post("/novels/{novel_id}/facts/compact", response_model=dict)
+def compact_facts(
+    novel_id: int,
+    db: Session = Depends(get_db),
+) -> dict:
+    """
+    对指定小说的剧情事实做一次完整去重与合并。
+    """
+
+    if db.query(Novel.id).filter(Novel.id == novel_id).one_or_none() is None:
+        raise HTTPException(status_code=404, detail="小说不存在")
+
+    token = new_lease_token()
+    if not claim_novel_lease(db, novel_id, token):
+        raise HTTPException(status_code=409, detail="该小说正在由其他任务创作")
+
+    with keep_novel_lease(novel_id, token):
+        retired = compact_novel_facts(db, novel_id)
+    context_cache.invalidate(novel_id)
+    retrieval_registry.invalidate(novel_id)
+    return {"success": True, "retired": len(retired)}
+
+
+@router.get("/novels/{novel_id}/stream")
+def stream_chapter_preview(
+    novel_id: int,
+    db: Session = Depends(get_db),
+) -> StreamingResponse:
+    """
+    以 SSE 推送指定小说当前生成章节的实时正文预览。
+    """
+
+    if db.query(Novel.id).filter(Novel.id == novel_id).one_or_none() is None:
+        raise HTTPException(status_code=404, detail="小说不存在")
+
+    async def _event_stream() -> AsyncIterator[str]:
+        async for event in preview_hub.subscribe(novel_id):
+            data = json.dumps(event["data"], ensure_ascii=False)
+            yield f"event: {event['event']}\ndata: {data}\n\n"
+
+    return StreamingResponse(
+        _event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/events")
+def stream_events(
+    last_event_id: Optional[str] = Header(None),
+) -> StreamingResponse:
+    """
+    以 SSE 推送控制台所需的增量事件：章节完成、新日志、调度器状态与统计增量。
+
+    浏览器断线重连时携带 Last-Event-ID，服务端补发其间错过的事件。
+    """
+
+    try:
+        after_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        after_id = None
+
+    async def _event_stream() -> AsyncIterator[str]:
+        async for event in event_bus.subscribe(after_id):
+            data = json.dumps(event["data"], ensure_ascii=False)
+            head = f"id: {event['id']}\n" if event["id"] is not None else ""
+            yield f"{head}event: {event['event']}\ndata: {data}\n\n"
+
+    return StreamingResponse(
+        _event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/logs", response_model=List[CreationLogSchema])
 def list_logs(
+    request: Request,
     limit: int = 200,
     db: Session = Depends(get_db),
-) -> List[CreationLogSchema]:
+) -> Response:
     """
     获取最新的创作过程日志列表。
     """
 
     limit = max(1, min(limit, 500))
-    logs: List[CreationLog] = (
-        db.query(CreationLog)
-        .order_by(CreationLog.created_at.desc())
-        .limit(limit)
-        .all()
-    )
-    return logs
+
+    def _compute() -> list:
+        logs: List[CreationLog] = (
+            db.query(CreationLog)
+            .order_by(CreationLog.created_at.desc())
+            .limit(limit)
+            .all()
+        )
+        return [
+            CreationLogSchema.model_validate(log, from_attributes=True).model_dump(
+                mode="json"
+            )
+            for log in logs
+        ]
+
+    return read_cache.respond(request, f"logs?limit={limit}", _compute)
+
+
+@router.get("/llm-usage/novels/{novel_id}", response_model=NovelLLMUsage)
+def get_novel_llm_usage(
+    novel_id: int,
+    db: Session = Depends(get_db),
+) -> NovelLLMUsage:
+    """
+    查看单本小说的模型用量：总计、按调用阶段与按章节，以及每千字 token 数。
+    """
+
+    if db.query(Novel.id).filter(Novel.id == novel_id).one_or_none() is None:
+        raise HTTPException(status_code=404, detail="小说不存在")
+    return novel_usage(db, novel_id)
+
+
+@router.get("/llm-usage/daily", response_model=List[DailyLLMUsage])
+def list_daily_llm_usage(
+    days: int = 7,
+    db: Session = Depends(get_db),
+) -> List[DailyLLMUsage]:
+    """
+    按天汇总最近若干天的模型用量。
+    """
+
+    return daily_usage(db, max(1, min(days, 90)))
+
+
+@router.get("/llm-usage/stages", response_model=List[StageLLMStats])
+def list_stage_llm_stats(
+    days: int = 7,
+    db: Session = Depends(get_db),
+) -> List[StageLLMStats]:
+    """
+    按调用阶段统计最近若干天的用量与延迟分位数。
+    """
+
+    return stage_stats(db, max(1, min(days, 90)))
 
 
 @router.get("/chapters/{chapter_id}", response_model=ChapterSchema)
 def get_chapter(
     chapter_id: int,
+    request: Request,
     db: Session = Depends(get_db),
-) -> ChapterSchema:
+) -> Response:
     """
     根据章节 ID 查询章节详情及正文内容。
     """
 
-    chapter: Chapter | None = db.query(Chapter).get(chapter_id)
-    if chapter is None:
+    novel_id = db.query(Chapter.novel_id).filter(Chapter.id == chapter_id).scalar()
+    if novel_id is None:
         raise HTTPException(status_code=404, detail="章节不存在")
-    return chapter
+
+    def _compute() -> dict:
+        chapter: Chapter = (
+            db.query(Chapter)
+            .options(selectinload(Chapter.stored_content))
+            .filter(Chapter.id == chapter_id)
+            .one()
+        )
+        return ChapterSchema.model_validate(chapter, from_attributes=True).model_dump(
+            mode="json"
+        )
+
+    return read_cache.respond(
+        request, f"chapters/{chapter_id}", _compute, novel_id=novel_id
+    )
 
 
 @router.get("/novels/{novel_id}/export-docx")
@@ -196,7 +433,11 @@ def export_novel_docx(
 
     chapters: List[Chapter] = (
         db.query(Chapter)
-        .filter(Chapter.novel_id == novel_id, Chapter.content.isnot(None))
+        .options(selectinload(Chapter.stored_content))
+        .filter(
+            Chapter.novel_id == novel_id,
+            Chapter.status == ChapterStatus.COMPLETED,
+        )
         .order_by(Chapter.index.asc())
         .all()
     )
@@ -258,7 +499,11 @@ def get_latest_chapter_for_novel(
 
     chapter: Chapter | None = (
         db.query(Chapter)
-        .filter(Chapter.novel_id == novel_id, Chapter.content.isnot(None))
+        .options(selectinload(Chapter.stored_content))
+        .filter(
+            Chapter.novel_id == novel_id,
+            Chapter.status == ChapterStatus.COMPLETED,
+        )
         .order_by(Chapter.index.desc())
         .first()
     )
@@ -289,6 +534,8 @@ def control_scheduler(cmd: ControlCommand) -> ControlState:
         is_running=scheduler.is_running(),
         is_paused=scheduler.is_paused(),
         last_heartbeat=scheduler.last_heartbeat(),
+        is_leader=scheduler.is_leader(),
+        instance_id=scheduler.instance_id(),
     )
 
 
@@ -302,9 +549,48 @@ def get_control_state() -> ControlState:
         is_running=scheduler.is_running(),
         is_paused=scheduler.is_paused(),
         last_heartbeat=scheduler.last_heartbeat(),
+        is_leader=scheduler.is_leader(),
+        instance_id=scheduler.instance_id(),
     )
 
 
+@router.get("/llm/providers", response_model=List[dict])
+def list_llm_providers() -> List[dict]:
+    """
+    查看各模型服务端点的健康度、摘除状态与限流额度。
+    """
+
+    return deepseek_client.pool.stats()
+
+
+@router.get("/llm/lanes", response_model=dict)
+def list_llm_lanes() -> dict:
+    """
+    查看各并发通道的占用情况。
+    """
+
+    return lanes.stats()
+
+
+@router.get("/llm/response-cache", response_model=dict)
+def get_response_cache_stats() -> dict:
+    """
+    查看响应缓存的条目数、占用空间与命中情况。
+    """
+
+    return response_cache.stats()
+
+
+@router.delete("/llm/response-cache", response_model=dict)
+def clear_response_cache() -> dict:
+    """
+    清空响应缓存。
+    """
+
+    response_cache.clear()
+    return response_cache.stats()
+
+
 @router.post("/config", response_model=dict)
 def update_config(config: ConfigUpdate) -> dict:
     """
@@ -321,6 +607,10 @@ def update_config(config: ConfigUpdate) -> dict:
         )
     if config.max_requests_per_minute is not None:
         settings.max_requests_per_minute = config.max_requests_per_minute
+    if config.max_tokens_per_minute is not None:
+        settings.max_tokens_per_minute = config.max_tokens_per_minute
+    deepseek_client.pool.reload_limits()
+    lanes.reload_limits()
     if config.preferred_genres is not None:
         settings.preferred_genres = config.preferred_genres
 
@@ -1,9 +1,24 @@
 from functools import lru_cache
-from typing import List
+from typing import Dict, List, Optional
 
 from pydantic import v1 as pydantic_v1
 
 
+class DeepSeekEndpoint(pydantic_v1.BaseModel):
+    """
+    模型服务端点配置：一个 API 地址与密钥的组合，可覆盖全局限流参数。
+    """
+
+    name: str
+    base_url: str
+    api_key: str = ""
+    model: Optional[str] = None
+    weight: float = 1.0
+    requests_per_minute: Optional[int] = None
+    tokens_per_minute: Optional[int] = None
+    max_concurrency: Optional[int] = None
+
+
 class Settings(pydantic_v1.BaseSettings):
     """
     全局配置对象，负责从环境变量加载系统运行参数。
@@ -23,6 +38,18 @@ class Settings(pydantic_v1.BaseSettings):
         "deepseek-chat",
         description="用于小说生成的 DeepSeek 模型名称",
     )
+    deepseek_endpoints: List[DeepSeekEndpoint] = pydantic_v1.Field(
+        default_factory=list,
+        description="多端点/多密钥配置（JSON 数组），为空时使用 deepseek_base_url 与 deepseek_api_key",
+    )
+    provider_eject_failures: int = pydantic_v1.Field(
+        3,
+        description="端点连续失败多少次后暂时摘除",
+    )
+    provider_eject_seconds: int = pydantic_v1.Field(
+        30,
+        description="端点首次摘除的时长（秒），再次摘除时翻倍，最长 10 分钟",
+    )
 
     daily_target_novels: int = pydantic_v1.Field(
         2,
@@ -35,12 +62,16 @@ class Settings(pydantic_v1.BaseSettings):
 
     max_concurrent_api_requests: int = pydantic_v1.Field(
         3,
-        description="DeepSeek API 最大并发请求数",
+        description="DeepSeek API 全局最大并发请求数，各调用通道共享",
     )
     max_requests_per_minute: int = pydantic_v1.Field(
         30,
         description="DeepSeek API 每分钟最大请求数",
     )
+    max_tokens_per_minute: int = pydantic_v1.Field(
+        0,
+        description="DeepSeek API 每分钟最大 token 数（提示词加输出），0 表示不限制",
+    )
     api_request_timeout: int = pydantic_v1.Field(
         60,
         description="DeepSeek API 请求超时时间（秒）",
@@ -49,6 +80,166 @@ class Settings(pydantic_v1.BaseSettings):
         3,
         description="DeepSeek API 调用失败时的最大重试次数",
     )
+    api_call_deadline_seconds: int = pydantic_v1.Field(
+        900,
+        description="单次模型调用（含排队、重试与退避）的总时限（秒），0 表示不限",
+    )
+    deepseek_async_enabled: bool = pydantic_v1.Field(
+        False,
+        description="是否通过后台事件循环上的异步客户端发送 DeepSeek 请求",
+    )
+    deepseek_http2_enabled: bool = pydantic_v1.Field(
+        True,
+        description="安装 h2 时是否对 DeepSeek 请求启用 HTTP/2",
+    )
+    deepseek_http_max_connections: int = pydantic_v1.Field(
+        20,
+        description="异步客户端连接池的最大连接数",
+    )
+    deepseek_stream_enabled: bool = pydantic_v1.Field(
+        True,
+        description="章节正文是否使用流式接口生成并推送实时预览",
+    )
+
+    draft_model: str = pydantic_v1.Field(
+        "",
+        description="章节正文生成使用的模型，为空时使用端点配置的模型",
+    )
+    draft_temperature: float = pydantic_v1.Field(
+        0.7,
+        description="章节正文生成的采样温度",
+    )
+    draft_max_tokens: int = pydantic_v1.Field(
+        4096,
+        description="章节正文生成的最大输出 token 数",
+    )
+    draft_lane: str = pydantic_v1.Field(
+        "draft",
+        description="章节正文生成所用的并发通道",
+    )
+    extract_model: str = pydantic_v1.Field(
+        "",
+        description="事实提取使用的模型，为空时使用端点配置的模型",
+    )
+    extract_temperature: float = pydantic_v1.Field(
+        0.2,
+        description="事实提取的采样温度",
+    )
+    extract_max_tokens: int = pydantic_v1.Field(
+        1024,
+        description="事实提取的最大输出 token 数",
+    )
+    extract_lane: str = pydantic_v1.Field(
+        "light",
+        description="事实提取所用的并发通道",
+    )
+    audit_model: str = pydantic_v1.Field(
+        "",
+        description="一致性审核使用的模型，为空时使用端点配置的模型",
+    )
+    audit_temperature: float = pydantic_v1.Field(
+        0.2,
+        description="一致性审核的采样温度",
+    )
+    audit_max_tokens: int = pydantic_v1.Field(
+        1024,
+        description="一致性审核的最大输出 token 数",
+    )
+    audit_lane: str = pydantic_v1.Field(
+        "light",
+        description="一致性审核所用的并发通道",
+    )
+    summary_model: str = pydantic_v1.Field(
+        "",
+        description="剧情摘要使用的模型，为空时使用端点配置的模型",
+    )
+    summary_temperature: float = pydantic_v1.Field(
+        0.3,
+        description="剧情摘要的采样温度",
+    )
+    summary_max_tokens: int = pydantic_v1.Field(
+        600,
+        description="剧情摘要的最大输出 token 数",
+    )
+    summary_lane: str = pydantic_v1.Field(
+        "light",
+        description="剧情摘要所用的并发通道",
+    )
+    review_model: str = pydantic_v1.Field(
+        "",
+        description="合并审核（冲突检查与事实提取）使用的模型，为空时使用端点配置的模型",
+    )
+    review_temperature: float = pydantic_v1.Field(
+        0.2,
+        description="合并审核的采样温度",
+    )
+    review_max_tokens: int = pydantic_v1.Field(
+        2048,
+        description="合并审核的最大输出 token 数",
+    )
+    review_lane: str = pydantic_v1.Field(
+        "light",
+        description="合并审核所用的并发通道",
+    )
+    combined_review_enabled: bool = pydantic_v1.Field(
+        False,
+        description="是否以一次结构化调用同时完成一致性审核与事实提取，失败时回退为两次调用",
+    )
+    llm_lane_concurrency: Dict[str, int] = pydantic_v1.Field(
+        default_factory=dict,
+        description="各并发通道的最大并发数（JSON 对象），不超过 max_concurrent_api_requests；未配置时正文通道取全局上限减一，其余通道取全局上限",
+    )
+    response_cache_enabled: bool = pydantic_v1.Field(
+        True,
+        description="是否缓存确定性阶段的模型响应，相同模型、参数与消息的请求直接复用结果",
+    )
+    response_cache_stages: List[str] = pydantic_v1.Field(
+        default_factory=lambda: ["extract", "audit", "review"],
+        description="启用响应缓存的调用阶段（JSON 数组）",
+    )
+    response_cache_path: str = pydantic_v1.Field(
+        "",
+        description="响应缓存的 SQLite 文件路径，留空时使用项目目录下的 data/response_cache.sqlite3",
+    )
+    response_cache_max_bytes: int = pydantic_v1.Field(
+        256 * 1024 * 1024,
+        description="响应缓存的容量上限（字节），超出时淘汰最久未访问的条目",
+    )
+    traffic_archive_enabled: bool = pydantic_v1.Field(
+        False,
+        description="是否将每次成功调用的请求与原始响应压缩归档，供离线回放",
+    )
+    traffic_archive_dir: str = pydantic_v1.Field(
+        "",
+        description="调用归档目录，留空时使用项目目录下的 data/traffic",
+    )
+
+    event_bus_buffer_size: int = pydantic_v1.Field(
+        1000,
+        description="事件总线保留的最近事件数，断线重连时据此补发错过的事件",
+    )
+
+    read_cache_enabled: bool = pydantic_v1.Field(
+        True,
+        description="是否缓存仪表盘、小说列表、日志与章节列表等读接口的响应",
+    )
+    read_cache_ttl_seconds: float = pydantic_v1.Field(
+        10.0,
+        description="读接口缓存的最长有效期（秒），兜底其他实例写入后的失效",
+    )
+    read_cache_max_entries: int = pydantic_v1.Field(
+        256,
+        description="读接口缓存的最大条目数，超出时淘汰最久未使用的条目",
+    )
+    read_cache_gzip_min_bytes: int = pydantic_v1.Field(
+        2048,
+        description="读接口响应体超过该字节数且客户端支持时使用 gzip 压缩",
+    )
+
+    chapter_content_codec: str = pydantic_v1.Field(
+        "zlib",
+        description="章节正文的压缩格式：zlib 或 zstd（需安装 zstandard，未安装时回退为 zlib）",
+    )
 
     scheduler_enabled: bool = pydantic_v1.Field(
         True,
@@ -58,6 +249,120 @@ class Settings(pydantic_v1.BaseSettings):
         60,
         description="调度器轮询间隔秒数",
     )
+    scheduler_worker_pool_enabled: bool = pydantic_v1.Field(
+        True,
+        description="是否以工作池模式并发创作多本小说（并发数取 max_concurrent_api_requests）",
+    )
+    novel_lease_seconds: int = pydantic_v1.Field(
+        300,
+        description="小说创作租约有效期秒数，持有期间由心跳线程续约",
+    )
+    leader_lease_seconds: int = pydantic_v1.Field(
+        60,
+        description="调度器主节点身份租期秒数",
+    )
+    lease_claim_batch_size: int = pydantic_v1.Field(
+        10,
+        description="每次申领租约时读取的候选小说数量",
+    )
+    lease_skip_locked: bool = pydantic_v1.Field(
+        True,
+        description="MySQL 8 下读取候选小说时是否使用 SKIP LOCKED（MySQL 5.7 需关闭）",
+    )
+
+    context_cache_max_bytes: int = pydantic_v1.Field(
+        64 * 1024 * 1024,
+        description="小说上下文快照缓存的内存预算（字节），超出后按 LRU 淘汰",
+    )
+
+    context_budget_total_tokens: int = pydantic_v1.Field(
+        6000,
+        description="章节生成上下文的总 token 预算",
+    )
+    context_budget_setting_tokens: int = pydantic_v1.Field(
+        600,
+        description="上下文中整体设定与情节节点分区的 token 预算",
+    )
+    context_budget_characters_tokens: int = pydantic_v1.Field(
+        800,
+        description="上下文中人物设定分区的 token 预算",
+    )
+    context_budget_facts_tokens: int = pydantic_v1.Field(
+        1800,
+        description="上下文中剧情事实分区的 token 预算",
+    )
+    context_budget_recap_tokens: int = pydantic_v1.Field(
+        2400,
+        description="上下文中前情回顾分区的 token 预算",
+    )
+    context_budget_latest_tail_tokens: int = pydantic_v1.Field(
+        400,
+        description="上下文中上一章结尾片段的 token 预算",
+    )
+    prompt_prefix_cache_enabled: bool = pydantic_v1.Field(
+        True,
+        description="是否将固定的设定、人物与只追加的关键事实放在提示词开头，以命中模型服务的前缀缓存",
+    )
+
+    summary_tree_enabled: bool = pydantic_v1.Field(
+        True,
+        description="是否在后台维护章节→剧情弧→分卷的分层摘要",
+    )
+    summary_arc_chapters: int = pydantic_v1.Field(
+        10,
+        description="每个剧情弧摘要覆盖的章节数",
+    )
+    summary_volume_arcs: int = pydantic_v1.Field(
+        10,
+        description="每个分卷摘要覆盖的剧情弧数",
+    )
+    context_recent_chapters: int = pydantic_v1.Field(
+        5,
+        description="上下文中保留原文片段的最近章节数，更早的内容使用分层摘要",
+    )
+
+    retrieval_enabled: bool = pydantic_v1.Field(
+        True,
+        description="是否基于本地检索索引为下一章挑选相关前文片段与设定事实",
+    )
+    retrieval_top_k_passages: int = pydantic_v1.Field(
+        6,
+        description="每章上下文检索的前文片段数量",
+    )
+    retrieval_top_k_facts: int = pydantic_v1.Field(
+        30,
+        description="每章上下文检索的普通设定事实数量",
+    )
+    retrieval_passage_chars: int = pydantic_v1.Field(
+        300,
+        description="章节正文切分为检索片段时的最大字数",
+    )
+    retrieval_index_max_novels: int = pydantic_v1.Field(
+        16,
+        description="内存中最多缓存检索索引的小说数量",
+    )
+    context_budget_retrieval_tokens: int = pydantic_v1.Field(
+        1200,
+        description="上下文中检索片段分区的 token 预算",
+    )
+
+    fact_compaction_enabled: bool = pydantic_v1.Field(
+        True,
+        description="是否在写入剧情事实时合并重复与被取代的事实",
+    )
+    fact_merge_similarity: float = pydantic_v1.Field(
+        0.8,
+        description="两条事实的字符二元组 Jaccard 相似度达到该值时视为同一事实",
+    )
+
+    entity_index_enabled: bool = pydantic_v1.Field(
+        True,
+        description="是否按章节涉及的人物、地点与组织挑选相关事实",
+    )
+    entity_recent_chapters: int = pydantic_v1.Field(
+        3,
+        description="最近多少章中出现过的实体视为仍在场",
+    )
 
     preferred_genres: List[str] = pydantic_v1.Field(
         default_factory=lambda: ["玄幻", "科幻", "都市", "悬疑"],
@@ -0,0 +1,71 @@
+import importlib.util
+import logging
+import zlib
+from typing import Tuple
+
+from .config import settings
+
+
+logger = logging.getLogger(__name__)
+
+CODEC_ZLIB = "zlib"
+CODEC_ZSTD = "zstd"
+
+_ZLIB_LEVEL = 6
+_ZSTD_LEVEL = 10
+
+# 缺少 zstandard 时只提示一次，避免每写入一章都记录警告
+_zstd_fallback_warned = False
+
+
+def zstd_available() -> bool:
+    """
+    判断是否安装了 zstd 压缩所需的 zstandard 依赖。
+    """
+
+    return importlib.util.find_spec("zstandard") is not None
+
+
+def compress_body(text: str, codec: str = "") -> Tuple[str, bytes, int]:
+    """
+    压缩章节正文，返回 (压缩格式, 压缩数据, 原文 UTF-8 字节数)。
+
+    配置为 zstd 但未安装 zstandard 时回退为 zlib。
+    """
+
+    global _zstd_fallback_warned
+
+    raw = text.encode("utf-8")
+    codec = codec or settings.chapter_content_codec
+    if codec == CODEC_ZSTD:
+        if zstd_available():
+            import zstandard
+
+            data = zstandard.ZstdCompressor(level=_ZSTD_LEVEL).compress(raw)
+            return CODEC_ZSTD, data, len(raw)
+        if not _zstd_fallback_warned:
+            _zstd_fallback_warned = True
+            logger.warning("未安装 zstandard，章节正文改用 zlib 压缩")
+    return CODEC_ZLIB, zlib.compress(raw, _ZLIB_LEVEL), len(raw)
+
+
+def decompress_body(codec: str, data: bytes, original_length: int) -> str:
+    """
+    解压章节正文，并校验解压后的长度与写入时记录的一致。
+    """
+
+    if codec == CODEC_ZLIB:
+        raw = zlib.decompress(data)
+    elif codec == CODEC_ZSTD:
+        import zstandard
+
+        raw = zstandard.ZstdDecompressor().decompress(
+            data, max_output_size=original_length
+        )
+    else:
+        raise ValueError(f"未知的章节正文压缩格式：{codec}")
+    if len(raw) != original_length:
+        raise ValueError(
+            f"章节正文解压后长度 {len(raw)} 与记录的 {original_length} 不一致"
+        )
+    return raw.decode("utf-8")
@@ -10,6 +10,7 @@ from .api import router as api_router
 from .config import settings
 from .db import Base, engine
 from .scheduler import scheduler
+from .services.schema_upgrade import upgrade_schema
 
 
 def _setup_logging() -> None:
@@ -39,6 +40,7 @@ def create_app() -> FastAPI:
     _setup_logging()
 
     Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
 
     app = FastAPI(title=settings.app_name)
 
@@ -1,5 +1,6 @@
 import enum
 from datetime import datetime, date
+from typing import Optional
 
 from sqlalchemy import (
     Column,
@@ -8,6 +9,7 @@ from sqlalchemy import (
     Enum,
     ForeignKey,
     Integer,
+    LargeBinary,
     String,
     Text,
     JSON,
@@ -16,9 +18,10 @@ from sqlalchemy import (
     UniqueConstraint,
     Index,
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 
 from .db import Base
+from .content_codec import compress_body, decompress_body
 
 
 class NovelStatus(str, enum.Enum):
@@ -41,6 +44,13 @@ class StoryFactImportance(str, enum.Enum):
     NORMAL = "NORMAL"
 
 
+class EntityKind(str, enum.Enum):
+    CHARACTER = "CHARACTER"
+    PLACE = "PLACE"
+    ORGANIZATION = "ORGANIZATION"
+    OTHER = "OTHER"
+
+
 class Novel(Base):
     __tablename__ = "novels"
 
@@ -51,6 +61,9 @@ class Novel(Base):
 
     target_chapter_count = Column(Integer, nullable=False, default=10)
     current_chapter_index = Column(Integer, nullable=False, default=0)
+    # 进度计数：已完成章节数与累计字数，随章节提交原子累加，可由 repair_counters 重算
+    completed_chapter_count = Column(Integer, nullable=False, default=0)
+    total_word_count = Column(Integer, nullable=False, default=0)
 
     status = Column(
         Enum(NovelStatus),
@@ -60,6 +73,9 @@ class Novel(Base):
 
     planned_date = Column(Date, nullable=True, index=True)
 
+    lease_owner = Column(String(128), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True, index=True)
+
     created_at = Column(
         DateTime, nullable=False, default=datetime.utcnow, index=True
     )
@@ -99,6 +115,21 @@ class Novel(Base):
         cascade="all, delete-orphan",
         order_by="StoryFact.chapter_index",
     )
+    arc_summaries = relationship(
+        "ArcSummary",
+        cascade="all, delete-orphan",
+        order_by="ArcSummary.arc_index",
+    )
+    volume_summaries = relationship(
+        "VolumeSummary",
+        cascade="all, delete-orphan",
+        order_by="VolumeSummary.volume_index",
+    )
+    entities = relationship(
+        "StoryEntity",
+        cascade="all, delete-orphan",
+        order_by="StoryEntity.id",
+    )
 
 
 class Chapter(Base):
@@ -115,7 +146,8 @@ class Chapter(Base):
     index = Column(Integer, nullable=False)
     title = Column(String(255), nullable=False)
     outline = Column(Text, nullable=True)
-    content = Column(Text, nullable=True)
+    # 早期版本直接存放正文的列，回填到 chapter_contents 后置空，仅用于兼容读取
+    legacy_content = deferred(Column("content", Text, nullable=True))
 
     word_count = Column(Integer, nullable=False, default=0)
 
@@ -146,6 +178,56 @@ class Chapter(Base):
         back_populates="chapter",
         cascade="all, delete-orphan",
     )
+    stored_content = relationship(
+        "ChapterContent",
+        uselist=False,
+        cascade="all, delete-orphan",
+    )
+
+    @property
+    def content(self) -> Optional[str]:
+        # 访问时才加载并解压正文，查询章节本身不会带出正文
+        stored = self.stored_content
+        if stored is not None:
+            return decompress_body(stored.codec, stored.data, stored.original_length)
+        return self.legacy_content
+
+    @content.setter
+    def content(self, text: Optional[str]) -> None:
+        self.legacy_content = None
+        if text is None:
+            self.stored_content = None
+            return
+        codec, data, original_length = compress_body(text)
+        if self.stored_content is None:
+            self.stored_content = ChapterContent(
+                codec=codec, data=data, original_length=original_length
+            )
+        else:
+            self.stored_content.codec = codec
+            self.stored_content.data = data
+            self.stored_content.original_length = original_length
+
+
+# 章节正文，压缩后单独存放；original_length 为原文 UTF-8 字节数，解压时校验
+class ChapterContent(Base):
+    __tablename__ = "chapter_contents"
+
+    chapter_id = Column(
+        Integer,
+        ForeignKey("chapters.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    codec = Column(String(16), nullable=False)
+    # MySQL 下为 MEDIUMBLOB
+    data = Column(LargeBinary(length=16 * 1024 * 1024), nullable=False)
+    original_length = Column(Integer, nullable=False)
+    updated_at = Column(
+        DateTime,
+        nullable=False,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+    )
 
 
 class Character(Base):
@@ -215,6 +297,12 @@ class CreationLog(Base):
     message = Column(Text, nullable=False)
     api_call_id = Column(String(128), nullable=True)
     latency_ms = Column(Float, nullable=True)
+    ttft_ms = Column(Float, nullable=True)
+    prompt_tokens_estimate = Column(Integer, nullable=True)
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    prompt_cache_hit_tokens = Column(Integer, nullable=True)
+    prompt_cache_miss_tokens = Column(Integer, nullable=True)
 
     created_at = Column(
         DateTime, nullable=False, default=datetime.utcnow, index=True
@@ -262,8 +350,27 @@ class SystemState(Base):
     )
 
 
+# 全站累计统计，只有一行（id 为 1），随小说创建、章节提交与删除原子累加
+class DashboardTotals(Base):
+    __tablename__ = "dashboard_totals"
+
+    id = Column(Integer, primary_key=True)
+    novel_count = Column(Integer, nullable=False, default=0)
+    chapter_count = Column(Integer, nullable=False, default=0)
+    word_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(
+        DateTime,
+        nullable=False,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+    )
+
+
 class GenerationMetric(Base):
     __tablename__ = "generation_metrics"
+    __table_args__ = (
+        UniqueConstraint("date", name="uix_generation_metric_date"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     date = Column(Date, nullable=False, index=True)
@@ -280,6 +387,7 @@ class StoryFact(Base):
     __tablename__ = "story_facts"
     __table_args__ = (
         Index("idx_story_facts_novel_chapter", "novel_id", "chapter_index"),
+        Index("idx_story_facts_novel_active", "novel_id", "is_active"),
     )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -299,9 +407,161 @@ class StoryFact(Base):
         default=StoryFactImportance.NORMAL,
     )
 
+    # 被更新的同义事实取代后置为 False，不再进入上下文与审核
+    is_active = Column(Boolean, nullable=False, default=True)
+    superseded_by_id = Column(
+        Integer,
+        ForeignKey("story_facts.id", ondelete="SET NULL"),
+        nullable=True,
+    )
+
     created_at = Column(
         DateTime, nullable=False, default=datetime.utcnow, index=True
     )
 
     novel = relationship("Novel", back_populates="facts")
 
+
+class ArcSummary(Base):
+    __tablename__ = "arc_summaries"
+    __table_args__ = (
+        UniqueConstraint("novel_id", "arc_index", name="uix_arc_summary_index"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    novel_id = Column(
+        Integer, ForeignKey("novels.id", ondelete="CASCADE"), nullable=False
+    )
+
+    arc_index = Column(Integer, nullable=False)
+    start_chapter = Column(Integer, nullable=False)
+    end_chapter = Column(Integer, nullable=False)
+    summary = Column(Text, nullable=False)
+
+    created_at = Column(
+        DateTime, nullable=False, default=datetime.utcnow, index=True
+    )
+
+
+class VolumeSummary(Base):
+    __tablename__ = "volume_summaries"
+    __table_args__ = (
+        UniqueConstraint(
+            "novel_id", "volume_index", name="uix_volume_summary_index"
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    novel_id = Column(
+        Integer, ForeignKey("novels.id", ondelete="CASCADE"), nullable=False
+    )
+
+    volume_index = Column(Integer, nullable=False)
+    start_chapter = Column(Integer, nullable=False)
+    end_chapter = Column(Integer, nullable=False)
+    summary = Column(Text, nullable=False)
+
+    created_at = Column(
+        DateTime, nullable=False, default=datetime.utcnow, index=True
+    )
+
+
+class StoryEntity(Base):
+    __tablename__ = "story_entities"
+    __table_args__ = (
+        UniqueConstraint("novel_id", "name", name="uix_story_entity_name"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    novel_id = Column(
+        Integer, ForeignKey("novels.id", ondelete="CASCADE"), nullable=False
+    )
+
+    name = Column(String(128), nullable=False)
+    kind = Column(Enum(EntityKind), nullable=False, default=EntityKind.OTHER)
+
+    created_at = Column(
+        DateTime, nullable=False, default=datetime.utcnow, index=True
+    )
+
+
+class FactEntity(Base):
+    __tablename__ = "fact_entities"
+    __table_args__ = (
+        UniqueConstraint("fact_id", "entity_id", name="uix_fact_entity"),
+        Index("idx_fact_entities_entity", "entity_id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    novel_id = Column(
+        Integer, ForeignKey("novels.id", ondelete="CASCADE"), nullable=False
+    )
+    fact_id = Column(
+        Integer, ForeignKey("story_facts.id", ondelete="CASCADE"), nullable=False
+    )
+    entity_id = Column(
+        Integer,
+        ForeignKey("story_entities.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+
+
+class ChapterEntity(Base):
+    __tablename__ = "chapter_entities"
+    __table_args__ = (
+        UniqueConstraint("chapter_id", "entity_id", name="uix_chapter_entity"),
+        Index("idx_chapter_entities_novel_chapter", "novel_id", "chapter_index"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    novel_id = Column(
+        Integer, ForeignKey("novels.id", ondelete="CASCADE"), nullable=False
+    )
+    chapter_id = Column(
+        Integer, ForeignKey("chapters.id", ondelete="CASCADE"), nullable=False
+    )
+    entity_id = Column(
+        Integer,
+        ForeignKey("story_entities.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+
+    chapter_index = Column(Integer, nullable=False)
+    mention_count = Column(Integer, nullable=False, default=1)
+
+
+class LLMCall(Base):
+    __tablename__ = "llm_calls"
+    __table_args__ = (
+        Index("idx_llm_calls_novel_chapter", "novel_id", "chapter_id"),
+        Index("idx_llm_calls_stage_time", "stage", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # 账目在小说或章节删除后仍保留，用于成本统计
+    novel_id = Column(
+        Integer, ForeignKey("novels.id", ondelete="SET NULL"), nullable=True
+    )
+    chapter_id = Column(
+        Integer, ForeignKey("chapters.id", ondelete="SET NULL"), nullable=True
+    )
+
+    stage = Column(String(32), nullable=False)
+    model = Column(String(128), nullable=True)
+    endpoint = Column(String(64), nullable=True)
+    request_id = Column(String(128), nullable=True)
+
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    cache_hit_tokens = Column(Integer, nullable=True)
+    cache_miss_tokens = Column(Integer, nullable=True)
+
+    latency_ms = Column(Float, nullable=True)
+    queue_ms = Column(Float, nullable=True)
+    attempts = Column(Integer, nullable=True)
+    success = Column(Boolean, nullable=False, default=True)
+    error = Column(String(512), nullable=True)
+
+    created_at = Column(
+        DateTime, nullable=False, default=datetime.utcnow, index=True
+    )
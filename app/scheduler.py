@@ -1,27 +1,45 @@
+import logging
 import threading
 import time
-from datetime import date, datetime
-from typing import Optional
+from datetime import datetime
+from typing import List, Optional, Set
 
 from sqlalchemy.orm import Session
 
 from .config import settings
 from .db import SessionLocal
-from .models import Novel, NovelStatus, SystemState
+from .models import SystemState
+from .services.event_bus import publish_scheduler_state
+from .services.lease import (
+    INSTANCE_ID,
+    acquire_leadership,
+    claim_next_novel,
+    keep_novel_lease,
+    new_lease_token,
+    sweep_expired_leases,
+)
 from .services.novel_service import generate_next_chapter_for_novel
 
 
+logger = logging.getLogger(__name__)
+
+
 class Scheduler:
     """
     简单的后台调度器，负责每日规划与自动章节生成。
     """
 
-    def __init__(self) -> None:
+    def __init__(self, instance_id: str = INSTANCE_ID) -> None:
+        self._instance_id = instance_id
         self._thread: Optional[threading.Thread] = None
         self._stop_event = threading.Event()
         self._pause_event = threading.Event()
+        self._wake_event = threading.Event()
         self._lock = threading.Lock()
         self._last_heartbeat: Optional[datetime] = None
+        self._in_flight: Set[int] = set()
+        self._in_flight_lock = threading.Lock()
+        self._is_leader = False
 
     def start(self) -> None:
         """
@@ -33,10 +51,12 @@ class Scheduler:
                 return
             self._stop_event.clear()
             self._pause_event.clear()
+            self._wake_event.clear()
             self._thread = threading.Thread(
                 target=self._run_loop, name="NovelBotScheduler", daemon=True
             )
             self._thread.start()
+        self._publish_state()
 
     def stop(self) -> None:
         """
@@ -44,6 +64,8 @@ class Scheduler:
         """
 
         self._stop_event.set()
+        self._wake_event.set()
+        self._publish_state()
 
     def pause(self) -> None:
         """
@@ -51,6 +73,7 @@ class Scheduler:
         """
 
         self._pause_event.set()
+        self._publish_state()
 
     def resume(self) -> None:
         """
@@ -58,6 +81,8 @@ class Scheduler:
         """
 
         self._pause_event.clear()
+        self._wake_event.set()
+        self._publish_state()
 
     def is_running(self) -> bool:
         """
@@ -80,16 +105,144 @@ class Scheduler:
 
         return self._last_heartbeat
 
+    def is_leader(self) -> bool:
+        """
+        返回当前实例是否为调度器主节点。
+        """
+
+        return self._is_leader
+
+    def instance_id(self) -> str:
+        """
+        返回当前进程的调度器实例标识。
+        """
+
+        return self._instance_id
+
+    def in_flight_novel_ids(self) -> List[int]:
+        """
+        返回工作池中正在创作的小说 ID 列表。
+        """
+
+        with self._in_flight_lock:
+            return sorted(self._in_flight)
+
+    def _publish_state(self, is_running: Optional[bool] = None) -> None:
+        """
+        向事件总线发布当前调度器状态，供控制台实时更新。
+        """
+
+        publish_scheduler_state(
+            is_running=self.is_running() if is_running is None else is_running,
+            is_paused=self.is_paused(),
+            is_leader=self._is_leader,
+            instance_id=self._instance_id,
+        )
+
     def _run_loop(self) -> None:
         """
         调度主循环，周期性执行规划与创作任务。
         """
 
+        try:
+            if settings.scheduler_worker_pool_enabled:
+                self._run_pool_loop()
+                return
+
+            while not self._stop_event.is_set():
+                self._last_heartbeat = datetime.utcnow()
+                if not self._pause_event.is_set():
+                    self._run_tick()
+                time.sleep(max(settings.scheduler_tick_seconds, 5))
+        finally:
+            # 线程即将退出，此时 is_alive 仍为真，显式发布已停止
+            self._publish_state(is_running=False)
+
+    def _run_pool_loop(self) -> None:
+        """
+        工作池模式主循环：有空闲槽位即派发下一本小说，仅在无可创作小说时退避。
+        """
+
+        idle_seconds = min(
+            max(settings.scheduler_tick_seconds, 5),
+            max(settings.leader_lease_seconds / 3.0, 1.0),
+        )
         while not self._stop_event.is_set():
             self._last_heartbeat = datetime.utcnow()
-            if not self._pause_event.is_set():
-                self._run_tick()
-            time.sleep(max(settings.scheduler_tick_seconds, 5))
+            self._wake_event.clear()
+
+            db: Session = SessionLocal()
+            try:
+                if not self._pause_event.is_set():
+                    self._dispatch_jobs(db)
+                self._run_leader_duties(db)
+            except Exception:
+                db.rollback()
+                logger.exception("调度循环执行异常")
+            finally:
+                db.close()
+
+            # 任一任务完成、恢复或停止时会被立即唤醒；
+            # 仅当暂停或暂无可创作小说时才会等满退避时间。
+            self._wake_event.wait(idle_seconds)
+
+    def _free_slots(self) -> int:
+        """
+        计算当前工作池剩余的空闲槽位数量。
+        """
+
+        limit = max(settings.max_concurrent_api_requests, 1)
+        with self._in_flight_lock:
+            return limit - len(self._in_flight)
+
+    def _dispatch_jobs(self, db: Session) -> int:
+        """
+        按空闲槽位数量挑选待创作小说并派发到工作线程，返回派发数量。
+        """
+
+        free_slots = self._free_slots()
+        if free_slots <= 0:
+            return 0
+
+        with self._in_flight_lock:
+            busy_ids = set(self._in_flight)
+
+        dispatched = 0
+        while dispatched < free_slots:
+            token = new_lease_token()
+            novel_id = claim_next_novel(db, token, exclude_ids=busy_ids)
+            if novel_id is None:
+                break
+            busy_ids.add(novel_id)
+            with self._in_flight_lock:
+                self._in_flight.add(novel_id)
+            worker = threading.Thread(
+                target=self._run_job,
+                args=(novel_id, token),
+                name=f"NovelBotWorker-{novel_id}",
+                daemon=True,
+            )
+            worker.start()
+            dispatched += 1
+
+        return dispatched
+
+    def _run_job(self, novel_id: int, token: str) -> None:
+        """
+        工作线程入口，持有租约并使用独立数据库会话为单本小说生成下一章。
+        """
+
+        db: Session = SessionLocal()
+        try:
+            with keep_novel_lease(novel_id, token):
+                generate_next_chapter_for_novel(db, novel_id, lease_token=token)
+        except Exception:
+            logger.exception("小说 %s 章节生成任务异常退出", novel_id)
+        finally:
+            db.close()
+            with self._in_flight_lock:
+                self._in_flight.discard(novel_id)
+            self._wake_event.set()
 
     def _run_tick(self) -> None:
         """
@@ -98,27 +251,41 @@ class Scheduler:
 
         db: Session = SessionLocal()
         try:
-            today = date.today()
-
-            novel: Optional[Novel] = (
-                db.query(Novel)
-                .filter(
-                    Novel.status.in_(
-                        [NovelStatus.PLANNED, NovelStatus.WRITING]
-                    ),
-                    Novel.planned_date <= today,
-                )
-                .order_by(Novel.planned_date.asc(), Novel.id.asc())
-                .first()
-            )
-
-            if novel:
-                generate_next_chapter_for_novel(db, novel.id)
+            token = new_lease_token()
+            novel_id = claim_next_novel(db, token)
+            if novel_id is not None:
+                with keep_novel_lease(novel_id, token):
+                    generate_next_chapter_for_novel(
+                        db, novel_id, lease_token=token
+                    )
 
-            self._save_state(db)
+            self._run_leader_duties(db)
         finally:
             db.close()
 
+    def _run_leader_duties(self, db: Session) -> None:
+        """
+        续约主节点身份；仅主节点负责持久化全局状态与清理过期租约。
+        """
+
+        was_leader = self._is_leader
+        try:
+            self._is_leader = acquire_leadership(db, self._instance_id)
+        except Exception:
+            db.rollback()
+            self._is_leader = False
+            logger.exception("调度器主节点选举失败")
+        if self._is_leader != was_leader:
+            self._publish_state()
+
+        if not self._is_leader:
+            return
+
+        self._save_state(db)
+        cleared = sweep_expired_leases(db)
+        if cleared:
+            logger.warning("已回收 %s 个过期的小说创作租约", cleared)
+
     def _save_state(self, db: Session) -> None:
         """
         将当前调度器运行状态持久化到数据库。
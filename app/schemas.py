@@ -1,5 +1,5 @@
 from datetime import date, datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel
 
@@ -60,6 +60,24 @@ class Chapter(ChapterBase):
         orm_mode = True
 
 
+class ChapterSummary(BaseModel):
+    id: int
+    index: int
+    title: str
+    status: ChapterStatus
+    word_count: int
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        orm_mode = True
+
+
+class ChapterPage(BaseModel):
+    items: List[ChapterSummary]
+    next_after_index: Optional[int] = None
+
+
 class NovelBase(BaseModel):
     title: str
     genre: str
@@ -79,7 +97,7 @@ class Novel(NovelBase):
     created_at: datetime
     updated_at: datetime
 
-    chapters: List[Chapter] = []
+    chapters: List[ChapterSummary] = []
     characters: List[Character] = []
 
     class Config:
@@ -94,6 +112,12 @@ class CreationLog(BaseModel):
     message: str
     api_call_id: Optional[str] = None
     latency_ms: Optional[float] = None
+    ttft_ms: Optional[float] = None
+    prompt_tokens_estimate: Optional[int] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    prompt_cache_hit_tokens: Optional[int] = None
+    prompt_cache_miss_tokens: Optional[int] = None
     created_at: datetime
 
     class Config:
@@ -149,6 +173,45 @@ class DashboardSummary(BaseModel):
     total_words: int
 
 
+class LLMUsageTotals(BaseModel):
+    calls: int
+    failed_calls: int
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+    cache_hit_tokens: int
+    cache_miss_tokens: int
+    cache_hit_ratio: Optional[float] = None
+    avg_latency_ms: Optional[float] = None
+
+
+class ChapterLLMUsage(LLMUsageTotals):
+    chapter_id: int
+    chapter_index: int
+    word_count: int
+    tokens_per_kword: Optional[float] = None
+
+
+class NovelLLMUsage(BaseModel):
+    novel_id: int
+    totals: LLMUsageTotals
+    word_count: int
+    tokens_per_kword: Optional[float] = None
+    stages: Dict[str, LLMUsageTotals]
+    chapters: List[ChapterLLMUsage]
+
+
+class DailyLLMUsage(LLMUsageTotals):
+    date: date
+
+
+class StageLLMStats(LLMUsageTotals):
+    stage: str
+    latency_p50_ms: Optional[float] = None
+    latency_p90_ms: Optional[float] = None
+    latency_p99_ms: Optional[float] = None
+
+
 class ControlCommand(BaseModel):
     action: str
 
@@ -157,6 +220,8 @@ class ControlState(BaseModel):
     is_running: bool
     is_paused: bool
     last_heartbeat: Optional[datetime] = None
+    is_leader: bool = False
+    instance_id: Optional[str] = None
 
 
 class ConfigUpdate(BaseModel):
@@ -164,4 +229,5 @@ class ConfigUpdate(BaseModel):
     default_chapters_per_novel: Optional[int] = None
     max_concurrent_api_requests: Optional[int] = None
     max_requests_per_minute: Optional[int] = None
+    max_tokens_per_minute: Optional[int] = None
     preferred_genres: Optional[List[str]] = None
@@ -0,0 +1,335 @@
+import asyncio
+import importlib.util
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from ..config import settings
+from .deepseek_client import (
+    SSE_DONE,
+    DeepSeekAPIError,
+    StreamAccumulator,
+    api_error,
+    build_chat_payload,
+    clean_content,
+    client as sync_client,
+    endpoint_payload,
+    parse_completion,
+    parse_sse_line,
+    settle_attempt,
+    should_abort,
+)
+from .llm_stages import StageProfile, lanes, stage_profile
+from .provider_pool import ProviderEndpoint, ProviderPool
+from .token_estimator import estimate_messages_tokens
+
+
+logger = logging.getLogger(__name__)
+
+
+def _http2_available() -> bool:
+    """
+    判断是否安装了 HTTP/2 所需的 h2 依赖。
+    """
+
+    return importlib.util.find_spec("h2") is not None
+
+
+class AsyncDeepSeekClient:
+    """
+    基于 asyncio 的 DeepSeek 客户端，与同步客户端的 generate_text 约定一致。
+
+    使用有界连接池与长连接，安装 h2 时启用 HTTP/2 多路复用；
+    端点池与限流额度与同步客户端共享，每次调用可设置总时限并支持取消。
+    """
+
+    def __init__(self, pool: ProviderPool) -> None:
+        self.pool = pool
+        self._max_retries = settings.api_max_retries
+        self._http2 = settings.deepseek_http2_enabled and _http2_available()
+        self._lock = threading.Lock()
+        self._clients: Dict[
+            Tuple[asyncio.AbstractEventLoop, str], httpx.AsyncClient
+        ] = {}
+
+    def _http(self, endpoint: ProviderEndpoint) -> httpx.AsyncClient:
+        """
+        返回当前事件循环上指定端点的连接池（httpx 连接不能跨事件循环复用）。
+        """
+
+        key = (asyncio.get_running_loop(), endpoint.name)
+        with self._lock:
+            http = self._clients.get(key)
+        if http is None or http.is_closed:
+            headers = {"Content-Type": "application/json"}
+            if endpoint.api_key:
+                headers["Authorization"] = f"Bearer {endpoint.api_key}"
+            http = httpx.AsyncClient(
+                base_url=endpoint.base_url,
+                headers=headers,
+                http2=self._http2,
+                limits=httpx.Limits(
+                    max_connections=settings.deepseek_http_max_connections,
+                    max_keepalive_connections=settings.deepseek_http_max_connections,
+                    keepalive_expiry=60.0,
+                ),
+                # read 超时作用于相邻数据块之间，长章节不会因总耗时超时
+                timeout=httpx.Timeout(
+                    settings.api_request_timeout, connect=10.0
+                ),
+            )
+            with self._lock:
+                self._prune_closed_loops_locked()
+                self._clients[key] = http
+        return http
+
+    def _prune_closed_loops_locked(self) -> None:
+        """
+        丢弃已关闭事件循环上的连接池：其连接无法再异步关闭，保留只会持有事件循环与连接。
+        """
+
+        for key in [key for key in self._clients if key[0].is_closed()]:
+            del self._clients[key]
+
+    async def aclose(self) -> None:
+        """
+        关闭当前事件循环上的全部连接池。
+        """
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = [
+                self._clients.pop(key) for key in list(self._clients) if key[0] is loop
+            ]
+        for http in clients:
+            await http.aclose()
+
+    async def generate_text(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        stop: Optional[List[str]] = None,
+        on_text: Optional[Callable[[str], None]] = None,
+        timeout: Optional[float] = None,
+        stage: Optional[str] = None,
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        调用 DeepSeek Chat Completions 接口生成文本。
+
+        stage 指定调用阶段，决定所用模型、并发通道与默认采样参数。
+        timeout 为包含排队、重试与退避在内的总时限（秒），默认取
+        api_call_deadline_seconds，0 表示不限；超时或任务被取消时会中断
+        进行中的请求并归还限流额度。
+        """
+
+        profile = stage_profile(stage)
+        if timeout is None:
+            timeout = settings.api_call_deadline_seconds or None
+        try:
+            return await asyncio.wait_for(
+                self._generate_in_lane(
+                    messages,
+                    profile,
+                    profile.temperature if temperature is None else temperature,
+                    profile.max_tokens if max_tokens is None else max_tokens,
+                    stop,
+                    on_text,
+                ),
+                timeout,
+            )
+        except asyncio.TimeoutError as exc:
+            raise DeepSeekAPIError(
+                f"DeepSeek API 调用超过 {timeout:g} 秒时限"
+            ) from exc
+
+    async def _generate_in_lane(
+        self,
+        messages: List[Dict[str, str]],
+        profile: StageProfile,
+        temperature: float,
+        max_tokens: int,
+        stop: Optional[List[str]],
+        on_text: Optional[Callable[[str], None]],
+    ) -> Tuple[str, Dict[str, Any]]:
+        lane = lanes.get(profile.lane)
+        lane_permit = await lane.acquire_async()
+        try:
+            text, meta = await self._generate(
+                messages, profile.model, temperature, max_tokens, stop, on_text
+            )
+        finally:
+            lane.release(lane_permit)
+        meta["stage"] = profile.stage
+        meta["lane_wait_ms"] = lane_permit.waited_seconds * 1000.0
+        return text, meta
+
+    async def _generate(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str],
+        temperature: float,
+        max_tokens: int,
+        stop: Optional[List[str]],
+        on_text: Optional[Callable[[str], None]],
+    ) -> Tuple[str, Dict[str, Any]]:
+        payload = build_chat_payload(
+            model,
+            messages,
+            temperature,
+            max_tokens,
+            stop,
+            stream=on_text is not None,
+        )
+        prompt_estimate = estimate_messages_tokens(messages)
+
+        last_error: Optional[Exception] = None
+        failed: List[str] = []
+        for attempt in range(1, self._max_retries + 1):
+            endpoint, permit = await self.pool.acquire_async(
+                prompt_estimate + max_tokens, exclude=failed[-1:]
+            )
+            content: Optional[str] = None
+            meta: Dict[str, Any] = {}
+            error: Optional[BaseException] = None
+            try:
+                if on_text is not None:
+                    content, meta = await self._stream_once(
+                        payload, endpoint, on_text
+                    )
+                else:
+                    content, meta = await self._post_once(payload, endpoint)
+            except Exception as exc:
+                error = exc
+                if should_abort(exc, self.pool, endpoint):
+                    # should_abort 只对 DeepSeekAPIError 返回 True
+                    exc.attempts = attempt
+                    raise
+            except BaseException as exc:
+                # 调用被取消时同样交给 settle_attempt，不能按成功结算
+                error = exc
+                raise
+            finally:
+                throttled = settle_attempt(
+                    self.pool, endpoint, permit, meta, error
+                )
+
+            cleaned = clean_content(content or "")
+            if cleaned:
+                usage = meta.get("usage") or {}
+                meta["attempts"] = attempt
+                meta["endpoint"] = endpoint.name
+                meta["model"] = model or endpoint.model
+                meta["prompt_tokens_estimate"] = prompt_estimate
+                meta["limiter_wait_ms"] = permit.waited_seconds * 1000.0
+                logger.info(
+                    "DeepSeek 调用完成：端点 %s，模型 %s，预估提示词 %s tokens，实际 %s tokens（缓存命中 %s），耗时 %.0f ms",
+                    endpoint.name,
+                    meta["model"],
+                    prompt_estimate,
+                    usage.get("prompt_tokens"),
+                    usage.get("prompt_cache_hit_tokens"),
+                    meta.get("latency_ms") or 0.0,
+                )
+                return cleaned, meta
+            last_error = error or DeepSeekAPIError("DeepSeek API 返回了空内容")
+            failed.append(endpoint.name)
+
+            # 限流时由限流器按 Retry-After 冷却；有其他端点时立即切换，否则指数退避
+            if (
+                not throttled
+                and attempt < self._max_retries
+                and not self.pool.has_alternative(endpoint)
+            ):
+                await asyncio.sleep(min(2 ** attempt, 30))
+
+        raise DeepSeekAPIError(
+            f"DeepSeek API 调用失败: {last_error}", attempts=self._max_retries
+        )
+
+    async def _post_once(
+        self,
+        payload: Dict[str, Any],
+        endpoint: ProviderEndpoint,
+    ) -> Tuple[Optional[str], Dict[str, Any]]:
+        """
+        向指定端点发送一次非流式请求；错误状态码抛出 DeepSeekAPIError。
+        """
+
+        loop = asyncio.get_running_loop()
+        start_ts = loop.time()
+        response = await self._http(endpoint).post(
+            "/chat/completions", json=endpoint_payload(payload, endpoint)
+        )
+        latency_ms = (loop.time() - start_ts) * 1000.0
+        if response.status_code >= 400:
+            raise api_error(response.status_code, response.headers, response.text)
+        return parse_completion(response.json(), latency_ms)
+
+    async def _stream_once(
+        self,
+        payload: Dict[str, Any],
+        endpoint: ProviderEndpoint,
+        on_text: Callable[[str], None],
+    ) -> Tuple[Optional[str], Dict[str, Any]]:
+        """
+        向指定端点发送一次流式请求并消费 SSE 增量，累计文本通过 on_text 回调。
+        """
+
+        accumulator = StreamAccumulator(on_text)
+        async with self._http(endpoint).stream(
+            "POST", "/chat/completions", json=endpoint_payload(payload, endpoint)
+        ) as response:
+            if response.status_code >= 400:
+                await response.aread()
+                raise api_error(
+                    response.status_code, response.headers, response.text
+                )
+            async for line in response.aiter_lines():
+                chunk = parse_sse_line(line)
+                if chunk is SSE_DONE:
+                    break
+                if chunk is not None:
+                    accumulator.feed(chunk)
+        return accumulator.content, accumulator.meta()
+
+
+class LLMEventLoop:
+    """
+    专用于模型调用的后台事件循环，让同步调用方共享同一个连接池。
+
+    同步线程提交协程后阻塞等待结果；等待方超时会取消协程并中断请求。
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=loop.run_forever, name="NovelBotLLMLoop", daemon=True
+                )
+                thread.start()
+                self._loop = loop
+            return self._loop
+
+    def run(self, coro: Any) -> Any:
+        """
+        在后台事件循环上运行协程并阻塞返回结果，调用线程中断时取消协程。
+        """
+
+        future = asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
+
+
+async_client = AsyncDeepSeekClient(sync_client.pool)
+llm_loop = LLMEventLoop()
@@ -0,0 +1,107 @@
+import logging
+from typing import Any, Dict, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Query, Session
+
+from ..models import Chapter, ChapterContent
+from ..content_codec import compress_body, decompress_body
+
+
+logger = logging.getLogger(__name__)
+
+# 与章节列一起查询正文时追加的列，配合 with_body 与 body_from_row 使用
+BODY_COLUMNS = (
+    ChapterContent.codec,
+    ChapterContent.data,
+    ChapterContent.original_length,
+    Chapter.legacy_content,
+)
+
+
+def with_body(query: Query) -> Query:
+    """
+    为按列查询章节的 Query 左连接正文表；尚未回填的章节从旧正文列读取。
+    """
+
+    return query.outerjoin(ChapterContent, ChapterContent.chapter_id == Chapter.id)
+
+
+def body_from_row(
+    codec: Optional[str],
+    data: Optional[bytes],
+    original_length: Optional[int],
+    legacy_content: Optional[str],
+) -> Optional[str]:
+    """
+    由 BODY_COLUMNS 对应的四列还原章节正文。
+    """
+
+    if codec is not None:
+        return decompress_body(codec, data, original_length)
+    return legacy_content
+
+
+def backfill_chapter_contents(
+    db: Session,
+    batch_size: int = 200,
+    dry_run: bool = False,
+    limit: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    将旧正文列中的章节正文压缩写入 chapter_contents 并置空旧列，每批提交一次，可中断后重跑。
+
+    dry_run 为真时只统计待迁移章节与压缩效果，不写入。
+    """
+
+    stats = {"chapters": 0, "raw_bytes": 0, "stored_bytes": 0, "skipped": 0}
+    last_id = 0
+    while limit is None or stats["chapters"] + stats["skipped"] < limit:
+        size = batch_size if limit is None else min(
+            batch_size, limit - stats["chapters"] - stats["skipped"]
+        )
+        rows = (
+            db.query(Chapter.id, Chapter.legacy_content, ChapterContent.chapter_id)
+            .outerjoin(ChapterContent, ChapterContent.chapter_id == Chapter.id)
+            .filter(Chapter.legacy_content.isnot(None), Chapter.id > last_id)
+            .order_by(Chapter.id.asc())
+            .limit(size)
+            .all()
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        values = []
+        for chapter_id, text, stored_id in rows:
+            if stored_id is not None:
+                # 已有新格式正文（例如迁移后又被重写），旧列只需置空
+                stats["skipped"] += 1
+                continue
+            codec, data, original_length = compress_body(text)
+            values.append(
+                {
+                    "chapter_id": chapter_id,
+                    "codec": codec,
+                    "data": data,
+                    "original_length": original_length,
+                }
+            )
+            stats["chapters"] += 1
+            stats["raw_bytes"] += original_length
+            stats["stored_bytes"] += len(data)
+
+        if dry_run:
+            continue
+        if values:
+            db.execute(insert(ChapterContent), values)
+        db.query(Chapter).filter(
+            Chapter.id.in_([row[0] for row in rows])
+        ).update(
+            # 原样回写 updated_at，迁移不算作章节修改
+            {Chapter.legacy_content: None, Chapter.updated_at: Chapter.updated_at},
+            synchronize_session=False,
+        )
+        db.commit()
+        logger.info("已迁移章节正文至 id %s，共 %s 章", last_id, stats["chapters"])
+    return stats
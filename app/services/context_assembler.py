@@ -0,0 +1,194 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+from ..config import settings
+from .token_estimator import estimate_tokens
+
+
+# 预算不足时各分区的填充优先级，靠前的分区先占用总预算
+SECTION_PRIORITY = [
+    "setting",
+    "latest_tail",
+    "characters",
+    "facts",
+    "retrieval",
+    "recap",
+]
+
+
+@dataclass
+class ContextItem:
+    """
+    上下文中的一个条目，预算不足时可退化为更精简的 fallback 文本。
+    """
+
+    text: str
+    fallback: Optional[str] = None
+
+
+@dataclass
+class ContextSection:
+    """
+    上下文分区：同一 budget_key 的多个分区共享一份 token 预算。
+    """
+
+    budget_key: str
+    title: Optional[str]
+    items: List[ContextItem] = field(default_factory=list)
+    prefer_recent: bool = False
+    truncate: bool = False
+
+
+@dataclass
+class AssembledContext:
+    """
+    组装完成的上下文文本及其 token 估算。
+    """
+
+    text: str
+    token_estimate: int
+    section_tokens: Dict[str, int]
+    dropped_items: int
+
+
+def context_budgets() -> Dict[str, int]:
+    """
+    从配置读取各分区的 token 预算。
+    """
+
+    return {
+        "setting": settings.context_budget_setting_tokens,
+        "characters": settings.context_budget_characters_tokens,
+        "facts": settings.context_budget_facts_tokens,
+        "retrieval": settings.context_budget_retrieval_tokens,
+        "recap": settings.context_budget_recap_tokens,
+        "latest_tail": settings.context_budget_latest_tail_tokens,
+    }
+
+
+def _truncate_to_tokens(text: str, max_tokens: int, keep_tail: bool) -> str:
+    """
+    将单个超长条目截断到预算以内，保留开头或结尾。
+    """
+
+    if max_tokens <= 0:
+        return ""
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        candidate = text[-mid:] if keep_tail else text[:mid]
+        if estimate_tokens(candidate) + 1 <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    if low == 0:
+        return ""
+    return text[-low:] if keep_tail else text[:low]
+
+
+def _fill_section(
+    section: ContextSection,
+    allowance: int,
+) -> tuple[List[Optional[str]], int, int]:
+    """
+    在给定额度内为单个分区挑选条目，返回 (按原顺序的条目文本, 消耗 token, 丢弃数)。
+    """
+
+    chosen: List[Optional[str]] = [None] * len(section.items)
+    title_cost = estimate_tokens(section.title or "") + 1 if section.title else 0
+    used = 0
+    dropped = 0
+
+    order = range(len(section.items))
+    if section.prefer_recent:
+        order = reversed(order)
+
+    for idx in order:
+        item = section.items[idx]
+        overhead = title_cost if used == 0 else 0
+        remaining = allowance - used - overhead
+
+        for candidate in (item.text, item.fallback):
+            if not candidate:
+                continue
+            cost = estimate_tokens(candidate) + 1
+            if cost <= remaining:
+                chosen[idx] = candidate
+                used += cost + overhead
+                break
+
+        if chosen[idx] is None and section.truncate and used == 0:
+            clipped = _truncate_to_tokens(
+                item.text, remaining, keep_tail=section.prefer_recent
+            )
+            if clipped:
+                chosen[idx] = clipped
+                used += estimate_tokens(clipped) + 1 + overhead
+
+        if chosen[idx] is None:
+            dropped += 1
+
+    return chosen, used, dropped
+
+
+def assemble_context(
+    sections: Sequence[ContextSection],
+    budgets: Optional[Dict[str, int]] = None,
+    total_budget: Optional[int] = None,
+) -> AssembledContext:
+    """
+    按分区预算与优先级组装上下文。
+
+    分区按 SECTION_PRIORITY 依次填充，未用完的额度顺延给后续分区，
+    同时不超过总预算；输出时仍保持分区的原始排列顺序。
+    """
+
+    budgets = budgets if budgets is not None else context_budgets()
+    remaining_total = (
+        total_budget
+        if total_budget is not None
+        else settings.context_budget_total_tokens
+    )
+
+    keys = [k for k in SECTION_PRIORITY if any(s.budget_key == k for s in sections)]
+    for section in sections:
+        if section.budget_key not in keys:
+            keys.append(section.budget_key)
+
+    filled: Dict[int, List[Optional[str]]] = {}
+    section_tokens: Dict[str, int] = {}
+    dropped_total = 0
+    carry = 0
+
+    for key in keys:
+        allowance = min(budgets.get(key, 0) + carry, remaining_total)
+        used_for_key = 0
+        for pos, section in enumerate(sections):
+            if section.budget_key != key:
+                continue
+            chosen, used, dropped = _fill_section(
+                section, allowance - used_for_key
+            )
+            filled[pos] = chosen
+            used_for_key += used
+            dropped_total += dropped
+        section_tokens[key] = used_for_key
+        remaining_total -= used_for_key
+        carry = max(allowance - used_for_key, 0)
+
+    lines: List[str] = []
+    for pos, section in enumerate(sections):
+        kept = [text for text in filled.get(pos, []) if text]
+        if not kept:
+            continue
+        if section.title:
+            lines.append(section.title)
+        lines.extend(kept)
+
+    text = "\n".join(lines)
+    return AssembledContext(
+        text=text,
+        token_estimate=estimate_tokens(text),
+        section_tokens=section_tokens,
+        dropped_items=dropped_total,
+    )
@@ -0,0 +1,435 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session, aliased
+
+from ..config import settings
+from ..models import (
+    Chapter,
+    ChapterStatus,
+    Character,
+    FactEntity,
+    PlotNode,
+    StoryFact,
+    StoryFactImportance,
+)
+from .chapter_store import BODY_COLUMNS, body_from_row, with_body
+
+
+_ENTRY_OVERHEAD_BYTES = 120
+
+
+def _text_bytes(*values: Optional[str]) -> int:
+    """
+    估算字符串占用的内存字节数（中文按每字 2 字节计）。
+    """
+
+    return sum(len(v) * 2 for v in values if v)
+
+
+@dataclass
+class ChapterDigest:
+    """
+    已完成章节在上下文中使用的摘要信息，不保留完整正文。
+    """
+
+    index: int
+    title: str
+    outline: str
+    snippet: str
+    tail: str = ""
+
+    def size_bytes(self) -> int:
+        return _ENTRY_OVERHEAD_BYTES + _text_bytes(
+            self.title, self.outline, self.snippet, self.tail
+        )
+
+
+@dataclass
+class FactEntry:
+    """
+    上下文使用的剧情事实条目。
+    """
+
+    id: int
+    chapter_index: int
+    content: str
+    importance: StoryFactImportance
+    entity_ids: Tuple[int, ...] = ()
+
+    def size_bytes(self) -> int:
+        return (
+            _ENTRY_OVERHEAD_BYTES
+            + _text_bytes(self.content)
+            + 8 * len(self.entity_ids)
+        )
+
+
+@dataclass
+class NovelContextSnapshot:
+    """
+    单本小说的上下文快照，覆盖 last_chapter_index 及之前的全部已完成章节。
+    """
+
+    novel_id: int
+    last_chapter_index: int
+    characters: List[Tuple[str, str, str]] = field(default_factory=list)
+    plot_nodes: List[Tuple[int, str]] = field(default_factory=list)
+    chapters: List[ChapterDigest] = field(default_factory=list)
+    facts: List[FactEntry] = field(default_factory=list)
+    size_bytes: int = 0
+
+    def recompute_size(self) -> None:
+        size = _ENTRY_OVERHEAD_BYTES
+        size += sum(
+            _ENTRY_OVERHEAD_BYTES + _text_bytes(*c) for c in self.characters
+        )
+        size += sum(
+            _ENTRY_OVERHEAD_BYTES + _text_bytes(n[1]) for n in self.plot_nodes
+        )
+        size += sum(c.size_bytes() for c in self.chapters)
+        size += sum(f.size_bytes() for f in self.facts)
+        self.size_bytes = size
+
+
+def make_chapter_digest(
+    index: int,
+    title: str,
+    outline: Optional[str],
+    content: Optional[str],
+) -> ChapterDigest:
+    """
+    根据章节正文生成摘要：非最新章节取首尾片段，同时保留末尾 500 字供最新章节使用。
+    """
+
+    text = (content or "").strip()
+    summary = (outline or "").strip()
+    if not summary and text:
+        summary = text[:60]
+
+    if len(text) <= 800:
+        snippet = text
+    else:
+        snippet = text[:400] + "\n……\n" + text[-300:]
+    tail = text[-500:] if len(text) > 500 else text
+
+    return ChapterDigest(
+        index=index,
+        title=title,
+        outline=summary,
+        snippet=snippet,
+        tail=tail,
+    )
+
+
+class NovelContextCache:
+    """
+    按小说缓存上下文快照，章节提交后增量更新，并按内存预算做 LRU 淘汰。
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._snapshots: "OrderedDict[int, NovelContextSnapshot]" = OrderedDict()
+        self._total_bytes = 0
+
+    def get_snapshot(
+        self,
+        db: Session,
+        novel_id: int,
+        target_chapter_index: int,
+    ) -> NovelContextSnapshot:
+        """
+        获取覆盖 target_chapter_index 之前所有章节的上下文快照。
+
+        命中缓存时只增量加载缺失的章节与事实；返回的是快照副本，可安全读取。
+        """
+
+        with self._lock:
+            snapshot = self._snapshots.get(novel_id)
+            if snapshot is not None:
+                self._snapshots.move_to_end(novel_id)
+
+        if snapshot is None or snapshot.last_chapter_index >= target_chapter_index:
+            snapshot = self._load_full(db, novel_id, target_chapter_index)
+        elif snapshot.last_chapter_index < target_chapter_index - 1:
+            snapshot = self._catch_up(db, snapshot, target_chapter_index)
+
+        with self._lock:
+            self._store_locked(snapshot)
+            return replace(
+                snapshot,
+                characters=list(snapshot.characters),
+                plot_nodes=list(snapshot.plot_nodes),
+                chapters=list(snapshot.chapters),
+                facts=list(snapshot.facts),
+            )
+
+    def note_chapter_committed(
+        self,
+        novel_id: int,
+        chapter_index: int,
+        title: str,
+        outline: Optional[str],
+        content: Optional[str],
+        facts: Iterable[StoryFact],
+        retired_fact_ids: Iterable[int] = (),
+        fact_entities: Optional[Dict[int, Tuple[int, ...]]] = None,
+    ) -> None:
+        """
+        章节提交后增量更新快照：替换最新章节片段、移除被取代的事实并追加新事实。
+
+        快照与该章节不连续时不做处理，下次读取会自动补齐。
+        """
+
+        retired = set(retired_fact_ids)
+        with self._lock:
+            snapshot = self._snapshots.get(novel_id)
+            if snapshot is None or snapshot.last_chapter_index != chapter_index - 1:
+                return
+
+            updated = replace(
+                snapshot,
+                chapters=list(snapshot.chapters),
+                facts=[f for f in snapshot.facts if f.id not in retired],
+            )
+            self._append_chapter(
+                updated, make_chapter_digest(chapter_index, title, outline, content)
+            )
+            updated.facts.extend(
+                FactEntry(
+                    id=f.id,
+                    chapter_index=f.chapter_index,
+                    content=f.content,
+                    importance=f.importance,
+                    entity_ids=(fact_entities or {}).get(f.id, ()),
+                )
+                for f in facts
+            )
+            updated.last_chapter_index = chapter_index
+            updated.recompute_size()
+            self._store_locked(updated)
+
+    def invalidate(self, novel_id: int) -> None:
+        """
+        丢弃指定小说的快照，例如小说被删除或事实被批量修改时。
+        """
+
+        with self._lock:
+            snapshot = self._snapshots.pop(novel_id, None)
+            if snapshot is not None:
+                self._total_bytes -= snapshot.size_bytes
+
+    def clear(self) -> None:
+        """
+        清空全部缓存。
+        """
+
+        with self._lock:
+            self._snapshots.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> dict:
+        """
+        返回缓存占用统计。
+        """
+
+        with self._lock:
+            return {
+                "novels": len(self._snapshots),
+                "bytes": self._total_bytes,
+                "max_bytes": self._max_bytes,
+            }
+
+    def _store_locked(self, snapshot: NovelContextSnapshot) -> None:
+        """
+        写入快照并按内存预算淘汰最久未使用的小说，调用方需持有锁。
+        """
+
+        previous = self._snapshots.pop(snapshot.novel_id, None)
+        if previous is not None:
+            self._total_bytes -= previous.size_bytes
+        self._snapshots[snapshot.novel_id] = snapshot
+        self._total_bytes += snapshot.size_bytes
+
+        while self._total_bytes > self._max_bytes and len(self._snapshots) > 1:
+            _, evicted = self._snapshots.popitem(last=False)
+            self._total_bytes -= evicted.size_bytes
+
+    def _append_chapter(
+        self, snapshot: NovelContextSnapshot, digest: ChapterDigest
+    ) -> None:
+        """
+        追加一章摘要，原最新章节只保留首尾片段。
+        """
+
+        if snapshot.chapters:
+            previous = snapshot.chapters[-1]
+            snapshot.chapters[-1] = replace(previous, tail="")
+        snapshot.chapters.append(digest)
+
+    def _load_full(
+        self,
+        db: Session,
+        novel_id: int,
+        target_chapter_index: int,
+    ) -> NovelContextSnapshot:
+        """
+        从数据库完整构建快照。
+        """
+
+        characters = [
+            (name, role or "", description or "")
+            for name, role, description in (
+                db.query(Character.name, Character.role, Character.description)
+                .filter(Character.novel_id == novel_id)
+                .order_by(Character.id.asc())
+                .all()
+            )
+        ]
+        plot_nodes = [
+            (index, summary)
+            for index, summary in (
+                db.query(PlotNode.index, PlotNode.summary)
+                .filter(PlotNode.novel_id == novel_id)
+                .order_by(PlotNode.index.asc())
+                .all()
+            )
+        ]
+        snapshot = NovelContextSnapshot(
+            novel_id=novel_id,
+            last_chapter_index=0,
+            characters=characters,
+            plot_nodes=plot_nodes,
+        )
+        return self._catch_up(db, snapshot, target_chapter_index)
+
+    def _catch_up(
+        self,
+        db: Session,
+        snapshot: NovelContextSnapshot,
+        target_chapter_index: int,
+    ) -> NovelContextSnapshot:
+        """
+        只加载快照之后、目标章节之前新增的章节与事实。
+        """
+
+        retired = self._retired_since(db, snapshot, target_chapter_index)
+        updated = replace(
+            snapshot,
+            chapters=list(snapshot.chapters),
+            facts=[f for f in snapshot.facts if f.id not in retired],
+        )
+        rows = (
+            with_body(
+                db.query(Chapter.index, Chapter.title, Chapter.outline, *BODY_COLUMNS)
+            )
+            .filter(
+                Chapter.novel_id == snapshot.novel_id,
+                Chapter.status == ChapterStatus.COMPLETED,
+                Chapter.index > snapshot.last_chapter_index,
+                Chapter.index < target_chapter_index,
+            )
+            .order_by(Chapter.index.asc())
+            .all()
+        )
+        for index, title, outline, *body in rows:
+            self._append_chapter(
+                updated,
+                make_chapter_digest(index, title, outline, body_from_row(*body)),
+            )
+
+        fact_rows = (
+            db.query(
+                StoryFact.id,
+                StoryFact.chapter_index,
+                StoryFact.content,
+                StoryFact.importance,
+            )
+            .filter(
+                StoryFact.novel_id == snapshot.novel_id,
+                StoryFact.is_active.is_(True),
+                StoryFact.chapter_index > snapshot.last_chapter_index,
+                StoryFact.chapter_index < target_chapter_index,
+            )
+            .order_by(StoryFact.chapter_index.asc(), StoryFact.id.asc())
+            .all()
+        )
+        entity_links = self._load_fact_entities(
+            db, snapshot, target_chapter_index
+        )
+        updated.facts.extend(
+            FactEntry(
+                id=fact_id,
+                chapter_index=chapter_index,
+                content=content,
+                importance=importance,
+                entity_ids=tuple(entity_links.get(fact_id, ())),
+            )
+            for fact_id, chapter_index, content, importance in fact_rows
+        )
+
+        updated.last_chapter_index = max(target_chapter_index - 1, 0)
+        updated.recompute_size()
+        return updated
+
+    def _load_fact_entities(
+        self,
+        db: Session,
+        snapshot: NovelContextSnapshot,
+        target_chapter_index: int,
+    ) -> Dict[int, List[int]]:
+        """
+        加载补齐区间内有效事实关联的实体 id。
+        """
+
+        links: Dict[int, List[int]] = {}
+        if not settings.entity_index_enabled:
+            return links
+        rows = (
+            db.query(FactEntity.fact_id, FactEntity.entity_id)
+            .join(StoryFact, StoryFact.id == FactEntity.fact_id)
+            .filter(
+                StoryFact.novel_id == snapshot.novel_id,
+                StoryFact.is_active.is_(True),
+                StoryFact.chapter_index > snapshot.last_chapter_index,
+                StoryFact.chapter_index < target_chapter_index,
+            )
+            .order_by(FactEntity.fact_id.asc(), FactEntity.entity_id.asc())
+            .all()
+        )
+        for fact_id, entity_id in rows:
+            links.setdefault(fact_id, []).append(entity_id)
+        return links
+
+    def _retired_since(
+        self,
+        db: Session,
+        snapshot: NovelContextSnapshot,
+        target_chapter_index: int,
+    ) -> Set[int]:
+        """
+        查询快照中已被新章节事实取代的旧事实（例如由其他实例写入的章节）。
+        """
+
+        if not snapshot.facts:
+            return set()
+        newer = aliased(StoryFact)
+        rows = (
+            db.query(StoryFact.id)
+            .join(newer, StoryFact.superseded_by_id == newer.id)
+            .filter(
+                StoryFact.novel_id == snapshot.novel_id,
+                StoryFact.is_active.is_(False),
+                StoryFact.chapter_index <= snapshot.last_chapter_index,
+                newer.chapter_index > snapshot.last_chapter_index,
+                newer.chapter_index < target_chapter_index,
+            )
+            .all()
+        )
+        return {row[0] for row in rows}
+
+
+context_cache = NovelContextCache(settings.context_cache_max_bytes)
@@ -1,139 +1,664 @@
-import threading
+import json
+import logging
 import time
-from collections import deque
-from typing import Any, Deque, Dict, List, Optional, Tuple
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+)
 
 import requests
 
 from ..config import settings
+from .llm_stages import StageProfile, lanes, stage_profile
+from .provider_pool import ProviderEndpoint, ProviderPool, build_provider_pool
+from .rate_limiter import LimiterPermit
+from .response_cache import response_cache, response_cache_key
+from .token_estimator import estimate_messages_tokens
+from .traffic_archive import traffic_archive
+from .usage_service import usage_recorder
 
 
-class DeepSeekRateLimiter:
+logger = logging.getLogger(__name__)
+
+
+class DeepSeekAPIError(RuntimeError):
     """
-    DeepSeek API 简单限流器，基于时间窗口统计请求次数。
+    DeepSeek 接口返回错误状态码或无效内容。
+
+    attempts 为调用放弃前实际发出的请求次数，供调用账目记录。
     """
 
-    def __init__(self, max_per_minute: int) -> None:
-        self._max_per_minute = max_per_minute
-        self._timestamps: Deque[float] = deque()
-        self._lock = threading.Lock()
+    def __init__(
+        self,
+        message: str,
+        status_code: Optional[int] = None,
+        retry_after: Optional[float] = None,
+        attempts: Optional[int] = None,
+    ) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.attempts = attempts
 
-    def acquire(self) -> None:
+    @property
+    def throttled(self) -> bool:
+        return self.status_code == 429
+
+    @property
+    def endpoint_fault(self) -> bool:
         """
-        阻塞当前线程直到满足每分钟请求上限的约束。
+        密钥无效、余额不足等只与当前端点有关的错误，可换用其他端点重试。
         """
 
-        while True:
-            with self._lock:
-                now = time.time()
-                cutoff = now - 60.0
-                while self._timestamps and self._timestamps[0] < cutoff:
-                    self._timestamps.popleft()
+        return self.status_code in (401, 402, 403)
+
+    @property
+    def retryable(self) -> bool:
+        return (
+            self.status_code is None
+            or self.status_code in (408, 429)
+            or self.status_code >= 500
+        )
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    解析 Retry-After 响应头，支持秒数与 HTTP 日期两种格式。
+    """
+
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def api_error(
+    status_code: int,
+    headers: Mapping[str, str],
+    detail: str,
+) -> DeepSeekAPIError:
+    """
+    根据错误响应构造 DeepSeekAPIError，携带状态码与 Retry-After。
+    """
+
+    return DeepSeekAPIError(
+        f"DeepSeek API error {status_code}: {detail[:200]}",
+        status_code=status_code,
+        retry_after=_parse_retry_after(headers.get("Retry-After")),
+    )
+
+
+def _raise_for_status(response: requests.Response) -> None:
+    """
+    非 2xx 响应转换为 DeepSeekAPIError。
+    """
+
+    if response.status_code < 400:
+        return
+    try:
+        detail = response.text
+    except Exception:
+        detail = ""
+    raise api_error(response.status_code, response.headers, detail)
+
+
+SSE_DONE: Dict[str, Any] = {"done": True}
+
+
+def parse_sse_line(line: str) -> Optional[Dict[str, Any]]:
+    """
+    解析一行 SSE 文本：返回 data 中的 JSON 数据块，结束标记返回 SSE_DONE，其余返回 None。
+    """
+
+    line = line.strip()
+    if not line.startswith("data:"):
+        return None
+    data = line[len("data:") :].strip()
+    if data == "[DONE]":
+        return SSE_DONE
+    try:
+        return json.loads(data)
+    except ValueError:
+        return None
 
-                if len(self._timestamps) < self._max_per_minute:
-                    self._timestamps.append(now)
-                    return
 
-                wait_seconds = 60.0 - (now - self._timestamps[0])
+class StreamAccumulator:
+    """
+    累积流式响应的增量文本、首字延迟与用量，结束后生成与非流式一致的 meta。
+    """
+
+    def __init__(self, on_text: Callable[[str], None]) -> None:
+        self._on_text = on_text
+        self._start_ts = time.time()
+        self.content = ""
+        self.ttft_ms: Optional[float] = None
+        self.request_id: Optional[str] = None
+        self.usage: Optional[Dict[str, Any]] = None
+        self.finish_reason: Optional[str] = None
+        on_text("")
+
+    def feed(self, chunk: Dict[str, Any]) -> None:
+        self.request_id = self.request_id or chunk.get("id")
+        if chunk.get("usage"):
+            self.usage = chunk["usage"]
+        for choice in chunk.get("choices") or []:
+            self.finish_reason = choice.get("finish_reason") or self.finish_reason
+            delta = (choice.get("delta") or {}).get("content")
+            if not delta:
+                continue
+            if self.ttft_ms is None:
+                self.ttft_ms = (time.time() - self._start_ts) * 1000.0
+            self.content += delta
+            self._on_text(self.content)
+
+    def meta(self) -> Dict[str, Any]:
+        return {
+            "raw": {
+                "id": self.request_id,
+                "object": "chat.completion",
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": self.content},
+                        "finish_reason": self.finish_reason,
+                    }
+                ],
+                "usage": self.usage,
+            },
+            "latency_ms": (time.time() - self._start_ts) * 1000.0,
+            "ttft_ms": self.ttft_ms,
+            "request_id": self.request_id,
+            "usage": self.usage,
+        }
+
+
+def build_chat_payload(
+    model: Optional[str],
+    messages: List[Dict[str, str]],
+    temperature: float,
+    max_tokens: int,
+    stop: Optional[List[str]],
+    stream: bool = False,
+) -> Dict[str, Any]:
+    """
+    构造 Chat Completions 请求体，model 为 None 时发送前填入端点的模型。
+    """
+
+    payload: Dict[str, Any] = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "stream": stream,
+    }
+    if stream:
+        payload["stream_options"] = {"include_usage": True}
+    if stop:
+        payload["stop"] = stop
+    return payload
+
+
+def endpoint_payload(
+    payload: Dict[str, Any],
+    endpoint: ProviderEndpoint,
+) -> Dict[str, Any]:
+    """
+    返回发往指定端点的请求体：阶段未指定模型时使用端点配置的模型。
+    """
+
+    return dict(payload, model=payload["model"] or endpoint.model)
+
+
+def parse_completion(
+    data: Dict[str, Any],
+    latency_ms: float,
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    解析非流式响应体，返回 (文本, meta)。
+    """
 
-            if wait_seconds > 0:
-                time.sleep(min(wait_seconds, 1.0))
+    content = (
+        data.get("choices", [{}])[0].get("message", {}).get("content", "")
+    )
+    return content, {
+        "raw": data,
+        "latency_ms": latency_ms,
+        "ttft_ms": None,
+        "request_id": data.get("id"),
+        "usage": data.get("usage"),
+    }
+
+
+def clean_content(content: str) -> str:
+    """
+    对模型输出的文本进行基础清洗，去除特殊符号与多余空白。
+    """
+
+    if not content:
+        return ""
+
+    cleaned = content.replace("\r\n", "\n").replace("\r", "\n")
+    cleaned = cleaned.replace("\u3000", " ").replace("\t", " ")
+    while "  " in cleaned:
+        cleaned = cleaned.replace("  ", " ")
+    lines = [line.strip() for line in cleaned.split("\n")]
+    return "\n".join(line for line in lines if line)
+
+
+def should_abort(
+    error: Exception,
+    pool: ProviderPool,
+    endpoint: ProviderEndpoint,
+) -> bool:
+    """
+    判断错误是否应立即终止调用：请求本身有误，或端点故障且没有其他端点可换。
+    """
+
+    if not isinstance(error, DeepSeekAPIError) or error.retryable:
+        return False
+    return not (error.endpoint_fault and pool.has_alternative(endpoint))
+
+
+def settle_attempt(
+    pool: ProviderPool,
+    endpoint: ProviderEndpoint,
+    permit: LimiterPermit,
+    meta: Dict[str, Any],
+    error: Optional[BaseException],
+) -> bool:
+    """
+    结束一次请求：按实际用量归还端点限流额度并更新端点健康度，返回是否被限流。
+
+    请求被取消（CancelledError 等非 Exception 异常）时只归还额度，不计入端点成败。
+    """
+
+    api_error_ = error if isinstance(error, DeepSeekAPIError) else None
+    throttled = api_error_ is not None and api_error_.throttled
+    cancelled = error is not None and not isinstance(error, Exception)
+    usage = meta.get("usage") or {}
+    endpoint.limiter.release(
+        permit,
+        actual_tokens=usage.get("total_tokens"),
+        throttled=throttled,
+        retry_after=api_error_.retry_after if throttled else None,
+        cancelled=cancelled,
+    )
+    if cancelled:
+        return False
+    if error is None:
+        pool.report_success(endpoint)
+    elif api_error_ is None or api_error_.retryable or api_error_.endpoint_fault:
+        # 限流由限流器处理，不计入端点失败
+        if not throttled:
+            pool.report_failure(
+                endpoint, eject=api_error_ is not None and api_error_.endpoint_fault
+            )
+    return throttled
 
 
 class DeepSeekClient:
     """
-    DeepSeek API 客户端封装，负责请求发送、重试与结果解析。
+    DeepSeek API 客户端封装，负责端点选择、请求发送、重试与结果解析。
     """
 
-    def __init__(self) -> None:
-        self._api_key = settings.deepseek_api_key
-        self._base_url = settings.deepseek_base_url.rstrip("/")
-        self._model = settings.deepseek_model
+    def __init__(self, pool: Optional[ProviderPool] = None) -> None:
+        self.pool = pool or build_provider_pool()
         self._timeout = settings.api_request_timeout
         self._max_retries = settings.api_max_retries
-        self._rate_limiter = DeepSeekRateLimiter(settings.max_requests_per_minute)
         self._session = requests.Session()
 
     def generate_text(
         self,
         messages: List[Dict[str, str]],
-        temperature: float = 0.9,
-        max_tokens: int = 2048,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
         stop: Optional[List[str]] = None,
+        on_text: Optional[Callable[[str], None]] = None,
+        stage: Optional[str] = None,
     ) -> Tuple[str, Dict[str, Any]]:
         """
         调用 DeepSeek Chat Completions 接口生成文本。
+
+        stage 指定调用阶段（见 llm_stages），决定所用模型、并发通道以及
+        未显式传入的 temperature 与 max_tokens。
+        传入 on_text 时改用流式接口，每收到增量都会以“当前累计文本”回调，
+        重试时累计文本从头开始，调用方据此即可识别重置。
+        启用 deepseek_async_enabled 时请求交由后台事件循环上的异步客户端发送，
+        所有调用线程共享同一个连接池。每次调用（无论成败）都会记入模型调用账目。
+        response_cache_stages 中的阶段先查询响应缓存，命中时不发起请求也不记账。
+        启用 traffic_archive_enabled 时成功调用的请求与原始响应写入调用归档。
         """
 
-        url = f"{self._base_url}/chat/completions"
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self._api_key}",
-        }
+        profile = stage_profile(stage)
+        if temperature is None:
+            temperature = profile.temperature
+        if max_tokens is None:
+            max_tokens = profile.max_tokens
+        if on_text is None and response_cache.enabled_for(profile.stage):
+            # 键取实际处理请求的模型；端点模型不一致时取全部候选模型
+            key = response_cache_key(
+                "|".join(self.pool.served_models(profile.model)),
+                messages,
+                temperature,
+                max_tokens,
+                stop,
+            )
+            return response_cache.get_or_compute(
+                key,
+                profile.stage,
+                lambda: self._generate_and_record(
+                    messages, profile, temperature, max_tokens, stop, None
+                ),
+            )
+        return self._generate_and_record(
+            messages, profile, temperature, max_tokens, stop, on_text
+        )
 
-        payload: Dict[str, Any] = {
-            "model": self._model,
-            "messages": messages,
-            "temperature": temperature,
-            "max_tokens": max_tokens,
-            "stream": False,
-        }
-        if stop:
-            payload["stop"] = stop
+    def _generate_and_record(
+        self,
+        messages: List[Dict[str, str]],
+        profile: StageProfile,
+        temperature: float,
+        max_tokens: int,
+        stop: Optional[List[str]],
+        on_text: Optional[Callable[[str], None]],
+    ) -> Tuple[str, Dict[str, Any]]:
+        start_ts = time.monotonic()
+        try:
+            text, meta = self._generate_for_stage(
+                messages, profile, temperature, max_tokens, stop, on_text
+            )
+        except Exception as exc:
+            usage_recorder.record(
+                profile.stage,
+                model="|".join(self.pool.served_models(profile.model)),
+                error=exc,
+                elapsed_ms=(time.monotonic() - start_ts) * 1000.0,
+            )
+            raise
+        usage_recorder.record(profile.stage, meta)
+        traffic_archive.record(
+            profile.stage,
+            {
+                "model": meta.get("model")
+                or "|".join(self.pool.served_models(profile.model)),
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "stop": stop,
+            },
+            text,
+            meta,
+        )
+        return text, meta
+
+    def _generate_for_stage(
+        self,
+        messages: List[Dict[str, str]],
+        profile: StageProfile,
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        stop: Optional[List[str]],
+        on_text: Optional[Callable[[str], None]],
+    ) -> Tuple[str, Dict[str, Any]]:
+        if settings.deepseek_async_enabled:
+            from .async_deepseek_client import async_client, llm_loop
+
+            return llm_loop.run(
+                async_client.generate_text(
+                    messages,
+                    temperature,
+                    max_tokens,
+                    stop,
+                    on_text,
+                    stage=profile.stage,
+                )
+            )
+
+        lane = lanes.get(profile.lane)
+        lane_permit = lane.acquire()
+        try:
+            text, meta = self._generate(
+                messages,
+                profile.model,
+                profile.temperature if temperature is None else temperature,
+                profile.max_tokens if max_tokens is None else max_tokens,
+                stop,
+                on_text,
+            )
+        finally:
+            lane.release(lane_permit)
+        meta["stage"] = profile.stage
+        meta["lane_wait_ms"] = lane_permit.waited_seconds * 1000.0
+        return text, meta
+
+    def _generate(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str],
+        temperature: float,
+        max_tokens: int,
+        stop: Optional[List[str]],
+        on_text: Optional[Callable[[str], None]],
+    ) -> Tuple[str, Dict[str, Any]]:
+        payload = build_chat_payload(
+            model, messages, temperature, max_tokens, stop
+        )
+        prompt_estimate = estimate_messages_tokens(messages)
 
         last_error: Optional[Exception] = None
+        failed: List[str] = []
         for attempt in range(1, self._max_retries + 1):
-            self._rate_limiter.acquire()
-            start_ts = time.time()
+            endpoint, permit = self.pool.acquire(
+                prompt_estimate + max_tokens, exclude=failed[-1:]
+            )
+            content: Optional[str] = None
+            meta: Dict[str, Any] = {}
+            error: Optional[Exception] = None
             try:
-                response = self._session.post(
-                    url,
-                    json=payload,
-                    headers=headers,
-                    timeout=self._timeout,
-                )
-                latency_ms = (time.time() - start_ts) * 1000.0
-                if response.status_code >= 500:
-                    last_error = RuntimeError(
-                        f"DeepSeek server error: {response.status_code}"
-                    )
+                if on_text is not None:
+                    content, meta = self._stream_once(payload, endpoint, on_text)
                 else:
-                    data = response.json()
-                    content = (
-                        data.get("choices", [{}])[0]
-                        .get("message", {})
-                        .get("content", "")
-                    )
-                    meta = {
-                        "raw": data,
-                        "latency_ms": latency_ms,
-                        "request_id": data.get("id"),
-                        "usage": data.get("usage"),
-                    }
-                    clean_text = self._clean_content(content)
-                    return clean_text, meta
+                    content, meta = self._post_once(payload, endpoint)
             except Exception as exc:
-                last_error = exc
+                error = exc
+                if should_abort(exc, self.pool, endpoint):
+                    # should_abort 只对 DeepSeekAPIError 返回 True
+                    exc.attempts = attempt
+                    raise
+            finally:
+                throttled = settle_attempt(
+                    self.pool, endpoint, permit, meta, error
+                )
+
+            cleaned = clean_content(content or "")
+            if cleaned:
+                usage = meta.get("usage") or {}
+                meta["attempts"] = attempt
+                meta["endpoint"] = endpoint.name
+                meta["model"] = model or endpoint.model
+                meta["prompt_tokens_estimate"] = prompt_estimate
+                meta["limiter_wait_ms"] = permit.waited_seconds * 1000.0
+                logger.info(
+                    "DeepSeek 调用完成：端点 %s，模型 %s，预估提示词 %s tokens，实际 %s tokens（缓存命中 %s），耗时 %.0f ms",
+                    endpoint.name,
+                    meta["model"],
+                    prompt_estimate,
+                    usage.get("prompt_tokens"),
+                    usage.get("prompt_cache_hit_tokens"),
+                    meta.get("latency_ms") or 0.0,
+                )
+                return cleaned, meta
+            last_error = error or DeepSeekAPIError("DeepSeek API 返回了空内容")
+            failed.append(endpoint.name)
+
+            # 限流时由限流器按 Retry-After 冷却；有其他端点时立即切换，否则指数退避
+            if (
+                not throttled
+                and attempt < self._max_retries
+                and not self.pool.has_alternative(endpoint)
+            ):
+                time.sleep(min(2 ** attempt, 30))
+
+        raise DeepSeekAPIError(
+            f"DeepSeek API 调用失败: {last_error}", attempts=self._max_retries
+        )
+
+    def stream_text(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        stop: Optional[List[str]] = None,
+        stage: Optional[str] = None,
+    ) -> Iterator[str]:
+        """
+        以生成器形式逐段返回模型输出的原始增量文本（单次请求，不重试）。
+        """
 
-            backoff = min(2 ** attempt, 30)
-            time.sleep(backoff)
+        profile = stage_profile(stage)
+        if temperature is None:
+            temperature = profile.temperature
+        if max_tokens is None:
+            max_tokens = profile.max_tokens
+        payload = build_chat_payload(
+            profile.model,
+            messages,
+            temperature,
+            max_tokens,
+            stop,
+            stream=True,
+        )
 
-        raise RuntimeError(f"DeepSeek API 调用失败: {last_error}")
+        lane = lanes.get(profile.lane)
+        lane_permit: Optional[LimiterPermit] = None
+        endpoint: Optional[ProviderEndpoint] = None
+        permit: Optional[LimiterPermit] = None
+        meta: Dict[str, Any] = {}
+        error: Optional[BaseException] = None
+        try:
+            lane_permit = lane.acquire()
+            endpoint, permit = self.pool.acquire(
+                estimate_messages_tokens(messages) + max_tokens
+            )
+            response = self._session.post(
+                f"{endpoint.base_url}/chat/completions",
+                json=endpoint_payload(payload, endpoint),
+                headers=self._headers(endpoint),
+                timeout=self._timeout,
+                stream=True,
+            )
+            with response:
+                _raise_for_status(response)
+                for chunk in self._iter_sse_chunks(response):
+                    if chunk.get("usage"):
+                        meta["usage"] = chunk["usage"]
+                    for choice in chunk.get("choices") or []:
+                        delta = (choice.get("delta") or {}).get("content")
+                        if delta:
+                            yield delta
+        except BaseException as exc:
+            # 调用方提前关闭生成器（GeneratorExit）按取消结算
+            error = exc
+            raise
+        finally:
+            if permit is not None:
+                settle_attempt(self.pool, endpoint, permit, meta, error)
+            if lane_permit is not None:
+                lane.release(lane_permit)
 
-    def _clean_content(self, content: str) -> str:
+    def _headers(self, endpoint: ProviderEndpoint) -> Dict[str, str]:
         """
-        对模型输出的文本进行基础清洗，去除特殊符号与多余空白。
+        构造请求头。
         """
 
-        if not content:
-            return ""
+        headers = {"Content-Type": "application/json"}
+        if endpoint.api_key:
+            headers["Authorization"] = f"Bearer {endpoint.api_key}"
+        return headers
+
+    def _post_once(
+        self,
+        payload: Dict[str, Any],
+        endpoint: ProviderEndpoint,
+    ) -> Tuple[Optional[str], Dict[str, Any]]:
+        """
+        向指定端点发送一次非流式请求；错误状态码抛出 DeepSeekAPIError。
+        """
+
+        start_ts = time.time()
+        response = self._session.post(
+            f"{endpoint.base_url}/chat/completions",
+            json=endpoint_payload(payload, endpoint),
+            headers=self._headers(endpoint),
+            timeout=self._timeout,
+        )
+        latency_ms = (time.time() - start_ts) * 1000.0
+        _raise_for_status(response)
+        return parse_completion(response.json(), latency_ms)
+
+    def _stream_once(
+        self,
+        payload: Dict[str, Any],
+        endpoint: ProviderEndpoint,
+        on_text: Callable[[str], None],
+    ) -> Tuple[Optional[str], Dict[str, Any]]:
+        """
+        向指定端点发送一次流式请求并消费 SSE 增量，累计文本通过 on_text 回调。
+
+        超时参数作用于相邻数据块之间，长章节不会因总耗时超时。
+        """
+
+        stream_payload = endpoint_payload(payload, endpoint)
+        stream_payload["stream"] = True
+        stream_payload["stream_options"] = {"include_usage": True}
+
+        accumulator = StreamAccumulator(on_text)
+        response = self._session.post(
+            f"{endpoint.base_url}/chat/completions",
+            json=stream_payload,
+            headers=self._headers(endpoint),
+            timeout=self._timeout,
+            stream=True,
+        )
+        with response:
+            _raise_for_status(response)
+            for chunk in self._iter_sse_chunks(response):
+                accumulator.feed(chunk)
+        return accumulator.content, accumulator.meta()
+
+    def _iter_sse_chunks(
+        self, response: requests.Response
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        解析 SSE 响应流，逐个返回 data 字段中的 JSON 数据块。
+        """
 
-        cleaned = content.replace("\r\n", "\n").replace("\r", "\n")
-        cleaned = cleaned.replace("\u3000", " ").replace("\t", " ")
-        while "  " in cleaned:
-            cleaned = cleaned.replace("  ", " ")
-        lines = [line.strip() for line in cleaned.split("\n")]
-        return "\n".join(line for line in lines if line)
+        for raw_line in response.iter_lines():
+            if not raw_line:
+                continue
+            chunk = parse_sse_line(raw_line.decode("utf-8", errors="replace"))
+            if chunk is SSE_DONE:
+                return
+            if chunk is not None:
+                yield chunk
 
 
 client = DeepSeekClient()
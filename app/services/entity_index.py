@@ -0,0 +1,263 @@
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import (
+    ChapterEntity,
+    EntityKind,
+    FactEntity,
+    StoryEntity,
+    StoryFact,
+)
+
+
+# 事实行末尾的实体标注，例如“- 林晚已与苏家退婚｜涉及：林晚、苏家”
+_ENTITY_TAG_PATTERN = re.compile(r"\s*[｜|]\s*涉及\s*[:：]\s*(.*)$")
+_NAME_SEPARATORS = re.compile(r"[、，,;；/\s]+")
+
+_PLACE_SUFFIXES = (
+    "城", "山", "村", "镇", "府", "宫", "殿", "谷", "岛", "国", "州", "县",
+    "街", "楼", "寺", "观", "峰", "湖", "河", "海", "洞", "林", "原", "关",
+)
+_ORGANIZATION_SUFFIXES = (
+    "宗", "门", "派", "帮", "会", "盟", "教", "阁", "军", "家族", "集团",
+    "公司", "学院", "书院", "商会", "世家",
+)
+
+_MIN_NAME_LENGTH = 2
+_MAX_NAME_LENGTH = 32
+
+
+def split_fact_entities(line: str) -> Tuple[str, List[str]]:
+    """
+    拆分事实行末尾的“｜涉及：”实体标注，返回 (事实正文, 实体名称列表)。
+    """
+
+    match = _ENTITY_TAG_PATTERN.search(line)
+    if not match:
+        return line, []
+    return line[: match.start()].strip(), clean_entity_names(
+        _NAME_SEPARATORS.split(match.group(1))
+    )
+
+
+def clean_entity_names(names: Iterable[str]) -> List[str]:
+    """
+    去掉名称两侧的引号与括号，并丢弃过短或过长的名称。
+    """
+
+    cleaned = [name.strip().strip("“”\"'《》[]【】") for name in names]
+    return [
+        name
+        for name in cleaned
+        if _MIN_NAME_LENGTH <= len(name) <= _MAX_NAME_LENGTH
+    ]
+
+
+def entity_key(name: str) -> str:
+    """
+    实体名称的比较键：统一全角半角与大小写。
+
+    MySQL 的 *_ci 排序规则下只差大小写或全角半角的名称会触发唯一约束，去重需与之一致。
+    """
+
+    return unicodedata.normalize("NFKC", name).casefold()
+
+
+def classify_entity_name(name: str, character_names: Set[str]) -> EntityKind:
+    """
+    根据已登记人物与常见后缀推断实体类型。
+    """
+
+    if name in character_names:
+        return EntityKind.CHARACTER
+    if name.endswith(_ORGANIZATION_SUFFIXES):
+        return EntityKind.ORGANIZATION
+    if name.endswith(_PLACE_SUFFIXES):
+        return EntityKind.PLACE
+    return EntityKind.OTHER
+
+
+def load_entity_names(db: Session, novel_id: int) -> Dict[str, int]:
+    """
+    读取小说的全部实体，返回 名称 -> 实体 id。
+    """
+
+    return {
+        name: entity_id
+        for entity_id, name in db.query(StoryEntity.id, StoryEntity.name)
+        .filter(StoryEntity.novel_id == novel_id)
+        .all()
+    }
+
+
+def find_mentions(names: Dict[str, int], text: str) -> Counter:
+    """
+    统计文本中出现的已知实体及出现次数。
+    """
+
+    mentions: Counter = Counter()
+    if not text:
+        return mentions
+    for name, entity_id in names.items():
+        count = text.count(name)
+        if count:
+            mentions[entity_id] += count
+    return mentions
+
+
+def ensure_entities(
+    db: Session,
+    novel_id: int,
+    names: Dict[str, int],
+    new_names: Iterable[str],
+    character_names: Set[str],
+) -> None:
+    """
+    为尚未登记的名称创建实体，并就地更新 names 映射。
+
+    与已有实体只差大小写或全角半角的名称映射到已有实体，不重复创建。
+    """
+
+    keys = {entity_key(name): entity_id for name, entity_id in names.items()}
+    for name in new_names:
+        if name in names:
+            continue
+        key = entity_key(name)
+        entity_id = keys.get(key)
+        if entity_id is None:
+            entity_id = _create_entity(
+                db, novel_id, name, classify_entity_name(name, character_names)
+            )
+            keys[key] = entity_id
+        names[name] = entity_id
+
+
+def _create_entity(db: Session, novel_id: int, name: str, kind: EntityKind) -> int:
+    """
+    在保存点内创建实体并返回 id；违反唯一约束时读取已有的同名实体。
+    """
+
+    try:
+        with db.begin_nested():
+            entity = StoryEntity(novel_id=novel_id, name=name, kind=kind)
+            db.add(entity)
+        return entity.id
+    except IntegrityError:
+        # 其他工作线程刚创建了同名实体，或排序规则认为两个名称相同；锁定读取才能看到刚提交的行
+        row = (
+            db.query(StoryEntity.id)
+            .filter(StoryEntity.novel_id == novel_id, StoryEntity.name == name)
+            .with_for_update()
+            .first()
+        )
+        if row is None:
+            raise
+        return row[0]
+
+
+def link_fact_entities(
+    db: Session,
+    novel_id: int,
+    facts: Sequence[StoryFact],
+    tagged_names: Sequence[Sequence[str]],
+    character_names: Set[str],
+) -> Dict[int, Tuple[int, ...]]:
+    """
+    记录每条事实涉及的实体：模型标注的名称加上正文中出现的已知实体。
+
+    事实需已 flush 以获得 id，返回 事实 id -> 实体 id 元组。
+    """
+
+    names = load_entity_names(db, novel_id)
+    ensure_entities(
+        db,
+        novel_id,
+        names,
+        list(character_names)
+        + [name for group in tagged_names for name in group],
+        character_names,
+    )
+
+    links: Dict[int, Tuple[int, ...]] = {}
+    for fact, tagged in zip(facts, tagged_names):
+        entity_ids = {names[name] for name in tagged if name in names}
+        entity_ids.update(find_mentions(names, fact.content))
+        links[fact.id] = tuple(sorted(entity_ids))
+        db.add_all(
+            FactEntity(novel_id=novel_id, fact_id=fact.id, entity_id=entity_id)
+            for entity_id in links[fact.id]
+        )
+    return links
+
+
+def record_chapter_mentions(
+    db: Session,
+    novel_id: int,
+    chapter_id: int,
+    chapter_index: int,
+    text: str,
+) -> Set[int]:
+    """
+    记录章节小结与正文中出现的实体，返回出现过的实体 id。
+    """
+
+    mentions = find_mentions(load_entity_names(db, novel_id), text)
+    db.query(ChapterEntity).filter(ChapterEntity.chapter_id == chapter_id).delete(
+        synchronize_session=False
+    )
+    db.add_all(
+        ChapterEntity(
+            novel_id=novel_id,
+            chapter_id=chapter_id,
+            chapter_index=chapter_index,
+            entity_id=entity_id,
+            mention_count=count,
+        )
+        for entity_id, count in mentions.items()
+    )
+    return set(mentions)
+
+
+def entities_in_play(
+    db: Session,
+    novel_id: int,
+    target_chapter_index: int,
+    text: str,
+    names: Optional[Dict[str, int]] = None,
+) -> Set[int]:
+    """
+    判断即将写作的章节涉及哪些实体：文本中直接提到的，加上最近几章出场的。
+    """
+
+    if names is None:
+        names = load_entity_names(db, novel_id)
+    in_play = set(find_mentions(names, text))
+
+    window = max(settings.entity_recent_chapters, 0)
+    if window:
+        rows = (
+            db.query(ChapterEntity.entity_id)
+            .filter(
+                ChapterEntity.novel_id == novel_id,
+                ChapterEntity.chapter_index >= target_chapter_index - window,
+                ChapterEntity.chapter_index < target_chapter_index,
+            )
+            .distinct()
+            .all()
+        )
+        in_play.update(row[0] for row in rows)
+    return in_play
+
+
+def is_fact_relevant(entity_ids: Tuple[int, ...], in_play: Set[int]) -> bool:
+    """
+    事实未关联任何实体（全局设定）或关联了在场实体时视为相关。
+    """
+
+    return not entity_ids or not in_play.isdisjoint(entity_ids)
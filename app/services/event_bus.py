@@ -0,0 +1,228 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+
+from ..config import settings
+
+
+EVENT_CHAPTER_COMPLETED = "chapter-completed"
+EVENT_LOG_ADDED = "log-added"
+EVENT_SCHEDULER_STATE = "scheduler-state"
+EVENT_METRIC_DELTA = "metric-delta"
+# 订阅者错过的事件已不在缓冲区（或服务已重启）时下发，前端应整体刷新
+EVENT_RESYNC = "resync"
+
+
+_Waiter = Tuple[asyncio.AbstractEventLoop, asyncio.Event]
+
+
+class EventBus:
+    """
+    进程内事件总线，生成线程与 API 在事务提交后发布事件，控制台通过 SSE 订阅增量。
+
+    事件带单调递增的 id 并保留最近若干条，断线重连时按 Last-Event-ID 补发；
+    与章节预览相同，通过 call_soon_threadsafe 唤醒订阅者，订阅者不占用线程池。
+    多实例部署时只能收到本进程发布的事件。
+    """
+
+    def __init__(self, buffer_size: Optional[int] = None) -> None:
+        self._lock = threading.Lock()
+        self._events: Deque[Dict[str, Any]] = deque(
+            maxlen=max(buffer_size or settings.event_bus_buffer_size, 1)
+        )
+        self._last_id = 0
+        self._waiters: Set[_Waiter] = set()
+
+    def publish(self, event: str, data: Dict[str, Any]) -> int:
+        """
+        发布一条事件并唤醒所有订阅者，返回事件 id；可在任意线程调用。
+        """
+
+        with self._lock:
+            self._last_id += 1
+            self._events.append(
+                {"id": self._last_id, "event": event, "data": data, "ts": time.time()}
+            )
+            for loop, waiter in self._waiters:
+                try:
+                    loop.call_soon_threadsafe(waiter.set)
+                except RuntimeError:
+                    # 事件循环已关闭，订阅者会在 finally 中自行注销
+                    continue
+            return self._last_id
+
+    def last_id(self) -> int:
+        with self._lock:
+            return self._last_id
+
+    def _events_after_locked(self, after_id: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        返回 id 大于 after_id 的事件；所需事件已被淘汰或 id 来自重启前的进程时返回 None。
+        """
+
+        if after_id > self._last_id:
+            return None
+        if not self._events:
+            return [] if after_id == self._last_id else None
+        if after_id < self._events[0]["id"] - 1:
+            return None
+        return [item for item in self._events if item["id"] > after_id]
+
+    async def subscribe(
+        self,
+        last_event_id: Optional[int] = None,
+        keepalive_seconds: float = 15.0,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        订阅事件流，依次产出 {"id", "event", "data"}。
+
+        传入 last_event_id 时先补发其后的事件，无法补发则先产出 resync 事件；
+        长时间无事件时产出不带 id 的 ping 事件保持连接。
+        """
+
+        waiter: _Waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._waiters.add(waiter)
+            if last_event_id is None:
+                sent_id = self._last_id
+                pending: Optional[List[Dict[str, Any]]] = []
+            else:
+                pending = self._events_after_locked(last_event_id)
+                sent_id = self._last_id if pending is None else last_event_id
+
+        try:
+            if pending is None:
+                yield {"id": sent_id, "event": EVENT_RESYNC, "data": {}}
+            while True:
+                waiter[1].clear()
+                with self._lock:
+                    batch = self._events_after_locked(sent_id)
+                    if batch is None:
+                        # 订阅者消费过慢，缓冲区已覆盖未发送的事件
+                        sent_id = self._last_id
+                if batch is None:
+                    yield {"id": sent_id, "event": EVENT_RESYNC, "data": {}}
+                    continue
+                if not batch:
+                    try:
+                        await asyncio.wait_for(
+                            waiter[1].wait(), timeout=keepalive_seconds
+                        )
+                    except asyncio.TimeoutError:
+                        yield {"id": None, "event": "ping", "data": {}}
+                    continue
+                for item in batch:
+                    sent_id = item["id"]
+                    yield {"id": item["id"], "event": item["event"], "data": item["data"]}
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+
+event_bus = EventBus()
+
+
+def _iso(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def publish_chapter_completed(
+    novel_id: int,
+    chapter_id: int,
+    chapter_index: int,
+    title: str,
+    word_count: int,
+    novel_status: str,
+    chapter_completed: int,
+    chapter_total: int,
+    words: int,
+) -> None:
+    """
+    章节提交后发布：前端据此更新对应小说行的进度，无需重新拉取仪表盘。
+    """
+
+    event_bus.publish(
+        EVENT_CHAPTER_COMPLETED,
+        {
+            "novel_id": novel_id,
+            "chapter_id": chapter_id,
+            "chapter_index": chapter_index,
+            "title": title,
+            "word_count": word_count,
+            "status": novel_status,
+            "chapter_completed": chapter_completed,
+            "chapter_total": chapter_total,
+            "words": words,
+        },
+    )
+
+
+def publish_log_added(log: Any) -> None:
+    event_bus.publish(
+        EVENT_LOG_ADDED,
+        {
+            "id": log.id,
+            "novel_id": log.novel_id,
+            "chapter_id": log.chapter_id,
+            "level": log.level,
+            "message": log.message,
+            "created_at": _iso(log.created_at),
+        },
+    )
+
+
+def publish_scheduler_state(
+    is_running: bool,
+    is_paused: bool,
+    is_leader: bool,
+    instance_id: str,
+) -> None:
+    event_bus.publish(
+        EVENT_SCHEDULER_STATE,
+        {
+            "is_running": is_running,
+            "is_paused": is_paused,
+            "is_leader": is_leader,
+            "instance_id": instance_id,
+        },
+    )
+
+
+def publish_metric_delta(
+    reason: str,
+    novels: int = 0,
+    chapters: int = 0,
+    words: int = 0,
+    day: Optional[date] = None,
+    daily_novels: int = 0,
+    daily_chapters: int = 0,
+    daily_words: int = 0,
+    novel_id: Optional[int] = None,
+) -> None:
+    """
+    发布全站累计统计与当日统计的增量，与 progress_counters 的累加口径一致。
+
+    reason 为 chapter-completed / novel-created / novel-deleted，
+    后两者会改变小说列表，前端需重新拉取一次仪表盘。
+    """
+
+    data: Dict[str, Any] = {
+        "reason": reason,
+        "novel_id": novel_id,
+        "total_novels": novels,
+        "total_chapters": chapters,
+        "total_words": words,
+    }
+    if day is not None:
+        data["daily"] = {
+            "date": day.isoformat(),
+            "novel_count": daily_novels,
+            "chapter_count": daily_chapters,
+            "word_count": daily_words,
+        }
+    event_bus.publish(EVENT_METRIC_DELTA, data)
@@ -0,0 +1,224 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import StoryFact, StoryFactImportance
+from .retrieval import char_bigrams
+
+
+_NOISE_PATTERN = re.compile(r"[\s\W_]+", re.UNICODE)
+
+# 事实动作：与已有事实完全相同、取代已有事实、或是全新信息
+FACT_DUPLICATE = "duplicate"
+FACT_SUPERSEDE = "supersede"
+FACT_NEW = "new"
+
+
+def normalize_fact_text(text: str) -> str:
+    """
+    归一化事实文本：去掉重要性标记、空白与标点，统一为小写。
+    """
+
+    clean = text.strip()
+    for tag in ("[重要]", "[一般]"):
+        if clean.startswith(tag):
+            clean = clean[len(tag) :]
+    return _NOISE_PATTERN.sub("", clean).lower()
+
+
+def fact_shingles(text: str) -> Set[str]:
+    """
+    将事实文本切分为字符二元组集合，用于相似度比较。
+    """
+
+    return set(char_bigrams(text))
+
+
+@dataclass
+class FactDecision:
+    """
+    新事实与规范事实集比对后的处理结论。
+    """
+
+    action: str
+    importance: StoryFactImportance
+    matched_key: Optional[Hashable] = None
+
+
+@dataclass
+class _CanonicalFact:
+    normalized: str
+    shingles: Set[str]
+    importance: StoryFactImportance
+
+
+class CanonicalFactSet:
+    """
+    单本小说当前有效的规范事实集，按字符二元组建立倒排表以快速查找相似事实。
+    """
+
+    def __init__(self, threshold: Optional[float] = None) -> None:
+        self._threshold = (
+            threshold if threshold is not None else settings.fact_merge_similarity
+        )
+        self._facts: Dict[Hashable, _CanonicalFact] = {}
+        self._by_text: Dict[str, Hashable] = {}
+        self._postings: Dict[str, Set[Hashable]] = {}
+
+    def __len__(self) -> int:
+        return len(self._facts)
+
+    def add(
+        self,
+        key: Hashable,
+        content: str,
+        importance: StoryFactImportance,
+    ) -> None:
+        """
+        将一条事实加入规范集。
+        """
+
+        normalized = normalize_fact_text(content)
+        shingles = fact_shingles(normalized)
+        self._facts[key] = _CanonicalFact(normalized, shingles, importance)
+        self._by_text[normalized] = key
+        for gram in shingles:
+            self._postings.setdefault(gram, set()).add(key)
+
+    def retire(self, key: Hashable) -> None:
+        """
+        将被取代的事实移出规范集。
+        """
+
+        fact = self._facts.pop(key, None)
+        if fact is None:
+            return
+        if self._by_text.get(fact.normalized) == key:
+            del self._by_text[fact.normalized]
+        for gram in fact.shingles:
+            keys = self._postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[gram]
+
+    def classify(
+        self,
+        content: str,
+        importance: StoryFactImportance,
+    ) -> FactDecision:
+        """
+        判断新事实应当丢弃、取代某条已有事实，还是作为新信息写入。
+
+        文本归一化后完全相同且重要性不升级时视为重复；与已有事实高度相似，
+        或完整包含一般事实时视为后文对同一设定的更新。包含也可能是否定
+        （“……的说法被证实是谎言”），因此重要事实只在高度相似时被取代，
+        否则作为新事实写入，交由一致性审核判断。重要性只升不降，
+        被取代的重要事实由新事实继承“重要”标记。
+        """
+
+        normalized = normalize_fact_text(content)
+        if not normalized:
+            return FactDecision(FACT_DUPLICATE, importance)
+
+        exact_key = self._by_text.get(normalized)
+        if exact_key is not None:
+            existing = self._facts[exact_key]
+            if (
+                importance == StoryFactImportance.CRITICAL
+                and existing.importance != StoryFactImportance.CRITICAL
+            ):
+                return FactDecision(FACT_SUPERSEDE, importance, exact_key)
+            return FactDecision(FACT_DUPLICATE, existing.importance, exact_key)
+
+        match = self._best_match(fact_shingles(normalized))
+        if match is None:
+            return FactDecision(FACT_NEW, importance)
+
+        existing = self._facts[match]
+        if existing.importance == StoryFactImportance.CRITICAL:
+            importance = StoryFactImportance.CRITICAL
+        return FactDecision(FACT_SUPERSEDE, importance, match)
+
+    def _best_match(self, shingles: Set[str]) -> Optional[Hashable]:
+        """
+        返回与给定二元组集合最相似且达到阈值的事实键。
+        """
+
+        if not shingles:
+            return None
+
+        overlaps: Dict[Hashable, int] = {}
+        for gram in shingles:
+            for key in self._postings.get(gram, ()):
+                overlaps[key] = overlaps.get(key, 0) + 1
+
+        best_key: Optional[Hashable] = None
+        best_score = 0.0
+        for key, overlap in overlaps.items():
+            fact = self._facts[key]
+            other = fact.shingles
+            jaccard = overlap / (len(shingles) + len(other) - overlap)
+            # 新事实完整包含旧的一般事实（补充了细节）时同样视为更新
+            contained = (
+                fact.importance != StoryFactImportance.CRITICAL
+                and len(other) >= 4
+                and overlap == len(other)
+            )
+            score = 1.0 if contained else jaccard
+            if score >= self._threshold and score > best_score:
+                best_key, best_score = key, score
+        return best_key
+
+
+def load_canonical_facts(
+    facts: Iterable[Tuple[int, str, StoryFactImportance]],
+) -> CanonicalFactSet:
+    """
+    由 (id, 内容, 重要性) 序列构建规范事实集，键为事实 id。
+    """
+
+    canonical = CanonicalFactSet()
+    for fact_id, content, importance in facts:
+        canonical.add(fact_id, content, importance)
+    return canonical
+
+
+def compact_novel_facts(db: Session, novel_id: int) -> List[int]:
+    """
+    对单本小说的全部有效事实做一次完整压实，返回本次被置为无效的事实 id。
+
+    按章节顺序重放事实：重复事实指向最早的版本，被更新的事实指向最新的版本。
+    """
+
+    rows: List[StoryFact] = (
+        db.query(StoryFact)
+        .filter(StoryFact.novel_id == novel_id, StoryFact.is_active.is_(True))
+        .order_by(StoryFact.chapter_index.asc(), StoryFact.id.asc())
+        .all()
+    )
+
+    canonical = CanonicalFactSet()
+    by_id: Dict[int, StoryFact] = {fact.id: fact for fact in rows}
+    retired: List[int] = []
+    for fact in rows:
+        decision = canonical.classify(fact.content, fact.importance)
+        if decision.action == FACT_DUPLICATE:
+            fact.is_active = False
+            fact.superseded_by_id = decision.matched_key
+            retired.append(fact.id)
+            continue
+        if decision.action == FACT_SUPERSEDE:
+            previous = by_id[decision.matched_key]
+            previous.is_active = False
+            previous.superseded_by_id = fact.id
+            canonical.retire(previous.id)
+            fact.importance = decision.importance
+            retired.append(previous.id)
+        canonical.add(fact.id, fact.content, fact.importance)
+
+    db.commit()
+    return retired
@@ -0,0 +1,262 @@
+import itertools
+import logging
+import os
+import socket
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Collection, Iterator, Optional
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..db import SessionLocal
+from ..models import Novel, NovelStatus, SystemState
+
+
+logger = logging.getLogger(__name__)
+
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+LEADER_STATE_KEY = "scheduler_leader"
+
+_token_counter = itertools.count(1)
+
+
+def new_lease_token() -> str:
+    """
+    生成一个全局唯一的租约令牌，同一进程内的不同任务也互不相同。
+    """
+
+    return f"{INSTANCE_ID}#{next(_token_counter)}"
+
+
+def _lease_available(now: datetime):
+    """
+    构造“租约空闲或已过期”的过滤条件。
+    """
+
+    return or_(
+        Novel.lease_owner.is_(None),
+        Novel.lease_expires_at.is_(None),
+        Novel.lease_expires_at < now,
+    )
+
+
+def claim_novel_lease(
+    db: Session,
+    novel_id: int,
+    token: str,
+    ttl_seconds: Optional[int] = None,
+) -> bool:
+    """
+    尝试为指定小说申领创作租约，成功返回 True。
+
+    通过带条件的 UPDATE 实现原子抢占，SQLite 与 MySQL 下语义一致。
+    """
+
+    now = datetime.utcnow()
+    ttl = ttl_seconds or settings.novel_lease_seconds
+    updated = (
+        db.query(Novel)
+        .filter(Novel.id == novel_id, _lease_available(now))
+        .update(
+            {
+                Novel.lease_owner: token,
+                Novel.lease_expires_at: now + timedelta(seconds=ttl),
+                Novel.updated_at: Novel.updated_at,
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return updated == 1
+
+
+def claim_next_novel(
+    db: Session,
+    token: str,
+    exclude_ids: Collection[int] = (),
+    ttl_seconds: Optional[int] = None,
+) -> Optional[int]:
+    """
+    挑选一本可创作且未被其他实例占用的小说并申领租约，返回小说 ID。
+
+    MySQL 8 下候选行使用 FOR UPDATE SKIP LOCKED 读取，
+    并发实例不会在同一行上排队；最终归属仍以条件 UPDATE 为准。
+    """
+
+    now = datetime.utcnow()
+    query = db.query(Novel.id).filter(
+        Novel.status.in_([NovelStatus.PLANNED, NovelStatus.WRITING]),
+        Novel.planned_date <= date.today(),
+        _lease_available(now),
+    )
+    if exclude_ids:
+        query = query.filter(Novel.id.notin_(list(exclude_ids)))
+    query = query.order_by(Novel.planned_date.asc(), Novel.id.asc()).limit(
+        settings.lease_claim_batch_size
+    )
+    if settings.lease_skip_locked and db.get_bind().dialect.name == "mysql":
+        query = query.with_for_update(skip_locked=True)
+
+    candidate_ids = [row[0] for row in query.all()]
+    db.commit()
+
+    for novel_id in candidate_ids:
+        if claim_novel_lease(db, novel_id, token, ttl_seconds):
+            return novel_id
+    return None
+
+
+def renew_novel_lease(
+    db: Session,
+    novel_id: int,
+    token: str,
+    ttl_seconds: Optional[int] = None,
+    commit: bool = True,
+) -> bool:
+    """
+    续约当前持有的租约；租约已被他人接管时返回 False。
+
+    commit=False 时续约语句加入调用方事务，可作为提交前的归属校验。
+    """
+
+    ttl = ttl_seconds or settings.novel_lease_seconds
+    updated = (
+        db.query(Novel)
+        .filter(Novel.id == novel_id, Novel.lease_owner == token)
+        .update(
+            {
+                Novel.lease_expires_at: datetime.utcnow()
+                + timedelta(seconds=ttl),
+                Novel.updated_at: Novel.updated_at,
+            },
+            synchronize_session=False,
+        )
+    )
+    if commit:
+        db.commit()
+    return updated == 1
+
+
+def release_novel_lease(db: Session, novel_id: int, token: str) -> None:
+    """
+    释放当前持有的租约，租约已不属于自己时不做任何修改。
+    """
+
+    db.query(Novel).filter(
+        Novel.id == novel_id, Novel.lease_owner == token
+    ).update(
+        {
+            Novel.lease_owner: None,
+            Novel.lease_expires_at: None,
+            Novel.updated_at: Novel.updated_at,
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+
+
+def sweep_expired_leases(db: Session) -> int:
+    """
+    清理已过期的租约字段，返回被清理的小说数量。
+    """
+
+    now = datetime.utcnow()
+    cleared = (
+        db.query(Novel)
+        .filter(Novel.lease_owner.isnot(None), Novel.lease_expires_at < now)
+        .update(
+            {
+                Novel.lease_owner: None,
+                Novel.lease_expires_at: None,
+                Novel.updated_at: Novel.updated_at,
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return cleared
+
+
+@contextmanager
+def keep_novel_lease(novel_id: int, token: str) -> Iterator[None]:
+    """
+    在上下文期间由后台线程定期续约，退出时释放租约。
+    """
+
+    stop_event = threading.Event()
+    interval = max(settings.novel_lease_seconds / 3.0, 1.0)
+
+    def _heartbeat() -> None:
+        while not stop_event.wait(interval):
+            db: Session = SessionLocal()
+            try:
+                if not renew_novel_lease(db, novel_id, token):
+                    logger.warning("小说 %s 的创作租约已丢失：%s", novel_id, token)
+                    return
+            except Exception:
+                logger.exception("小说 %s 租约续约失败", novel_id)
+            finally:
+                db.close()
+
+    heartbeat = threading.Thread(
+        target=_heartbeat, name=f"NovelLease-{novel_id}", daemon=True
+    )
+    heartbeat.start()
+    try:
+        yield
+    finally:
+        stop_event.set()
+        db: Session = SessionLocal()
+        try:
+            release_novel_lease(db, novel_id, token)
+        except Exception:
+            logger.exception("小说 %s 租约释放失败", novel_id)
+        finally:
+            db.close()
+
+
+def acquire_leadership(db: Session, instance_id: str = INSTANCE_ID) -> bool:
+    """
+    申领或续约调度器主节点身份，返回当前实例是否为主节点。
+
+    主节点信息保存在 system_state 表中，updated_at 超过租期即视为失效。
+    """
+
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=settings.leader_lease_seconds)
+    updated = (
+        db.query(SystemState)
+        .filter(
+            SystemState.key == LEADER_STATE_KEY,
+            or_(SystemState.value == instance_id, SystemState.updated_at < cutoff),
+        )
+        .update(
+            {SystemState.value: instance_id, SystemState.updated_at: now},
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    if updated == 1:
+        return True
+
+    exists = (
+        db.query(SystemState.id)
+        .filter(SystemState.key == LEADER_STATE_KEY)
+        .one_or_none()
+    )
+    if exists:
+        return False
+
+    db.add(SystemState(key=LEADER_STATE_KEY, value=instance_id, updated_at=now))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return False
+    return True
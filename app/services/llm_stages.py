@@ -0,0 +1,181 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from ..config import settings
+from .rate_limiter import AdaptiveRateLimiter, LimiterPermit
+
+
+# 模型调用阶段：章节正文、事实提取、一致性审核、剧情摘要，以及审核与提取合并的一次调用
+STAGE_DRAFT = "draft"
+STAGE_EXTRACT = "extract"
+STAGE_AUDIT = "audit"
+STAGE_SUMMARY = "summary"
+STAGE_REVIEW = "review"
+
+_STAGES = (STAGE_DRAFT, STAGE_EXTRACT, STAGE_AUDIT, STAGE_SUMMARY, STAGE_REVIEW)
+
+# 未指定阶段的调用使用的通用配置与通道
+DEFAULT_STAGE = "default"
+DEFAULT_LANE = "default"
+
+
+@dataclass(frozen=True)
+class StageProfile:
+    """
+    一个调用阶段使用的模型、采样参数与并发通道。
+
+    model 为 None 时使用端点配置的模型。
+    """
+
+    stage: str
+    model: Optional[str]
+    temperature: float
+    max_tokens: int
+    lane: str
+
+
+def stage_profile(stage: Optional[str]) -> StageProfile:
+    """
+    读取阶段配置；未指定阶段时返回通用默认配置。
+    """
+
+    if stage is None or stage == DEFAULT_STAGE:
+        return StageProfile(
+            stage=DEFAULT_STAGE,
+            model=None,
+            temperature=0.9,
+            max_tokens=2048,
+            lane=DEFAULT_LANE,
+        )
+    if stage not in _STAGES:
+        raise ValueError(f"未知的模型调用阶段：{stage}")
+    return StageProfile(
+        stage=stage,
+        model=getattr(settings, f"{stage}_model") or None,
+        temperature=getattr(settings, f"{stage}_temperature"),
+        max_tokens=getattr(settings, f"{stage}_max_tokens"),
+        lane=getattr(settings, f"{stage}_lane") or DEFAULT_LANE,
+    )
+
+
+def _draft_lane() -> Optional[str]:
+    """
+    返回正文生成独占的通道名；与其他阶段共用通道时返回 None。
+    """
+
+    draft = stage_profile(STAGE_DRAFT).lane
+    others = {stage_profile(stage).lane for stage in _STAGES if stage != STAGE_DRAFT}
+    return None if draft in others else draft
+
+
+class Lane:
+    """
+    一个并发通道：先占用通道名额，再占用所有通道共享的全局并发名额。
+    """
+
+    def __init__(
+        self, limiter: AdaptiveRateLimiter, total: AdaptiveRateLimiter
+    ) -> None:
+        self.limiter = limiter
+        self._total = total
+
+    def acquire(self) -> LimiterPermit:
+        start = time.monotonic()
+        permit = self.limiter.acquire()
+        try:
+            self._total.acquire()
+        except BaseException:
+            self.limiter.release(permit)
+            raise
+        permit.waited_seconds = time.monotonic() - start
+        return permit
+
+    async def acquire_async(self) -> LimiterPermit:
+        start = time.monotonic()
+        permit = await self.limiter.acquire_async()
+        try:
+            await self._total.acquire_async()
+        except BaseException:
+            self.limiter.release(permit)
+            raise
+        permit.waited_seconds = time.monotonic() - start
+        return permit
+
+    def release(self, permit: LimiterPermit) -> None:
+        self._total.release(permit)
+        self.limiter.release(permit)
+
+    def stats(self) -> Dict[str, float]:
+        return self.limiter.stats()
+
+
+class LaneRegistry:
+    """
+    并发通道：各通道在全局并发上限 max_concurrent_api_requests 内再各自限制并发数。
+
+    正文生成耗时较长，与短小的提取、审核调用分属不同通道；通道并发数之和不超过全局上限时，
+    后者不会排在长请求之后等待并发名额。请求数与 token 额度仍由端点限流器统一约束。
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._lanes: Dict[str, Lane] = {}
+        self._total = AdaptiveRateLimiter(
+            requests_per_minute=0,
+            max_concurrency=self._total_concurrency(),
+        )
+
+    @staticmethod
+    def _total_concurrency() -> int:
+        return max(settings.max_concurrent_api_requests, 1)
+
+    def _concurrency(self, name: str) -> int:
+        """
+        通道并发数：配置值不超过全局上限；未配置时正文通道比全局上限少一个名额，
+        保证正文调用占满时提取、审核等短调用仍有全局名额可用，其余通道取全局上限。
+        """
+
+        total = self._total_concurrency()
+        configured = settings.llm_lane_concurrency.get(name)
+        if configured:
+            return min(configured, total)
+        if name == _draft_lane() and total > 1:
+            return total - 1
+        return total
+
+    def get(self, name: str) -> Lane:
+        with self._lock:
+            lane = self._lanes.get(name)
+            if lane is None:
+                lane = Lane(
+                    AdaptiveRateLimiter(
+                        requests_per_minute=0,
+                        max_concurrency=self._concurrency(name),
+                    ),
+                    self._total,
+                )
+                self._lanes[name] = lane
+            return lane
+
+    def reload_limits(self) -> None:
+        """
+        并发配置变化后重新应用到全局上限与已创建的通道。
+        """
+
+        with self._lock:
+            self._total.configure(max_concurrency=self._total_concurrency())
+            for name, lane in self._lanes.items():
+                lane.limiter.configure(max_concurrency=self._concurrency(name))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lanes = dict(self._lanes)
+        return {
+            "global": self._total.stats(),
+            "lanes": {name: lane.stats() for name, lane in lanes.items()},
+        }
+
+
+lanes = LaneRegistry()
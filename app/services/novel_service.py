@@ -1,24 +1,58 @@
+import json
+from dataclasses import dataclass
 from datetime import date, datetime
-from typing import List, Tuple
+from typing import Dict, Hashable, List, Set, Tuple
 
-from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from ..config import settings
 from ..models import (
     Chapter,
     ChapterStatus,
+    Character,
     CreationLog,
     GenerationMetric,
     Novel,
     NovelStatus,
-    PlotNode,
-    Character,
     StoryFact,
     StoryFactImportance,
 )
 from ..schemas import DashboardSummary, DailyProgress, NovelProgress
+from .context_assembler import (
+    ContextItem,
+    ContextSection,
+    assemble_context,
+    context_budgets,
+)
+from .context_cache import ChapterDigest, context_cache
 from .deepseek_client import client as deepseek_client
+from .entity_index import (
+    clean_entity_names,
+    entities_in_play,
+    is_fact_relevant,
+    link_fact_entities,
+    record_chapter_mentions,
+    split_fact_entities,
+)
+from .event_bus import (
+    publish_chapter_completed,
+    publish_log_added,
+    publish_metric_delta,
+)
+from .fact_compaction import (
+    FACT_DUPLICATE,
+    FACT_SUPERSEDE,
+    load_canonical_facts,
+)
+from .lease import renew_novel_lease
+from .llm_stages import STAGE_AUDIT, STAGE_DRAFT, STAGE_EXTRACT, STAGE_REVIEW
+from .preview import preview_hub
+from .progress_counters import note_chapter_completed, read_totals
+from .retrieval import retrieval_registry
+from .summary_tree import load_summary_blocks, summary_maintainer
+from .token_estimator import estimate_tokens
+from .usage_service import llm_call_scope
 
 
 def log_creation_event(
@@ -34,10 +68,16 @@ def log_creation_event(
     """
 
     latency_ms = None
+    ttft_ms = None
+    prompt_tokens_estimate = None
     request_id = None
+    usage: dict = {}
     if api_meta:
         latency_ms = api_meta.get("latency_ms")
+        ttft_ms = api_meta.get("ttft_ms")
+        prompt_tokens_estimate = api_meta.get("prompt_tokens_estimate")
         request_id = api_meta.get("request_id")
+        usage = api_meta.get("usage") or {}
 
     log = CreationLog(
         novel_id=novel_id,
@@ -46,125 +86,290 @@ def log_creation_event(
         message=message,
         api_call_id=request_id,
         latency_ms=latency_ms,
+        ttft_ms=ttft_ms,
+        prompt_tokens_estimate=prompt_tokens_estimate,
+        prompt_tokens=usage.get("prompt_tokens"),
+        completion_tokens=usage.get("completion_tokens"),
+        prompt_cache_hit_tokens=usage.get("prompt_cache_hit_tokens"),
+        prompt_cache_miss_tokens=usage.get("prompt_cache_miss_tokens"),
         created_at=datetime.utcnow(),
     )
     db.add(log)
     db.commit()
+    publish_log_added(log)
 
 
-def _build_novel_context(
+def _chapter_heading(ch: ChapterDigest) -> str:
+    """
+    生成前情回顾中单章的标题与小结行。
+    """
+
+    if ch.outline:
+        return f"第{ch.index}章《{ch.title}》小结：{ch.outline}"
+    return f"第{ch.index}章《{ch.title}》"
+
+
+def _retrieval_query(
     db: Session,
     novel: Novel,
     target_chapter_index: int,
+    latest: ChapterDigest | None,
 ) -> str:
     """
-    构造用于 RAG 的小说上下文字符串，包含最近章节与主要角色信息。
+    拼出检索查询：待写章节的预设大纲、上一章小结与结尾片段。
+
+    同一段文本也用于判断即将出场的实体。
     """
 
-    recent_chapters: List[Chapter] = (
-        db.query(Chapter)
+    parts: List[str] = []
+    target_outline = (
+        db.query(Chapter.outline)
         .filter(
             Chapter.novel_id == novel.id,
-            Chapter.status == ChapterStatus.COMPLETED,
-            Chapter.index < target_chapter_index,
+            Chapter.index == target_chapter_index,
         )
-        .order_by(Chapter.index.asc())
-        .all()
+        .scalar()
     )
+    if target_outline:
+        parts.append(target_outline)
+    if latest is not None:
+        parts.append(latest.outline)
+        parts.append(latest.tail)
+    return "\n".join(p for p in parts if p)
 
-    characters: List[Character] = (
-        db.query(Character)
-        .filter(Character.novel_id == novel.id)
-        .order_by(Character.id.asc())
-        .all()
-    )
 
-    plot_nodes: List[PlotNode] = (
-        db.query(PlotNode)
-        .filter(PlotNode.novel_id == novel.id)
-        .order_by(PlotNode.index.asc())
-        .all()
-    )
+@dataclass
+class NovelContext:
+    """
+    章节生成上下文：prefix 在各章之间保持不变、只会在末尾追加，body 为每章变化的部分。
+    """
 
-    facts: List[StoryFact] = (
-        db.query(StoryFact)
-        .filter(
-            StoryFact.novel_id == novel.id,
-            StoryFact.chapter_index < target_chapter_index,
-        )
-        .order_by(StoryFact.chapter_index.asc(), StoryFact.id.asc())
-        .all()
-    )
+    prefix: str
+    body: str
 
-    lines: List[str] = []
-    lines.append(f"小说标题：{novel.title}")
-    lines.append(f"类型：{novel.genre}")
-    if novel.description:
-        lines.append(f"整体设定：{novel.description}")
-
-    if characters:
-        lines.append("\n主要人物：")
-        for c in characters:
-            desc = c.description or ""
-            lines.append(f"- {c.name}（{c.role or '未知身份'}）：{desc}")
-
-    if plot_nodes:
-        lines.append("\n关键情节节点：")
-        for node in plot_nodes[-10:]:
-            lines.append(f"- 第{node.index}节点：{node.summary}")
-
-    if facts:
-        critical = [
-            f for f in facts if f.importance == StoryFactImportance.CRITICAL
+    @property
+    def text(self) -> str:
+        return "\n".join(part for part in (self.prefix, self.body) if part)
+
+
+def _stable_prefix_length(items: List[str], title: str, budget: int) -> int:
+    """
+    返回按原顺序在预算内能完整放下的条目数。
+
+    只截取连续的前缀，新条目追加在末尾时已选中的条目保持不变。
+    """
+
+    used = estimate_tokens(title) + 1
+    for count, text in enumerate(items):
+        used += estimate_tokens(text) + 1
+        if used > budget:
+            return count
+    return len(items)
+
+
+def _build_novel_context(
+    db: Session,
+    novel: Novel,
+    target_chapter_index: int,
+) -> NovelContext:
+    """
+    构造用于 RAG 的小说上下文，包含最近章节与主要角色信息。
+
+    章节、人物、情节节点与事实均来自按小说缓存的上下文快照，只增量加载新章节；
+    启用检索时，按待写章节的大纲从本地索引中挑选相关前文片段与普通事实；
+    启用实体索引时，只保留与在场实体相关的事实；
+    各分区按 token 预算组装，超出预算时优先保留较新的内容。
+    启用前缀缓存时，设定、人物、情节节点与预算内最早的关键事实组成固定前缀，
+    其余随章节变化的内容放在 body 中。
+    """
+
+    snapshot = context_cache.get_snapshot(db, novel.id, target_chapter_index)
+    latest = snapshot.chapters[-1] if snapshot.chapters else None
+    recent = snapshot.chapters
+    if settings.summary_tree_enabled or settings.retrieval_enabled:
+        recent = snapshot.chapters[-max(settings.context_recent_chapters, 1) :]
+
+    stable_critical: List[str] = []
+    stable_ids: Set[int] = set()
+    critical_title = "\n已确立且不能自相矛盾的关键事实："
+    if settings.prompt_prefix_cache_enabled:
+        # 固定前缀中的关键事实不按在场实体筛选，按写入顺序只追加，保证前缀稳定
+        all_critical = [
+            f
+            for f in snapshot.facts
+            if f.importance == StoryFactImportance.CRITICAL
         ]
-        normal = [
-            f for f in facts if f.importance == StoryFactImportance.NORMAL
+        count = _stable_prefix_length(
+            [f"- {f.content}" for f in all_critical],
+            critical_title,
+            settings.context_budget_facts_tokens,
+        )
+        stable_critical = [f.content for f in all_critical[:count]]
+        stable_ids = {f.id for f in all_critical[:count]}
+
+    facts = [f for f in snapshot.facts if f.id not in stable_ids]
+    query = ""
+    if latest is not None and (
+        settings.retrieval_enabled or settings.entity_index_enabled
+    ):
+        query = _retrieval_query(db, novel, target_chapter_index, latest)
+    if settings.entity_index_enabled and latest is not None:
+        # 只保留与在场人物、地点、组织相关的事实，以及未关联实体的全局设定
+        in_play = entities_in_play(db, novel.id, target_chapter_index, query)
+        facts = [f for f in facts if is_fact_relevant(f.entity_ids, in_play)]
+
+    critical_facts = [
+        f.content for f in facts if f.importance == StoryFactImportance.CRITICAL
+    ]
+    normal_facts = [
+        f.content for f in facts if f.importance == StoryFactImportance.NORMAL
+    ]
+    passage_items: List[ContextItem] = []
+    if settings.retrieval_enabled and latest is not None:
+        index = retrieval_registry.get_index(db, novel.id, target_chapter_index)
+        top_k = settings.retrieval_top_k_facts
+        relevant_ids = {f.id for f in facts}
+        fact_hits = [
+            hit
+            for hit in index.search(query, top_k * 3, kinds=("fact",))
+            if hit[1].ref_id in relevant_ids
+        ][:top_k]
+        # 检索结果按章节先后排列，便于模型理解时间线
+        normal_facts = [
+            p.text
+            for _, p in sorted(fact_hits, key=lambda hit: hit[1].chapter_index)
+        ]
+        passage_hits = index.search(
+            query,
+            settings.retrieval_top_k_passages,
+            kinds=("chapter",),
+            before_chapter=recent[0].index,
+        )
+        # 片段按相关度从低到高排列，预算不足时优先丢弃相关度低的
+        passage_items = [
+            ContextItem(f"（第{p.chapter_index}章）{p.text}")
+            for _, p in reversed(passage_hits)
         ]
 
-        critical = critical[-60:]
-        normal = normal[-80:]
-
-        if critical:
-            lines.append("\n已确立且不能自相矛盾的关键事实：")
-            for f in critical:
-                lines.append(f"- " + f.content)
-
-        if normal:
-            lines.append("\n补充世界观事实：")
-            for f in normal:
-                lines.append(f"- " + f.content)
-
-    if recent_chapters:
-        lines.append("\n前情回顾（按章节顺序）：")
-        latest = recent_chapters[-1]
-        for ch in recent_chapters:
-            content = (ch.content or "").strip()
-            outline = (ch.outline or "").strip()
-            if not outline and content:
-                outline = content[:60]
-
-            if not content:
-                snippet = ""
-            elif ch.id == latest.id:
-                if len(content) > 500:
-                    snippet = content[-500:]
-                else:
-                    snippet = content
-            else:
-                if len(content) <= 800:
-                    snippet = content
-                else:
-                    snippet = content[:400] + "\n……\n" + content[-300:]
+    setting_items = [
+        ContextItem(f"小说标题：{novel.title}"),
+        ContextItem(f"类型：{novel.genre}"),
+    ]
+    if novel.description:
+        setting_items.append(ContextItem(f"整体设定：{novel.description}"))
+
+    prefix_sections: List[ContextSection] = [
+        ContextSection("setting", None, setting_items, truncate=True),
+        ContextSection(
+            "characters",
+            "\n主要人物：",
+            [
+                ContextItem(f"- {name}（{role or '未知身份'}）：{desc}")
+                for name, role, desc in snapshot.characters
+            ],
+        ),
+        ContextSection(
+            "setting",
+            "\n关键情节节点：",
+            [
+                ContextItem(f"- 第{index}节点：{summary}")
+                for index, summary in snapshot.plot_nodes[-10:]
+            ],
+            prefer_recent=True,
+        ),
+    ]
+    if stable_critical:
+        prefix_sections.append(
+            ContextSection(
+                "facts",
+                critical_title,
+                [ContextItem(f"- {content}") for content in stable_critical],
+            )
+        )
 
-            if outline:
-                lines.append(f"第{ch.index}章《{ch.title}》小结：{outline}")
+    sections: List[ContextSection] = [
+        ContextSection(
+            "facts",
+            "\n近期新增的关键事实："
+            if settings.prompt_prefix_cache_enabled
+            else critical_title,
+            [ContextItem(f"- {content}") for content in critical_facts],
+            prefer_recent=True,
+        ),
+        ContextSection(
+            "facts",
+            "\n补充世界观事实：",
+            [ContextItem(f"- {content}") for content in normal_facts],
+            prefer_recent=True,
+        ),
+    ]
+    if passage_items:
+        sections.append(
+            ContextSection(
+                "retrieval",
+                "\n相关前文片段：",
+                passage_items,
+                prefer_recent=True,
+            )
+        )
+
+    if latest is not None:
+        recap_items: List[ContextItem] = []
+        if len(recent) < len(snapshot.chapters):
+            covered_until = 0
+            if settings.summary_tree_enabled:
+                for block in load_summary_blocks(db, novel.id, recent[0].index):
+                    if block.level == "volume":
+                        label = f"第{block.index}卷（第{block.start_chapter}-{block.end_chapter}章）概要"
+                    else:
+                        label = f"第{block.start_chapter}-{block.end_chapter}章剧情梗概"
+                    recap_items.append(ContextItem(f"{label}：{block.summary}"))
+                    covered_until = block.end_chapter
+            for ch in snapshot.chapters[: len(snapshot.chapters) - len(recent)]:
+                if ch.index > covered_until:
+                    recap_items.append(ContextItem(_chapter_heading(ch)))
+
+        for ch in recent:
+            heading = _chapter_heading(ch)
+            if ch is latest or not ch.snippet:
+                recap_items.append(ContextItem(heading))
             else:
-                lines.append(f"第{ch.index}章《{ch.title}》")
-            if snippet:
-                lines.append("关键片段：")
-                lines.append(snippet)
+                recap_items.append(
+                    ContextItem(f"{heading}\n关键片段：\n{ch.snippet}", heading)
+                )
+        sections.append(
+            ContextSection(
+                "recap",
+                "\n前情回顾（按章节顺序）：",
+                recap_items,
+                prefer_recent=True,
+            )
+        )
+        if latest.tail:
+            sections.append(
+                ContextSection(
+                    "latest_tail",
+                    f"\n上一章（第{latest.index}章）结尾片段：",
+                    [ContextItem(latest.tail)],
+                    prefer_recent=True,
+                    truncate=True,
+                )
+            )
 
-    return "\n".join(lines)
+    if not settings.prompt_prefix_cache_enabled:
+        return NovelContext("", assemble_context(prefix_sections + sections).text)
+
+    # 固定前缀先占用预算，剩余额度留给随章节变化的部分
+    prefix = assemble_context(prefix_sections)
+    budgets = context_budgets()
+    for key, used in prefix.section_tokens.items():
+        budgets[key] = max(budgets.get(key, 0) - used, 0)
+    body = assemble_context(
+        sections,
+        budgets,
+        max(settings.context_budget_total_tokens - prefix.token_estimate, 0),
+    )
+    return NovelContext(prefix.text, body.text.lstrip("\n"))
 
 
 def _parse_generation_output(text: str) -> Tuple[str, str]:
@@ -206,12 +411,14 @@ def _generate_chapter_title(index: int, summary: str) -> str:
     return clean
 
 
-def _parse_facts_from_text(text: str) -> List[tuple[str, StoryFactImportance]]:
+def _parse_facts_from_text(
+    text: str,
+) -> List[tuple[str, StoryFactImportance, List[str]]]:
     """
-    从模型返回的文本中解析剧情事实列表与重要性标记。
+    从模型返回的文本中解析剧情事实列表、重要性标记与涉及的实体名称。
     """
 
-    results: List[tuple[str, StoryFactImportance]] = []
+    results: List[tuple[str, StoryFactImportance, List[str]]] = []
     if not text:
         return results
 
@@ -232,11 +439,12 @@ def _parse_facts_from_text(text: str) -> List[tuple[str, StoryFactImportance]]:
             importance = StoryFactImportance.NORMAL
         else:
             importance = StoryFactImportance.NORMAL
+        line, entity_names = split_fact_entities(line)
         if not line:
             continue
         if len(line) > 120:
             line = line[:120]
-        results.append((line, importance))
+        results.append((line, importance, entity_names))
 
     return results
 
@@ -247,13 +455,17 @@ def _extract_story_facts(
     chapter: Chapter,
     summary: str,
     body: str,
-) -> None:
+) -> Tuple[List[StoryFact], List[int], Dict[int, Tuple[int, ...]]]:
     """
     调用模型从章节内容中抽取关键剧情事实并写入数据库。
+
+    启用事实压实时，与已有事实重复的条目直接丢弃，被更新的旧事实置为无效；
+    启用实体索引时，同时记录每条事实涉及的人物、地点与组织。
+    返回 (新增的事实, 被取代的旧事实 id, 事实 id -> 实体 id)。
     """
 
     if not body:
-        return
+        return [], [], {}
 
     system_prompt = (
         "你是一名严谨的小说策划编辑，负责维护长篇小说的世界观与设定一致性。"
@@ -270,6 +482,7 @@ def _extract_story_facts(
         "3. 对于一旦写出就绝不能自相矛盾的设定（如某人已去世、公司已经破产等），在行首加上“[重要]”。\n"
         "4. 普通事实在行首可加“[一般]”或不加标签。\n"
         "5. 每行一个事实，以“- ”开头，不要编号，不要任何额外解释或总结。\n"
+        "6. 在每条事实末尾以“｜涉及：”列出该事实涉及的人物、地点或组织名称，多个名称用顿号分隔。\n"
         "仅输出事实列表本身。"
     )
 
@@ -281,51 +494,127 @@ def _extract_story_facts(
     try:
         text, _ = deepseek_client.generate_text(
             messages=messages,
-            temperature=0.2,
-            max_tokens=1024,
+            stage=STAGE_EXTRACT,
         )
     except Exception:
-        return
+        return [], [], {}
+
+    return _store_story_facts(db, novel, chapter, _parse_facts_from_text(text))
+
+
+def _store_story_facts(
+    db: Session,
+    novel: Novel,
+    chapter: Chapter,
+    parsed: List[tuple[str, StoryFactImportance, List[str]]],
+) -> Tuple[List[StoryFact], List[int], Dict[int, Tuple[int, ...]]]:
+    """
+    将解析出的 (内容, 重要性, 实体名称) 写入数据库，返回值同 _extract_story_facts。
+    """
 
-    parsed = _parse_facts_from_text(text)
     if not parsed:
-        return
+        return [], [], {}
+
+    # 同一章内的新事实也可能互相重复，以临时键参与比对，落库后再回填 id
+    pending: Dict[Hashable, Tuple[StoryFact, List[str]]] = {}
+    superseded: Dict[int, Hashable] = {}
+    canonical = None
+    if settings.fact_compaction_enabled:
+        snapshot = context_cache.get_snapshot(db, novel.id, chapter.index)
+        canonical = load_canonical_facts(
+            (f.id, f.content, f.importance) for f in snapshot.facts
+        )
 
-    for content, importance in parsed:
-        fact = StoryFact(
-            novel_id=novel.id,
-            chapter_id=chapter.id,
-            chapter_index=chapter.index,
-            category=None,
-            content=content,
-            importance=importance,
-            created_at=datetime.utcnow(),
+    for position, (content, importance, entity_names) in enumerate(parsed):
+        key = ("new", position)
+        if canonical is not None:
+            decision = canonical.classify(content, importance)
+            if decision.action == FACT_DUPLICATE:
+                continue
+            importance = decision.importance
+            if decision.action == FACT_SUPERSEDE:
+                canonical.retire(decision.matched_key)
+                if decision.matched_key in pending:
+                    pending.pop(decision.matched_key)
+                    for old_id, by_key in superseded.items():
+                        if by_key == decision.matched_key:
+                            superseded[old_id] = key
+                else:
+                    superseded[decision.matched_key] = key
+            canonical.add(key, content, importance)
+        pending[key] = (
+            StoryFact(
+                novel_id=novel.id,
+                chapter_id=chapter.id,
+                chapter_index=chapter.index,
+                category=None,
+                content=content,
+                importance=importance,
+                created_at=datetime.utcnow(),
+            ),
+            entity_names,
+        )
+
+    facts = [fact for fact, _ in pending.values()]
+    db.add_all(facts)
+    if not superseded and not settings.entity_index_enabled:
+        return facts, [], {}
+
+    db.flush()
+    for old_fact in db.query(StoryFact).filter(
+        StoryFact.id.in_(list(superseded))
+    ):
+        replacement = pending.get(superseded[old_fact.id])
+        old_fact.is_active = False
+        old_fact.superseded_by_id = replacement[0].id if replacement else None
+
+    fact_entities: Dict[int, Tuple[int, ...]] = {}
+    if settings.entity_index_enabled:
+        fact_entities = link_fact_entities(
+            db,
+            novel.id,
+            facts,
+            [names for _, names in pending.values()],
+            _character_names(db, novel.id),
         )
-        db.add(fact)
+    return facts, list(superseded), fact_entities
+
+
+def _character_names(db: Session, novel_id: int) -> Set[str]:
+    """
+    读取小说已登记的人物姓名。
+    """
+
+    return {
+        row[0]
+        for row in db.query(Character.name)
+        .filter(Character.novel_id == novel_id)
+        .all()
+    }
 
 
 def _build_fact_block_for_audit(
     db: Session,
     novel: Novel,
     target_chapter_index: int,
+    draft: str = "",
 ) -> str:
     """
     构造用于一致性审核的已知关键事实文本块。
+
+    启用实体索引时，按草稿中出现的实体挑选事实，并完整列出这些实体的全部关键事实；
+    否则退化为最近的 50 条关键事实与 50 条补充事实。
     """
 
-    facts: List[StoryFact] = (
-        db.query(StoryFact)
-        .filter(
-            StoryFact.novel_id == novel.id,
-            StoryFact.chapter_index < target_chapter_index,
-        )
-        .order_by(StoryFact.chapter_index.asc(), StoryFact.id.asc())
-        .all()
-    )
+    facts = context_cache.get_snapshot(db, novel.id, target_chapter_index).facts
 
     if not facts:
         return ""
 
+    if settings.entity_index_enabled and draft:
+        in_play = entities_in_play(db, novel.id, target_chapter_index, draft)
+        facts = [f for f in facts if is_fact_relevant(f.entity_ids, in_play)]
+
     critical = [
         f for f in facts if f.importance == StoryFactImportance.CRITICAL
     ]
@@ -333,7 +622,8 @@ def _build_fact_block_for_audit(
         f for f in facts if f.importance == StoryFactImportance.NORMAL
     ]
 
-    critical = critical[-50:]
+    if not (settings.entity_index_enabled and draft):
+        critical = critical[-50:]
     normal = normal[-50:]
 
     lines: List[str] = []
@@ -360,7 +650,9 @@ def _audit_chapter_consistency(
     审核章节内容是否与已记录的关键事实存在明显矛盾。
     """
 
-    fact_block = _build_fact_block_for_audit(db, novel, chapter_index)
+    fact_block = _build_fact_block_for_audit(
+        db, novel, chapter_index, f"{summary}\n{body}"
+    )
     if not fact_block:
         return True, []
     if not body:
@@ -391,8 +683,7 @@ def _audit_chapter_consistency(
     try:
         text, _ = deepseek_client.generate_text(
             messages=messages,
-            temperature=0.2,
-            max_tokens=1024,
+            stage=STAGE_AUDIT,
         )
     except Exception:
         return True, []
@@ -419,6 +710,125 @@ def _audit_chapter_consistency(
     return False, issue_lines
 
 
+@dataclass
+class ChapterReview:
+    """
+    合并审核的结果：与已有事实的冲突，以及从本章提取的新事实。
+    """
+
+    issues: List[str]
+    facts: List[tuple[str, StoryFactImportance, List[str]]]
+
+
+def _parse_review_output(text: str) -> ChapterReview | None:
+    """
+    严格解析合并审核返回的 JSON，结构不符时返回 None 以便回退。
+    """
+
+    raw = text.strip()
+    if raw.startswith("```"):
+        raw = raw.strip("`").strip()
+        if raw.lower().startswith("json"):
+            raw = raw[4:]
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    conflicts = data.get("conflicts")
+    raw_facts = data.get("facts")
+    if not isinstance(conflicts, list) or not isinstance(raw_facts, list):
+        return None
+    if not all(isinstance(item, str) for item in conflicts):
+        return None
+
+    facts: List[tuple[str, StoryFactImportance, List[str]]] = []
+    for item in raw_facts:
+        if not isinstance(item, dict):
+            return None
+        content = item.get("content")
+        important = item.get("important", False)
+        entities = item.get("entities", [])
+        if (
+            not isinstance(content, str)
+            or not isinstance(important, bool)
+            or not isinstance(entities, list)
+            or not all(isinstance(name, str) for name in entities)
+        ):
+            return None
+        content = content.strip()
+        if not content:
+            continue
+        facts.append(
+            (
+                content[:120],
+                StoryFactImportance.CRITICAL
+                if important
+                else StoryFactImportance.NORMAL,
+                clean_entity_names(entities),
+            )
+        )
+
+    return ChapterReview(
+        issues=[item.strip() for item in conflicts if item.strip()],
+        facts=facts,
+    )
+
+
+def _review_chapter(
+    db: Session,
+    novel: Novel,
+    chapter_index: int,
+    summary: str,
+    body: str,
+) -> ChapterReview | None:
+    """
+    一次调用同时完成一致性审核与事实提取，正文只发送一次。
+
+    调用失败或返回内容无法严格解析时返回 None，由调用方回退为审核、提取两次调用。
+    """
+
+    if not body:
+        return None
+
+    fact_block = _build_fact_block_for_audit(
+        db, novel, chapter_index, f"{summary}\n{body}"
+    )
+    system_prompt = (
+        "你是一名严谨的小说审读编辑，负责维护长篇小说的世界观与设定一致性。"
+        "你需要检查当前章节是否与既有事实矛盾，并从中提取对后续剧情至关重要的客观事实。"
+    )
+    user_prompt = (
+        "下面是这本小说当前已经确立的事实，以及本章的小结和正文。\n\n"
+        f"{fact_block or '（暂无已确立的事实）'}\n\n"
+        f"【本章小结】\n{summary}\n\n"
+        "【本章正文】\n"
+        f"{body}\n\n"
+        "请完成两项工作：\n"
+        "一、逐条检查本章内容是否与关键事实存在明显冲突，每个冲突写成“冲突描述；相关事实：XXX”。\n"
+        "二、提取不超过20条可以被后文反复引用的客观设定事实，例如人物的家庭关系、婚姻状态、生死、重大疾病、破产与否等，"
+        "不要主观感受、比喻和修辞；一旦写出就绝不能自相矛盾的设定标记为重要，"
+        "并列出每条事实涉及的人物、地点或组织名称。\n"
+        "只输出一个 JSON 对象，不要任何额外解释，格式如下：\n"
+        '{"conflicts": ["冲突描述；相关事实：XXX"], '
+        '"facts": [{"content": "事实内容", "important": true, "entities": ["名称"]}]}\n'
+        "没有冲突时 conflicts 为空数组。"
+    )
+
+    try:
+        text, _ = deepseek_client.generate_text(
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            stage=STAGE_REVIEW,
+        )
+    except Exception:
+        return None
+    return _parse_review_output(text)
+
+
 def _count_words(text: str) -> int:
     """
     粗略统计文本字数，用于字数监控与统计。
@@ -430,9 +840,43 @@ def _count_words(text: str) -> int:
     return len(normalized)
 
 
-def generate_next_chapter_for_novel(db: Session, novel_id: int) -> bool:
+def _daily_metric_id(db: Session, today: date) -> int:
+    """
+    返回当日统计行的 id，不存在时创建。
+
+    多个工作线程可能同时创建当日统计行，由 date 唯一约束保证只保留一行。
+    """
+
+    query = db.query(GenerationMetric.id).filter(GenerationMetric.date == today)
+    row = query.order_by(GenerationMetric.id.asc()).first()
+    if row:
+        return row[0]
+    try:
+        with db.begin_nested():
+            metric = GenerationMetric(
+                date=today,
+                novel_count=0,
+                chapter_count=0,
+                word_count=0,
+                created_at=datetime.utcnow(),
+            )
+            db.add(metric)
+        return metric.id
+    except IntegrityError:
+        # 锁定读取才能看到其他事务刚提交的行
+        return query.with_for_update().one()[0]
+
+
+def generate_next_chapter_for_novel(
+    db: Session,
+    novel_id: int,
+    lease_token: str | None = None,
+) -> bool:
     """
     为指定小说生成下一章内容，并更新进度和统计信息。
+
+    传入 lease_token 时，提交前会在同一事务内校验租约归属，
+    租约已被其他实例接管则放弃写入，避免同一章节被重复生成。
     """
 
     novel: Novel | None = db.query(Novel).get(novel_id)
@@ -452,153 +896,266 @@ def generate_next_chapter_for_novel(db: Session, novel_id: int) -> bool:
         db.commit()
         return False
 
-    try:
-        context = _build_novel_context(db, novel, next_chapter.index)
-        is_last_chapter = next_chapter.index >= novel.target_chapter_count
-
-        system_prompt = (
-            "你是一名专业网络小说作家，擅长用中文创作长篇连载小说。"
-            "必须严格保持人物设定和既有情节的连续性，避免与之前内容矛盾或重复编造新的版本，"
-            "对于前文已经明确揭示过的设定和真相，只能在此基础上延展或回顾，"
-            "语言流畅，情绪饱满，节奏自然推进。"
-        )
-        if is_last_chapter:
-            base_user_prompt = (
-                f"下面是这本小说当前已知的信息与上下文：\n\n{context}\n\n"
-                f"现在请你在充分承接上一章剧情的基础上，创作本书的最终结局章节（第{next_chapter.index}章），"
-                "这是整本小说的收官之章，必须完成主线矛盾的解决与人物命运的交代。\n"
-                "创作要求：\n"
-                "1. 彻底解决贯穿全书的主要冲突与悬念，不要再引入新的核心矛盾；\n"
-                "2. 清晰交代男女主以及关键配角的最终去向和情感走向；\n"
-                "3. 对前文重要事件做适度呼应和总结，有情感上的回望与升华；\n"
-                "4. 可以保留少量开放式伏笔，但不能留下影响阅读体验的巨大坑。\n"
-                "输出格式要求：\n"
-                "1. 第一行以“本章小结：”开头，给出不超过120字的结局摘要，明确说明本书已经完结；\n"
-                "2. 第二行开始为空一行；\n"
-                "3. 之后输出本章正文，分段自然，有人物对话和场景描写，整体有明显的终章收束感；\n"
-                "4. 严格使用中文创作，不要输出任何额外解释。"
+    # 本章内的所有模型调用（正文、审核、提取）记入本章账目
+    with llm_call_scope(novel_id=novel.id, chapter_id=next_chapter.id):
+        try:
+            context = _build_novel_context(db, novel, next_chapter.index)
+            is_last_chapter = next_chapter.index >= novel.target_chapter_count
+
+            system_prompt = (
+                "你是一名专业网络小说作家，擅长用中文创作长篇连载小说。"
+                "必须严格保持人物设定和既有情节的连续性，避免与之前内容矛盾或重复编造新的版本，"
+                "对于前文已经明确揭示过的设定和真相，只能在此基础上延展或回顾，"
+                "语言流畅，情绪饱满，节奏自然推进。"
             )
-        else:
-            base_user_prompt = (
-                f"下面是这本小说当前已知的信息与上下文：\n\n{context}\n\n"
-                f"现在请你在充分承接上一章剧情的基础上，创作第{next_chapter.index}章的完整内容，"
-                "要求让情节从上一章自然过渡，人物行为与心态前后一致。\n"
-                "输出格式要求：\n"
-                "1. 第一行以“本章小结：”开头，给出不超过100字的剧情摘要；\n"
-                "2. 第二行开始为空一行；\n"
-                "3. 之后输出本章正文，分段自然，有人物对话和场景描写；\n"
-                "4. 严格使用中文创作，不要输出任何额外解释。"
+            if context.prefix:
+                # 固定前缀放在系统提示词之后，各章请求共享同一段开头，便于命中前缀缓存
+                system_prompt += f"\n\n以下是这本小说的固定设定：\n\n{context.prefix}"
+                context_intro = f"下面是这本小说最新的剧情上下文：\n\n{context.body}\n\n"
+            else:
+                context_intro = (
+                    f"下面是这本小说当前已知的信息与上下文：\n\n{context.body}\n\n"
+                )
+            if is_last_chapter:
+                base_user_prompt = (
+                    context_intro
+                    + f"现在请你在充分承接上一章剧情的基础上，创作本书的最终结局章节（第{next_chapter.index}章），"
+                    "这是整本小说的收官之章，必须完成主线矛盾的解决与人物命运的交代。\n"
+                    "创作要求：\n"
+                    "1. 彻底解决贯穿全书的主要冲突与悬念，不要再引入新的核心矛盾；\n"
+                    "2. 清晰交代男女主以及关键配角的最终去向和情感走向；\n"
+                    "3. 对前文重要事件做适度呼应和总结，有情感上的回望与升华；\n"
+                    "4. 可以保留少量开放式伏笔，但不能留下影响阅读体验的巨大坑。\n"
+                    "输出格式要求：\n"
+                    "1. 第一行以“本章小结：”开头，给出不超过120字的结局摘要，明确说明本书已经完结；\n"
+                    "2. 第二行开始为空一行；\n"
+                    "3. 之后输出本章正文，分段自然，有人物对话和场景描写，整体有明显的终章收束感；\n"
+                    "4. 严格使用中文创作，不要输出任何额外解释。"
+                )
+            else:
+                base_user_prompt = (
+                    context_intro
+                    + f"现在请你在充分承接上一章剧情的基础上，创作第{next_chapter.index}章的完整内容，"
+                    "要求让情节从上一章自然过渡，人物行为与心态前后一致。\n"
+                    "输出格式要求：\n"
+                    "1. 第一行以“本章小结：”开头，给出不超过100字的剧情摘要；\n"
+                    "2. 第二行开始为空一行；\n"
+                    "3. 之后输出本章正文，分段自然，有人物对话和场景描写；\n"
+                    "4. 严格使用中文创作，不要输出任何额外解释。"
+                )
+
+            on_text = None
+            if settings.deepseek_stream_enabled:
+                preview_hub.begin(novel_id, next_chapter.index)
+
+                def on_text(partial: str) -> None:
+                    preview_hub.update(novel_id, partial)
+
+            def _call_model(user_prompt: str) -> tuple[str, str, int, dict]:
+                messages = [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt},
+                ]
+                text, meta = deepseek_client.generate_text(
+                    messages=messages,
+                    on_text=on_text,
+                    stage=STAGE_DRAFT,
+                )
+                summary_inner, body_inner = _parse_generation_output(text)
+                if not body_inner:
+                    raise RuntimeError("模型未返回章节正文")
+                word_count_inner = _count_words(body_inner)
+                return summary_inner, body_inner, word_count_inner, meta
+
+            summary, body, word_count, meta = _call_model(base_user_prompt)
+
+            review = None
+            if settings.combined_review_enabled:
+                review = _review_chapter(
+                    db=db,
+                    novel=novel,
+                    chapter_index=next_chapter.index,
+                    summary=summary,
+                    body=body,
+                )
+            if review is not None:
+                ok, issues = not review.issues, review.issues
+            else:
+                ok, issues = _audit_chapter_consistency(
+                    db=db,
+                    novel=novel,
+                    chapter_index=next_chapter.index,
+                    summary=summary,
+                    body=body,
+                )
+
+            if not ok and issues:
+                avoid_block = "\n".join(f"- {item}" for item in issues)
+                retry_prompt = (
+                    base_user_prompt
+                    + "\n\n上一次生成的版本与已有关键事实存在如下冲突，请在重新创作本章时严格避免出现这些问题：\n"
+                    + avoid_block
+                    + "\n请重新输出符合要求的本章小结和正文。"
+                )
+                summary, body, word_count, meta = _call_model(retry_prompt)
+                # 合并审核提取的事实属于被重写的版本，新版本需重新提取
+                review = None
+
+            next_chapter.title = _generate_chapter_title(
+                next_chapter.index,
+                summary,
             )
-
-        def _call_model(user_prompt: str) -> tuple[str, str, int, dict]:
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ]
-            text, meta = deepseek_client.generate_text(
-                messages=messages,
-                temperature=0.7,
-                max_tokens=4096,
+            next_chapter.outline = summary
+            next_chapter.content = body
+            next_chapter.word_count = word_count
+            next_chapter.status = ChapterStatus.COMPLETED
+            next_chapter.updated_at = datetime.utcnow()
+
+            novel.current_chapter_index = next_chapter.index
+            novel.status = (
+                NovelStatus.COMPLETED
+                if novel.current_chapter_index >= novel.target_chapter_count
+                else NovelStatus.WRITING
             )
-            summary_inner, body_inner = _parse_generation_output(text)
-            word_count_inner = _count_words(body_inner)
-            return summary_inner, body_inner, word_count_inner, meta
-
-        summary, body, word_count, meta = _call_model(base_user_prompt)
-
-        ok, issues = _audit_chapter_consistency(
-            db=db,
-            novel=novel,
-            chapter_index=next_chapter.index,
-            summary=summary,
-            body=body,
-        )
 
-        if not ok and issues:
-            avoid_block = "\n".join(f"- {item}" for item in issues)
-            retry_prompt = (
-                base_user_prompt
-                + "\n\n上一次生成的版本与已有关键事实存在如下冲突，请在重新创作本章时严格避免出现这些问题：\n"
-                + avoid_block
-                + "\n请重新输出符合要求的本章小结和正文。"
+            # 以 SQL 表达式累加，并发工作线程同时完成章节时不会互相覆盖
+            today = date.today()
+            db.query(GenerationMetric).filter(
+                GenerationMetric.id == _daily_metric_id(db, today)
+            ).update(
+                {
+                    GenerationMetric.chapter_count: GenerationMetric.chapter_count + 1,
+                    GenerationMetric.word_count: GenerationMetric.word_count
+                    + word_count,
+                    GenerationMetric.novel_count: GenerationMetric.novel_count
+                    + (1 if novel.current_chapter_index == 1 else 0),
+                },
+                synchronize_session=False,
             )
-            summary, body, word_count, meta = _call_model(retry_prompt)
+            note_chapter_completed(db, novel, word_count)
 
-        next_chapter.title = _generate_chapter_title(
-            next_chapter.index,
-            summary,
-        )
-        next_chapter.outline = summary
-        next_chapter.content = body
-        next_chapter.word_count = word_count
-        next_chapter.status = ChapterStatus.COMPLETED
-        next_chapter.updated_at = datetime.utcnow()
-
-        novel.current_chapter_index = next_chapter.index
-        novel.status = (
-            NovelStatus.COMPLETED
-            if novel.current_chapter_index >= novel.target_chapter_count
-            else NovelStatus.WRITING
-        )
-
-        today = date.today()
-        metric: GenerationMetric | None = (
-            db.query(GenerationMetric)
-            .filter(GenerationMetric.date == today)
-            .one_or_none()
-        )
-        if not metric:
-            metric = GenerationMetric(
-                date=today,
-                novel_count=0,
-                chapter_count=0,
-                word_count=0,
-                created_at=datetime.utcnow(),
+            if review is not None:
+                new_facts, retired_fact_ids, fact_entities = _store_story_facts(
+                    db, novel, next_chapter, review.facts
+                )
+            else:
+                new_facts, retired_fact_ids, fact_entities = _extract_story_facts(
+                    db=db,
+                    novel=novel,
+                    chapter=next_chapter,
+                    summary=summary,
+                    body=body,
+                )
+            if settings.entity_index_enabled:
+                record_chapter_mentions(
+                    db,
+                    novel.id,
+                    next_chapter.id,
+                    next_chapter.index,
+                    f"{summary}\n{body}",
+                )
+
+            if lease_token and not renew_novel_lease(
+                db, novel.id, lease_token, commit=False
+            ):
+                chapter_id = next_chapter.id
+                chapter_index = next_chapter.index
+                db.rollback()
+                preview_hub.finish(novel_id, status="aborted")
+                log_creation_event(
+                    db=db,
+                    novel_id=novel_id,
+                    chapter_id=chapter_id,
+                    level="WARNING",
+                    message=f"创作租约已失效，放弃写入第{chapter_index}章",
+                    api_meta=meta,
+                )
+                return False
+
+            db.commit()
+            preview_hub.finish(novel_id)
+            publish_chapter_completed(
+                novel_id=novel.id,
+                chapter_id=next_chapter.id,
+                chapter_index=next_chapter.index,
+                title=next_chapter.title,
+                word_count=word_count,
+                novel_status=novel.status.value,
+                chapter_completed=novel.completed_chapter_count,
+                chapter_total=novel.target_chapter_count,
+                words=novel.total_word_count,
             )
-            db.add(metric)
-
-        metric.chapter_count += 1
-        metric.word_count += word_count
-        if novel.current_chapter_index == 1:
-            metric.novel_count += 1
-
-        _extract_story_facts(
-            db=db,
-            novel=novel,
-            chapter=next_chapter,
-            summary=summary,
-            body=body,
-        )
-
-        db.commit()
+            publish_metric_delta(
+                "chapter-completed",
+                words=word_count,
+                day=today,
+                daily_novels=1 if novel.current_chapter_index == 1 else 0,
+                daily_chapters=1,
+                daily_words=word_count,
+                novel_id=novel.id,
+            )
+            context_cache.note_chapter_committed(
+                novel_id=novel.id,
+                chapter_index=next_chapter.index,
+                title=next_chapter.title,
+                outline=next_chapter.outline,
+                content=body,
+                facts=new_facts,
+                retired_fact_ids=retired_fact_ids,
+                fact_entities=fact_entities,
+            )
+            retrieval_registry.note_chapter_committed(
+                novel_id=novel.id,
+                chapter_index=next_chapter.index,
+                content=body,
+                facts=new_facts,
+            )
+            retrieval_registry.forget_facts(novel.id, retired_fact_ids)
+            if settings.summary_tree_enabled:
+                summary_maintainer.schedule(novel.id)
 
-        log_creation_event(
-            db=db,
-            novel_id=novel.id,
-            chapter_id=next_chapter.id,
-            level="INFO",
-            message=f"成功生成第{next_chapter.index}章，字数约为 {word_count}",
-            api_meta=meta,
-        )
+            log_creation_event(
+                db=db,
+                novel_id=novel.id,
+                chapter_id=next_chapter.id,
+                level="INFO",
+                message=f"成功生成第{next_chapter.index}章，字数约为 {word_count}",
+                api_meta=meta,
+            )
 
-        return True
-    except Exception as exc:
-        log_creation_event(
-            db=db,
-            novel_id=novel.id,
-            chapter_id=next_chapter.id if next_chapter else None,
-            level="ERROR",
-            message=f"生成章节失败：{exc}",
-            api_meta=None,
-        )
-        novel.status = NovelStatus.ERROR
-        db.commit()
-        return False
+            return True
+        except Exception as exc:
+            # 先回滚本次尝试已 flush 的章节、计数与事实，再记录失败
+            chapter_id = next_chapter.id
+            db.rollback()
+            preview_hub.finish(novel_id, status="error")
+            log_creation_event(
+                db=db,
+                novel_id=novel_id,
+                chapter_id=chapter_id,
+                level="ERROR",
+                message=f"生成章节失败：{exc}",
+                api_meta=None,
+            )
+            novel = db.query(Novel).get(novel_id)
+            if novel is None:
+                return False
+            # 租约已被其他实例接管时不改动小说状态
+            if lease_token and not renew_novel_lease(
+                db, novel_id, lease_token, commit=False
+            ):
+                db.rollback()
+                return False
+            novel.status = NovelStatus.ERROR
+            db.commit()
+            return False
 
 
 def get_dashboard_summary(db: Session) -> DashboardSummary:
     """
     汇总仪表盘所需统计信息，用于前端数据可视化。
+
+    进度与累计数据读取小说表与全站统计行上的计数，查询数与小说数量无关。
     """
 
     novels: List[Novel] = (
@@ -608,44 +1165,23 @@ def get_dashboard_summary(db: Session) -> DashboardSummary:
         .all()
     )
 
-    novel_progress: List[NovelProgress] = []
-
-    for novel in novels:
-        total_chapters = novel.target_chapter_count
-        completed_chapters = (
-            db.query(func.count(Chapter.id))
-            .filter(
-                Chapter.novel_id == novel.id,
-                Chapter.status == ChapterStatus.COMPLETED,
-            )
-            .scalar()
-            or 0
-        )
-        total_words = (
-            db.query(func.coalesce(func.sum(Chapter.word_count), 0))
-            .filter(Chapter.novel_id == novel.id)
-            .scalar()
-            or 0
-        )
-
-        ratio = (
-            completed_chapters / total_chapters
-            if total_chapters > 0
-            else 0.0
-        )
-
-        novel_progress.append(
-            NovelProgress(
-                novel_id=novel.id,
-                title=novel.title,
-                genre=novel.genre,
-                status=novel.status,
-                chapter_completed=completed_chapters,
-                chapter_total=total_chapters,
-                words=total_words,
-                progress_ratio=ratio,
-            )
+    novel_progress: List[NovelProgress] = [
+        NovelProgress(
+            novel_id=novel.id,
+            title=novel.title,
+            genre=novel.genre,
+            status=novel.status,
+            chapter_completed=novel.completed_chapter_count,
+            chapter_total=novel.target_chapter_count,
+            words=novel.total_word_count,
+            progress_ratio=(
+                novel.completed_chapter_count / novel.target_chapter_count
+                if novel.target_chapter_count > 0
+                else 0.0
+            ),
         )
+        for novel in novels
+    ]
 
     metrics: List[GenerationMetric] = (
         db.query(GenerationMetric)
@@ -664,24 +1200,12 @@ def get_dashboard_summary(db: Session) -> DashboardSummary:
         for m in reversed(metrics)
     ]
 
-    aggregate = (
-        db.query(
-            func.count(Novel.id),
-            func.coalesce(func.sum(Chapter.word_count), 0),
-            func.count(Chapter.id),
-        )
-        .select_from(Novel)
-        .join(Chapter, Chapter.novel_id == Novel.id, isouter=True)
-        .one()
-    )
-    total_novels = int(aggregate[0] or 0)
-    total_words = int(aggregate[1] or 0)
-    total_chapters = int(aggregate[2] or 0)
+    totals = read_totals(db)
 
     return DashboardSummary(
         novels=novel_progress,
         daily_stats=daily_stats,
-        total_novels=total_novels,
-        total_chapters=total_chapters,
-        total_words=total_words,
+        total_novels=totals["novel_count"],
+        total_chapters=totals["chapter_count"],
+        total_words=totals["word_count"],
     )
@@ -6,6 +6,8 @@ from sqlalchemy.orm import Session
 
 from ..config import settings
 from ..models import DailyPlan, Novel, NovelStatus, Chapter, ChapterStatus
+from .event_bus import publish_metric_delta
+from .progress_counters import note_novel_created
 
 
 def ensure_daily_plan(db: Session, target_date: date) -> DailyPlan:
@@ -81,6 +83,7 @@ def plan_novels_for_day(db: Session, target_date: date) -> List[Novel]:
                 updated_at=datetime.utcnow(),
             )
             db.add(chapter)
+        note_novel_created(db, settings.default_chapters_per_novel)
 
         novels.append(novel)
 
@@ -88,5 +91,11 @@ def plan_novels_for_day(db: Session, target_date: date) -> List[Novel]:
         db.commit()
         for novel in novels:
             db.refresh(novel)
+            publish_metric_delta(
+                "novel-created",
+                novels=1,
+                chapters=novel.target_chapter_count,
+                novel_id=novel.id,
+            )
 
     return novels
@@ -0,0 +1,204 @@
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Optional, Set, Tuple
+
+
+@dataclass
+class ChapterPreview:
+    """
+    单本小说当前正在生成章节的实时预览状态。
+    """
+
+    chapter_index: int
+    text: str = ""
+    version: int = 0
+    attempt: int = 1
+    done: bool = False
+    status: str = "writing"
+    updated_at: float = field(default_factory=time.time)
+
+
+_Waiter = Tuple[asyncio.AbstractEventLoop, asyncio.Event]
+
+
+class ChapterPreviewHub:
+    """
+    进程内章节实时预览中心，生成线程写入累计文本，SSE 订阅者按增量读取。
+
+    生成线程与事件循环之间通过 call_soon_threadsafe 唤醒，订阅者不占用线程池。
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._previews: Dict[int, ChapterPreview] = {}
+        self._waiters: Dict[int, Set[_Waiter]] = {}
+
+    def begin(self, novel_id: int, chapter_index: int) -> None:
+        """
+        标记某本小说开始生成新章节，清空上一轮预览。
+        """
+
+        with self._lock:
+            self._previews[novel_id] = ChapterPreview(chapter_index=chapter_index)
+            self._notify_locked(novel_id)
+
+    def update(self, novel_id: int, text: str) -> None:
+        """
+        写入当前累计文本；文本不再是上一版本的延续时视为重新生成。
+        """
+
+        with self._lock:
+            preview = self._previews.get(novel_id)
+            if preview is None or preview.done:
+                return
+            if not text.startswith(preview.text):
+                preview.attempt += 1
+            preview.text = text
+            preview.version += 1
+            preview.updated_at = time.time()
+            self._notify_locked(novel_id)
+
+    def finish(self, novel_id: int, status: str = "completed") -> None:
+        """
+        标记当前章节生成结束；没有订阅者时立即移除预览，否则由最后一个订阅者退出时移除。
+        """
+
+        with self._lock:
+            preview = self._previews.get(novel_id)
+            if preview is None:
+                return
+            preview.done = True
+            preview.status = status
+            preview.version += 1
+            self._notify_locked(novel_id)
+            self._drop_finished_locked(novel_id)
+
+    def _drop_finished_locked(self, novel_id: int) -> None:
+        """
+        移除已结束且无人订阅的预览，调用方需持有锁。
+        """
+
+        preview = self._previews.get(novel_id)
+        if preview is not None and preview.done and not self._waiters.get(novel_id):
+            del self._previews[novel_id]
+
+    def _notify_locked(self, novel_id: int) -> None:
+        """
+        唤醒订阅该小说的所有事件循环等待者，调用方需持有锁。
+        """
+
+        for loop, event in self._waiters.get(novel_id, ()):
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # 事件循环已关闭，订阅者会在 finally 中自行注销
+                continue
+
+    async def subscribe(
+        self,
+        novel_id: int,
+        keepalive_seconds: float = 15.0,
+        idle_timeout_seconds: float = 300.0,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        订阅指定小说的预览事件流，依次产出 start / reset / delta / done 事件。
+
+        尚未开始生成时会等待，超过 idle_timeout_seconds 仍无进展则结束订阅。
+        """
+
+        waiter: _Waiter = (asyncio.get_running_loop(), asyncio.Event())
+        sent_version = -1
+        sent_attempt = 0
+        sent_length = 0
+        current: Optional[ChapterPreview] = None
+        idle_since = time.time()
+
+        with self._lock:
+            self._waiters.setdefault(novel_id, set()).add(waiter)
+            finished = self._previews.get(novel_id)
+            if finished is not None and finished.done:
+                # 已结束的上一轮预览不再重放，只等待下一次生成
+                current = finished
+                sent_version = finished.version
+
+        try:
+            while True:
+                waiter[1].clear()
+                with self._lock:
+                    preview = self._previews.get(novel_id)
+                    if preview is None or (
+                        preview is current and preview.version == sent_version
+                    ):
+                        snapshot = None
+                    else:
+                        snapshot = (
+                            preview,
+                            preview.chapter_index,
+                            preview.text,
+                            preview.version,
+                            preview.attempt,
+                            preview.done,
+                            preview.status,
+                        )
+
+                if snapshot is None:
+                    if time.time() - idle_since > idle_timeout_seconds:
+                        return
+                    try:
+                        await asyncio.wait_for(
+                            waiter[1].wait(), timeout=keepalive_seconds
+                        )
+                    except asyncio.TimeoutError:
+                        yield {"event": "ping", "data": {}}
+                    continue
+
+                idle_since = time.time()
+                (
+                    preview,
+                    chapter_index,
+                    text,
+                    version,
+                    attempt,
+                    done,
+                    status,
+                ) = snapshot
+                if preview is not current:
+                    current = preview
+                    sent_attempt = attempt
+                    sent_length = 0
+                    yield {
+                        "event": "start",
+                        "data": {"chapter_index": chapter_index},
+                    }
+                elif attempt != sent_attempt:
+                    sent_attempt = attempt
+                    sent_length = 0
+                    yield {
+                        "event": "reset",
+                        "data": {"chapter_index": chapter_index},
+                    }
+
+                if len(text) > sent_length:
+                    yield {"event": "delta", "data": {"text": text[sent_length:]}}
+                    sent_length = len(text)
+                sent_version = version
+
+                if done:
+                    yield {
+                        "event": "done",
+                        "data": {"chapter_index": chapter_index, "status": status},
+                    }
+                    return
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(novel_id)
+                if waiters is not None:
+                    waiters.discard(waiter)
+                    if not waiters:
+                        del self._waiters[novel_id]
+                self._drop_finished_locked(novel_id)
+
+
+preview_hub = ChapterPreviewHub()
@@ -0,0 +1,177 @@
+import logging
+from typing import Dict, List, Tuple
+
+from sqlalchemy import case, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models import Chapter, ChapterStatus, DashboardTotals, Novel
+
+
+logger = logging.getLogger(__name__)
+
+TOTALS_ID = 1
+
+
+def count_totals(db: Session) -> Dict[str, int]:
+    """
+    直接从小说与章节表统计全站累计数据。
+    """
+
+    novel_count = db.query(func.count(Novel.id)).scalar() or 0
+    chapter_count, word_count = db.query(
+        func.count(Chapter.id), func.coalesce(func.sum(Chapter.word_count), 0)
+    ).one()
+    return {
+        "novel_count": int(novel_count),
+        "chapter_count": int(chapter_count or 0),
+        "word_count": int(word_count or 0),
+    }
+
+
+def read_totals(db: Session) -> Dict[str, int]:
+    """
+    读取全站累计统计；统计行尚未建立时现场统计（不写入）。
+    """
+
+    row = db.query(DashboardTotals).get(TOTALS_ID)
+    if row is None:
+        return count_totals(db)
+    return {
+        "novel_count": row.novel_count,
+        "chapter_count": row.chapter_count,
+        "word_count": row.word_count,
+    }
+
+
+def _update_totals(db: Session, novels: int, chapters: int, words: int) -> bool:
+    return bool(
+        db.query(DashboardTotals)
+        .filter(DashboardTotals.id == TOTALS_ID)
+        .update(
+            {
+                DashboardTotals.novel_count: DashboardTotals.novel_count + novels,
+                DashboardTotals.chapter_count: DashboardTotals.chapter_count
+                + chapters,
+                DashboardTotals.word_count: DashboardTotals.word_count + words,
+            },
+            synchronize_session=False,
+        )
+    )
+
+
+def bump_totals(db: Session, novels: int = 0, chapters: int = 0, words: int = 0) -> None:
+    """
+    在当前事务内原子累加全站统计，随调用方的事务一起提交或回滚。
+
+    统计行不存在时按当前数据（含本事务未提交的修改）统计建行；
+    并发事务同时建行时由主键冲突保证只保留一行，冲突方改为累加。
+    """
+
+    if _update_totals(db, novels, chapters, words):
+        return
+    db.flush()
+    try:
+        with db.begin_nested():
+            db.add(DashboardTotals(id=TOTALS_ID, **count_totals(db)))
+    except IntegrityError:
+        _update_totals(db, novels, chapters, words)
+
+
+def note_novel_created(db: Session, chapter_count: int) -> None:
+    bump_totals(db, novels=1, chapters=chapter_count)
+
+
+def note_chapter_completed(db: Session, novel: Novel, word_count: int) -> None:
+    """
+    章节提交时以 SQL 表达式累加小说与全站计数，并发提交不会互相覆盖。
+    """
+
+    db.query(Novel).filter(Novel.id == novel.id).update(
+        {
+            Novel.completed_chapter_count: Novel.completed_chapter_count + 1,
+            Novel.total_word_count: Novel.total_word_count + word_count,
+        },
+        synchronize_session=False,
+    )
+    db.expire(novel, ["completed_chapter_count", "total_word_count"])
+    bump_totals(db, words=word_count)
+
+
+def delete_novel(db: Session, novel: Novel) -> Tuple[int, int]:
+    """
+    删除小说（随级联删除章节等数据）并扣除其章节与字数，由调用方提交。
+
+    返回被扣除的 (章节数, 字数)。
+    """
+
+    chapters, words = db.query(
+        func.count(Chapter.id), func.coalesce(func.sum(Chapter.word_count), 0)
+    ).filter(Chapter.novel_id == novel.id).one()
+    db.delete(novel)
+    # 先落库删除，统计行不存在而需现场统计建行时不会把本小说计入
+    db.flush()
+    chapters, words = int(chapters or 0), int(words or 0)
+    bump_totals(db, novels=-1, chapters=-chapters, words=-words)
+    return chapters, words
+
+
+def recompute_counters(
+    db: Session,
+    dry_run: bool = False,
+) -> Tuple[List[Dict[str, int]], Dict[str, int]]:
+    """
+    从章节表重算每本小说的进度计数与全站统计，返回 (有偏差的小说, 重算后的全站统计)。
+
+    dry_run 为真时只报告偏差，不写入。
+    """
+
+    actual = {
+        row[0]: (int(row[1] or 0), int(row[2] or 0))
+        for row in db.query(
+            Chapter.novel_id,
+            func.sum(case((Chapter.status == ChapterStatus.COMPLETED, 1), else_=0)),
+            func.coalesce(func.sum(Chapter.word_count), 0),
+        )
+        .group_by(Chapter.novel_id)
+        .all()
+    }
+
+    drifted: List[Dict[str, int]] = []
+    for novel_id, completed, words in db.query(
+        Novel.id, Novel.completed_chapter_count, Novel.total_word_count
+    ).all():
+        expected_completed, expected_words = actual.get(novel_id, (0, 0))
+        if (completed, words) == (expected_completed, expected_words):
+            continue
+        drifted.append(
+            {
+                "novel_id": novel_id,
+                "completed_chapter_count": completed,
+                "expected_completed_chapter_count": expected_completed,
+                "total_word_count": words,
+                "expected_total_word_count": expected_words,
+            }
+        )
+        if not dry_run:
+            db.query(Novel).filter(Novel.id == novel_id).update(
+                {
+                    Novel.completed_chapter_count: expected_completed,
+                    Novel.total_word_count: expected_words,
+                },
+                synchronize_session=False,
+            )
+
+    totals = count_totals(db)
+    if not dry_run:
+        row = db.query(DashboardTotals).get(TOTALS_ID)
+        if row is None:
+            db.add(DashboardTotals(id=TOTALS_ID, **totals))
+        else:
+            row.novel_count = totals["novel_count"]
+            row.chapter_count = totals["chapter_count"]
+            row.word_count = totals["word_count"]
+        db.commit()
+        if drifted:
+            logger.warning("已修正 %s 本小说的进度计数", len(drifted))
+    return drifted, totals
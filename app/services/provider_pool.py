@@ -0,0 +1,308 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ..config import DeepSeekEndpoint, settings
+from .rate_limiter import AdaptiveRateLimiter, LimiterPermit, RateLimitTimeout
+
+
+logger = logging.getLogger(__name__)
+
+_MAX_EJECT_SECONDS = 600.0
+_HEALTH_DECAY = 0.8
+_MIN_HEALTH = 0.05
+# 健康度在无流量时随时间回升的半衰期（秒），避免恢复后的端点长期得不到流量
+_HEALTH_RECOVERY_HALF_LIFE = 60.0
+# 所有端点额度已满时，每隔该秒数重新比较一次各端点
+_RESELECT_SECONDS = 0.5
+
+
+class ProviderEndpoint:
+    """
+    一个模型服务端点的运行状态：独立的限流器、权重与健康度。
+    """
+
+    def __init__(self, config: DeepSeekEndpoint) -> None:
+        self.name = config.name
+        self.base_url = config.base_url.rstrip("/")
+        self.api_key = config.api_key
+        self.model = config.model or settings.deepseek_model
+        self.weight = max(config.weight, 0.0)
+        self._config = config
+        self.limiter = AdaptiveRateLimiter(
+            requests_per_minute=self._limit("requests_per_minute"),
+            tokens_per_minute=self._limit("tokens_per_minute"),
+            max_concurrency=self._limit("max_concurrency"),
+        )
+        self._health = 1.0
+        self._health_at = time.monotonic()
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.total_requests = 0
+        self.total_failures = 0
+
+    def _limit(self, field: str) -> int:
+        """
+        端点未单独配置时沿用全局限流参数；并发默认不在端点上限制，由调用通道与全局并发上限约束。
+        """
+
+        value = getattr(self._config, field)
+        if value is not None:
+            return value
+        return {
+            "requests_per_minute": settings.max_requests_per_minute,
+            "tokens_per_minute": settings.max_tokens_per_minute,
+            "max_concurrency": 0,
+        }[field]
+
+    def reload_limits(self) -> None:
+        """
+        全局限流参数变化后重新应用到未单独配置的端点。
+        """
+
+        self.limiter.configure(
+            requests_per_minute=self._limit("requests_per_minute"),
+            tokens_per_minute=self._limit("tokens_per_minute"),
+            max_concurrency=self._limit("max_concurrency"),
+        )
+
+    @property
+    def health(self) -> float:
+        """
+        当前健康度（0~1）：失败时下降，成功或随时间推移逐步回升。
+        """
+
+        elapsed = time.monotonic() - self._health_at
+        deficit = (1.0 - self._health) * 0.5 ** (
+            elapsed / _HEALTH_RECOVERY_HALF_LIFE
+        )
+        return 1.0 - deficit
+
+    @health.setter
+    def health(self, value: float) -> None:
+        self._health = value
+        self._health_at = time.monotonic()
+
+    def is_ejected(self, now: float) -> bool:
+        return now < self.ejected_until
+
+    def score(self) -> float:
+        """
+        路由评分：权重 × 剩余额度 × 健康度。
+        """
+
+        return self.weight * self.limiter.headroom() * self.health
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "name": self.name,
+            "base_url": self.base_url,
+            "model": self.model,
+            "weight": self.weight,
+            "health": round(self.health, 3),
+            "ejected": self.is_ejected(now),
+            "ejected_seconds": max(self.ejected_until - now, 0.0),
+            "consecutive_failures": self.consecutive_failures,
+            "total_requests": self.total_requests,
+            "total_failures": self.total_failures,
+            "limiter": self.limiter.stats(),
+        }
+
+
+class ProviderPool:
+    """
+    多端点路由池：每次调用选择剩余额度最多的健康端点。
+
+    连续失败达到阈值的端点被暂时摘除，摘除时长逐次翻倍；到期后重新参与路由，
+    首次成功即恢复正常。所有端点都被摘除时仍选择最早到期的端点兜底。
+    """
+
+    def __init__(self, endpoints: Iterable[DeepSeekEndpoint]) -> None:
+        self._lock = threading.Lock()
+        self._endpoints: List[ProviderEndpoint] = [
+            ProviderEndpoint(config) for config in endpoints
+        ]
+        if not self._endpoints:
+            raise ValueError("至少需要配置一个模型服务端点")
+
+    @property
+    def endpoints(self) -> List[ProviderEndpoint]:
+        return list(self._endpoints)
+
+    def select(self, exclude: Iterable[str] = ()) -> ProviderEndpoint:
+        """
+        选择当前评分最高的端点，exclude 中的端点仅在别无选择时使用。
+        """
+
+        return self._ranked(exclude)[0]
+
+    def acquire(
+        self,
+        estimated_tokens: int = 0,
+        exclude: Iterable[str] = (),
+    ) -> Tuple[ProviderEndpoint, LimiterPermit]:
+        """
+        按评分依次尝试立即占用端点额度；全部已满时在评分最高的端点上短暂等待后重新选择。
+
+        选择与占用一并完成，避免并发调用同时涌向同一个端点。
+        """
+
+        start = time.monotonic()
+        while True:
+            ranked = self._ranked(exclude)
+            for endpoint in ranked:
+                permit = endpoint.limiter.try_acquire(estimated_tokens)
+                if permit is not None:
+                    return endpoint, _waited_since(permit, start)
+            try:
+                permit = ranked[0].limiter.acquire(
+                    estimated_tokens, timeout=_RESELECT_SECONDS
+                )
+            except RateLimitTimeout:
+                continue
+            return ranked[0], _waited_since(permit, start)
+
+    async def acquire_async(
+        self,
+        estimated_tokens: int = 0,
+        exclude: Iterable[str] = (),
+    ) -> Tuple[ProviderEndpoint, LimiterPermit]:
+        """
+        acquire 的协程版本。
+        """
+
+        start = time.monotonic()
+        while True:
+            ranked = self._ranked(exclude)
+            for endpoint in ranked:
+                permit = endpoint.limiter.try_acquire(estimated_tokens)
+                if permit is not None:
+                    return endpoint, _waited_since(permit, start)
+            try:
+                permit = await ranked[0].limiter.acquire_async(
+                    estimated_tokens, timeout=_RESELECT_SECONDS
+                )
+            except RateLimitTimeout:
+                continue
+            return ranked[0], _waited_since(permit, start)
+
+    def _ranked(self, exclude: Iterable[str]) -> List[ProviderEndpoint]:
+        """
+        按评分从高到低排列可用端点；全部被摘除时返回最早到期的端点兜底。
+        """
+
+        excluded = set(exclude)
+        now = time.monotonic()
+        with self._lock:
+            candidates = [
+                ep
+                for ep in self._endpoints
+                if not ep.is_ejected(now) and ep.name not in excluded
+            ] or [ep for ep in self._endpoints if not ep.is_ejected(now)]
+            if not candidates:
+                return [min(self._endpoints, key=lambda ep: ep.ejected_until)]
+            return sorted(candidates, key=lambda ep: ep.score(), reverse=True)
+
+    def report_success(self, endpoint: ProviderEndpoint) -> None:
+        """
+        记录一次成功调用，恢复健康度并清除摘除状态。
+        """
+
+        with self._lock:
+            endpoint.total_requests += 1
+            endpoint.health = _HEALTH_DECAY * endpoint.health + (1 - _HEALTH_DECAY)
+            endpoint.consecutive_failures = 0
+            if endpoint.ejections:
+                logger.info("模型端点 %s 已恢复", endpoint.name)
+            endpoint.ejections = 0
+            endpoint.ejected_until = 0.0
+
+    def report_failure(
+        self,
+        endpoint: ProviderEndpoint,
+        eject: bool = False,
+    ) -> None:
+        """
+        记录一次失败；连续失败达到阈值或 eject 为真（例如密钥失效）时摘除端点。
+        """
+
+        with self._lock:
+            endpoint.total_requests += 1
+            endpoint.total_failures += 1
+            endpoint.health = max(_HEALTH_DECAY * endpoint.health, _MIN_HEALTH)
+            endpoint.consecutive_failures += 1
+            # 摘除到期后重新接入、尚未成功过的端点再次失败时立即摘除
+            if (
+                not eject
+                and not endpoint.ejections
+                and endpoint.consecutive_failures
+                < max(settings.provider_eject_failures, 1)
+            ):
+                return
+            duration = min(
+                settings.provider_eject_seconds * (2 ** endpoint.ejections),
+                _MAX_EJECT_SECONDS,
+            )
+            endpoint.ejections += 1
+            endpoint.consecutive_failures = 0
+            endpoint.ejected_until = time.monotonic() + duration
+            logger.warning(
+                "模型端点 %s 连续失败，摘除 %.0f 秒", endpoint.name, duration
+            )
+
+    def has_alternative(self, endpoint: ProviderEndpoint) -> bool:
+        """
+        是否还有其他未被摘除的端点可用。
+        """
+
+        now = time.monotonic()
+        return any(
+            ep is not endpoint and not ep.is_ejected(now)
+            for ep in self._endpoints
+        )
+
+    def served_models(self, model: Optional[str] = None) -> List[str]:
+        """
+        可能处理请求的模型：调用指定了模型时即为该模型，否则为各端点配置的模型。
+        """
+
+        if model:
+            return [model]
+        return sorted({endpoint.model for endpoint in self._endpoints})
+
+    def reload_limits(self) -> None:
+        for endpoint in self._endpoints:
+            endpoint.reload_limits()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [endpoint.stats() for endpoint in self._endpoints]
+
+
+def _waited_since(permit: LimiterPermit, start: float) -> LimiterPermit:
+    permit.waited_seconds = permit.acquired_at - start
+    return permit
+
+
+def endpoint_configs() -> List[DeepSeekEndpoint]:
+    """
+    读取端点配置；未配置 deepseek_endpoints 时使用单一默认端点。
+    """
+
+    if settings.deepseek_endpoints:
+        return list(settings.deepseek_endpoints)
+    return [
+        DeepSeekEndpoint(
+            name="default",
+            base_url=settings.deepseek_base_url,
+            api_key=settings.deepseek_api_key,
+        )
+    ]
+
+
+def build_provider_pool(
+    endpoints: Optional[Iterable[DeepSeekEndpoint]] = None,
+) -> ProviderPool:
+    return ProviderPool(endpoints if endpoints is not None else endpoint_configs())
@@ -0,0 +1,339 @@
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitTimeout(TimeoutError):
+    """
+    在截止时间内未能获得调用许可。
+    """
+
+
+class TokenBucket:
+    """
+    令牌桶：容量为每分钟配额，按秒匀速补充；余额允许短暂为负以记录超额使用。
+
+    本类不加锁，由持有它的限流器负责同步。
+    """
+
+    def __init__(self, per_minute: float) -> None:
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self._updated_at = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def refill(self, now: float) -> None:
+        elapsed = max(now - self._updated_at, 0.0)
+        self._updated_at = now
+        if not self.unlimited:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+
+    def wait_time(self, amount: float) -> float:
+        """
+        返回余额足以支付 amount 还需等待的秒数，0 表示可以立即扣减。
+        """
+
+        if self.unlimited:
+            return 0.0
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        if self.rate <= 0:
+            return float("inf")
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        if not self.unlimited:
+            self.tokens -= min(amount, self.capacity)
+
+    def give_back(self, amount: float) -> None:
+        """
+        归还或追加扣减（amount 为负）令牌，用于按实际用量对账。
+        """
+
+        if not self.unlimited:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+    def reconfigure(self, per_minute: float, scale: float) -> None:
+        """
+        调整配额上限与补充速率，已有余额按新容量截断。
+        """
+
+        self.refill(time.monotonic())
+        was_unlimited = self.unlimited
+        self.capacity = float(per_minute)
+        self.rate = self.capacity * scale / 60.0
+        self.tokens = (
+            self.capacity if was_unlimited else min(self.tokens, self.capacity)
+        )
+
+
+@dataclass
+class LimiterPermit:
+    """
+    一次调用占用的限流额度，调用结束后交还给限流器对账。
+    """
+
+    reserved_tokens: int
+    acquired_at: float
+    waited_seconds: float
+
+
+_AsyncWaiter = Tuple[asyncio.AbstractEventLoop, asyncio.Event]
+
+
+class AdaptiveRateLimiter:
+    """
+    自适应限流器：同时约束每分钟请求数、每分钟 token 数与并发请求数。
+
+    等待通过条件变量完成，额度释放或补充到位时立即唤醒；收到 429 时按 AIMD
+    策略将补充速率减半并遵守 Retry-After 冷却，之后每次成功调用逐步恢复。
+    线程与协程共用同一份额度，协程等待不占用事件循环线程。
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int,
+        tokens_per_minute: int = 0,
+        max_concurrency: int = 0,
+        min_scale: float = 0.1,
+        increase_step: float = 0.05,
+        decrease_factor: float = 0.5,
+    ) -> None:
+        self._cond = threading.Condition()
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._max_concurrency = max_concurrency
+        self._in_flight = 0
+        self._scale = 1.0
+        self._min_scale = min_scale
+        self._increase_step = increase_step
+        self._decrease_factor = decrease_factor
+        self._cooldown_until = 0.0
+        self._throttled_count = 0
+        self._async_waiters: Set[_AsyncWaiter] = set()
+
+    def configure(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+    ) -> None:
+        """
+        运行时调整配额，等待中的调用会按新配额重新计算。
+        """
+
+        with self._cond:
+            if requests_per_minute is not None:
+                self._requests.reconfigure(requests_per_minute, self._scale)
+            if tokens_per_minute is not None:
+                self._tokens.reconfigure(tokens_per_minute, self._scale)
+            if max_concurrency is not None:
+                self._max_concurrency = max_concurrency
+            self._notify_locked()
+
+    def acquire(
+        self,
+        estimated_tokens: int = 0,
+        timeout: Optional[float] = None,
+    ) -> LimiterPermit:
+        """
+        阻塞直到并发、请求数与 token 额度全部满足，返回本次调用的许可。
+
+        超过 timeout 秒仍未获得许可时抛出 RateLimitTimeout。
+        """
+
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                wait = self._wait_time_locked(now, estimated_tokens)
+                if wait <= 0:
+                    return self._take_locked(now, start, estimated_tokens)
+                if deadline is not None:
+                    if now >= deadline:
+                        raise RateLimitTimeout("等待 DeepSeek 调用额度超时")
+                    wait = min(wait, deadline - now)
+                # 并发已满时无法预知等待时长，只能等待其他调用释放额度
+                self._cond.wait(None if wait == float("inf") else wait)
+
+    def try_acquire(self, estimated_tokens: int = 0) -> Optional[LimiterPermit]:
+        """
+        不等待地尝试获取许可，额度不足时返回 None。
+        """
+
+        with self._cond:
+            now = time.monotonic()
+            if self._wait_time_locked(now, estimated_tokens) > 0:
+                return None
+            return self._take_locked(now, now, estimated_tokens)
+
+    async def acquire_async(
+        self,
+        estimated_tokens: int = 0,
+        timeout: Optional[float] = None,
+    ) -> LimiterPermit:
+        """
+        acquire 的协程版本：在事件循环上等待额度，可被取消。
+        """
+
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        waiter: _AsyncWaiter = (asyncio.get_running_loop(), asyncio.Event())
+        try:
+            while True:
+                with self._cond:
+                    now = time.monotonic()
+                    wait = self._wait_time_locked(now, estimated_tokens)
+                    if wait <= 0:
+                        return self._take_locked(now, start, estimated_tokens)
+                    waiter[1].clear()
+                    self._async_waiters.add(waiter)
+                if deadline is not None:
+                    if now >= deadline:
+                        raise RateLimitTimeout("等待 DeepSeek 调用额度超时")
+                    wait = min(wait, deadline - now)
+                try:
+                    await asyncio.wait_for(
+                        waiter[1].wait(),
+                        None if wait == float("inf") else wait,
+                    )
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self._cond:
+                self._async_waiters.discard(waiter)
+
+    def release(
+        self,
+        permit: LimiterPermit,
+        actual_tokens: Optional[int] = None,
+        throttled: bool = False,
+        retry_after: Optional[float] = None,
+        cancelled: bool = False,
+    ) -> None:
+        """
+        交还许可：按实际 token 用量对账，并根据是否被限流调整速率。
+
+        请求被调用方取消时结果未知，只归还名额，不调整速率。
+        """
+
+        with self._cond:
+            self._in_flight = max(self._in_flight - 1, 0)
+            now = time.monotonic()
+            self._requests.refill(now)
+            self._tokens.refill(now)
+            if actual_tokens is not None:
+                self._tokens.give_back(permit.reserved_tokens - actual_tokens)
+
+            if throttled:
+                self._throttled_count += 1
+                self._set_scale_locked(self._scale * self._decrease_factor)
+                cooldown = retry_after if retry_after is not None else 1.0
+                self._cooldown_until = max(self._cooldown_until, now + cooldown)
+                logger.warning(
+                    "DeepSeek 返回限流，速率系数降至 %.2f，冷却 %.1f 秒",
+                    self._scale,
+                    cooldown,
+                )
+            elif not cancelled and self._scale < 1.0:
+                self._set_scale_locked(self._scale + self._increase_step)
+            self._notify_locked()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        返回限流器当前状态。
+        """
+
+        with self._cond:
+            now = time.monotonic()
+            self._requests.refill(now)
+            self._tokens.refill(now)
+            return {
+                "in_flight": self._in_flight,
+                "max_concurrency": self._max_concurrency,
+                "rate_scale": self._scale,
+                "request_tokens": self._requests.tokens,
+                "token_tokens": self._tokens.tokens,
+                "cooldown_seconds": max(self._cooldown_until - now, 0.0),
+                "throttled_count": self._throttled_count,
+            }
+
+    def headroom(self) -> float:
+        """
+        估算当前剩余额度占配额的比例（0~1），供多端点路由比较。
+        """
+
+        with self._cond:
+            now = time.monotonic()
+            if now < self._cooldown_until:
+                return 0.0
+            self._requests.refill(now)
+            self._tokens.refill(now)
+            ratios = [self._scale]
+            for bucket in (self._requests, self._tokens):
+                if not bucket.unlimited:
+                    ratios.append(max(bucket.tokens, 0.0) / bucket.capacity)
+            if self._max_concurrency > 0:
+                ratios.append(
+                    max(self._max_concurrency - self._in_flight, 0)
+                    / self._max_concurrency
+                )
+            return min(ratios)
+
+    def _notify_locked(self) -> None:
+        """
+        唤醒所有等待中的线程与协程重新检查额度，调用方需持有锁。
+        """
+
+        self._cond.notify_all()
+        for loop, event in self._async_waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # 事件循环已关闭，等待者会在 finally 中自行注销
+                continue
+
+    def _set_scale_locked(self, scale: float) -> None:
+        self._scale = min(max(scale, self._min_scale), 1.0)
+        self._requests.reconfigure(self._requests.capacity, self._scale)
+        self._tokens.reconfigure(self._tokens.capacity, self._scale)
+
+    def _take_locked(
+        self, now: float, start: float, estimated_tokens: int
+    ) -> LimiterPermit:
+        self._requests.take(1)
+        self._tokens.take(estimated_tokens)
+        self._in_flight += 1
+        return LimiterPermit(
+            reserved_tokens=estimated_tokens,
+            acquired_at=now,
+            waited_seconds=now - start,
+        )
+
+    def _wait_time_locked(self, now: float, estimated_tokens: int) -> float:
+        """
+        计算还需等待的秒数；并发已满时返回 inf，由 release 唤醒。
+        """
+
+        if self._max_concurrency > 0 and self._in_flight >= self._max_concurrency:
+            return float("inf")
+        if now < self._cooldown_until:
+            return self._cooldown_until - now
+        self._requests.refill(now)
+        self._tokens.refill(now)
+        return max(
+            self._requests.wait_time(1),
+            self._tokens.wait_time(estimated_tokens),
+        )
@@ -0,0 +1,273 @@
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from fastapi import Request, Response
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from ..config import settings
+from ..db import SessionLocal
+
+
+# 写入后需要使全局读接口（仪表盘、小说列表、日志）失效的表；小说列表内嵌章节
+_GLOBAL_TABLES = {
+    "novels",
+    "chapters",
+    "creation_logs",
+    "generation_metrics",
+    "dashboard_totals",
+}
+# 写入后需要使所属小说的读接口（章节列表）失效的表
+_NOVEL_TABLES = {"novels", "chapters"}
+# 只改动这些列的写入不使缓存失效：调度器频繁续约租约，并原样回写 updated_at 以免触发自动更新
+_IGNORED_COLUMNS = {"lease_owner", "lease_expires_at", "updated_at"}
+
+_DIRTY_KEY = "read_cache_dirty"
+
+
+@dataclass
+class _Dirty:
+    """
+    单个会话在当前事务内写入涉及的失效范围，提交后统一递增版本号。
+    """
+
+    global_scope: bool = False
+    all_novels: bool = False
+    novel_ids: Set[int] = field(default_factory=set)
+
+
+@dataclass
+class _Entry:
+    version: Tuple[int, ...]
+    body: bytes
+    etag: str
+    expires_at: float
+    gzipped: Optional[bytes] = None
+
+
+class ReadCache:
+    """
+    带版本号的读接口响应缓存。
+
+    全局版本与按小说的版本在相关表的写入事务提交后递增，缓存条目记录计算时的版本，
+    版本变化或超过 TTL 即重新计算；TTL 兜底其他实例或绕过会话的写入。
+    ETag 取响应体摘要，因此重新计算但内容未变时客户端仍会得到 304。
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: Optional[float] = None,
+        max_entries: Optional[int] = None,
+    ) -> None:
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._global_version = 0
+        self._novels_epoch = 0
+        self._novel_versions: Dict[int, int] = {}
+        self._ttl_seconds = ttl_seconds
+        self._max_entries = max_entries
+        self._hits = 0
+        self._misses = 0
+
+    def version(self, novel_id: Optional[int] = None) -> Tuple[int, ...]:
+        """
+        返回全局版本，或指定小说的版本 (全体小说失效次数, 该小说版本)。
+        """
+
+        with self._lock:
+            if novel_id is None:
+                return (self._global_version,)
+            return (self._novels_epoch, self._novel_versions.get(novel_id, 0))
+
+    def bump(
+        self,
+        global_scope: bool = False,
+        novel_ids: Tuple[int, ...] = (),
+        all_novels: bool = False,
+    ) -> None:
+        with self._lock:
+            if global_scope:
+                self._global_version += 1
+            if all_novels:
+                self._novels_epoch += 1
+                self._novel_versions.clear()
+            else:
+                for novel_id in novel_ids:
+                    self._novel_versions[novel_id] = (
+                        self._novel_versions.get(novel_id, 0) + 1
+                    )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "global_version": self._global_version,
+            }
+
+    def _lookup(self, key: str, version: Tuple[int, ...]) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if (
+                entry is None
+                or entry.version != version
+                or entry.expires_at <= time.monotonic()
+            ):
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def _store(self, key: str, entry: _Entry) -> None:
+        max_entries = self._max_entries or settings.read_cache_max_entries
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > max(max_entries, 1):
+                self._entries.popitem(last=False)
+
+    def respond(
+        self,
+        request: Request,
+        key: str,
+        compute: Callable[[], Any],
+        novel_id: Optional[int] = None,
+    ) -> Response:
+        """
+        返回读接口的 JSON 响应：命中缓存时跳过查询与序列化，
+        If-None-Match 与 ETag 一致时返回 304，响应体较大且客户端支持时返回 gzip。
+
+        compute 返回可直接 JSON 序列化的数据，在请求线程内执行。
+        """
+
+        version = self.version(novel_id)
+        entry = self._lookup(key, version) if settings.read_cache_enabled else None
+        if entry is None:
+            body = json.dumps(
+                compute(), ensure_ascii=False, separators=(",", ":")
+            ).encode("utf-8")
+            # 弱 ETag：gzip 与未压缩的表示共用同一校验值
+            etag = 'W/"%s"' % hashlib.sha1(body).hexdigest()[:20]
+            ttl = (
+                self._ttl_seconds
+                if self._ttl_seconds is not None
+                else settings.read_cache_ttl_seconds
+            )
+            # 版本取自计算之前，计算期间提交的写入会使该条目在下次请求时失效
+            entry = _Entry(
+                version=version,
+                body=body,
+                etag=etag,
+                expires_at=time.monotonic() + ttl,
+            )
+            if settings.read_cache_enabled:
+                self._store(key, entry)
+
+        headers = {
+            "ETag": entry.etag,
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if_none_match = request.headers.get("if-none-match", "")
+        if entry.etag in (tag.strip() for tag in if_none_match.split(",")):
+            return Response(status_code=304, headers=headers)
+
+        content = entry.body
+        if len(entry.body) >= settings.read_cache_gzip_min_bytes and "gzip" in (
+            request.headers.get("accept-encoding", "")
+        ):
+            if entry.gzipped is None:
+                entry.gzipped = gzip.compress(entry.body, compresslevel=6)
+            content = entry.gzipped
+            headers["Content-Encoding"] = "gzip"
+        return Response(content=content, media_type="application/json", headers=headers)
+
+
+read_cache = ReadCache()
+
+
+def _dirty(session: Session) -> _Dirty:
+    dirty = session.info.get(_DIRTY_KEY)
+    if dirty is None:
+        dirty = session.info[_DIRTY_KEY] = _Dirty()
+    return dirty
+
+
+def _only_ignored(keys: Iterable[Any]) -> bool:
+    return set(keys) <= _IGNORED_COLUMNS
+
+
+def _note_flush(session: Session, flush_context: Any) -> None:
+    """
+    flush 后记录本次写入涉及的表与小说；此时 new / dirty / deleted 仍为 flush 前的内容。
+    """
+
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, "__tablename__", None)
+        if obj in session.dirty and _only_ignored(
+            attr.key for attr in inspect(obj).attrs if attr.history.has_changes()
+        ):
+            continue
+        if table in _GLOBAL_TABLES:
+            _dirty(session).global_scope = True
+        if table in _NOVEL_TABLES:
+            novel_id = obj.id if table == "novels" else getattr(obj, "novel_id", None)
+            if novel_id is not None:
+                _dirty(session).novel_ids.add(novel_id)
+
+
+def _note_bulk(state: ORMExecuteState) -> None:
+    """
+    Query.update / delete 与批量插入不经过 flush，按目标表整体标记失效。
+    """
+
+    if not (state.is_update or state.is_delete or state.is_insert):
+        return
+    values = getattr(state.statement, "_values", None)
+    if state.is_update and values and _only_ignored(
+        getattr(column, "key", column) for column in values
+    ):
+        return
+    for mapper in state.all_mappers:
+        table = getattr(mapper.class_, "__tablename__", None)
+        if table in _GLOBAL_TABLES:
+            _dirty(state.session).global_scope = True
+        if table == "chapters":
+            _dirty(state.session).all_novels = True
+
+
+def _after_commit(session: Session) -> None:
+    # 释放 SAVEPOINT 也会触发 after_commit，此时外层事务尚未提交
+    if session.in_nested_transaction():
+        return
+    dirty = session.info.pop(_DIRTY_KEY, None)
+    if dirty is not None:
+        read_cache.bump(
+            global_scope=dirty.global_scope,
+            novel_ids=tuple(dirty.novel_ids),
+            all_novels=dirty.all_novels,
+        )
+
+
+def _after_soft_rollback(session: Session, previous_transaction: Any) -> None:
+    # 回滚 SAVEPOINT 时外层事务已 flush 的写入仍会提交，只在最外层事务回滚时丢弃
+    if previous_transaction.parent is None:
+        session.info.pop(_DIRTY_KEY, None)
+
+
+event.listen(SessionLocal, "after_flush", _note_flush)
+event.listen(SessionLocal, "do_orm_execute", _note_bulk)
+event.listen(SessionLocal, "after_commit", _after_commit)
+event.listen(SessionLocal, "after_soft_rollback", _after_soft_rollback)
@@ -0,0 +1,272 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..config import settings
+
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "..", "data", "response_cache.sqlite3"
+)
+# 超出容量时一次淘汰到容量的该比例以下，避免每次写入都触发淘汰
+_EVICT_TARGET_RATIO = 0.9
+
+Response = Tuple[str, Dict[str, Any]]
+
+
+def response_cache_key(
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    max_tokens: int,
+    stop: Optional[List[str]],
+) -> str:
+    """
+    由模型、采样参数与完整消息计算内容寻址的缓存键。
+    """
+
+    material = json.dumps(
+        {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stop": stop or [],
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    """
+    一次进行中的调用，相同请求的其他调用方等待其结果。
+    """
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Optional[Response] = None
+        self.error: Optional[BaseException] = None
+
+
+class ResponseCache:
+    """
+    持久化的模型响应缓存，存放在本地 SQLite 文件中。
+
+    相同模型、参数与消息的请求直接返回已保存的结果；总大小超过上限时按最近访问时间淘汰。
+    并发的相同请求合并为一次调用，其余调用方等待并共享结果。
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: Optional[int] = None):
+        self._path = path
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._total_bytes = 0
+        self._flights: Dict[str, _Flight] = {}
+        self._flights_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def enabled_for(stage: str) -> bool:
+        return settings.response_cache_enabled and (
+            stage in settings.response_cache_stages
+        )
+
+    @property
+    def max_bytes(self) -> int:
+        if self._max_bytes is not None:
+            return self._max_bytes
+        return settings.response_cache_max_bytes
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        打开缓存数据库，调用方需持有锁。
+        """
+
+        if self._conn is None:
+            path = os.path.abspath(
+                self._path or settings.response_cache_path or _DEFAULT_PATH
+            )
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " stage TEXT NOT NULL,"
+                " content TEXT NOT NULL,"
+                " meta TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_responses_accessed"
+                " ON responses (accessed_at)"
+            )
+            conn.commit()
+            self._total_bytes = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[Response]:
+        """
+        读取缓存结果并刷新访问时间，未命中返回 None；缓存文件损坏或被锁时按未命中处理。
+        """
+
+        try:
+            with self._lock:
+                conn = self._connection()
+                row = conn.execute(
+                    "SELECT content, meta FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute(
+                    "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                    (time.time(), key),
+                )
+                conn.commit()
+        except sqlite3.Error:
+            logger.exception("读取响应缓存失败")
+            return None
+        return row[0], json.loads(row[1])
+
+    def put(self, key: str, stage: str, content: str, meta: Dict[str, Any]) -> None:
+        """
+        写入一条结果，超出容量时淘汰最久未访问的条目。
+        """
+
+        meta_text = json.dumps(meta, ensure_ascii=False, default=str)
+        size = len(content.encode("utf-8")) + len(meta_text.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            previous = conn.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses"
+                " (key, stage, content, meta, size, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, stage, content, meta_text, size, now, now),
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict_locked(conn)
+            conn.commit()
+
+    def _evict_locked(self, conn: sqlite3.Connection) -> None:
+        target = self.max_bytes * _EVICT_TARGET_RATIO
+        evicted = 0
+        while self._total_bytes > target:
+            rows = conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed_at LIMIT 100"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                break
+            for key, size in rows:
+                if self._total_bytes <= target:
+                    break
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total_bytes -= size
+                evicted += 1
+        logger.info("响应缓存超出容量，淘汰 %s 条", evicted)
+
+    def get_or_compute(
+        self,
+        key: str,
+        stage: str,
+        compute: Callable[[], Response],
+    ) -> Response:
+        """
+        命中缓存时直接返回；否则调用 compute 并写入缓存。
+
+        同一键同时只有一个调用方真正执行 compute，其余调用方等待并共享其结果或异常。
+        """
+
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            content, meta = cached
+            return content, dict(meta, response_cache="hit")
+
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+
+        if not leader:
+            flight.done.wait()
+            self.coalesced += 1
+            if flight.error is not None:
+                raise flight.error
+            content, meta = flight.result
+            return content, dict(meta, response_cache="coalesced")
+
+        try:
+            # 上一个执行者可能在本次查询之后、成为执行者之前写入了结果
+            cached = self.get(key)
+            if cached is not None:
+                self.hits += 1
+                flight.result = cached
+                content, meta = cached
+                return content, dict(meta, response_cache="hit")
+            self.misses += 1
+            flight.result = compute()
+            content, meta = flight.result
+            try:
+                self.put(key, stage, content, meta)
+            except sqlite3.Error:
+                logger.exception("写入响应缓存失败")
+            return flight.result
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._flights_lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def clear(self) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM responses")
+            conn.commit()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._connection().execute(
+                "SELECT COUNT(*) FROM responses"
+            ).fetchone()[0]
+            return {
+                "entries": entries,
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "stages": list(settings.response_cache_stages),
+            }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,353 @@
+import math
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import Chapter, ChapterStatus, StoryFact, StoryFactImportance
+from .chapter_store import BODY_COLUMNS, body_from_row, with_body
+
+
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+
+
+def _is_token_char(ch: str) -> bool:
+    """
+    判断字符是否参与 n-gram 切分（汉字、字母与数字）。
+    """
+
+    return ch.isalnum()
+
+
+def char_bigrams(text: str) -> Counter:
+    """
+    将文本切分为字符二元组词频，跨标点与空白处断开。
+    """
+
+    grams: Counter = Counter()
+    run: List[str] = []
+    for ch in text:
+        if _is_token_char(ch):
+            run.append(ch.lower())
+            continue
+        _add_run(grams, run)
+        run = []
+    _add_run(grams, run)
+    return grams
+
+
+def _add_run(grams: Counter, run: List[str]) -> None:
+    """
+    将一段连续字符的二元组累加到词频表，单字片段按一元组计入。
+    """
+
+    if len(run) == 1:
+        grams[run[0]] += 1
+        return
+    for i in range(len(run) - 1):
+        grams[run[i] + run[i + 1]] += 1
+
+
+def split_passages(text: str, max_chars: int) -> List[str]:
+    """
+    按段落将章节正文切成长度不超过 max_chars 的片段。
+    """
+
+    passages: List[str] = []
+    buffer = ""
+    for para in (p.strip() for p in text.split("\n")):
+        if not para:
+            continue
+        while len(para) > max_chars:
+            if buffer:
+                passages.append(buffer)
+                buffer = ""
+            passages.append(para[:max_chars])
+            para = para[max_chars:]
+        if buffer and len(buffer) + len(para) + 1 > max_chars:
+            passages.append(buffer)
+            buffer = ""
+        buffer = f"{buffer}\n{para}" if buffer else para
+    if buffer:
+        passages.append(buffer)
+    return passages
+
+
+@dataclass
+class Passage:
+    """
+    检索索引中的一个文档：章节片段或剧情事实。
+    """
+
+    kind: str
+    ref_id: int
+    chapter_index: int
+    text: str
+    length: int
+    alive: bool = True
+
+
+class NovelRetrievalIndex:
+    """
+    单本小说的本地 BM25 倒排索引，基于字符二元组，无需网络与 GPU。
+    """
+
+    def __init__(self, novel_id: int) -> None:
+        self.novel_id = novel_id
+        self.covered_chapter_index = 0
+        self.lock = threading.Lock()
+        self._passages: List[Passage] = []
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._fact_docs: Dict[int, int] = {}
+        self._total_length = 0
+        self._alive_count = 0
+
+    def __len__(self) -> int:
+        return self._alive_count
+
+    def add(self, kind: str, ref_id: int, chapter_index: int, text: str) -> None:
+        """
+        向索引追加一个文档，调用方需持有索引锁。
+        """
+
+        grams = char_bigrams(text)
+        length = sum(grams.values())
+        if not length:
+            return
+        doc_id = len(self._passages)
+        self._passages.append(
+            Passage(
+                kind=kind,
+                ref_id=ref_id,
+                chapter_index=chapter_index,
+                text=text,
+                length=length,
+            )
+        )
+        for gram, tf in grams.items():
+            self._postings.setdefault(gram, []).append((doc_id, tf))
+        self._total_length += length
+        self._alive_count += 1
+        if kind == "fact":
+            self._fact_docs[ref_id] = doc_id
+
+    def add_chapter(self, chapter_index: int, content: Optional[str]) -> None:
+        """
+        将章节正文切片后加入索引。
+        """
+
+        for passage in split_passages(
+            content or "", max(settings.retrieval_passage_chars, 50)
+        ):
+            self.add("chapter", chapter_index, chapter_index, passage)
+
+    def remove_fact(self, fact_id: int) -> None:
+        """
+        将已被合并或废弃的事实从检索结果中排除。
+        """
+
+        doc_id = self._fact_docs.pop(fact_id, None)
+        if doc_id is None:
+            return
+        passage = self._passages[doc_id]
+        if passage.alive:
+            passage.alive = False
+            self._alive_count -= 1
+
+    def search(
+        self,
+        query: str,
+        top_k: int,
+        kinds: Iterable[str] = ("chapter", "fact"),
+        before_chapter: Optional[int] = None,
+    ) -> List[Tuple[float, Passage]]:
+        """
+        返回与查询最相关的 top_k 个文档及其 BM25 得分。
+        """
+
+        with self.lock:
+            return self._search_locked(query, top_k, kinds, before_chapter)
+
+    def _search_locked(
+        self,
+        query: str,
+        top_k: int,
+        kinds: Iterable[str],
+        before_chapter: Optional[int],
+    ) -> List[Tuple[float, Passage]]:
+        """
+        search 的实现，调用方需持有索引锁。
+        """
+
+        if not self._passages or top_k <= 0:
+            return []
+
+        allowed = set(kinds)
+        doc_count = len(self._passages)
+        avg_length = self._total_length / doc_count
+        scores: Dict[int, float] = {}
+        for gram in char_bigrams(query):
+            postings = self._postings.get(gram)
+            if not postings:
+                continue
+            idf = math.log(
+                1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5)
+            )
+            for doc_id, tf in postings:
+                passage = self._passages[doc_id]
+                if not passage.alive or passage.kind not in allowed:
+                    continue
+                if (
+                    before_chapter is not None
+                    and passage.chapter_index >= before_chapter
+                ):
+                    continue
+                norm = tf + _BM25_K1 * (
+                    1 - _BM25_B + _BM25_B * passage.length / avg_length
+                )
+                scores[doc_id] = (
+                    scores.get(doc_id, 0.0) + idf * tf * (_BM25_K1 + 1) / norm
+                )
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [
+            (score, self._passages[doc_id]) for doc_id, score in ranked[:top_k]
+        ]
+
+
+class RetrievalIndexRegistry:
+    """
+    按小说缓存检索索引，章节提交后增量更新，超过上限时按 LRU 淘汰。
+    """
+
+    def __init__(self, max_novels: int) -> None:
+        self._max_novels = max_novels
+        self._lock = threading.Lock()
+        self._indexes: "OrderedDict[int, NovelRetrievalIndex]" = OrderedDict()
+
+    def get_index(
+        self,
+        db: Session,
+        novel_id: int,
+        target_chapter_index: int,
+    ) -> NovelRetrievalIndex:
+        """
+        获取覆盖 target_chapter_index 之前全部章节与事实的索引，缺失部分增量补齐。
+        """
+
+        with self._lock:
+            index = self._indexes.get(novel_id)
+            if index is not None:
+                self._indexes.move_to_end(novel_id)
+            if index is None or index.covered_chapter_index >= target_chapter_index:
+                index = NovelRetrievalIndex(novel_id)
+                self._store_locked(index)
+
+        # 补齐过程只持有单本小说的锁，不阻塞其他小说的检索
+        with index.lock:
+            if index.covered_chapter_index < target_chapter_index - 1:
+                self._catch_up(db, index, target_chapter_index)
+        return index
+
+    def note_chapter_committed(
+        self,
+        novel_id: int,
+        chapter_index: int,
+        content: Optional[str],
+        facts: Iterable[StoryFact],
+    ) -> None:
+        """
+        章节提交后将正文与新事实追加进已缓存的索引。
+        """
+
+        with self._lock:
+            index = self._indexes.get(novel_id)
+        if index is None:
+            return
+        with index.lock:
+            if index.covered_chapter_index != chapter_index - 1:
+                return
+            index.add_chapter(chapter_index, content)
+            for fact in facts:
+                if fact.importance == StoryFactImportance.NORMAL:
+                    index.add("fact", fact.id, fact.chapter_index, fact.content)
+            index.covered_chapter_index = chapter_index
+
+    def forget_facts(self, novel_id: int, fact_ids: Iterable[int]) -> None:
+        """
+        从已缓存的索引中排除指定事实。
+        """
+
+        with self._lock:
+            index = self._indexes.get(novel_id)
+        if index is None:
+            return
+        with index.lock:
+            for fact_id in fact_ids:
+                index.remove_fact(fact_id)
+
+    def invalidate(self, novel_id: int) -> None:
+        """
+        丢弃指定小说的索引。
+        """
+
+        with self._lock:
+            self._indexes.pop(novel_id, None)
+
+    def _store_locked(self, index: NovelRetrievalIndex) -> None:
+        """
+        写入索引并淘汰最久未使用的小说，调用方需持有锁。
+        """
+
+        self._indexes[index.novel_id] = index
+        self._indexes.move_to_end(index.novel_id)
+        while len(self._indexes) > max(self._max_novels, 1):
+            self._indexes.popitem(last=False)
+
+    def _catch_up(
+        self,
+        db: Session,
+        index: NovelRetrievalIndex,
+        target_chapter_index: int,
+    ) -> None:
+        """
+        加载索引尚未覆盖的章节正文与普通事实。
+        """
+
+        rows = (
+            with_body(db.query(Chapter.index, *BODY_COLUMNS))
+            .filter(
+                Chapter.novel_id == index.novel_id,
+                Chapter.status == ChapterStatus.COMPLETED,
+                Chapter.index > index.covered_chapter_index,
+                Chapter.index < target_chapter_index,
+            )
+            .order_by(Chapter.index.asc())
+            .all()
+        )
+        for chapter_index, *body in rows:
+            index.add_chapter(chapter_index, body_from_row(*body))
+
+        fact_rows = (
+            db.query(StoryFact.id, StoryFact.chapter_index, StoryFact.content)
+            .filter(
+                StoryFact.novel_id == index.novel_id,
+                StoryFact.importance == StoryFactImportance.NORMAL,
+                StoryFact.is_active.is_(True),
+                StoryFact.chapter_index > index.covered_chapter_index,
+                StoryFact.chapter_index < target_chapter_index,
+            )
+            .order_by(StoryFact.chapter_index.asc(), StoryFact.id.asc())
+            .all()
+        )
+        for fact_id, chapter_index, content in fact_rows:
+            index.add("fact", fact_id, chapter_index, content)
+
+        index.covered_chapter_index = max(target_chapter_index - 1, 0)
+
+
+retrieval_registry = RetrievalIndexRegistry(settings.retrieval_index_max_novels)
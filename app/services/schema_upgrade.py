@@ -0,0 +1,185 @@
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import (
+    Index,
+    UniqueConstraint,
+    delete,
+    func,
+    inspect,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from .. import models  # noqa: F401
+from ..db import Base, engine as default_engine
+from .progress_counters import recompute_counters
+
+
+logger = logging.getLogger(__name__)
+
+# 已有表上后续新增的列：(表名, 列名, 已有行的默认值 SQL)。
+# create_all 只建缺失的表，不会为已存在的表补列；NOT NULL 列必须给出默认值
+_ADDED_COLUMNS: Tuple[Tuple[str, str, Optional[str]], ...] = (
+    # 多实例调度的小说租约
+    ("novels", "lease_owner", None),
+    ("novels", "lease_expires_at", None),
+    # 事实压缩：被取代的事实置为失效并指向取代它的事实
+    ("story_facts", "is_active", "1"),
+    ("story_facts", "superseded_by_id", None),
+    # 流式生成的首 token 延迟
+    ("creation_logs", "ttft_ms", None),
+    # 按分段预算组装上下文时估算的提示词 token 数
+    ("creation_logs", "prompt_tokens_estimate", None),
+    # 接口返回的 token 用量与前缀缓存命中情况
+    ("creation_logs", "prompt_tokens", None),
+    ("creation_logs", "completion_tokens", None),
+    ("creation_logs", "prompt_cache_hit_tokens", None),
+    ("creation_logs", "prompt_cache_miss_tokens", None),
+    # 小说进度计数，补列后从章节表重算
+    ("novels", "completed_chapter_count", "0"),
+    ("novels", "total_word_count", "0"),
+)
+
+# 已有表上后续新增的索引与唯一约束：(表名, 名称)，定义取自模型
+_ADDED_INDEXES: Tuple[Tuple[str, str], ...] = (
+    ("novels", "ix_novels_lease_expires_at"),
+    ("story_facts", "idx_story_facts_novel_active"),
+    # 每日统计行按日期唯一，旧版本并发创建的重复行需先合并
+    ("generation_metrics", "uix_generation_metric_date"),
+)
+
+
+def _add_column(
+    conn: Connection, table_name: str, column_name: str, default_sql: Optional[str]
+) -> str:
+    column = Base.metadata.tables[table_name].c[column_name]
+    column_type = column.type.compile(dialect=conn.dialect)
+    statement = f"ALTER TABLE {table_name} ADD COLUMN {column.name} {column_type}"
+    if default_sql is not None:
+        statement += f" DEFAULT {default_sql}"
+    statement += " NULL" if column.nullable else " NOT NULL"
+    conn.execute(text(statement))
+    return statement
+
+
+def _create_index(conn: Connection, table_name: str, index_name: str) -> str:
+    table = Base.metadata.tables[table_name]
+    index = next((index for index in table.indexes if index.name == index_name), None)
+    if index is None:
+        # 唯一约束以同名唯一索引补建，MySQL 与 SQLite 均按唯一约束处理
+        constraint = next(
+            constraint
+            for constraint in table.constraints
+            if isinstance(constraint, UniqueConstraint) and constraint.name == index_name
+        )
+        index = Index(index_name, *constraint.columns, unique=True)
+    index.create(bind=conn)
+    unique = "UNIQUE " if index.unique else ""
+    return f"CREATE {unique}INDEX {index_name} ON {table_name}"
+
+
+def _merge_duplicate_daily_metrics(conn: Connection) -> List[str]:
+    """
+    将同一日期的多行每日统计累加到 id 最小的一行并删除其余行。
+    """
+
+    metrics = Base.metadata.tables["generation_metrics"]
+    days = conn.execute(
+        select(metrics.c.date).group_by(metrics.c.date).having(func.count() > 1)
+    ).scalars().all()
+    merged: List[str] = []
+    for day in days:
+        rows = conn.execute(
+            select(metrics).where(metrics.c.date == day).order_by(metrics.c.id.asc())
+        ).all()
+        keep_id = rows[0].id
+        conn.execute(
+            update(metrics)
+            .where(metrics.c.id == keep_id)
+            .values(
+                novel_count=sum(row.novel_count for row in rows),
+                chapter_count=sum(row.chapter_count for row in rows),
+                word_count=sum(row.word_count for row in rows),
+            )
+        )
+        conn.execute(
+            delete(metrics).where(metrics.c.date == day, metrics.c.id != keep_id)
+        )
+        merged.append(f"合并 {day} 的 {len(rows)} 行每日统计到 id {keep_id}")
+    return merged
+
+
+# 创建前需要先清理数据的索引
+_INDEX_PREPARERS: Dict[str, Callable[[Connection], List[str]]] = {
+    "uix_generation_metric_date": _merge_duplicate_daily_metrics,
+}
+
+
+def _recompute_progress_counters(bind: Engine) -> List[str]:
+    """
+    从章节表重算已有小说的进度计数与全站统计。
+    """
+
+    db = Session(bind=bind)
+    try:
+        drifted, _ = recompute_counters(db)
+    finally:
+        db.close()
+    return [f"重算 {len(drifted)} 本小说的进度计数"]
+
+
+# 补列后需要回填数据的列，回填在结构变更提交后执行
+_COLUMN_BACKFILLS: Dict[Tuple[str, str], Callable[[Engine], List[str]]] = {
+    ("novels", "completed_chapter_count"): _recompute_progress_counters,
+    ("novels", "total_word_count"): _recompute_progress_counters,
+}
+
+
+def upgrade_schema(bind: Optional[Engine] = None) -> List[str]:
+    """
+    为已存在的表补齐模型中后续新增的列与索引，返回本次执行的变更；可重复执行。
+
+    需在 Base.metadata.create_all 之后调用，新建的表已包含全部列，不会重复变更；
+    补列需要回填数据时（如进度计数），回填在结构变更提交后执行。
+    """
+
+    bind = bind or default_engine
+    applied: List[str] = []
+    backfills: List[Callable[[Engine], List[str]]] = []
+    with bind.begin() as conn:
+        inspector = inspect(conn)
+        tables = set(inspector.get_table_names())
+        for table_name, column_name, default_sql in _ADDED_COLUMNS:
+            if table_name not in tables:
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table_name)}
+            if column_name in existing:
+                continue
+            applied.append(_add_column(conn, table_name, column_name, default_sql))
+            backfill = _COLUMN_BACKFILLS.get((table_name, column_name))
+            if backfill is not None and backfill not in backfills:
+                backfills.append(backfill)
+        for table_name, index_name in _ADDED_INDEXES:
+            if table_name not in tables:
+                continue
+            existing = {index["name"] for index in inspector.get_indexes(table_name)}
+            existing |= {
+                constraint["name"]
+                for constraint in inspector.get_unique_constraints(table_name)
+            }
+            if index_name in existing:
+                continue
+            prepare = _INDEX_PREPARERS.get(index_name)
+            if prepare is not None:
+                applied.extend(prepare(conn))
+            applied.append(_create_index(conn, table_name, index_name))
+    for backfill in backfills:
+        applied.extend(backfill(bind))
+
+    for statement in applied:
+        logger.info("数据库结构升级：%s", statement)
+    return applied
@@ -0,0 +1,285 @@
+import logging
+import queue
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Set
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..db import SessionLocal
+from ..models import ArcSummary, Chapter, ChapterStatus, Novel, VolumeSummary
+from .deepseek_client import client as deepseek_client
+from .llm_stages import STAGE_SUMMARY
+from .usage_service import llm_call_scope
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SummaryBlock:
+    """
+    上下文使用的分层摘要条目，覆盖 [start_chapter, end_chapter] 区间。
+    """
+
+    level: str
+    index: int
+    start_chapter: int
+    end_chapter: int
+    summary: str
+
+
+def _summarize(novel: Novel, scope: str, material: str) -> str:
+    """
+    调用模型将一段剧情材料压缩为摘要。
+    """
+
+    system_prompt = (
+        "你是一名资深的网络小说责任编辑，擅长把长篇连载的剧情压缩成简洁准确的梗概。"
+        "只保留主线推进、人物关系变化、重要伏笔与已确立的设定，不做评价。"
+    )
+    user_prompt = (
+        f"小说《{novel.title}》（{novel.genre}）的{scope}剧情材料如下：\n\n"
+        f"{material}\n\n"
+        "请将以上内容压缩为一段不超过300字的剧情梗概，按时间顺序叙述，"
+        "必须保留人物生死、身份揭示、重大转折等后文不能矛盾的信息。"
+        "只输出梗概本身。"
+    )
+    text, _ = deepseek_client.generate_text(
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        stage=STAGE_SUMMARY,
+    )
+    return text.strip()
+
+
+def maintain_summary_tree(db: Session, novel_id: int) -> int:
+    """
+    为已完成但尚未汇总的剧情弧与分卷补写摘要，返回新写入的摘要数量。
+    """
+
+    novel: Novel | None = db.query(Novel).get(novel_id)
+    if not novel:
+        return 0
+
+    arc_size = max(settings.summary_arc_chapters, 1)
+    volume_arcs = max(settings.summary_volume_arcs, 1)
+    completed_arcs = novel.current_chapter_index // arc_size
+    written = 0
+
+    existing_arcs = {
+        row[0]
+        for row in db.query(ArcSummary.arc_index)
+        .filter(ArcSummary.novel_id == novel_id)
+        .all()
+    }
+    for arc_index in range(1, completed_arcs + 1):
+        if arc_index in existing_arcs:
+            continue
+        start = (arc_index - 1) * arc_size + 1
+        end = arc_index * arc_size
+        rows = (
+            db.query(Chapter.index, Chapter.title, Chapter.outline)
+            .filter(
+                Chapter.novel_id == novel_id,
+                Chapter.status == ChapterStatus.COMPLETED,
+                Chapter.index >= start,
+                Chapter.index <= end,
+            )
+            .order_by(Chapter.index.asc())
+            .all()
+        )
+        if len(rows) < end - start + 1:
+            break
+        material = "\n".join(
+            f"第{index}章《{title}》：{outline or ''}"
+            for index, title, outline in rows
+        )
+        summary = _summarize(novel, f"第{start}-{end}章", material)
+        if not summary:
+            break
+        db.add(
+            ArcSummary(
+                novel_id=novel_id,
+                arc_index=arc_index,
+                start_chapter=start,
+                end_chapter=end,
+                summary=summary,
+                created_at=datetime.utcnow(),
+            )
+        )
+        if not _commit_or_skip(db):
+            return written
+        written += 1
+
+    existing_volumes = {
+        row[0]
+        for row in db.query(VolumeSummary.volume_index)
+        .filter(VolumeSummary.novel_id == novel_id)
+        .all()
+    }
+    for volume_index in range(1, completed_arcs // volume_arcs + 1):
+        if volume_index in existing_volumes:
+            continue
+        first_arc = (volume_index - 1) * volume_arcs + 1
+        last_arc = volume_index * volume_arcs
+        arcs: List[ArcSummary] = (
+            db.query(ArcSummary)
+            .filter(
+                ArcSummary.novel_id == novel_id,
+                ArcSummary.arc_index >= first_arc,
+                ArcSummary.arc_index <= last_arc,
+            )
+            .order_by(ArcSummary.arc_index.asc())
+            .all()
+        )
+        if len(arcs) < volume_arcs:
+            break
+        material = "\n".join(
+            f"第{a.start_chapter}-{a.end_chapter}章：{a.summary}" for a in arcs
+        )
+        start, end = arcs[0].start_chapter, arcs[-1].end_chapter
+        summary = _summarize(novel, f"第{volume_index}卷（第{start}-{end}章）", material)
+        if not summary:
+            break
+        db.add(
+            VolumeSummary(
+                novel_id=novel_id,
+                volume_index=volume_index,
+                start_chapter=start,
+                end_chapter=end,
+                summary=summary,
+                created_at=datetime.utcnow(),
+            )
+        )
+        if not _commit_or_skip(db):
+            return written
+        written += 1
+
+    return written
+
+
+def _commit_or_skip(db: Session) -> bool:
+    """
+    提交摘要；其他实例已写入同一摘要时回滚并返回 False。
+    """
+
+    try:
+        db.commit()
+        return True
+    except IntegrityError:
+        db.rollback()
+        return False
+
+
+def load_summary_blocks(
+    db: Session,
+    novel_id: int,
+    before_chapter: int,
+) -> List[SummaryBlock]:
+    """
+    取出完整覆盖 before_chapter 之前章节的最粗粒度摘要序列（分卷优先，其次剧情弧）。
+    """
+
+    volumes = (
+        db.query(
+            VolumeSummary.volume_index,
+            VolumeSummary.start_chapter,
+            VolumeSummary.end_chapter,
+            VolumeSummary.summary,
+        )
+        .filter(
+            VolumeSummary.novel_id == novel_id,
+            VolumeSummary.end_chapter < before_chapter,
+        )
+        .order_by(VolumeSummary.start_chapter.asc())
+        .all()
+    )
+
+    blocks: List[SummaryBlock] = []
+    covered_until = 0
+    for index, start, end, summary in volumes:
+        if start != covered_until + 1:
+            break
+        blocks.append(SummaryBlock("volume", index, start, end, summary))
+        covered_until = end
+
+    arcs = (
+        db.query(
+            ArcSummary.arc_index,
+            ArcSummary.start_chapter,
+            ArcSummary.end_chapter,
+            ArcSummary.summary,
+        )
+        .filter(
+            ArcSummary.novel_id == novel_id,
+            ArcSummary.start_chapter > covered_until,
+            ArcSummary.end_chapter < before_chapter,
+        )
+        .order_by(ArcSummary.start_chapter.asc())
+        .all()
+    )
+    for index, start, end, summary in arcs:
+        if start != covered_until + 1:
+            break
+        blocks.append(SummaryBlock("arc", index, start, end, summary))
+        covered_until = end
+
+    return blocks
+
+
+class SummaryMaintainer:
+    """
+    后台摘要维护线程，按小说去重排队，避免阻塞章节生成主流程。
+    """
+
+    def __init__(self) -> None:
+        self._queue: "queue.Queue[int]" = queue.Queue()
+        self._pending: Set[int] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, novel_id: int) -> None:
+        """
+        将小说加入摘要维护队列，已在队列中则忽略。
+        """
+
+        with self._lock:
+            if novel_id in self._pending:
+                return
+            self._pending.add(novel_id)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="NovelBotSummary", daemon=True
+                )
+                self._thread.start()
+        self._queue.put(novel_id)
+
+    def _run(self) -> None:
+        """
+        后台线程主循环。
+        """
+
+        while True:
+            novel_id = self._queue.get()
+            with self._lock:
+                self._pending.discard(novel_id)
+            db: Session = SessionLocal()
+            try:
+                with llm_call_scope(novel_id=novel_id):
+                    written = maintain_summary_tree(db, novel_id)
+                if written:
+                    logger.info("小说 %s 新增 %s 条分层摘要", novel_id, written)
+            except Exception:
+                db.rollback()
+                logger.exception("小说 %s 分层摘要维护失败", novel_id)
+            finally:
+                db.close()
+
+
+summary_maintainer = SummaryMaintainer()
@@ -0,0 +1,38 @@
+import math
+from typing import Dict, Iterable
+
+
+# DeepSeek 官方给出的经验换算：1 个中文字符约 0.6 token，1 个英文字符约 0.3 token
+_CJK_TOKENS_PER_CHAR = 0.6
+_ASCII_TOKENS_PER_CHAR = 0.3
+# 每条消息的角色与分隔符开销
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    在本地粗略估算文本的 token 数，无需加载分词器。
+    """
+
+    if not text:
+        return 0
+
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    other_chars = len(text) - ascii_chars
+    return int(
+        math.ceil(
+            ascii_chars * _ASCII_TOKENS_PER_CHAR
+            + other_chars * _CJK_TOKENS_PER_CHAR
+        )
+    )
+
+
+def estimate_messages_tokens(messages: Iterable[Dict[str, str]]) -> int:
+    """
+    估算一组 Chat 消息的提示词 token 数。
+    """
+
+    return sum(
+        estimate_tokens(m.get("content") or "") + _MESSAGE_OVERHEAD_TOKENS
+        for m in messages
+    )
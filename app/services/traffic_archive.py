@@ -0,0 +1,259 @@
+import glob
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ..config import settings
+from .llm_stages import stage_profile
+from .provider_pool import ProviderPool, build_provider_pool
+from .response_cache import response_cache_key
+from .usage_service import current_llm_call_scope
+
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data", "traffic")
+_BATCH_SIZE = 200
+
+
+def archive_dir() -> str:
+    return os.path.abspath(settings.traffic_archive_dir or _DEFAULT_DIR)
+
+
+class TrafficArchive:
+    """
+    模型调用流量的只追加归档：每次成功调用的请求与原始响应写为一行 JSON。
+
+    归档按 UTC 日期分文件（traffic-YYYYMMDD.jsonl.gz），后台线程将积压的记录
+    压缩为一个 gzip 成员后追加写入；多个 gzip 成员首尾相接仍是合法的 gzip 文件。
+    """
+
+    def __init__(self) -> None:
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def record(
+        self,
+        stage: str,
+        request: Dict[str, Any],
+        content: str,
+        meta: Dict[str, Any],
+    ) -> None:
+        """
+        归档一次成功的调用；request 为解析完阶段配置后的模型参数与消息，
+        其中 model 为实际处理请求的模型。
+        """
+
+        if not settings.traffic_archive_enabled:
+            return
+        scope = current_llm_call_scope()
+        self._ensure_thread()
+        self._queue.put(
+            {
+                "ts": datetime.utcnow().isoformat(),
+                "novel_id": scope.novel_id,
+                "chapter_id": scope.chapter_id,
+                "stage": stage,
+                "key": response_cache_key(
+                    request["model"],
+                    request["messages"],
+                    request["temperature"],
+                    request["max_tokens"],
+                    request["stop"],
+                ),
+                "request": request,
+                "content": content,
+                "response": meta.get("raw"),
+                "meta": {k: v for k, v in meta.items() if k != "raw"},
+            }
+        )
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """
+        等待已入队的记录全部写入磁盘。
+        """
+
+        done = threading.Event()
+        self._queue.put({"_flush": done})
+        self._ensure_thread()
+        done.wait(timeout)
+
+    def _ensure_thread(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="NovelBotTraffic", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            items = [self._queue.get()]
+            while len(items) < _BATCH_SIZE:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [item for item in items if "_flush" not in item]
+            if rows:
+                self._write(rows)
+            for item in items:
+                if "_flush" in item:
+                    item["_flush"].set()
+
+    @staticmethod
+    def _write(rows: List[Dict[str, Any]]) -> None:
+        directory = archive_dir()
+        path = os.path.join(
+            directory, f"traffic-{datetime.utcnow():%Y%m%d}.jsonl.gz"
+        )
+        data = "".join(
+            json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in rows
+        )
+        try:
+            os.makedirs(directory, exist_ok=True)
+            # 整批压缩后一次写入，追加模式下多个进程的写入不会交错
+            with open(path, "ab") as fh:
+                fh.write(gzip.compress(data.encode("utf-8")))
+        except OSError:
+            logger.exception("写入 %s 条调用归档失败", len(rows))
+
+
+traffic_archive = TrafficArchive()
+
+
+def archive_files(paths: Optional[Iterable[str]] = None) -> List[str]:
+    """
+    展开归档路径：目录取其中全部归档文件，未指定时使用配置的归档目录。
+    """
+
+    files: List[str] = []
+    for path in paths if paths is not None else [archive_dir()]:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "traffic-*.jsonl.gz"))))
+        else:
+            files.append(path)
+    return files
+
+
+def iter_archive(
+    paths: Optional[Iterable[str]] = None,
+    stage: Optional[str] = None,
+    novel_id: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    按写入顺序逐条读取归档记录，可按阶段与小说过滤；末尾不完整的记录会被跳过。
+    """
+
+    for path in archive_files(paths):
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        item = json.loads(line)
+                    except ValueError:
+                        continue
+                    if stage is not None and item.get("stage") != stage:
+                        continue
+                    if novel_id is not None and item.get("novel_id") != novel_id:
+                        continue
+                    yield item
+        except (OSError, EOFError):
+            logger.warning("归档文件 %s 读取中断，已跳过其余内容", path)
+
+
+class ReplayMiss(LookupError):
+    """
+    归档中没有与请求匹配的响应。
+    """
+
+
+class ReplayDeepSeekClient:
+    """
+    从流量归档回放响应的客户端，接口与 DeepSeekClient.generate_text 一致。
+
+    请求按与响应缓存相同的内容键匹配，不发起网络请求也不记账，
+    用于离线重跑解析、事实提取后处理与基准测试。
+    阶段未指定模型时依次尝试端点池中各端点的模型（默认取当前配置的端点）。
+    同一键多次出现时按归档顺序依次返回，用尽后重复最后一条。
+    """
+
+    def __init__(
+        self,
+        paths: Optional[Iterable[str]] = None,
+        pool: Optional[ProviderPool] = None,
+    ) -> None:
+        self._pool = pool or build_provider_pool()
+        self._lock = threading.Lock()
+        self._responses: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+        self._cursors: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        for item in iter_archive(paths):
+            meta = dict(item.get("meta") or {}, raw=item.get("response"))
+            self._responses.setdefault(item["key"], []).append(
+                (item["content"], meta)
+            )
+
+    def __len__(self) -> int:
+        return sum(len(items) for items in self._responses.values())
+
+    def generate_text(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        stop: Optional[List[str]] = None,
+        on_text: Optional[Callable[[str], None]] = None,
+        stage: Optional[str] = None,
+    ) -> Tuple[str, Dict[str, Any]]:
+        profile = stage_profile(stage)
+        keys = [
+            response_cache_key(
+                model,
+                messages,
+                profile.temperature if temperature is None else temperature,
+                profile.max_tokens if max_tokens is None else max_tokens,
+                stop,
+            )
+            for model in self._pool.served_models(profile.model)
+        ]
+        with self._lock:
+            key = next((key for key in keys if key in self._responses), None)
+            items = self._responses.get(key) if key is not None else None
+            if not items:
+                self.misses += 1
+                raise ReplayMiss(f"归档中没有阶段 {profile.stage} 的匹配响应")
+            cursor = self._cursors.get(key, 0)
+            self._cursors[key] = cursor + 1
+            self.hits += 1
+            content, meta = items[min(cursor, len(items) - 1)]
+        if on_text is not None:
+            on_text(content)
+        return content, dict(meta, replayed=True)
+
+
+@contextmanager
+def replaying(client: Any) -> Iterator[Any]:
+    """
+    在 with 块内让章节生成与摘要服务改用指定客户端（通常是 ReplayDeepSeekClient）。
+    """
+
+    from . import novel_service, summary_tree
+
+    modules = (novel_service, summary_tree)
+    previous = [module.deepseek_client for module in modules]
+    for module in modules:
+        module.deepseek_client = client
+    try:
+        yield client
+    finally:
+        for module, original in zip(modules, previous):
+            module.deepseek_client = original
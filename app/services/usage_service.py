@@ -0,0 +1,341 @@
+import contextvars
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from ..db import SessionLocal
+from ..models import Chapter, LLMCall
+from ..schemas import (
+    ChapterLLMUsage,
+    DailyLLMUsage,
+    LLMUsageTotals,
+    NovelLLMUsage,
+    StageLLMStats,
+)
+
+
+logger = logging.getLogger(__name__)
+
+_BATCH_SIZE = 200
+# 计算延迟分位数时每个阶段最多读取的最近成功调用数
+_LATENCY_SAMPLE_SIZE = 5000
+
+
+@dataclass(frozen=True)
+class LLMCallScope:
+    """
+    模型调用的归属：当前正在处理的小说与章节。
+    """
+
+    novel_id: Optional[int] = None
+    chapter_id: Optional[int] = None
+
+
+_current_scope: contextvars.ContextVar[LLMCallScope] = contextvars.ContextVar(
+    "llm_call_scope", default=LLMCallScope()
+)
+
+
+@contextmanager
+def llm_call_scope(
+    novel_id: Optional[int] = None,
+    chapter_id: Optional[int] = None,
+) -> Iterator[LLMCallScope]:
+    """
+    在 with 块内发起的模型调用记入指定小说与章节的账目。
+    """
+
+    scope = LLMCallScope(novel_id=novel_id, chapter_id=chapter_id)
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+
+
+def current_llm_call_scope() -> LLMCallScope:
+    return _current_scope.get()
+
+
+class UsageRecorder:
+    """
+    模型调用账目的后台写入器。
+
+    调用线程只负责入队，由后台线程批量写入 llm_calls 表，
+    记账不占用调用方的数据库事务，章节回滚时账目仍然保留。
+    """
+
+    def __init__(self) -> None:
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def record(
+        self,
+        stage: str,
+        meta: Optional[Dict[str, Any]] = None,
+        model: Optional[str] = None,
+        error: Optional[BaseException] = None,
+        elapsed_ms: Optional[float] = None,
+    ) -> None:
+        """
+        记录一次模型调用：成功时传入调用返回的 meta，失败时传入异常。
+        """
+
+        meta = meta or {}
+        usage = meta.get("usage") or {}
+        scope = _current_scope.get()
+        queue_ms = None
+        if "limiter_wait_ms" in meta or "lane_wait_ms" in meta:
+            queue_ms = (meta.get("limiter_wait_ms") or 0.0) + (
+                meta.get("lane_wait_ms") or 0.0
+            )
+        row = {
+            "novel_id": scope.novel_id,
+            "chapter_id": scope.chapter_id,
+            "stage": stage,
+            "model": meta.get("model") or model,
+            "endpoint": meta.get("endpoint"),
+            "request_id": meta.get("request_id"),
+            "prompt_tokens": usage.get("prompt_tokens"),
+            "completion_tokens": usage.get("completion_tokens"),
+            "cache_hit_tokens": usage.get("prompt_cache_hit_tokens"),
+            "cache_miss_tokens": usage.get("prompt_cache_miss_tokens"),
+            "latency_ms": meta.get("latency_ms", elapsed_ms),
+            "queue_ms": queue_ms,
+            "attempts": meta.get("attempts") or getattr(error, "attempts", None),
+            "success": error is None,
+            "error": str(error)[:500] if error is not None else None,
+            "created_at": datetime.utcnow(),
+        }
+        self._ensure_thread()
+        self._queue.put(row)
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """
+        等待已入队的账目全部写入数据库。
+        """
+
+        done = threading.Event()
+        self._queue.put({"_flush": done})
+        self._ensure_thread()
+        done.wait(timeout)
+
+    def _ensure_thread(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="NovelBotUsage", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        """
+        后台线程主循环：取出当前积压的账目，一次事务批量写入。
+        """
+
+        while True:
+            items = [self._queue.get()]
+            while len(items) < _BATCH_SIZE:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [item for item in items if "_flush" not in item]
+            if rows:
+                self._write(rows)
+            for item in items:
+                if "_flush" in item:
+                    item["_flush"].set()
+
+    @staticmethod
+    def _write(rows: List[Dict[str, Any]]) -> None:
+        db: Session = SessionLocal()
+        try:
+            db.bulk_insert_mappings(LLMCall, rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.exception("写入 %s 条模型调用账目失败", len(rows))
+        finally:
+            db.close()
+
+
+usage_recorder = UsageRecorder()
+
+
+def _totals_columns() -> List[Any]:
+    return [
+        func.count(LLMCall.id),
+        func.sum(case((LLMCall.success.is_(False), 1), else_=0)),
+        func.sum(func.coalesce(LLMCall.prompt_tokens, 0)),
+        func.sum(func.coalesce(LLMCall.completion_tokens, 0)),
+        func.sum(func.coalesce(LLMCall.cache_hit_tokens, 0)),
+        func.sum(func.coalesce(LLMCall.cache_miss_tokens, 0)),
+        func.avg(LLMCall.latency_ms),
+    ]
+
+
+def _totals(row: Sequence[Any]) -> Dict[str, Any]:
+    """
+    将 _totals_columns 的查询结果转换为用量汇总字段。
+    """
+
+    prompt, completion, hit, miss = (int(value or 0) for value in row[2:6])
+    return {
+        "calls": row[0] or 0,
+        "failed_calls": int(row[1] or 0),
+        "prompt_tokens": prompt,
+        "completion_tokens": completion,
+        "total_tokens": prompt + completion,
+        "cache_hit_tokens": hit,
+        "cache_miss_tokens": miss,
+        "cache_hit_ratio": hit / (hit + miss) if hit + miss else None,
+        "avg_latency_ms": float(row[6]) if row[6] is not None else None,
+    }
+
+
+def _tokens_per_kword(total_tokens: int, word_count: int) -> Optional[float]:
+    return total_tokens * 1000.0 / word_count if word_count else None
+
+
+def novel_usage(db: Session, novel_id: int) -> NovelLLMUsage:
+    """
+    汇总单本小说的模型用量：总计、按阶段与按章节，并折算每千字 token 数。
+    """
+
+    totals = _totals(
+        db.query(*_totals_columns()).filter(LLMCall.novel_id == novel_id).one()
+    )
+
+    stages: Dict[str, LLMUsageTotals] = {}
+    for row in (
+        db.query(LLMCall.stage, *_totals_columns())
+        .filter(LLMCall.novel_id == novel_id)
+        .group_by(LLMCall.stage)
+        .all()
+    ):
+        stages[row[0]] = LLMUsageTotals(**_totals(row[1:]))
+
+    chapters: List[ChapterLLMUsage] = []
+    total_words = 0
+    for row in (
+        db.query(
+            Chapter.id,
+            Chapter.index,
+            Chapter.word_count,
+            *_totals_columns(),
+        )
+        .join(LLMCall, LLMCall.chapter_id == Chapter.id)
+        .filter(LLMCall.novel_id == novel_id)
+        .group_by(Chapter.id, Chapter.index, Chapter.word_count)
+        .order_by(Chapter.index.asc())
+        .all()
+    ):
+        word_count = row[2] or 0
+        total_words += word_count
+        chapter_totals = _totals(row[3:])
+        chapters.append(
+            ChapterLLMUsage(
+                chapter_id=row[0],
+                chapter_index=row[1],
+                word_count=word_count,
+                tokens_per_kword=_tokens_per_kword(
+                    chapter_totals["total_tokens"], word_count
+                ),
+                **chapter_totals,
+            )
+        )
+
+    return NovelLLMUsage(
+        novel_id=novel_id,
+        totals=LLMUsageTotals(**totals),
+        word_count=total_words,
+        tokens_per_kword=_tokens_per_kword(totals["total_tokens"], total_words),
+        stages=stages,
+        chapters=chapters,
+    )
+
+
+def daily_usage(db: Session, days: int = 7) -> List[DailyLLMUsage]:
+    """
+    按天汇总最近若干天的模型用量（按 UTC 日期）。
+    """
+
+    since = datetime.combine(
+        datetime.utcnow().date() - timedelta(days=max(days, 1) - 1),
+        datetime.min.time(),
+    )
+    day = func.date(LLMCall.created_at)
+    results: List[DailyLLMUsage] = []
+    for row in (
+        db.query(day, *_totals_columns())
+        .filter(LLMCall.created_at >= since)
+        .group_by(day)
+        .order_by(day.asc())
+        .all()
+    ):
+        value = row[0]
+        if not isinstance(value, date):
+            value = date.fromisoformat(str(value))
+        results.append(
+            DailyLLMUsage(
+                date=value,
+                **_totals(row[1:]),
+            )
+        )
+    return results
+
+
+def _percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    position = min(int(round(q * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[position]
+
+
+def stage_stats(db: Session, days: int = 7) -> List[StageLLMStats]:
+    """
+    按调用阶段统计最近若干天的用量与成功调用的延迟分位数。
+
+    分位数取自每个阶段最近的 _LATENCY_SAMPLE_SIZE 次成功调用，查询量不随时间范围增长。
+    """
+
+    since = datetime.utcnow() - timedelta(days=max(days, 1))
+    results: List[StageLLMStats] = []
+    for row in (
+        db.query(LLMCall.stage, *_totals_columns())
+        .filter(LLMCall.created_at >= since)
+        .group_by(LLMCall.stage)
+        .order_by(LLMCall.stage.asc())
+        .all()
+    ):
+        values = sorted(
+            latency
+            for (latency,) in db.query(LLMCall.latency_ms)
+            .filter(
+                LLMCall.stage == row[0],
+                LLMCall.created_at >= since,
+                LLMCall.success.is_(True),
+                LLMCall.latency_ms.isnot(None),
+            )
+            .order_by(LLMCall.created_at.desc())
+            .limit(_LATENCY_SAMPLE_SIZE)
+        )
+        results.append(
+            StageLLMStats(
+                stage=row[0],
+                latency_p50_ms=_percentile(values, 0.5),
+                latency_p90_ms=_percentile(values, 0.9),
+                latency_p99_ms=_percentile(values, 0.99),
+                **_totals(row[1:]),
+            )
+        )
+    return results
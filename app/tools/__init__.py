@@ -0,0 +1,3 @@
+"""
+离线工具：本地模拟模型服务、基准测试与数据维护脚本。
+"""
@@ -0,0 +1,271 @@
+"""
+上下文构建与仪表盘的微基准：在合成语料上测量热点函数随数据规模增长的耗时、查询数与内存峰值。
+
+测量对象：
+    _build_novel_context        为下一章构建上下文（10 / 100 / 1k / 10k 章）
+    _build_fact_block_for_audit 构建审核用事实列表（同上）
+    get_dashboard_summary       仪表盘汇总（100 / 10k 本小说）
+
+上下文函数分别测量冷启动（清空上下文缓存与检索索引）与热缓存两种情况。
+
+用法：
+    python -m app.tools.bench_context --output context.json
+    python -m app.tools.bench_context --chapter-scales 10,100 --novel-scales 100 --save-baseline base.json
+    python -m app.tools.bench_context --baseline base.json --max-regression 0.25
+
+指定 --baseline 时，任一场景耗时或查询数超出基线 --max-regression 比例即以状态码 1 退出。
+默认使用临时 SQLite 数据库，配置在导入应用模块前写入环境变量。
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from .synthetic_corpus import CorpusSpec, chinese_prose, seed_corpus
+
+
+class QueryCounter:
+    """
+    通过 SQLAlchemy 游标事件统计执行的语句数。
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def install(self, engine: Any) -> None:
+        from sqlalchemy import event
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _count(conn, cursor, statement, parameters, context, executemany):  # type: ignore[no-untyped-def]
+            with self._lock:
+                self.count += 1
+
+
+def measure(
+    fn: Callable[[], Any],
+    counter: QueryCounter,
+    repeat: int,
+    before: Callable[[], None] = lambda: None,
+) -> Dict[str, float]:
+    """
+    运行 fn 若干次，返回耗时中位数、单次查询数与内存峰值。
+
+    内存追踪会显著拖慢 Python 代码，因此耗时在不追踪的运行中测量，另跑一次测量内存峰值。
+    before 在每次运行前调用（不计入耗时），用于清空缓存以测量冷启动。
+    """
+
+    timings: List[float] = []
+    queries = 0
+    for _ in range(max(repeat, 1)):
+        before()
+        start_queries = counter.count
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+        queries = counter.count - start_queries
+
+    before()
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "ms": round(statistics.median(timings) * 1000.0, 2),
+        "queries": queries,
+        "peak_kb": round(peak / 1024.0, 1),
+    }
+
+
+def run_benchmarks(args: argparse.Namespace) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix="novelbot-bench-context-")
+    os.environ["NOVELBOT_MYSQL_DSN"] = args.dsn or f"sqlite:///{os.path.join(workdir, 'context.db')}"
+
+    from ..config import settings
+    from ..db import Base, SessionLocal, engine
+    from ..models import Novel
+    from ..services.context_cache import context_cache
+    from ..services.novel_service import (
+        _build_fact_block_for_audit,
+        _build_novel_context,
+        get_dashboard_summary,
+    )
+    from ..services.retrieval import retrieval_registry
+
+    Base.metadata.create_all(bind=engine)
+    counter = QueryCounter()
+    counter.install(engine)
+    draft = "本章小结：林晚与沈川在青云城重逢。\n\n" + chinese_prose(random.Random(1), 2500)
+    results: Dict[str, Any] = {
+        "config": {
+            "database": engine.dialect.name,
+            "repeat": args.repeat,
+            "facts_per_chapter": args.facts_per_chapter,
+            "retrieval_enabled": settings.retrieval_enabled,
+            "entity_index_enabled": settings.entity_index_enabled,
+        },
+        "context": {},
+        "dashboard": {},
+    }
+
+    db = SessionLocal()
+    try:
+        for chapters in args.chapter_scales:
+            started = time.perf_counter()
+            novel_id = seed_corpus(
+                db,
+                CorpusSpec(
+                    novels=1,
+                    chapters=chapters,
+                    facts_per_chapter=args.facts_per_chapter,
+                    logs_per_chapter=args.logs_per_chapter,
+                    chapter_chars=args.chapter_chars,
+                ),
+            )[0]
+            seeded = time.perf_counter() - started
+            novel = db.query(Novel).get(novel_id)
+            target = chapters + 1
+
+            def cold() -> None:
+                context_cache.invalidate(novel_id)
+                retrieval_registry.invalidate(novel_id)
+
+            results["context"][str(chapters)] = {
+                "seed_seconds": round(seeded, 2),
+                "build_context_cold": measure(
+                    lambda: _build_novel_context(db, novel, target), counter, args.repeat, cold
+                ),
+                "build_context_warm": measure(
+                    lambda: _build_novel_context(db, novel, target), counter, args.repeat
+                ),
+                "fact_block_cold": measure(
+                    lambda: _build_fact_block_for_audit(db, novel, target, draft),
+                    counter,
+                    args.repeat,
+                    cold,
+                ),
+                "fact_block_warm": measure(
+                    lambda: _build_fact_block_for_audit(db, novel, target, draft),
+                    counter,
+                    args.repeat,
+                ),
+            }
+            db.commit()
+            print(f"{chapters} 章：{json.dumps(results['context'][str(chapters)], ensure_ascii=False)}")
+
+        existing = db.query(Novel).count()
+        for novels in args.novel_scales:
+            missing = max(novels - existing, 0)
+            started = time.perf_counter()
+            if missing:
+                seed_corpus(
+                    db,
+                    CorpusSpec(
+                        novels=missing,
+                        chapters=args.dashboard_chapters,
+                        facts_per_chapter=0,
+                        logs_per_chapter=1,
+                        chapter_chars=args.dashboard_chapter_chars,
+                        characters_per_novel=1,
+                    ),
+                )
+                existing += missing
+            results["dashboard"][str(novels)] = {
+                "seed_seconds": round(time.perf_counter() - started, 2),
+                "dashboard": measure(lambda: get_dashboard_summary(db), counter, args.repeat),
+            }
+            db.commit()
+            print(f"{novels} 本小说：{json.dumps(results['dashboard'][str(novels)], ensure_ascii=False)}")
+    finally:
+        db.close()
+    return results
+
+
+def _metrics(report: Dict[str, Any]) -> Dict[str, float]:
+    """
+    展开为 “场景.指标” 形式的数值，耗时与查询数均为越小越好。
+    """
+
+    values: Dict[str, float] = {}
+    for group in ("context", "dashboard"):
+        for scale, cases in (report.get(group) or {}).items():
+            for case, stats in cases.items():
+                if not isinstance(stats, dict):
+                    continue
+                for key in ("ms", "queries"):
+                    values[f"{group}.{scale}.{case}.{key}"] = stats[key]
+    return values
+
+
+def compare_with_baseline(
+    report: Dict[str, Any],
+    baseline: Dict[str, Any],
+    max_regression: float,
+    min_ms: float = 1.0,
+) -> List[str]:
+    """
+    与基线逐项比较，返回超出允许退化比例的指标；耗时低于 min_ms 的场景噪声过大，不参与比较。
+    """
+
+    current = _metrics(report)
+    failures: List[str] = []
+    for key, expected in _metrics(baseline).items():
+        actual = current.get(key)
+        if actual is None:
+            continue
+        if key.endswith(".ms") and max(expected, actual) < min_ms:
+            continue
+        if actual > expected * (1 + max_regression):
+            failures.append(f"{key}: 基线 {expected:g}，本次 {actual:g}")
+    return failures
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="上下文构建与仪表盘微基准")
+    parser.add_argument("--chapter-scales", type=_int_list, default=[10, 100, 1000, 10000])
+    parser.add_argument("--novel-scales", type=_int_list, default=[100, 10000])
+    parser.add_argument("--facts-per-chapter", type=int, default=5)
+    parser.add_argument("--logs-per-chapter", type=int, default=2)
+    parser.add_argument("--chapter-chars", type=int, default=2500)
+    parser.add_argument("--dashboard-chapters", type=int, default=3, help="仪表盘场景中每本小说的章节数")
+    parser.add_argument("--dashboard-chapter-chars", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=3, help="每个场景的运行次数，取耗时中位数")
+    parser.add_argument("--dsn", default="", help="数据库连接串，默认使用临时 SQLite")
+    parser.add_argument("--output", help="将完整报告写入 JSON 文件")
+    parser.add_argument("--baseline", help="与该基线报告比较，退化超出阈值时以状态码 1 退出")
+    parser.add_argument("--max-regression", type=float, default=0.25)
+    parser.add_argument("--save-baseline", help="将本次报告保存为基线")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as fh:
+                json.dump(report, fh, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        failures = compare_with_baseline(report, baseline, args.max_regression)
+        for failure in failures:
+            print(f"性能退化：{failure}")
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
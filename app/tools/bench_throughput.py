@@ -0,0 +1,318 @@
+"""
+端到端吞吐基准：在本地模拟服务上运行调度器，统计章节产出速度、接口额度利用率、
+各阶段延迟与数据库耗时。
+
+用法：
+    python -m app.tools.bench_throughput --novels 8 --chapters 5 --latency-ms 300
+    python -m app.tools.bench_throughput --output bench.json --save-baseline baseline.json
+    python -m app.tools.bench_throughput --baseline baseline.json --max-regression 0.15
+
+指定 --baseline 时与基线比较，章节产出速度下降或延迟、数据库耗时上升超过
+--max-regression 比例即以非零状态码退出，可直接用于 CI。
+默认使用临时 SQLite 数据库；需要接近生产的数据库耗时时以 --dsn 指定 MySQL。
+配置在导入应用模块前写入环境变量，因此应用模块均在函数内导入。
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime
+from typing import Any, Dict, List
+
+from .mock_deepseek import MockDeepSeekServer, add_mock_arguments, mock_options
+
+
+# 比较基线时的指标方向：1 表示越大越好，-1 表示越小越好
+_BASELINE_METRICS = {
+    "chapters_per_hour": 1,
+    "db_ms_per_chapter": -1,
+}
+
+
+class DBTimer:
+    """
+    通过 SQLAlchemy 游标事件累计语句数量与执行耗时。
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.statements = 0
+        self.seconds = 0.0
+
+    def install(self, engine: Any) -> None:
+        from sqlalchemy import event
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):  # type: ignore[no-untyped-def]
+            conn.info.setdefault("_bench_started", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):  # type: ignore[no-untyped-def]
+            started = conn.info["_bench_started"].pop()
+            with self._lock:
+                self.statements += 1
+                self.seconds += time.perf_counter() - started
+
+
+def _configure_environment(args: argparse.Namespace, base_url: str, workdir: str) -> None:
+    """
+    在导入应用配置之前写入本次基准使用的环境变量。
+    """
+
+    os.environ["NOVELBOT_MYSQL_DSN"] = args.dsn or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["NOVELBOT_DEEPSEEK_BASE_URL"] = base_url
+    os.environ["NOVELBOT_DEEPSEEK_API_KEY"] = "mock"
+    os.environ["NOVELBOT_DEEPSEEK_ENDPOINTS"] = "[]"
+    os.environ["NOVELBOT_DEEPSEEK_STREAM_ENABLED"] = "true" if args.stream else "false"
+    os.environ["NOVELBOT_SCHEDULER_WORKER_POOL_ENABLED"] = "true"
+    os.environ["NOVELBOT_MAX_CONCURRENT_API_REQUESTS"] = str(args.concurrency)
+    os.environ["NOVELBOT_MAX_REQUESTS_PER_MINUTE"] = str(args.requests_per_minute)
+    os.environ["NOVELBOT_MAX_TOKENS_PER_MINUTE"] = str(args.tokens_per_minute)
+    os.environ["NOVELBOT_API_MAX_RETRIES"] = str(args.max_retries)
+    # 响应缓存与调用归档写到临时目录，避免不同轮次之间互相命中
+    os.environ["NOVELBOT_RESPONSE_CACHE_PATH"] = os.path.join(workdir, "response_cache.sqlite3")
+    os.environ["NOVELBOT_TRAFFIC_ARCHIVE_ENABLED"] = "false"
+
+
+def _seed_novels(db: Any, novels: int, chapters: int) -> None:
+    from ..models import Chapter, ChapterStatus, Character, Novel, NovelStatus
+    from ..services.progress_counters import note_novel_created
+
+    now = datetime.utcnow()
+    for i in range(novels):
+        novel = Novel(
+            title=f"基准测试小说{i + 1}",
+            genre="玄幻",
+            description="林晚拜入天剑宗后下山历练的故事。",
+            target_chapter_count=chapters,
+            status=NovelStatus.PLANNED,
+            planned_date=date.today(),
+        )
+        db.add(novel)
+        db.flush()
+        db.add(Character(novel_id=novel.id, name="林晚", role="女主", description="天剑宗弟子"))
+        db.add_all(
+            Chapter(
+                novel_id=novel.id,
+                index=idx,
+                title=f"第{idx}章",
+                status=ChapterStatus.PLANNED,
+                created_at=now,
+                updated_at=now,
+            )
+            for idx in range(1, chapters + 1)
+        )
+        note_novel_created(db, chapters)
+    db.commit()
+
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    启动模拟服务与调度器，直到全部章节完成或超时，返回基准报告。
+    """
+
+    server = MockDeepSeekServer(port=args.port, options=mock_options(args)).start()
+    workdir = tempfile.mkdtemp(prefix="novelbot-bench-")
+    _configure_environment(args, server.base_url, workdir)
+
+    from ..config import settings
+    from ..db import Base, SessionLocal, engine
+    from ..models import Chapter, ChapterStatus
+    from ..scheduler import Scheduler
+    from ..services.usage_service import stage_stats, usage_recorder
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        _seed_novels(db, args.novels, args.chapters)
+    finally:
+        db.close()
+
+    timer = DBTimer()
+    timer.install(engine)
+    total = args.novels * args.chapters
+    scheduler = Scheduler(instance_id="bench")
+    started = time.monotonic()
+    scheduler.start()
+    done = 0
+    db = SessionLocal()
+    try:
+        while time.monotonic() - started < args.timeout:
+            done = (
+                db.query(Chapter)
+                .filter(Chapter.status == ChapterStatus.COMPLETED)
+                .count()
+            )
+            db.commit()
+            if done >= total:
+                break
+            time.sleep(0.5)
+        elapsed = time.monotonic() - started
+        scheduler.stop()
+        usage_recorder.flush(10)
+        stages = stage_stats(db, days=1)
+    finally:
+        db.close()
+        server.stop()
+
+    minutes = elapsed / 60.0
+    mock = server.stats
+    requests_per_minute = mock.requests / minutes if minutes else 0.0
+    tokens_per_minute = (mock.prompt_tokens + mock.completion_tokens) / minutes if minutes else 0.0
+    return {
+        "config": {
+            "novels": args.novels,
+            "chapters": args.chapters,
+            "concurrency": settings.max_concurrent_api_requests,
+            "stream": settings.deepseek_stream_enabled,
+            "combined_review": settings.combined_review_enabled,
+            "latency_ms": args.latency_ms,
+            "tokens_per_second": args.tokens_per_second,
+            "error_429": args.error_429,
+            "error_500": args.error_500,
+            "database": engine.dialect.name,
+        },
+        "completed_chapters": done,
+        "target_chapters": total,
+        "elapsed_seconds": round(elapsed, 2),
+        "chapters_per_hour": round(done / elapsed * 3600.0, 1) if elapsed else 0.0,
+        "api": {
+            "requests": mock.requests,
+            "throttled": mock.throttled,
+            "errors": mock.errors,
+            "requests_per_minute": round(requests_per_minute, 1),
+            "tokens_per_minute": round(tokens_per_minute, 1),
+            "request_quota_utilization": round(requests_per_minute / settings.max_requests_per_minute, 3)
+            if settings.max_requests_per_minute > 0
+            else None,
+            "token_quota_utilization": round(tokens_per_minute / settings.max_tokens_per_minute, 3)
+            if settings.max_tokens_per_minute > 0
+            else None,
+            "stages": dict(mock.stages),
+        },
+        "stages": {
+            s.stage: {
+                "calls": s.calls,
+                "failed_calls": s.failed_calls,
+                "latency_p50_ms": s.latency_p50_ms,
+                "latency_p90_ms": s.latency_p90_ms,
+                "latency_p99_ms": s.latency_p99_ms,
+            }
+            for s in stages
+        },
+        "db": {
+            "statements": timer.statements,
+            "seconds": round(timer.seconds, 3),
+            "share_of_wall_time": round(timer.seconds / elapsed, 3) if elapsed else None,
+            "db_ms_per_chapter": round(timer.seconds * 1000.0 / done, 2) if done else None,
+        },
+    }
+
+
+def _metrics(report: Dict[str, Any]) -> Dict[str, float]:
+    """
+    取出参与基线比较的指标：章节产出速度、每章数据库耗时与各阶段 p90 延迟。
+    """
+
+    values = {
+        "chapters_per_hour": report.get("chapters_per_hour"),
+        "db_ms_per_chapter": (report.get("db") or {}).get("db_ms_per_chapter"),
+    }
+    for stage, stats in (report.get("stages") or {}).items():
+        values[f"{stage}_latency_p90_ms"] = stats.get("latency_p90_ms")
+    return {key: value for key, value in values.items() if value is not None}
+
+
+def compare_with_baseline(
+    report: Dict[str, Any],
+    baseline: Dict[str, Any],
+    max_regression: float,
+) -> List[str]:
+    """
+    与基线逐项比较，返回超出允许退化比例的指标说明。
+    """
+
+    current = _metrics(report)
+    failures: List[str] = []
+    for key, expected in _metrics(baseline).items():
+        actual = current.get(key)
+        if actual is None or expected <= 0:
+            continue
+        direction = _BASELINE_METRICS.get(key, -1)
+        change = (actual - expected) / expected * direction
+        if change < -max_regression:
+            failures.append(f"{key}: 基线 {expected:g}，本次 {actual:g}（退化 {-change:.1%}）")
+    return failures
+
+
+def _print_summary(report: Dict[str, Any]) -> None:
+    api = report["api"]
+    print(
+        f"完成章节 {report['completed_chapters']}/{report['target_chapters']}，"
+        f"耗时 {report['elapsed_seconds']} 秒，每小时 {report['chapters_per_hour']} 章"
+    )
+    print(
+        f"接口请求 {api['requests']} 次（429：{api['throttled']}，5xx：{api['errors']}），"
+        f"每分钟 {api['requests_per_minute']} 次 / {api['tokens_per_minute']} tokens，"
+        f"请求额度利用率 {api['request_quota_utilization']}，token 额度利用率 {api['token_quota_utilization']}"
+    )
+    for stage, stats in report["stages"].items():
+        print(
+            f"  {stage:<8} 调用 {stats['calls']:>4}  失败 {stats['failed_calls']:>3}  "
+            f"p50 {stats['latency_p50_ms'] or 0:>8.0f} ms  p90 {stats['latency_p90_ms'] or 0:>8.0f} ms  "
+            f"p99 {stats['latency_p99_ms'] or 0:>8.0f} ms"
+        )
+    db = report["db"]
+    print(
+        f"数据库语句 {db['statements']} 条，累计 {db['seconds']} 秒，"
+        f"为总耗时的 {db['share_of_wall_time']} 倍（多线程累计），每章 {db['db_ms_per_chapter']} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="NovelBot 端到端吞吐基准")
+    parser.add_argument("--novels", type=int, default=4, help="并行创作的小说数")
+    parser.add_argument("--chapters", type=int, default=3, help="每本小说的章节数")
+    parser.add_argument("--concurrency", type=int, default=4, help="工作池并发数")
+    parser.add_argument("--requests-per-minute", type=int, default=600, help="每分钟请求额度")
+    parser.add_argument("--tokens-per-minute", type=int, default=0, help="每分钟 token 额度，0 表示不限")
+    parser.add_argument("--max-retries", type=int, default=3, help="单次调用最大重试次数")
+    parser.add_argument("--stream", action="store_true", help="章节正文使用流式接口")
+    parser.add_argument("--timeout", type=float, default=600.0, help="最长运行秒数")
+    parser.add_argument("--port", type=int, default=0, help="模拟服务端口，0 表示随机")
+    parser.add_argument("--dsn", default="", help="数据库连接串，默认使用临时 SQLite")
+    parser.add_argument("--output", help="将完整报告写入 JSON 文件")
+    parser.add_argument("--baseline", help="与该基线报告比较，退化超出阈值时以状态码 1 退出")
+    parser.add_argument("--max-regression", type=float, default=0.15, help="允许的最大退化比例")
+    parser.add_argument("--save-baseline", help="将本次报告保存为基线")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+    _print_summary(report)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as fh:
+                json.dump(report, fh, ensure_ascii=False, indent=2)
+
+    exit_code = 0
+    if report["completed_chapters"] < report["target_chapters"]:
+        print("未在超时前完成全部章节")
+        exit_code = 1
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        failures = compare_with_baseline(report, baseline, args.max_regression)
+        for failure in failures:
+            print(f"性能退化：{failure}")
+        if failures:
+            exit_code = 1
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
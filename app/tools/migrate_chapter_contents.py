@@ -0,0 +1,55 @@
+"""
+将章节表旧正文列中的正文压缩迁移到 chapter_contents 表。
+
+用法：
+    python -m app.tools.migrate_chapter_contents              # 迁移全部章节
+    python -m app.tools.migrate_chapter_contents --dry-run    # 只统计待迁移章节与压缩效果
+    python -m app.tools.migrate_chapter_contents --limit 1000 --batch-size 500
+
+升级后首次部署时运行。未迁移的章节仍可从旧列读取，因此可在服务运行期间分批执行，
+中断后重跑会从剩余章节继续。迁移后旧列置空但保留；MySQL 可执行 OPTIMIZE TABLE chapters 回收空间。
+"""
+
+import argparse
+import os
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="迁移章节正文到压缩正文表")
+    parser.add_argument("--dsn", default="", help="数据库连接串，默认使用配置中的数据库")
+    parser.add_argument("--batch-size", type=int, default=200, help="每批迁移并提交的章节数")
+    parser.add_argument("--limit", type=int, default=None, help="本次最多处理的章节数")
+    parser.add_argument("--codec", choices=("zlib", "zstd"), help="压缩格式，默认取配置")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不写入")
+    args = parser.parse_args()
+    if args.dsn:
+        os.environ["NOVELBOT_MYSQL_DSN"] = args.dsn
+    if args.codec:
+        os.environ["NOVELBOT_CHAPTER_CONTENT_CODEC"] = args.codec
+
+    from ..db import Base, SessionLocal, engine
+    from ..services.chapter_store import backfill_chapter_contents
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        stats = backfill_chapter_contents(
+            db,
+            batch_size=max(args.batch_size, 1),
+            dry_run=args.dry_run,
+            limit=args.limit,
+        )
+    finally:
+        db.close()
+
+    ratio = stats["stored_bytes"] / stats["raw_bytes"] if stats["raw_bytes"] else 0.0
+    action = "待迁移" if args.dry_run else "已迁移"
+    print(
+        f"{action} {stats['chapters']} 章，原文 {stats['raw_bytes']} 字节，"
+        f"压缩后 {stats['stored_bytes']} 字节（{ratio:.1%}）；"
+        f"{stats['skipped']} 章已有新格式正文，仅清空旧列"
+    )
+
+
+if __name__ == "__main__":
+    main()
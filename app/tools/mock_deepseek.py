@@ -0,0 +1,326 @@
+"""
+本地模拟的 OpenAI 兼容 Chat Completions 服务，用于在不调用真实接口的情况下测量吞吐。
+
+按提示词内容识别调用阶段并返回格式正确的内容：正文、事实列表、审核结论、合并审核 JSON 与剧情梗概。
+延迟由首包延迟（对数正态分布）加上按每秒 token 数输出的时间组成，可按比例注入 429 与 500 错误，
+支持流式输出，并按系统提示词是否出现过模拟前缀缓存命中。
+
+用法：python -m app.tools.mock_deepseek --port 18080 --latency-ms 800 --tokens-per-second 60
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from ..services.token_estimator import estimate_messages_tokens, estimate_tokens
+from .synthetic_corpus import chinese_prose
+
+
+@dataclass
+class MockOptions:
+    """
+    模拟服务的行为参数。
+    """
+
+    latency_ms: float = 500.0
+    latency_sigma: float = 0.3
+    tokens_per_second: float = 80.0
+    chapter_chars: int = 2500
+    error_429_rate: float = 0.0
+    error_500_rate: float = 0.0
+    retry_after_seconds: float = 1.0
+    seed: Optional[int] = None
+
+
+@dataclass
+class MockStats:
+    """
+    模拟服务收到的请求计数与 token 总量。
+    """
+
+    requests: int = 0
+    streamed: int = 0
+    throttled: int = 0
+    errors: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    stages: Dict[str, int] = field(default_factory=dict)
+
+
+def classify_request(messages: List[Dict[str, str]]) -> str:
+    """
+    根据提示词判断调用阶段。
+    """
+
+    system = messages[0].get("content", "") if messages else ""
+    user = messages[-1].get("content", "") if messages else ""
+    if "JSON" in user and '"conflicts"' in user:
+        return "review"
+    if "提取" in user and "事实" in user:
+        return "extract"
+    if "审读" in system:
+        return "audit"
+    if "梗概" in user:
+        return "summary"
+    return "draft"
+
+
+def build_content(stage: str, max_tokens: int, rng: random.Random, options: MockOptions) -> str:
+    """
+    为指定阶段生成格式正确的模拟输出。
+    """
+
+    if stage == "review":
+        return json.dumps(
+            {
+                "conflicts": [],
+                "facts": [
+                    {
+                        "content": f"林晚已拜入天剑宗第{rng.randint(1, 99)}代",
+                        "important": True,
+                        "entities": ["林晚", "天剑宗"],
+                    }
+                ],
+            },
+            ensure_ascii=False,
+        )
+    if stage == "extract":
+        return "\n".join(
+            f"- [{'重要' if i == 0 else '一般'}]林晚在第{rng.randint(1, 999)}日习得剑招｜涉及：林晚、天剑宗"
+            for i in range(3)
+        )
+    if stage == "audit":
+        return "OK"
+    if stage == "summary":
+        return chinese_prose(rng, 200)
+    # 正文长度受 max_tokens 约束，中文约 0.6 token/字
+    chars = min(options.chapter_chars, int(max_tokens / 0.6))
+    return "本章小结：林晚与师兄在山门前告别，踏上下山历练之路。\n\n" + chinese_prose(rng, chars)
+
+
+class MockDeepSeekServer:
+    """
+    可在进程内启动的模拟服务，也可通过命令行独立运行。
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, options: Optional[MockOptions] = None) -> None:
+        self.options = options or MockOptions()
+        self.stats = MockStats()
+        self._rng = random.Random(self.options.seed)
+        self._lock = threading.Lock()
+        self._prefixes: Set[str] = set()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockDeepSeekServer":
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="MockDeepSeek", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def _plan(self, payload: Dict[str, Any]) -> Tuple[Optional[int], str, Dict[str, Any], float, float]:
+        """
+        决定本次请求的结果：返回 (错误状态码, 内容, usage, 首包延迟秒数, 每 token 秒数)。
+        """
+
+        messages = payload.get("messages") or []
+        stage = classify_request(messages)
+        with self._lock:
+            self.stats.requests += 1
+            self.stats.stages[stage] = self.stats.stages.get(stage, 0) + 1
+            roll = self._rng.random()
+            latency = self.options.latency_ms / 1000.0 * math.exp(
+                self._rng.gauss(0.0, self.options.latency_sigma)
+            )
+            if roll < self.options.error_429_rate:
+                self.stats.throttled += 1
+                return 429, "", {}, 0.0, 0.0
+            if roll < self.options.error_429_rate + self.options.error_500_rate:
+                self.stats.errors += 1
+                return 500, "", {}, latency, 0.0
+            content = build_content(
+                stage, int(payload.get("max_tokens") or 2048), self._rng, self.options
+            )
+            system = messages[0].get("content", "") if messages else ""
+            prefix_key = hashlib.sha1(system.encode("utf-8")).hexdigest()
+            cached = prefix_key in self._prefixes
+            self._prefixes.add(prefix_key)
+
+        prompt_tokens = estimate_messages_tokens(messages)
+        completion_tokens = estimate_tokens(content)
+        hit = min(estimate_tokens(system), prompt_tokens) if cached else 0
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_cache_hit_tokens": hit,
+            "prompt_cache_miss_tokens": prompt_tokens - hit,
+        }
+        with self._lock:
+            self.stats.prompt_tokens += prompt_tokens
+            self.stats.completion_tokens += completion_tokens
+        per_token = 1.0 / self.options.tokens_per_second if self.options.tokens_per_second > 0 else 0.0
+        return None, content, usage, latency, per_token
+
+    def _handler_class(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "not found"}})
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                status, content, usage, latency, per_token = server._plan(payload)
+                if status == 429:
+                    self._send_json(
+                        429,
+                        {"error": {"message": "rate limited"}},
+                        {"Retry-After": str(server.options.retry_after_seconds)},
+                    )
+                    return
+                time.sleep(latency)
+                if status is not None:
+                    self._send_json(status, {"error": {"message": "mock server error"}})
+                    return
+                request_id = f"mock-{time.time_ns()}"
+                if payload.get("stream"):
+                    with server._lock:
+                        server.stats.streamed += 1
+                    self._stream(request_id, content, usage, per_token)
+                    return
+                time.sleep(usage["completion_tokens"] * per_token)
+                self._send_json(
+                    200,
+                    {
+                        "id": request_id,
+                        "object": "chat.completion",
+                        "model": payload.get("model"),
+                        "choices": [
+                            {
+                                "index": 0,
+                                "message": {"role": "assistant", "content": content},
+                                "finish_reason": "stop",
+                            }
+                        ],
+                        "usage": usage,
+                    },
+                )
+
+            def _stream(self, request_id: str, content: str, usage: Dict[str, Any], per_token: float) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                step = 32
+                for start in range(0, len(content), step):
+                    piece = content[start:start + step]
+                    time.sleep(estimate_tokens(piece) * per_token)
+                    self._event(
+                        {
+                            "id": request_id,
+                            "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+                        }
+                    )
+                self._event(
+                    {
+                        "id": request_id,
+                        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                        "usage": usage,
+                    }
+                )
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+            def _event(self, data: Dict[str, Any]) -> None:
+                self.wfile.write(
+                    b"data: " + json.dumps(data, ensure_ascii=False).encode("utf-8") + b"\n\n"
+                )
+                self.wfile.flush()
+
+            def _send_json(self, status: int, data: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+                body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    注册模拟服务的命令行参数，供本模块与基准测试脚本共用。
+    """
+
+    parser.add_argument("--latency-ms", type=float, default=500.0, help="首包延迟中位数（毫秒）")
+    parser.add_argument("--latency-sigma", type=float, default=0.3, help="首包延迟对数正态分布的 sigma")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0, help="每秒输出 token 数，0 表示不限")
+    parser.add_argument("--chapter-chars", type=int, default=2500, help="正文输出字数")
+    parser.add_argument("--error-429", type=float, default=0.0, help="返回 429 的比例")
+    parser.add_argument("--error-500", type=float, default=0.0, help="返回 500 的比例")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429 响应的 Retry-After 秒数")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子")
+
+
+def mock_options(args: argparse.Namespace) -> MockOptions:
+    return MockOptions(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        tokens_per_second=args.tokens_per_second,
+        chapter_chars=args.chapter_chars,
+        error_429_rate=args.error_429,
+        error_500_rate=args.error_500,
+        retry_after_seconds=args.retry_after,
+        seed=args.seed,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="本地模拟 DeepSeek Chat Completions 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18080)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockDeepSeekServer(args.host, args.port, mock_options(args))
+    print(f"模拟服务已启动：{server.base_url}（将 NOVELBOT_DEEPSEEK_BASE_URL 指向该地址）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
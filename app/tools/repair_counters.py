@@ -0,0 +1,49 @@
+"""
+从章节表重算小说进度计数（已完成章节数、累计字数）与全站统计行。
+
+用法：
+    python -m app.tools.repair_counters            # 修正并报告偏差
+    python -m app.tools.repair_counters --dry-run  # 只报告偏差
+
+怀疑计数漂移时运行；缺少计数列时会先补齐（补列时已自动重算一次）。
+"""
+
+import argparse
+import os
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="重算小说进度计数与全站统计")
+    parser.add_argument("--dsn", default="", help="数据库连接串，默认使用配置中的数据库")
+    parser.add_argument("--dry-run", action="store_true", help="只报告偏差，不写入")
+    args = parser.parse_args()
+    if args.dsn:
+        os.environ["NOVELBOT_MYSQL_DSN"] = args.dsn
+
+    from ..db import Base, SessionLocal, engine
+    from ..services.progress_counters import recompute_counters
+    from ..services.schema_upgrade import upgrade_schema
+
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+    db = SessionLocal()
+    try:
+        drifted, totals = recompute_counters(db, dry_run=args.dry_run)
+    finally:
+        db.close()
+
+    for item in drifted:
+        print(
+            f"小说 {item['novel_id']}：已完成章节 {item['completed_chapter_count']} -> "
+            f"{item['expected_completed_chapter_count']}，字数 {item['total_word_count']} -> "
+            f"{item['expected_total_word_count']}"
+        )
+    action = "发现" if args.dry_run else "已修正"
+    print(
+        f"{action} {len(drifted)} 本小说的计数偏差；全站统计：小说 {totals['novel_count']} 本，"
+        f"章节 {totals['chapter_count']} 章，字数 {totals['word_count']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
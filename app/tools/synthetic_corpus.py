@@ -0,0 +1,253 @@
+"""
+合成语料生成器：向数据库批量写入指定规模的小说、章节、人物、剧情事实与创作日志，
+供基准测试在接近生产的数据量下运行。
+
+用法：
+    python -m app.tools.synthetic_corpus --dsn sqlite:///corpus.db --novels 10 --chapters 1000
+
+章节正文按真实中文章节长度生成，全部章节标记为已完成。
+使用批量插入写入，万级章节可在数十秒内完成。
+配置在导入应用模块前写入环境变量，因此应用模块均在函数内导入。
+"""
+
+import argparse
+import os
+import random
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+
+_SENTENCES = (
+    "夜色渐深，山门外的风吹得檐角铜铃叮当作响。",
+    "她握紧手中的长剑，目光越过人群落在远处的石阶上。",
+    "“你若执意要走，我便陪你走到最后。”他低声说道。",
+    "众人面面相觑，谁也没有想到局势会在此刻急转直下。",
+    "远处传来沉闷的雷声，一场大雨眼看就要落下。",
+    "他想起师父临终前的嘱托，心中一阵酸楚。",
+    "城中灯火次第亮起，街巷间弥漫着饭菜的香气。",
+    "她没有回头，只是把那枚旧玉佩轻轻放在桌上。",
+)
+_NAMES = ("林晚", "沈川", "苏念", "顾长风", "叶知秋", "陆青", "白露", "温言")
+_PLACES = ("天剑宗", "青云城", "落霞山", "北境", "临江府", "万妖谷")
+_FACT_TEMPLATES = (
+    "{a}是{b}的师兄",
+    "{a}在{p}身受重伤",
+    "{a}已与{b}订下婚约",
+    "{a}得知自己是{p}前任宗主之子",
+    "{a}的父亲死于{p}之战",
+    "{a}将祖传玉佩交给了{b}",
+)
+
+_BATCH_SIZE = 1000
+
+
+def chinese_prose(rng: random.Random, chars: int) -> str:
+    """
+    生成约 chars 字、分段的中文叙事文本。
+    """
+
+    paragraphs: List[str] = []
+    length = 0
+    while length < chars:
+        paragraph = "".join(rng.choice(_SENTENCES) for _ in range(rng.randint(2, 5)))
+        paragraphs.append(paragraph)
+        length += len(paragraph)
+    return "\n\n".join(paragraphs)
+
+
+def synthetic_fact(rng: random.Random) -> str:
+    a, b = rng.sample(_NAMES, 2)
+    return rng.choice(_FACT_TEMPLATES).format(a=a, b=b, p=rng.choice(_PLACES))
+
+
+@dataclass
+class CorpusSpec:
+    """
+    语料规模：小说数、每本章节数、每章事实数与日志数，以及正文字数。
+    """
+
+    novels: int = 10
+    chapters: int = 100
+    facts_per_chapter: int = 5
+    logs_per_chapter: int = 2
+    chapter_chars: int = 2500
+    characters_per_novel: int = 6
+    seed: Optional[int] = 0
+
+
+def _insert(db: Any, model: Any, rows: List[Dict[str, Any]]) -> None:
+    from sqlalchemy import insert
+
+    for start in range(0, len(rows), _BATCH_SIZE):
+        db.execute(insert(model), rows[start:start + _BATCH_SIZE])
+
+
+def seed_corpus(db: Any, spec: CorpusSpec) -> List[int]:
+    """
+    按 spec 写入合成语料并提交，返回新建小说的 id 列表。
+
+    每本小说的 current_chapter_index 等于已写章节数，
+    目标章节数多一章，因此可直接为“下一章”构建上下文。
+    """
+
+    from ..models import (
+        Chapter,
+        ChapterContent,
+        ChapterStatus,
+        Character,
+        CreationLog,
+        Novel,
+        NovelStatus,
+        StoryFact,
+        StoryFactImportance,
+    )
+    from ..content_codec import compress_body
+    from ..services.progress_counters import bump_totals
+
+    rng = random.Random(spec.seed)
+    now = datetime.utcnow()
+    novel_ids: List[int] = []
+    for n in range(spec.novels):
+        novel = Novel(
+            title=f"合成小说{n + 1}",
+            genre=rng.choice(("玄幻", "都市", "仙侠", "悬疑")),
+            description=chinese_prose(rng, 120),
+            target_chapter_count=spec.chapters + 1,
+            current_chapter_index=spec.chapters,
+            status=NovelStatus.WRITING,
+            planned_date=date.today(),
+            created_at=now + timedelta(microseconds=n),
+        )
+        db.add(novel)
+        db.flush()
+        novel_ids.append(novel.id)
+
+        _insert(
+            db,
+            Character,
+            [
+                {
+                    "novel_id": novel.id,
+                    "name": name,
+                    "role": "主角" if i == 0 else "配角",
+                    "description": chinese_prose(rng, 60),
+                    "created_at": now,
+                }
+                for i, name in enumerate(_NAMES[: spec.characters_per_novel])
+            ],
+        )
+
+        chapter_rows: List[Dict[str, Any]] = []
+        bodies: Dict[int, str] = {}
+        for index in range(1, spec.chapters + 2):
+            written = index <= spec.chapters
+            content = chinese_prose(rng, spec.chapter_chars) if written else None
+            chapter_rows.append(
+                {
+                    "novel_id": novel.id,
+                    "index": index,
+                    "title": f"第{index}章",
+                    "outline": chinese_prose(rng, 80) if written else None,
+                    "word_count": len(content) if content else 0,
+                    "status": ChapterStatus.COMPLETED
+                    if written
+                    else ChapterStatus.PLANNED,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+            )
+            if content:
+                bodies[index] = content
+        _insert(db, Chapter, chapter_rows)
+        words = sum(row["word_count"] for row in chapter_rows)
+        novel.completed_chapter_count = spec.chapters
+        novel.total_word_count = words
+        bump_totals(db, novels=1, chapters=len(chapter_rows), words=words)
+        chapter_ids = dict(
+            db.query(Chapter.index, Chapter.id).filter(Chapter.novel_id == novel.id).all()
+        )
+        content_rows: List[Dict[str, Any]] = []
+        for index, content in bodies.items():
+            codec, data, original_length = compress_body(content)
+            content_rows.append(
+                {
+                    "chapter_id": chapter_ids[index],
+                    "codec": codec,
+                    "data": data,
+                    "original_length": original_length,
+                    "updated_at": now,
+                }
+            )
+        _insert(db, ChapterContent, content_rows)
+
+        fact_rows: List[Dict[str, Any]] = []
+        log_rows: List[Dict[str, Any]] = []
+        for index in range(1, spec.chapters + 1):
+            for _ in range(spec.facts_per_chapter):
+                fact_rows.append(
+                    {
+                        "novel_id": novel.id,
+                        "chapter_id": chapter_ids[index],
+                        "chapter_index": index,
+                        "content": synthetic_fact(rng),
+                        "importance": StoryFactImportance.CRITICAL
+                        if rng.random() < 0.3
+                        else StoryFactImportance.NORMAL,
+                        "is_active": True,
+                        "created_at": now,
+                    }
+                )
+            for _ in range(spec.logs_per_chapter):
+                log_rows.append(
+                    {
+                        "novel_id": novel.id,
+                        "chapter_id": chapter_ids[index],
+                        "level": "INFO",
+                        "message": f"成功生成第{index}章，字数约为 {spec.chapter_chars}",
+                        "latency_ms": rng.uniform(5000, 40000),
+                        "created_at": now,
+                    }
+                )
+        _insert(db, StoryFact, fact_rows)
+        _insert(db, CreationLog, log_rows)
+        db.commit()
+    return novel_ids
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="向数据库写入合成小说语料")
+    parser.add_argument("--dsn", default="", help="数据库连接串，默认使用配置中的数据库")
+    parser.add_argument("--novels", type=int, default=10)
+    parser.add_argument("--chapters", type=int, default=100, help="每本小说已完成的章节数")
+    parser.add_argument("--facts-per-chapter", type=int, default=5)
+    parser.add_argument("--logs-per-chapter", type=int, default=2)
+    parser.add_argument("--chapter-chars", type=int, default=2500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.dsn:
+        os.environ["NOVELBOT_MYSQL_DSN"] = args.dsn
+
+    from ..db import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        ids = seed_corpus(
+            db,
+            CorpusSpec(
+                novels=args.novels,
+                chapters=args.chapters,
+                facts_per_chapter=args.facts_per_chapter,
+                logs_per_chapter=args.logs_per_chapter,
+                chapter_chars=args.chapter_chars,
+                seed=args.seed,
+            ),
+        )
+    finally:
+        db.close()
+    print(f"已写入 {len(ids)} 本小说，每本 {args.chapters} 章（小说 id {ids[0]}~{ids[-1]}）")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,57 +15,232 @@ async function fetchJson(url, options) {
   return await resp.json();
 }
 
-async function updateDashboard() {
-  try {
-    const data = await fetchJson("/api/dashboard");
+const LOG_LIMIT = 200;
+// 事件总线只覆盖本实例的写入，多实例部署时靠低频对账拉取其他实例的变更；读接口带 ETag，未变化时只返回 304
+const RECONCILE_INTERVAL_MS = 60000;
+let dashboardState = null;
+let dashboardLoading = null;
+let dashboardStale = false;
+let logEntries = [];
+let liveEvents = false;
+
+function formatLog(l) {
+  return `[${l.created_at}] [${l.level}] 小说${l.novel_id}：${l.message}`;
+}
 
-    document.getElementById("total-novels").innerText = data.total_novels;
-    document.getElementById("total-chapters").innerText =
-      data.total_chapters;
-    document.getElementById("total-words").innerText = formatNumber(
-      data.total_words
-    );
+function renderTotals() {
+  document.getElementById("total-novels").innerText =
+    dashboardState.total_novels;
+  document.getElementById("total-chapters").innerText =
+    dashboardState.total_chapters;
+  document.getElementById("total-words").innerText = formatNumber(
+    dashboardState.total_words
+  );
+}
 
-    updateDailyChart(data.daily_stats || []);
-    updateNovelTable(data.novels || []);
-  } catch (err) {
-    console.error(err);
+async function loadDashboard() {
+  const data = await fetchJson("/api/dashboard");
+  dashboardState = data;
+  renderTotals();
+  updateDailyChart(data.daily_stats || []);
+  updateNovelTable(data.novels || []);
+}
+
+async function updateDashboard() {
+  // 拉取过程中收到的增量不能叠加到旧快照上，拉取结束后再整体刷新一次
+  if (dashboardLoading) {
+    dashboardStale = true;
+    return dashboardLoading;
   }
+  dashboardLoading = (async () => {
+    try {
+      do {
+        dashboardStale = false;
+        await loadDashboard();
+      } while (dashboardStale);
+    } catch (err) {
+      console.error(err);
+    } finally {
+      dashboardLoading = null;
+    }
+  })();
+  return dashboardLoading;
+}
+
+function renderLogs() {
+  const pre = document.getElementById("log-output");
+  pre.textContent = logEntries.map(formatLog).join("\n");
+  pre.scrollTop = pre.scrollHeight;
 }
 
 async function updateLogs() {
   try {
-    const logs = await fetchJson("/api/logs?limit=200");
-    const pre = document.getElementById("log-output");
-    pre.textContent = logs
-      .map((l) => `[${l.created_at}] [${l.level}] 小说${l.novel_id}：${l.message}`)
-      .join("\n");
-    pre.scrollTop = pre.scrollHeight;
+    const logs = await fetchJson(`/api/logs?limit=${LOG_LIMIT}`);
+    logEntries = logs;
+    renderLogs();
   } catch (err) {
     console.error(err);
   }
 }
 
+function renderSchedulerState(state) {
+  const label = document.getElementById("scheduler-status");
+  if (!state.is_running) {
+    label.innerText = "未运行";
+    label.className = "text-danger fw-bold";
+  } else if (state.is_paused) {
+    label.innerText = "已暂停";
+    label.className = "text-warning fw-bold";
+  } else {
+    label.innerText = "运行中";
+    label.className = "text-success fw-bold";
+  }
+}
+
 async function updateSchedulerState() {
   try {
-    const state = await fetchJson("/api/control/state");
-    const label = document.getElementById("scheduler-status");
-    if (!state.is_running) {
-      label.innerText = "未运行";
-      label.className = "text-danger fw-bold";
-    } else if (state.is_paused) {
-      label.innerText = "已暂停";
-      label.className = "text-warning fw-bold";
-    } else {
-      label.innerText = "运行中";
-      label.className = "text-success fw-bold";
-    }
+    renderSchedulerState(await fetchJson("/api/control/state"));
   } catch (err) {
     console.error(err);
   }
 }
 
+async function refreshAll() {
+  await updateSchedulerState();
+  await updateDashboard();
+  await updateLogs();
+}
+
+function applyChapterCompleted(data) {
+  if (!dashboardState || dashboardLoading) {
+    updateDashboard();
+    return;
+  }
+  const novel = (dashboardState.novels || []).find(
+    (n) => n.novel_id === data.novel_id
+  );
+  if (!novel) {
+    updateDashboard();
+    return;
+  }
+  novel.status = data.status;
+  novel.chapter_completed = data.chapter_completed;
+  novel.chapter_total = data.chapter_total;
+  novel.words = data.words;
+  novel.progress_ratio =
+    data.chapter_total > 0 ? data.chapter_completed / data.chapter_total : 0;
+  updateNovelTable(dashboardState.novels);
+}
+
+function applyMetricDelta(data) {
+  // 新建与删除小说会改变列表本身，直接重新拉取
+  if (data.reason !== "chapter-completed" || !dashboardState || dashboardLoading) {
+    updateDashboard();
+    return;
+  }
+  dashboardState.total_novels += data.total_novels;
+  dashboardState.total_chapters += data.total_chapters;
+  dashboardState.total_words += data.total_words;
+  renderTotals();
+
+  if (data.daily) {
+    const stats = dashboardState.daily_stats || (dashboardState.daily_stats = []);
+    let day = stats.find((d) => d.date === data.daily.date);
+    if (!day) {
+      day = { date: data.daily.date, novel_count: 0, chapter_count: 0, word_count: 0 };
+      stats.push(day);
+      if (stats.length > 30) stats.shift();
+    }
+    day.novel_count += data.daily.novel_count;
+    day.chapter_count += data.daily.chapter_count;
+    day.word_count += data.daily.word_count;
+    updateDailyChart(stats);
+  }
+}
+
+function applyLogAdded(data) {
+  // 首屏拉取可能已包含该条日志
+  if (logEntries.some((l) => l.id === data.id)) return;
+  logEntries.unshift(data);
+  if (logEntries.length > LOG_LIMIT) logEntries.length = LOG_LIMIT;
+  renderLogs();
+}
+
+function startPolling() {
+  setInterval(updateSchedulerState, 8000);
+  setInterval(updateDashboard, 10000);
+  setInterval(updateLogs, 12000);
+}
+
+function watchEvents() {
+  if (!window.EventSource) {
+    startPolling();
+    return;
+  }
+
+  setInterval(refreshAll, RECONCILE_INTERVAL_MS);
+  const source = new EventSource("/api/events");
+  const on = (name, handler) =>
+    source.addEventListener(name, (e) => handler(JSON.parse(e.data)));
+
+  source.onopen = () => {
+    liveEvents = true;
+  };
+  // 断线期间浏览器会携带 Last-Event-ID 自动重连，由服务端补发错过的事件
+  source.onerror = () => {
+    liveEvents = false;
+  };
+  on("chapter-completed", applyChapterCompleted);
+  on("metric-delta", applyMetricDelta);
+  on("log-added", applyLogAdded);
+  on("scheduler-state", renderSchedulerState);
+  on("resync", refreshAll);
+}
+
 let chartDaily = null;
+let previewSource = null;
+
+function watchChapterPreview(novelId) {
+  const pre = document.getElementById("live-preview");
+  const meta = document.getElementById("live-preview-meta");
+  if (!pre || !window.EventSource) return;
+
+  if (previewSource) {
+    previewSource.close();
+  }
+  pre.textContent = "";
+  meta.innerText = `小说${novelId}：等待模型输出...`;
+
+  const source = new EventSource(`/api/novels/${novelId}/stream`);
+  previewSource = source;
+
+  source.addEventListener("start", (e) => {
+    const data = JSON.parse(e.data);
+    pre.textContent = "";
+    meta.innerText = `小说${novelId}：正在生成第 ${data.chapter_index} 章`;
+  });
+  source.addEventListener("reset", (e) => {
+    const data = JSON.parse(e.data);
+    pre.textContent = "";
+    meta.innerText = `小说${novelId}：第 ${data.chapter_index} 章重新生成中`;
+  });
+  source.addEventListener("delta", (e) => {
+    const data = JSON.parse(e.data);
+    pre.textContent += data.text;
+    pre.scrollTop = pre.scrollHeight;
+  });
+  source.addEventListener("done", (e) => {
+    const data = JSON.parse(e.data);
+    const statusMap = { completed: "已完成", error: "失败", aborted: "已放弃" };
+    meta.innerText = `小说${novelId}：第 ${data.chapter_index} 章${
+      statusMap[data.status] || data.status
+    }`;
+    source.close();
+    if (previewSource === source) {
+      previewSource = null;
+    }
+  });
+}
 
 function updateDailyChart(dailyStats) {
   const ctx = document.getElementById("chart-daily").getContext("2d");
@@ -161,10 +336,13 @@ function updateNovelTable(novels) {
         const id = e.target.getAttribute("data-id");
         btn.disabled = true;
         btn.innerText = "生成中...";
+        watchChapterPreview(id);
         try {
           await fetchJson(`/api/novels/${id}/generate`, { method: "POST" });
-          await updateDashboard();
-          await updateLogs();
+          if (!liveEvents) {
+            await updateDashboard();
+            await updateLogs();
+          }
         } catch (err) {
           console.error(err);
           alert("生成失败，请查看日志。");
@@ -181,12 +359,13 @@ function updateNovelTable(novels) {
       btn.disabled = true;
       btn.innerText = "加载中...";
       try {
-        const chapters = await fetchJson(`/api/novels/${id}/chapters`);
-        if (!chapters || chapters.length === 0) {
+        const chapters = await fetchChapterSummaries(id);
+        if (chapters.length === 0) {
           alert("该小说暂无已生成章节。");
           return;
         }
-        showChapterModal(chapters[0], chapters);
+        const first = await fetchJson(`/api/chapters/${chapters[0].id}`);
+        showChapterModal(first, chapters);
       } catch (err) {
         console.error(err);
         alert("加载章节列表失败，请稍后重试。");
@@ -220,8 +399,10 @@ function updateNovelTable(novels) {
       btn.innerText = "删除中...";
       try {
         await fetchJson(`/api/novels/${id}`, { method: "DELETE" });
-        await updateDashboard();
-        await updateLogs();
+        if (!liveEvents) {
+          await updateDashboard();
+          await updateLogs();
+        }
       } catch (err) {
         console.error(err);
         alert("删除失败，请检查后端日志。");
@@ -233,6 +414,20 @@ function updateNovelTable(novels) {
   });
 }
 
+async function fetchChapterSummaries(novelId) {
+  // 章节摘要不含正文，按章节序号分页拉取；正文在选中章节时再单独获取
+  const chapters = [];
+  let after = 0;
+  while (after !== null) {
+    const page = await fetchJson(
+      `/api/novels/${novelId}/chapters?after_index=${after}&limit=500`
+    );
+    chapters.push(...page.items);
+    after = page.next_after_index;
+  }
+  return chapters;
+}
+
 function showChapterModal(chapter, chapters) {
   const titleEl = document.getElementById("chapter-modal-title");
   const metaEl = document.getElementById("chapter-modal-meta");
@@ -254,15 +449,13 @@ function showChapterModal(chapter, chapters) {
 
     selectEl.onchange = async () => {
       const selectedId = parseInt(selectEl.value, 10);
-      let target = chapters.find((c) => c.id === selectedId);
-      if (!target) {
-        try {
-          target = await fetchJson(`/api/chapters/${selectedId}`);
-        } catch (err) {
-          console.error(err);
-          alert("加载章节内容失败。");
-          return;
-        }
+      let target;
+      try {
+        target = await fetchJson(`/api/chapters/${selectedId}`);
+      } catch (err) {
+        console.error(err);
+        alert("加载章节内容失败。");
+        return;
       }
       fillChapterContent(target);
     };
@@ -307,7 +500,9 @@ function setupControlButtons() {
           headers: { "Content-Type": "application/json" },
           body: JSON.stringify({ action }),
         });
-        await updateSchedulerState();
+        if (!liveEvents) {
+          await updateSchedulerState();
+        }
       } catch (err) {
         console.error(err);
         alert("控制失败，请查看后台日志。");
@@ -328,13 +523,9 @@ async function init() {
   setupConfigForm();
   setupCreateNovelForm();
 
-  await updateSchedulerState();
-  await updateDashboard();
-  await updateLogs();
-
-  setInterval(updateSchedulerState, 8000);
-  setInterval(updateDashboard, 10000);
-  setInterval(updateLogs, 12000);
+  // 先订阅再拉取首屏数据，拉取期间到达的增量由 updateDashboard 合并为一次重新拉取
+  watchEvents();
+  await refreshAll();
 }
 
 function setupCreateNovelForm() {
@@ -374,7 +565,9 @@ function setupCreateNovelForm() {
       outlineInput.value = "";
       genreInput.value = "";
       chaptersInput.value = "10";
-      await updateDashboard();
+      if (!liveEvents) {
+        await updateDashboard();
+      }
     } catch (err) {
       console.error(err);
       alert("创建小说计划失败，请检查后端日志。");
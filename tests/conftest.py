@@ -0,0 +1,26 @@
+import os
+import tempfile
+
+# 配置在导入应用模块前写入环境变量，测试使用独立的临时 SQLite 数据库
+_workdir = tempfile.mkdtemp(prefix="novelbot-tests-")
+os.environ["NOVELBOT_MYSQL_DSN"] = f"sqlite:///{os.path.join(_workdir, 'test.db')}"
+os.environ["NOVELBOT_SCHEDULER_ENABLED"] = "false"
+os.environ["NOVELBOT_RESPONSE_CACHE_PATH"] = os.path.join(_workdir, "response_cache.sqlite3")
+
+import pytest  # noqa: E402
+
+from app import models  # noqa: E402,F401
+from app.db import Base, SessionLocal, engine  # noqa: E402
+
+
+Base.metadata.create_all(bind=engine)
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
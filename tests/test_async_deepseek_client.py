@@ -0,0 +1,74 @@
+import asyncio
+
+from app.config import DeepSeekEndpoint
+from app.services.async_deepseek_client import AsyncDeepSeekClient
+from app.services.llm_stages import lanes
+from app.services.provider_pool import ProviderPool
+
+
+def _client():
+    pool = ProviderPool([DeepSeekEndpoint(name="main", base_url="http://127.0.0.1:9")])
+    return AsyncDeepSeekClient(pool), pool.endpoints[0]
+
+
+def test_clients_of_closed_loops_are_dropped():
+    client, endpoint = _client()
+
+    async def open_http():
+        return client._http(endpoint)
+
+    first = asyncio.run(open_http())
+    second = asyncio.run(open_http())
+
+    assert first is not second
+    assert list(client._clients.values()) == [second]
+
+
+def test_aclose_removes_the_current_loop_clients():
+    client, endpoint = _client()
+
+    async def open_and_close():
+        http = client._http(endpoint)
+        await client.aclose()
+        return http
+
+    http = asyncio.run(open_and_close())
+
+    assert http.is_closed
+    assert client._clients == {}
+
+
+def test_cancelled_request_settles_without_touching_health(monkeypatch):
+    client, endpoint = _client()
+    endpoint.limiter._scale = 0.5
+    health_before = endpoint.health
+
+    async def cancel_stalled_request():
+        started = asyncio.Event()
+
+        async def stalled_post(payload, endpoint):
+            started.set()
+            await asyncio.Event().wait()
+
+        monkeypatch.setattr(client, "_post_once", stalled_post)
+        task = asyncio.ensure_future(
+            client.generate_text([{"role": "user", "content": "你好"}], timeout=30)
+        )
+        await started.wait()
+        assert endpoint.limiter.stats()["in_flight"] == 1
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            return True
+        return False
+
+    assert asyncio.run(cancel_stalled_request())
+
+    stats = endpoint.limiter.stats()
+    assert stats["in_flight"] == 0
+    assert stats["rate_scale"] == 0.5
+    assert endpoint.health == health_before
+    assert endpoint.total_requests == 0
+    assert endpoint.total_failures == 0
+    assert lanes.stats()["global"]["in_flight"] == 0
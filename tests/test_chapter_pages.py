@@ -0,0 +1,78 @@
+from datetime import date
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import router
+from app.models import Chapter, ChapterStatus, Novel, NovelStatus
+
+
+@pytest.fixture(scope="module")
+def client():
+    app = FastAPI()
+    app.include_router(router)
+    with TestClient(app) as client:
+        yield client
+
+
+def _novel(db, completed, planned=()):
+    indexes = sorted(set(completed) | set(planned))
+    novel = Novel(
+        title="分页测试",
+        genre="都市",
+        target_chapter_count=len(indexes),
+        status=NovelStatus.WRITING,
+        planned_date=date.today(),
+    )
+    db.add(novel)
+    db.flush()
+    db.add_all(
+        Chapter(
+            novel_id=novel.id,
+            index=index,
+            title=f"第{index}章",
+            word_count=100,
+            status=ChapterStatus.COMPLETED
+            if index in completed
+            else ChapterStatus.PLANNED,
+        )
+        for index in indexes
+    )
+    db.commit()
+    return novel
+
+
+def _page(client, novel, **params):
+    response = client.get(f"/api/novels/{novel.id}/chapters", params=params)
+    assert response.status_code == 200
+    page = response.json()
+    return [item["index"] for item in page["items"]], page["next_after_index"]
+
+
+def test_pages_follow_next_after_index_to_the_end(db, client):
+    # 第 3 章尚未生成，不出现在分页中
+    novel = _novel(db, completed={1, 2, 4, 5, 6}, planned={3})
+
+    assert _page(client, novel, limit=2) == ([1, 2], 2)
+    assert _page(client, novel, after_index=2, limit=2) == ([4, 5], 5)
+    assert _page(client, novel, after_index=5, limit=2) == ([6], None)
+    assert _page(client, novel, after_index=6, limit=2) == ([], None)
+
+
+def test_exactly_full_last_page_has_no_cursor(db, client):
+    novel = _novel(db, completed={1, 2, 3, 4})
+
+    assert _page(client, novel, limit=2) == ([1, 2], 2)
+    assert _page(client, novel, after_index=2, limit=2) == ([3, 4], None)
+
+
+def test_limit_is_capped_at_500(db, client):
+    novel = _novel(db, completed=set(range(1, 503)))
+
+    items, cursor = _page(client, novel, limit=10000)
+    assert len(items) == 500
+    assert cursor == 500
+    assert _page(client, novel, after_index=cursor, limit=10000) == ([501, 502], None)
+
+    assert _page(client, novel, limit=0) == ([1], 1)
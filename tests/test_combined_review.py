@@ -0,0 +1,153 @@
+import json
+from datetime import date
+
+import pytest
+
+from app.config import settings
+from app.models import (
+    Chapter,
+    Novel,
+    NovelStatus,
+    StoryFact,
+    StoryFactImportance,
+)
+from app.services import novel_service
+from app.services.novel_service import (
+    _parse_review_output,
+    generate_next_chapter_for_novel,
+)
+
+
+class _FakeClient:
+    """
+    按调用阶段返回预设内容并记录调用顺序的模型客户端。
+    """
+
+    def __init__(self, replies):
+        self.replies = {stage: list(texts) for stage, texts in replies.items()}
+        self.stages = []
+
+    def generate_text(self, messages, stage=None, on_text=None, **kwargs):
+        self.stages.append(stage)
+        texts = self.replies[stage]
+        return (texts.pop(0) if len(texts) > 1 else texts[0]), {}
+
+
+@pytest.fixture(autouse=True)
+def review_settings(monkeypatch):
+    monkeypatch.setattr(settings, "combined_review_enabled", True)
+    for name in (
+        "deepseek_stream_enabled",
+        "entity_index_enabled",
+        "summary_tree_enabled",
+        "retrieval_enabled",
+    ):
+        monkeypatch.setattr(settings, name, False)
+
+
+def _novel(db):
+    novel = Novel(
+        title="审核测试",
+        genre="仙侠",
+        target_chapter_count=3,
+        current_chapter_index=1,
+        status=NovelStatus.WRITING,
+        planned_date=date.today(),
+    )
+    db.add(novel)
+    db.flush()
+    first = Chapter(novel_id=novel.id, index=1, title="第1章")
+    db.add_all([first, Chapter(novel_id=novel.id, index=2, title="第2章")])
+    db.flush()
+    # 已有关键事实，单独审核时才会真正调用模型
+    db.add(
+        StoryFact(
+            novel_id=novel.id,
+            chapter_id=first.id,
+            chapter_index=1,
+            content="韩松已经去世",
+            importance=StoryFactImportance.CRITICAL,
+        )
+    )
+    db.commit()
+    return novel
+
+
+def _run(db, monkeypatch, replies):
+    client = _FakeClient(replies)
+    monkeypatch.setattr(novel_service, "deepseek_client", client)
+    novel = _novel(db)
+    assert generate_next_chapter_for_novel(db, novel.id)
+    facts = {
+        (fact.content, fact.importance)
+        for fact in db.query(StoryFact).filter(
+            StoryFact.novel_id == novel.id, StoryFact.chapter_index == 2
+        )
+    }
+    return client.stages, facts
+
+
+DRAFT = "本章小结：林晚下山\n\n林晚辞别师门，独自下山。"
+REVIEW = json.dumps(
+    {
+        "conflicts": [],
+        "facts": [
+            {"content": "林晚已离开师门", "important": True, "entities": ["林晚"]}
+        ],
+    },
+    ensure_ascii=False,
+)
+
+
+def test_combined_review_replaces_audit_and_extract(db, monkeypatch):
+    stages, facts = _run(db, monkeypatch, {"draft": [DRAFT], "review": [REVIEW]})
+
+    assert stages == ["draft", "review"]
+    assert facts == {("林晚已离开师门", StoryFactImportance.CRITICAL)}
+
+
+def test_unparseable_review_falls_back_to_separate_calls(db, monkeypatch):
+    stages, facts = _run(
+        db,
+        monkeypatch,
+        {
+            "draft": [DRAFT],
+            "review": ["审核通过，没有发现冲突。"],
+            "audit": ["OK"],
+            "extract": ["- [一般] 林晚独自下山｜涉及：林晚"],
+        },
+    )
+
+    assert stages == ["draft", "review", "audit", "extract"]
+    assert facts == {("林晚独自下山", StoryFactImportance.NORMAL)}
+
+
+def test_conflicting_review_rewrites_and_extracts_again(db, monkeypatch):
+    conflict = json.dumps(
+        {"conflicts": ["韩松再次出场；相关事实：韩松已经去世"], "facts": []},
+        ensure_ascii=False,
+    )
+    stages, facts = _run(
+        db,
+        monkeypatch,
+        {
+            "draft": [DRAFT],
+            "review": [conflict],
+            "extract": ["- 林晚独自下山"],
+        },
+    )
+
+    # 重写后的版本不沿用合并审核的事实，改为单独提取
+    assert stages == ["draft", "review", "draft", "extract"]
+    assert facts == {("林晚独自下山", StoryFactImportance.NORMAL)}
+
+
+def test_review_parsing_is_strict():
+    fenced = _parse_review_output(f"```json\n{REVIEW}\n```")
+    assert fenced is not None
+    assert fenced.issues == []
+    assert [content for content, _, _ in fenced.facts] == ["林晚已离开师门"]
+
+    assert _parse_review_output('{"conflicts": "无", "facts": []}') is None
+    assert _parse_review_output('{"conflicts": [], "facts": [{"content": 1}]}') is None
+    assert _parse_review_output("[]") is None
@@ -0,0 +1,34 @@
+import logging
+
+import pytest
+
+from app import content_codec
+from app.content_codec import CODEC_ZLIB, CODEC_ZSTD, compress_body, decompress_body
+
+
+def test_zlib_round_trip():
+    text = "林晚推开山门。" * 200
+
+    codec, data, original_length = compress_body(text, CODEC_ZLIB)
+
+    assert codec == CODEC_ZLIB
+    assert len(data) < original_length == len(text.encode("utf-8"))
+    assert decompress_body(codec, data, original_length) == text
+
+
+def test_length_mismatch_is_rejected():
+    codec, data, original_length = compress_body("正文", CODEC_ZLIB)
+
+    with pytest.raises(ValueError):
+        decompress_body(codec, data, original_length + 1)
+
+
+def test_missing_zstandard_falls_back_and_warns_once(monkeypatch, caplog):
+    monkeypatch.setattr(content_codec, "zstd_available", lambda: False)
+    monkeypatch.setattr(content_codec, "_zstd_fallback_warned", False)
+
+    with caplog.at_level(logging.WARNING, logger=content_codec.__name__):
+        codecs = [compress_body("正文", CODEC_ZSTD)[0] for _ in range(3)]
+
+    assert codecs == [CODEC_ZLIB] * 3
+    assert len(caplog.records) == 1
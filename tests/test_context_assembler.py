@@ -0,0 +1,119 @@
+from app.services.context_assembler import (
+    ContextItem,
+    ContextSection,
+    assemble_context,
+)
+from app.services.token_estimator import estimate_tokens
+
+
+# 十个汉字约 6 token，加换行共 7 token
+TEN_CHARS = "甲乙丙丁戊己庚辛壬癸"
+ITEM_COST = estimate_tokens(TEN_CHARS) + 1
+
+
+def _items(count):
+    return [ContextItem(f"{i}{TEN_CHARS}"[:10]) for i in range(count)]
+
+
+def test_sections_keep_their_order_while_filling_by_priority():
+    sections = [
+        ContextSection("recap", None, [ContextItem("前情" + TEN_CHARS)]),
+        ContextSection("setting", None, [ContextItem("设定" + TEN_CHARS)]),
+    ]
+
+    result = assemble_context(
+        sections, budgets={"setting": 20, "recap": 20}, total_budget=100
+    )
+
+    assert result.text.splitlines()[0].startswith("前情")
+    assert result.dropped_items == 0
+
+
+def test_total_budget_goes_to_higher_priority_sections_first():
+    sections = [
+        ContextSection("recap", None, [ContextItem(TEN_CHARS)]),
+        ContextSection("setting", None, [ContextItem(TEN_CHARS)]),
+    ]
+
+    result = assemble_context(
+        sections, budgets={"setting": 20, "recap": 20}, total_budget=ITEM_COST
+    )
+
+    assert result.section_tokens == {"setting": ITEM_COST, "recap": 0}
+    assert result.dropped_items == 1
+
+
+def test_unused_allowance_carries_over_to_later_sections():
+    sections = [
+        ContextSection("setting", None, [ContextItem(TEN_CHARS)]),
+        ContextSection("facts", None, _items(3)),
+    ]
+
+    result = assemble_context(
+        sections,
+        budgets={"setting": 3 * ITEM_COST, "facts": ITEM_COST},
+        total_budget=100,
+    )
+
+    assert result.section_tokens["facts"] == 3 * ITEM_COST
+    assert result.dropped_items == 0
+
+
+def test_fallback_replaces_items_that_do_not_fit():
+    sections = [
+        ContextSection(
+            "characters",
+            None,
+            [ContextItem(TEN_CHARS * 5, fallback="林晚：女主")],
+        )
+    ]
+
+    result = assemble_context(
+        sections, budgets={"characters": ITEM_COST}, total_budget=100
+    )
+
+    assert result.text == "林晚：女主"
+
+
+def test_prefer_recent_drops_the_oldest_items():
+    items = [ContextItem(f"第{i}章" + TEN_CHARS[:7]) for i in range(1, 4)]
+    sections = [ContextSection("recap", None, items, prefer_recent=True)]
+
+    result = assemble_context(
+        sections, budgets={"recap": 2 * ITEM_COST}, total_budget=100
+    )
+
+    assert result.text.splitlines() == [items[1].text, items[2].text]
+    assert result.dropped_items == 1
+
+
+def test_truncated_section_keeps_the_tail():
+    text = "开头" + TEN_CHARS * 10 + "结尾"
+    sections = [
+        ContextSection(
+            "latest_tail", None, [ContextItem(text)], prefer_recent=True, truncate=True
+        )
+    ]
+
+    result = assemble_context(
+        sections, budgets={"latest_tail": 2 * ITEM_COST}, total_budget=100
+    )
+
+    assert result.text.endswith("结尾")
+    assert "开头" not in result.text
+    assert result.section_tokens["latest_tail"] <= 2 * ITEM_COST
+
+
+def test_title_is_emitted_only_when_items_are_kept():
+    sections = [
+        ContextSection("facts", "【已知事实】", [ContextItem(TEN_CHARS * 10)]),
+        ContextSection("setting", "【设定】", [ContextItem(TEN_CHARS)]),
+    ]
+
+    result = assemble_context(
+        sections,
+        budgets={"facts": ITEM_COST, "setting": 3 * ITEM_COST},
+        total_budget=3 * ITEM_COST,
+    )
+
+    assert result.text.splitlines() == ["【设定】", TEN_CHARS]
@@ -0,0 +1,134 @@
+from datetime import date
+
+import pytest
+
+from app.config import settings
+from app.models import (
+    Chapter,
+    ChapterStatus,
+    Character,
+    Novel,
+    NovelStatus,
+    PlotNode,
+    StoryFact,
+    StoryFactImportance,
+)
+from app.services.context_cache import NovelContextCache
+
+
+@pytest.fixture(autouse=True)
+def no_entity_index(monkeypatch):
+    monkeypatch.setattr(settings, "entity_index_enabled", False)
+
+
+def _body(index):
+    # 超过 800 字，摘要取首尾片段并保留末尾供最新章节使用
+    return "\n".join(f"第{index}章第{line}段，" + "山风" * 40 for line in range(12))
+
+
+def _novel(db):
+    novel = Novel(
+        title="快照测试",
+        genre="仙侠",
+        target_chapter_count=4,
+        current_chapter_index=2,
+        status=NovelStatus.WRITING,
+        planned_date=date.today(),
+    )
+    db.add(novel)
+    db.flush()
+    db.add(Character(novel_id=novel.id, name="林晚", role="主角", description="剑修"))
+    db.add(PlotNode(novel_id=novel.id, index=1, summary="拜入青云门"))
+    chapters = []
+    for index in range(1, 5):
+        chapter = Chapter(
+            novel_id=novel.id,
+            index=index,
+            title=f"第{index}章",
+            status=ChapterStatus.COMPLETED if index <= 2 else ChapterStatus.PLANNED,
+        )
+        if index <= 2:
+            chapter.outline = f"第{index}章小结"
+            chapter.content = _body(index)
+        chapters.append(chapter)
+    db.add_all(chapters)
+    db.flush()
+    old = StoryFact(
+        novel_id=novel.id,
+        chapter_id=chapters[0].id,
+        chapter_index=1,
+        content="林晚是外门弟子",
+        importance=StoryFactImportance.CRITICAL,
+    )
+    kept = StoryFact(
+        novel_id=novel.id,
+        chapter_id=chapters[1].id,
+        chapter_index=2,
+        content="青云门有七座山峰",
+        importance=StoryFactImportance.NORMAL,
+    )
+    db.add_all([old, kept])
+    db.commit()
+    return novel, chapters, old
+
+
+def _commit_chapter_three(db, chapters, old):
+    chapter = chapters[2]
+    chapter.outline = "第3章小结"
+    chapter.content = _body(3)
+    chapter.status = ChapterStatus.COMPLETED
+    new = StoryFact(
+        novel_id=chapter.novel_id,
+        chapter_id=chapter.id,
+        chapter_index=3,
+        content="林晚晋升内门弟子",
+        importance=StoryFactImportance.CRITICAL,
+    )
+    db.add(new)
+    db.flush()
+    old.is_active = False
+    old.superseded_by_id = new.id
+    db.commit()
+    return chapter, new
+
+
+def _fresh(db, novel_id, target):
+    return NovelContextCache(max_bytes=10**8).get_snapshot(db, novel_id, target)
+
+
+def test_snapshot_after_commit_equals_a_fresh_rebuild(db):
+    novel, chapters, old = _novel(db)
+    cache = NovelContextCache(max_bytes=10**8)
+    cache.get_snapshot(db, novel.id, 3)
+
+    chapter, new = _commit_chapter_three(db, chapters, old)
+    cache.note_chapter_committed(
+        novel_id=novel.id,
+        chapter_index=3,
+        title=chapter.title,
+        outline=chapter.outline,
+        content=_body(3),
+        facts=[new],
+        retired_fact_ids=[old.id],
+    )
+
+    incremental = cache.get_snapshot(db, novel.id, 4)
+    assert incremental == _fresh(db, novel.id, 4)
+    assert [c.index for c in incremental.chapters] == [1, 2, 3]
+    assert old.id not in {f.id for f in incremental.facts}
+    # 只有最新章节保留末尾片段
+    assert [bool(c.tail) for c in incremental.chapters] == [False, False, True]
+
+
+def test_catch_up_after_another_instance_commit_equals_a_fresh_rebuild(db):
+    novel, chapters, old = _novel(db)
+    cache = NovelContextCache(max_bytes=10**8)
+    cache.get_snapshot(db, novel.id, 3)
+
+    # 其他实例写入了第 3 章，本进程未收到提交通知
+    _commit_chapter_three(db, chapters, old)
+
+    caught_up = cache.get_snapshot(db, novel.id, 4)
+    assert caught_up == _fresh(db, novel.id, 4)
+    assert old.id not in {f.id for f in caught_up.facts}
+    assert cache.stats()["bytes"] == caught_up.size_bytes
@@ -0,0 +1,70 @@
+import pytest
+
+from app.config import DeepSeekEndpoint, settings
+from app.services.deepseek_client import DeepSeekClient
+from app.services.llm_stages import lanes, stage_profile
+from app.services.provider_pool import ProviderPool
+from app.services.rate_limiter import RateLimitTimeout
+from app.services.response_cache import response_cache, response_cache_key
+
+
+def _client(*models):
+    pool = ProviderPool(
+        [
+            DeepSeekEndpoint(name=f"ep{i}", base_url="http://127.0.0.1:9", model=model)
+            for i, model in enumerate(models or (None,))
+        ]
+    )
+    return DeepSeekClient(pool)
+
+
+def test_stream_text_returns_the_lane_permit_when_the_pool_times_out(monkeypatch):
+    client = _client()
+
+    def timed_out(*args, **kwargs):
+        raise RateLimitTimeout("等待限流额度超时")
+
+    monkeypatch.setattr(client.pool, "acquire", timed_out)
+
+    with pytest.raises(RateLimitTimeout):
+        list(client.stream_text([{"role": "user", "content": "你好"}]))
+
+    assert lanes.stats()["global"]["in_flight"] == 0
+    assert all(lane["in_flight"] == 0 for lane in lanes.stats()["lanes"].values())
+
+
+def _cache_key_of(monkeypatch, client, stage="extract"):
+    keys = []
+    monkeypatch.setattr(response_cache, "enabled_for", lambda stage: True)
+    monkeypatch.setattr(
+        response_cache,
+        "get_or_compute",
+        lambda key, stage, compute: keys.append(key) or ("", {}),
+    )
+    client.generate_text([{"role": "user", "content": "你好"}], stage=stage)
+    return keys[0]
+
+
+def _expected_key(model, stage="extract"):
+    profile = stage_profile(stage)
+    return response_cache_key(
+        model,
+        [{"role": "user", "content": "你好"}],
+        profile.temperature,
+        profile.max_tokens,
+        None,
+    )
+
+
+def test_cache_key_uses_the_endpoint_model(monkeypatch):
+    monkeypatch.setattr(settings, "extract_model", "")
+    client = _client("deepseek-reasoner")
+
+    assert _cache_key_of(monkeypatch, client) == _expected_key("deepseek-reasoner")
+
+
+def test_cache_key_uses_the_stage_model_when_configured(monkeypatch):
+    monkeypatch.setattr(settings, "extract_model", "deepseek-lite")
+    client = _client("deepseek-reasoner")
+
+    assert _cache_key_of(monkeypatch, client) == _expected_key("deepseek-lite")
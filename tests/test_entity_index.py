@@ -0,0 +1,53 @@
+from datetime import date
+
+from app.db import SessionLocal
+from app.models import Novel, NovelStatus, StoryEntity
+from app.services.entity_index import ensure_entities, load_entity_names
+
+
+def _novel(db):
+    novel = Novel(
+        title="实体索引",
+        genre="玄幻",
+        target_chapter_count=3,
+        status=NovelStatus.WRITING,
+        planned_date=date.today(),
+    )
+    db.add(novel)
+    db.commit()
+    return novel
+
+
+def _entity_count(db, novel_id):
+    return db.query(StoryEntity).filter(StoryEntity.novel_id == novel_id).count()
+
+
+def test_width_and_case_variants_map_to_one_entity(db):
+    novel = _novel(db)
+    names = load_entity_names(db, novel.id)
+
+    ensure_entities(db, novel.id, names, ["ＡＢ宗", "ab宗", "林晚"], {"林晚"})
+    db.commit()
+
+    assert names["ＡＢ宗"] == names["ab宗"]
+    assert _entity_count(db, novel.id) == 2
+
+
+def test_concurrently_created_entity_is_reused(db):
+    novel = _novel(db)
+    names = load_entity_names(db, novel.id)
+
+    other = SessionLocal()
+    try:
+        other.add(StoryEntity(novel_id=novel.id, name="天剑宗"))
+        other.commit()
+        existing_id = other.query(StoryEntity.id).filter_by(name="天剑宗").scalar()
+    finally:
+        other.close()
+
+    ensure_entities(db, novel.id, names, ["天剑宗", "青云城"], set())
+    db.commit()
+
+    assert names["天剑宗"] == existing_id
+    assert "青云城" in names
+    assert _entity_count(db, novel.id) == 2
@@ -0,0 +1,101 @@
+import asyncio
+
+from app.services.event_bus import EVENT_RESYNC, EventBus
+
+
+def _publish(bus, count, start=1):
+    return [bus.publish("log-added", {"n": n}) for n in range(start, start + count)]
+
+
+async def _take(stream, count):
+    events = []
+    while len(events) < count:
+        events.append(await asyncio.wait_for(stream.__anext__(), 2))
+    return events
+
+
+def _ids(events):
+    return [(event["id"], event["event"]) for event in events]
+
+
+def test_reconnect_replays_events_still_in_the_buffer():
+    bus = EventBus(buffer_size=4)
+    _publish(bus, 3)
+
+    async def run():
+        stream = bus.subscribe(last_event_id=1)
+        replayed = await _take(stream, 2)
+        bus.publish("log-added", {"n": 4})
+        live = await _take(stream, 1)
+        await stream.aclose()
+        return replayed + live
+
+    events = asyncio.run(run())
+
+    assert _ids(events) == [(2, "log-added"), (3, "log-added"), (4, "log-added")]
+    assert [event["data"]["n"] for event in events] == [2, 3, 4]
+
+
+def test_reconnect_at_the_latest_id_only_waits_for_new_events():
+    bus = EventBus(buffer_size=4)
+    _publish(bus, 2)
+
+    async def run():
+        stream = bus.subscribe(last_event_id=2)
+        pending = asyncio.ensure_future(_take(stream, 1))
+        await asyncio.sleep(0.05)
+        assert not pending.done()
+        bus.publish("scheduler-state", {})
+        events = await pending
+        await stream.aclose()
+        return events
+
+    assert _ids(asyncio.run(run())) == [(3, "scheduler-state")]
+
+
+def test_reconnect_after_the_buffer_wrapped_asks_for_resync():
+    bus = EventBus(buffer_size=3)
+    _publish(bus, 6)
+
+    async def run():
+        stream = bus.subscribe(last_event_id=1)
+        first = await _take(stream, 1)
+        bus.publish("log-added", {"n": 7})
+        live = await _take(stream, 1)
+        await stream.aclose()
+        return first + live
+
+    # 第 2、3 条已被淘汰，先整体刷新，再从最新 id 之后继续推送
+    assert _ids(asyncio.run(run())) == [(6, EVENT_RESYNC), (7, "log-added")]
+
+
+def test_id_from_a_previous_process_asks_for_resync():
+    bus = EventBus(buffer_size=3)
+    _publish(bus, 2)
+
+    async def run():
+        stream = bus.subscribe(last_event_id=50)
+        events = await _take(stream, 1)
+        await stream.aclose()
+        return events
+
+    assert _ids(asyncio.run(run())) == [(2, EVENT_RESYNC)]
+
+
+def test_slow_subscriber_is_resynced_when_the_buffer_overtakes_it():
+    bus = EventBus(buffer_size=3)
+
+    async def run():
+        stream = bus.subscribe()
+        first = asyncio.ensure_future(_take(stream, 1))
+        await asyncio.sleep(0.05)
+        # 订阅者尚未消费时缓冲区已被覆盖
+        _publish(bus, 5)
+        events = await first
+        bus.publish("log-added", {"n": 6})
+        events += await _take(stream, 1)
+        await stream.aclose()
+        return events
+
+    assert _ids(asyncio.run(run())) == [(5, EVENT_RESYNC), (6, "log-added")]
+    assert bus._waiters == set()
@@ -0,0 +1,119 @@
+from datetime import date
+
+from app.models import (
+    Chapter,
+    ChapterStatus,
+    Novel,
+    NovelStatus,
+    StoryFact,
+    StoryFactImportance,
+)
+from app.services.fact_compaction import (
+    FACT_DUPLICATE,
+    FACT_NEW,
+    FACT_SUPERSEDE,
+    CanonicalFactSet,
+    compact_novel_facts,
+)
+
+
+CRITICAL = StoryFactImportance.CRITICAL
+NORMAL = StoryFactImportance.NORMAL
+
+
+def _canonical(*facts):
+    canonical = CanonicalFactSet(threshold=0.8)
+    for key, (content, importance) in enumerate(facts, start=1):
+        canonical.add(key, content, importance)
+    return canonical
+
+
+def test_same_text_after_normalization_is_duplicate():
+    canonical = _canonical(("林晚是天剑宗掌门之女", CRITICAL))
+
+    decision = canonical.classify("[重要] 林晚是天剑宗掌门之女。", NORMAL)
+
+    assert decision.action == FACT_DUPLICATE
+    assert decision.matched_key == 1
+    assert decision.importance == CRITICAL
+
+
+def test_duplicate_with_higher_importance_supersedes():
+    canonical = _canonical(("沈川持有一把断剑", NORMAL))
+
+    decision = canonical.classify("沈川持有一把断剑", CRITICAL)
+
+    assert decision.action == FACT_SUPERSEDE
+    assert decision.matched_key == 1
+
+
+def test_detail_added_to_normal_fact_supersedes():
+    canonical = _canonical(("沈川持有一把断剑", NORMAL))
+
+    decision = canonical.classify("沈川持有一把断剑，剑名为青霜", NORMAL)
+
+    assert decision.action == FACT_SUPERSEDE
+    assert decision.matched_key == 1
+
+
+def test_negation_containing_critical_fact_does_not_supersede_it():
+    canonical = _canonical(("林晚是天剑宗掌门之女", CRITICAL))
+
+    decision = canonical.classify("林晚是天剑宗掌门之女的说法被证实是谎言", NORMAL)
+
+    assert decision.action == FACT_NEW
+    assert decision.matched_key is None
+
+
+def test_unrelated_fact_is_new():
+    canonical = _canonical(("林晚是天剑宗掌门之女", CRITICAL))
+
+    assert canonical.classify("青云城位于北境", NORMAL).action == FACT_NEW
+
+
+def test_compaction_keeps_critical_fact_next_to_its_negation(db):
+    novel = Novel(
+        title="事实压缩",
+        genre="玄幻",
+        target_chapter_count=3,
+        status=NovelStatus.WRITING,
+        planned_date=date.today(),
+    )
+    db.add(novel)
+    db.flush()
+    chapters = {
+        index: Chapter(
+            novel_id=novel.id,
+            index=index,
+            title=f"第{index}章",
+            status=ChapterStatus.COMPLETED,
+        )
+        for index in (1, 2)
+    }
+    db.add_all(chapters.values())
+    db.flush()
+    contents = [
+        ("林晚是天剑宗掌门之女", CRITICAL, 1),
+        ("沈川持有一把断剑", NORMAL, 1),
+        ("林晚是天剑宗掌门之女的说法被证实是谎言", NORMAL, 2),
+        ("沈川持有一把断剑", NORMAL, 2),
+    ]
+    facts = [
+        StoryFact(
+            novel_id=novel.id,
+            chapter_id=chapters[chapter_index].id,
+            chapter_index=chapter_index,
+            content=content,
+            importance=importance,
+        )
+        for content, importance, chapter_index in contents
+    ]
+    db.add_all(facts)
+    db.commit()
+
+    retired = compact_novel_facts(db, novel.id)
+
+    assert retired == [facts[3].id]
+    assert facts[0].is_active
+    assert facts[2].is_active
+    assert facts[3].superseded_by_id == facts[1].id
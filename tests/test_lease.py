@@ -0,0 +1,185 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app.models import Novel, NovelStatus, SystemState
+from app.services.lease import (
+    LEADER_STATE_KEY,
+    acquire_leadership,
+    claim_next_novel,
+    claim_novel_lease,
+    release_novel_lease,
+    renew_novel_lease,
+    sweep_expired_leases,
+)
+
+
+def _novel(db, status=NovelStatus.PLANNED, planned_date=None):
+    novel = Novel(
+        title="租约测试",
+        genre="玄幻",
+        target_chapter_count=3,
+        status=status,
+        planned_date=planned_date or date.today(),
+    )
+    db.add(novel)
+    db.commit()
+    return novel
+
+
+def _expire(db, novel):
+    db.query(Novel).filter(Novel.id == novel.id).update(
+        {Novel.lease_expires_at: datetime.utcnow() - timedelta(seconds=1)},
+        synchronize_session=False,
+    )
+    db.commit()
+
+
+def _lease_owner(db, novel):
+    return db.query(Novel.lease_owner).filter(Novel.id == novel.id).scalar()
+
+
+def test_lease_is_exclusive_until_released(db):
+    novel = _novel(db)
+
+    assert claim_novel_lease(db, novel.id, "a#1")
+    assert not claim_novel_lease(db, novel.id, "b#1")
+
+    release_novel_lease(db, novel.id, "b#1")
+    assert _lease_owner(db, novel) == "a#1"
+
+    release_novel_lease(db, novel.id, "a#1")
+    assert claim_novel_lease(db, novel.id, "b#1")
+
+
+def test_expired_lease_can_be_taken_over(db):
+    novel = _novel(db)
+    claim_novel_lease(db, novel.id, "a#1")
+    _expire(db, novel)
+
+    assert claim_novel_lease(db, novel.id, "b#1")
+    assert not renew_novel_lease(db, novel.id, "a#1")
+    assert renew_novel_lease(db, novel.id, "b#1")
+
+
+def test_claim_next_skips_leased_excluded_and_future_novels(db):
+    others = [row[0] for row in db.query(Novel.id).all()]
+    leased = _novel(db)
+    excluded = _novel(db)
+    _novel(db, planned_date=date.today() + timedelta(days=1))
+    _novel(db, status=NovelStatus.COMPLETED)
+    free = _novel(db, status=NovelStatus.WRITING)
+    claim_novel_lease(db, leased.id, "a#1")
+
+    claimed = claim_next_novel(db, "b#1", exclude_ids=others + [excluded.id])
+
+    assert claimed == free.id
+    assert claim_next_novel(db, "c#1", exclude_ids=others + [excluded.id]) is None
+
+
+def test_sweep_clears_only_expired_leases(db):
+    expired, active = _novel(db), _novel(db)
+    claim_novel_lease(db, expired.id, "a#1")
+    claim_novel_lease(db, active.id, "a#2")
+    _expire(db, expired)
+
+    assert sweep_expired_leases(db) >= 1
+    assert _lease_owner(db, expired) is None
+    assert _lease_owner(db, active) == "a#2"
+
+
+@pytest.fixture
+def no_leader(db):
+    db.query(SystemState).filter(SystemState.key == LEADER_STATE_KEY).delete()
+    db.commit()
+    yield
+
+
+def test_leadership_is_held_until_it_expires(db, no_leader):
+    assert acquire_leadership(db, "node-a")
+    assert not acquire_leadership(db, "node-b")
+    assert acquire_leadership(db, "node-a")
+
+    db.query(SystemState).filter(SystemState.key == LEADER_STATE_KEY).update(
+        {SystemState.updated_at: datetime.utcnow() - timedelta(hours=1)},
+        synchronize_session=False,
+    )
+    db.commit()
+
+    assert acquire_leadership(db, "node-b")
+    assert not acquire_leadership(db, "node-a")
+
+
+@pytest.fixture
+def failing_generation(monkeypatch):
+    from app.config import settings
+    from app.services import novel_service
+
+    for name in (
+        "deepseek_stream_enabled",
+        "combined_review_enabled",
+        "entity_index_enabled",
+        "summary_tree_enabled",
+    ):
+        monkeypatch.setattr(settings, name, False)
+    monkeypatch.setattr(
+        novel_service.deepseek_client,
+        "generate_text",
+        lambda **kwargs: ("本章小结：测试\n\n正文内容", {}),
+    )
+    monkeypatch.setattr(
+        novel_service, "_audit_chapter_consistency", lambda **kwargs: (True, [])
+    )
+
+    def fail_extract(**kwargs):
+        raise RuntimeError("提取失败")
+
+    monkeypatch.setattr(novel_service, "_extract_story_facts", fail_extract)
+    return novel_service.generate_next_chapter_for_novel
+
+
+def _novel_with_chapter(db):
+    from app.models import Chapter
+
+    novel = _novel(db, status=NovelStatus.WRITING)
+    chapter = Chapter(novel_id=novel.id, index=1, title="第1章")
+    db.add(chapter)
+    db.commit()
+    return novel, chapter
+
+
+def test_failed_generation_discards_the_attempt(db, failing_generation):
+    from app.models import Chapter, ChapterStatus, CreationLog
+
+    novel, chapter = _novel_with_chapter(db)
+    token = "worker-a"
+    assert claim_novel_lease(db, novel.id, token)
+
+    assert failing_generation(db, novel.id, lease_token=token) is False
+
+    db.expire_all()
+    assert db.get(Chapter, chapter.id).status == ChapterStatus.PLANNED
+    stored = db.get(Novel, novel.id)
+    assert stored.current_chapter_index == 0
+    assert stored.completed_chapter_count == 0
+    assert stored.status == NovelStatus.ERROR
+    assert (
+        db.query(CreationLog)
+        .filter(CreationLog.novel_id == novel.id, CreationLog.level == "ERROR")
+        .count()
+        == 1
+    )
+
+
+def test_failed_generation_leaves_a_taken_over_novel_alone(db, failing_generation):
+    novel, _ = _novel_with_chapter(db)
+    assert claim_novel_lease(db, novel.id, "worker-a")
+    _expire(db, novel)
+    assert claim_novel_lease(db, novel.id, "worker-b")
+
+    assert failing_generation(db, novel.id, lease_token="worker-a") is False
+
+    db.expire_all()
+    stored = db.get(Novel, novel.id)
+    assert stored.status == NovelStatus.WRITING
+    assert stored.lease_owner == "worker-b"
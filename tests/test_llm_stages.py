@@ -0,0 +1,78 @@
+import threading
+
+from app.config import settings
+from app.services.llm_stages import STAGE_AUDIT, LaneRegistry, stage_profile
+
+
+def _acquire_in_thread(lane):
+    """
+    在后台线程中占用并立即归还通道名额，返回获得名额时置位的事件。
+    """
+
+    acquired = threading.Event()
+
+    def run():
+        lane.release(lane.acquire())
+        acquired.set()
+
+    threading.Thread(target=run, daemon=True).start()
+    return acquired
+
+
+def test_lanes_share_the_global_concurrency_cap(monkeypatch):
+    monkeypatch.setattr(settings, "max_concurrent_api_requests", 2)
+    monkeypatch.setattr(settings, "llm_lane_concurrency", {})
+    registry = LaneRegistry()
+    light, other = registry.get("light"), registry.get("other")
+    permits = [light.acquire(), light.acquire()]
+
+    acquired = _acquire_in_thread(other)
+    assert not acquired.wait(0.2)
+
+    light.release(permits.pop())
+    assert acquired.wait(2)
+    light.release(permits.pop())
+    assert registry.stats()["global"]["in_flight"] == 0
+
+
+def test_audit_gets_a_slot_while_every_draft_slot_is_busy(monkeypatch):
+    monkeypatch.setattr(settings, "max_concurrent_api_requests", 3)
+    monkeypatch.setattr(settings, "llm_lane_concurrency", {})
+    registry = LaneRegistry()
+    draft = registry.get(stage_profile("draft").lane)
+    audit = registry.get(stage_profile(STAGE_AUDIT).lane)
+
+    assert draft.stats()["max_concurrency"] == 2
+    permits = [draft.acquire(), draft.acquire()]
+    # 正文通道已满，第三个正文调用需等待
+    assert not _acquire_in_thread(draft).wait(0.2)
+
+    assert _acquire_in_thread(audit).wait(2)
+
+    for permit in permits:
+        draft.release(permit)
+
+
+def test_shared_draft_lane_keeps_the_full_cap(monkeypatch):
+    monkeypatch.setattr(settings, "max_concurrent_api_requests", 3)
+    monkeypatch.setattr(settings, "llm_lane_concurrency", {})
+    monkeypatch.setattr(settings, "draft_lane", "light")
+    registry = LaneRegistry()
+
+    assert registry.get("light").stats()["max_concurrency"] == 3
+
+
+def test_lane_concurrency_is_clamped_to_the_global_cap(monkeypatch):
+    monkeypatch.setattr(settings, "max_concurrent_api_requests", 3)
+    monkeypatch.setattr(settings, "llm_lane_concurrency", {"draft": 8, "light": 1})
+    registry = LaneRegistry()
+
+    assert registry.get("draft").stats()["max_concurrency"] == 3
+    assert registry.get("light").stats()["max_concurrency"] == 1
+
+    monkeypatch.setattr(settings, "max_concurrent_api_requests", 2)
+    registry.reload_limits()
+
+    stats = registry.stats()
+    assert stats["global"]["max_concurrency"] == 2
+    assert stats["lanes"]["draft"]["max_concurrency"] == 2
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import threading
+import time
+from datetime import date
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import router
+from app.models import Novel, NovelStatus
+from app.services.preview import ChapterPreviewHub, preview_hub
+
+
+async def _collect(hub, novel_id, events):
+    async for event in hub.subscribe(novel_id, keepalive_seconds=5):
+        events.append(event)
+
+
+async def _subscribed(hub, novel_id):
+    while not hub._waiters.get(novel_id):
+        await asyncio.sleep(0)
+
+
+def test_subscriber_receives_the_chapter_and_releases_it():
+    hub = ChapterPreviewHub()
+    events = []
+
+    async def run():
+        task = asyncio.ensure_future(_collect(hub, 1, events))
+        await _subscribed(hub, 1)
+        hub.begin(1, 3)
+        hub.update(1, "林晚")
+        hub.update(1, "林晚推开门")
+        hub.finish(1)
+        await asyncio.wait_for(task, 2)
+
+    asyncio.run(run())
+
+    assert [event["event"] for event in events] == ["start", "delta", "done"]
+    assert events[1]["data"]["text"] == "林晚推开门"
+    assert events[2]["data"] == {"chapter_index": 3, "status": "completed"}
+    assert hub._previews == {}
+    assert hub._waiters == {}
+
+
+def test_regenerated_text_emits_reset():
+    hub = ChapterPreviewHub()
+    events = []
+
+    async def run():
+        task = asyncio.ensure_future(_collect(hub, 1, events))
+        await _subscribed(hub, 1)
+        hub.begin(1, 1)
+        hub.update(1, "第一版")
+        while len(events) < 2:
+            await asyncio.sleep(0.01)
+        hub.update(1, "重写")
+        hub.finish(1, status="error")
+        await asyncio.wait_for(task, 2)
+
+    asyncio.run(run())
+
+    assert [event["event"] for event in events] == [
+        "start",
+        "delta",
+        "reset",
+        "delta",
+        "done",
+    ]
+    assert events[3]["data"]["text"] == "重写"
+    assert events[4]["data"]["status"] == "error"
+
+
+def test_finished_preview_without_subscribers_is_dropped():
+    hub = ChapterPreviewHub()
+
+    hub.begin(1, 1)
+    hub.update(1, "正文")
+    hub.finish(1)
+
+    assert hub._previews == {}
+    # 移除后的迟到写入被忽略
+    hub.update(1, "正文续写")
+    assert hub._previews == {}
+
+
+def test_stream_endpoint_pushes_the_preview(db):
+    novel = Novel(
+        title="预览测试",
+        genre="仙侠",
+        target_chapter_count=2,
+        status=NovelStatus.WRITING,
+        planned_date=date.today(),
+    )
+    db.add(novel)
+    db.commit()
+    app = FastAPI()
+    app.include_router(router)
+
+    def generate():
+        deadline = time.time() + 5
+        while not preview_hub._waiters.get(novel.id) and time.time() < deadline:
+            time.sleep(0.01)
+        preview_hub.begin(novel.id, 1)
+        preview_hub.update(novel.id, "山门外")
+        preview_hub.finish(novel.id)
+
+    worker = threading.Thread(target=generate)
+    worker.start()
+    with TestClient(app) as client:
+        response = client.get(f"/api/novels/{novel.id}/stream")
+        missing = client.get("/api/novels/999999/stream")
+    worker.join()
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    blocks = [block for block in response.text.split("\n\n") if block]
+    events = [
+        (block.split("\n")[0][len("event: "):], json.loads(block.split("\n")[1][6:]))
+        for block in blocks
+    ]
+    assert events == [
+        ("start", {"chapter_index": 1}),
+        ("delta", {"text": "山门外"}),
+        ("done", {"chapter_index": 1, "status": "completed"}),
+    ]
+    assert novel.id not in preview_hub._previews
+    assert missing.status_code == 404
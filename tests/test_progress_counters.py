@@ -0,0 +1,107 @@
+from datetime import date
+
+from app.models import Chapter, ChapterStatus, DashboardTotals, Novel, NovelStatus
+from app.services.progress_counters import (
+    TOTALS_ID,
+    bump_totals,
+    count_totals,
+    delete_novel,
+    note_chapter_completed,
+    read_totals,
+    recompute_counters,
+)
+
+
+def _novel(db, word_counts=(), planned=0):
+    novel = Novel(
+        title="计数测试",
+        genre="都市",
+        target_chapter_count=len(word_counts) + planned,
+        status=NovelStatus.WRITING,
+        planned_date=date.today(),
+    )
+    db.add(novel)
+    db.flush()
+    for index, words in enumerate(word_counts, start=1):
+        db.add(
+            Chapter(
+                novel_id=novel.id,
+                index=index,
+                title=f"第{index}章",
+                word_count=words,
+                status=ChapterStatus.COMPLETED,
+            )
+        )
+    for index in range(len(word_counts) + 1, len(word_counts) + planned + 1):
+        db.add(Chapter(novel_id=novel.id, index=index, title=f"第{index}章"))
+    db.commit()
+    return novel
+
+
+def test_bump_totals_accumulates_on_the_existing_row(db):
+    recompute_counters(db)
+    before = read_totals(db)
+
+    bump_totals(db, novels=1, chapters=3, words=500)
+    bump_totals(db, words=-200)
+
+    assert read_totals(db) == {
+        "novel_count": before["novel_count"] + 1,
+        "chapter_count": before["chapter_count"] + 3,
+        "word_count": before["word_count"] + 300,
+    }
+
+
+def test_bump_totals_seeds_a_missing_row_from_current_data(db):
+    db.query(DashboardTotals).delete()
+    db.add(Novel(title="新小说", genre="科幻", target_chapter_count=1))
+
+    bump_totals(db, novels=1)
+
+    # 统计行按含本事务修改的现有数据建立，增量不再重复累加
+    assert db.get(DashboardTotals, TOTALS_ID) is not None
+    assert read_totals(db) == count_totals(db)
+
+
+def test_chapter_completion_and_deletion_keep_counters_in_step(db):
+    novel = _novel(db, word_counts=(1000,), planned=1)
+    recompute_counters(db)
+    before = read_totals(db)
+
+    note_chapter_completed(db, novel, 600)
+    db.commit()
+
+    assert (novel.completed_chapter_count, novel.total_word_count) == (2, 1600)
+    assert read_totals(db)["word_count"] == before["word_count"] + 600
+
+    chapters, words = delete_novel(db, novel)
+    db.commit()
+
+    assert (chapters, words) == (2, 1000)
+    assert read_totals(db) == {
+        "novel_count": before["novel_count"] - 1,
+        "chapter_count": before["chapter_count"] - 2,
+        "word_count": before["word_count"] - 400,
+    }
+
+
+def test_recompute_reports_and_repairs_drift(db):
+    novel = _novel(db, word_counts=(1200, 800), planned=1)
+    db.query(Novel).filter(Novel.id == novel.id).update(
+        {Novel.completed_chapter_count: 5, Novel.total_word_count: 9},
+        synchronize_session=False,
+    )
+    db.commit()
+
+    drifted, _ = recompute_counters(db, dry_run=True)
+    report = next(item for item in drifted if item["novel_id"] == novel.id)
+    assert report["expected_completed_chapter_count"] == 2
+    assert report["expected_total_word_count"] == 2000
+    db.refresh(novel)
+    assert novel.completed_chapter_count == 5
+
+    drifted, totals = recompute_counters(db)
+    db.refresh(novel)
+    assert (novel.completed_chapter_count, novel.total_word_count) == (2, 2000)
+    assert totals == count_totals(db) == read_totals(db)
+    assert all(item["novel_id"] != novel.id for item in recompute_counters(db)[0])
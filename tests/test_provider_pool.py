@@ -0,0 +1,117 @@
+import pytest
+
+from app.config import DeepSeekEndpoint, settings
+from app.services import provider_pool
+from app.services.provider_pool import ProviderPool
+
+
+class _Clock:
+    """
+    可手动推进的单调时钟，替换 provider_pool 中的 time 模块。
+    """
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(provider_pool, "time", clock)
+    monkeypatch.setattr(settings, "provider_eject_failures", 2)
+    monkeypatch.setattr(settings, "provider_eject_seconds", 10)
+    return clock
+
+
+def _pool(*weights):
+    # 不限速的端点剩余额度恒为 1，评分只取决于权重与健康度
+    return ProviderPool(
+        [
+            DeepSeekEndpoint(
+                name=name,
+                base_url=f"http://{name}.example",
+                weight=weight,
+                requests_per_minute=0,
+                tokens_per_minute=0,
+            )
+            for name, weight in zip("abc", weights)
+        ]
+    )
+
+
+def _names(pool):
+    return [endpoint.name for endpoint in pool._ranked(())]
+
+
+def test_selection_follows_weight_and_health(clock, monkeypatch):
+    pool = _pool(1.0, 3.0)
+    a, b = pool.endpoints
+
+    assert pool.select().name == "b"
+    assert pool.select(exclude=["b"]).name == "a"
+    # 全部被排除时仍返回评分最高的端点
+    assert pool.select(exclude=["a", "b"]).name == "b"
+
+    monkeypatch.setattr(settings, "provider_eject_failures", 100)
+    for _ in range(5):
+        pool.report_failure(b)
+    # 3 × 0.8^5 < 1
+    assert pool.select().name == "a"
+
+    # 健康度随时间回升
+    clock.now += 600
+    assert pool.select().name == "b"
+
+
+def test_ejection_doubles_and_clears_on_success(clock):
+    pool = _pool(1.0, 3.0)
+    a, b = pool.endpoints
+
+    pool.report_failure(b)
+    assert not b.is_ejected(clock.now)
+    pool.report_failure(b)
+    assert b.ejected_until == clock.now + 10
+    assert _names(pool) == ["a"]
+    assert pool.has_alternative(b)
+    assert not pool.has_alternative(a)
+
+    # 到期后重新接入，尚未成功前再次失败立即摘除且时长翻倍
+    clock.now += 10
+    assert pool.has_alternative(a)
+    pool.report_failure(b)
+    assert b.ejected_until == clock.now + 20
+
+    clock.now += 20
+    pool.report_success(b)
+    assert (b.ejections, b.consecutive_failures, b.ejected_until) == (0, 0, 0.0)
+    pool.report_failure(b)
+    assert not b.is_ejected(clock.now)
+
+
+def test_forced_ejection_and_all_ejected_fallback(clock):
+    pool = _pool(1.0, 3.0)
+    a, b = pool.endpoints
+
+    pool.report_failure(b, eject=True)
+    clock.now += 1
+    pool.report_failure(a, eject=True)
+
+    # 全部被摘除时选择最早到期的端点兜底
+    assert _names(pool) == ["b"]
+    assert not pool.has_alternative(a)
+    assert not pool.has_alternative(b)
+
+
+def test_ejection_time_is_capped(clock):
+    pool = _pool(1.0)
+    (a,) = pool.endpoints
+
+    for _ in range(12):
+        pool.report_failure(a, eject=True)
+        clock.now = a.ejected_until
+
+    pool.report_failure(a, eject=True)
+    assert a.ejected_until - clock.now == provider_pool._MAX_EJECT_SECONDS
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.rate_limiter import AdaptiveRateLimiter, RateLimitTimeout, TokenBucket
+
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(60)
+    bucket.take(60)
+
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    assert bucket.wait_time(1000) == pytest.approx(60.0)
+
+    bucket.give_back(10)
+    assert bucket.wait_time(5) == 0.0
+
+
+def test_unlimited_bucket_never_waits():
+    bucket = TokenBucket(0)
+    bucket.take(10 ** 6)
+
+    assert bucket.unlimited
+    assert bucket.wait_time(10 ** 6) == 0.0
+
+
+def test_concurrency_limit_blocks_until_release():
+    limiter = AdaptiveRateLimiter(requests_per_minute=0, max_concurrency=1)
+    permit = limiter.acquire()
+
+    assert limiter.try_acquire() is None
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire(timeout=0.05)
+
+    limiter.release(permit)
+    assert limiter.try_acquire() is not None
+
+
+def test_throttling_halves_rate_and_successes_recover():
+    limiter = AdaptiveRateLimiter(
+        requests_per_minute=600, increase_step=0.1, decrease_factor=0.5
+    )
+
+    limiter.release(limiter.acquire(), throttled=True, retry_after=0)
+    assert limiter.stats()["rate_scale"] == pytest.approx(0.5)
+    assert limiter.stats()["throttled_count"] == 1
+
+    limiter.release(limiter.acquire())
+    limiter.release(limiter.acquire())
+    assert limiter.stats()["rate_scale"] == pytest.approx(0.7)
+
+
+def test_rate_scale_never_drops_below_minimum():
+    limiter = AdaptiveRateLimiter(requests_per_minute=600, min_scale=0.2)
+
+    for _ in range(5):
+        limiter.release(limiter.acquire(), throttled=True, retry_after=0)
+
+    assert limiter.stats()["rate_scale"] == pytest.approx(0.2)
+
+
+def test_retry_after_holds_every_caller():
+    limiter = AdaptiveRateLimiter(requests_per_minute=0)
+    limiter.release(limiter.acquire(), throttled=True, retry_after=0.2)
+
+    assert limiter.try_acquire() is None
+    assert limiter.headroom() == 0.0
+
+    start = time.monotonic()
+    limiter.acquire(timeout=2)
+    assert time.monotonic() - start >= 0.15
+
+
+def test_actual_usage_reconciles_reserved_tokens():
+    limiter = AdaptiveRateLimiter(requests_per_minute=0, tokens_per_minute=1000)
+
+    limiter.release(limiter.acquire(estimated_tokens=800), actual_tokens=100)
+
+    assert limiter.stats()["token_tokens"] == pytest.approx(900, abs=1)
+
+
+def test_async_waiter_is_woken_by_release_from_another_thread():
+    limiter = AdaptiveRateLimiter(requests_per_minute=0, max_concurrency=1)
+    held = limiter.acquire()
+
+    async def wait_for_slot():
+        threading.Timer(0.1, limiter.release, args=(held,)).start()
+        start = time.monotonic()
+        permit = await limiter.acquire_async(timeout=5)
+        return permit, time.monotonic() - start
+
+    permit, waited = asyncio.run(wait_for_slot())
+
+    assert 0.05 <= waited < 1.0
+    assert permit.waited_seconds == pytest.approx(waited, abs=0.05)
+    assert limiter._async_waiters == set()
+
+
+def test_cancelled_async_waiter_is_unregistered():
+    limiter = AdaptiveRateLimiter(requests_per_minute=0, max_concurrency=1)
+    limiter.acquire()
+
+    async def cancel_waiter():
+        task = asyncio.ensure_future(limiter.acquire_async())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_waiter())
+
+    assert limiter._async_waiters == set()
+    assert limiter.stats()["in_flight"] == 1
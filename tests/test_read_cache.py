@@ -0,0 +1,132 @@
+from datetime import date
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+from starlette.requests import Request
+
+from app.models import Novel, NovelStatus
+from app.services.read_cache import ReadCache, read_cache
+
+
+def _novel(db, title="测试小说"):
+    novel = Novel(
+        title=title,
+        genre="玄幻",
+        target_chapter_count=3,
+        status=NovelStatus.PLANNED,
+        planned_date=date.today(),
+    )
+    db.add(novel)
+    db.commit()
+    return novel
+
+
+def _request(headers=None):
+    raw = [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+def test_commit_bumps_global_and_novel_versions(db):
+    novel = _novel(db)
+    before = read_cache.version(), read_cache.version(novel.id)
+
+    novel.title = "改名"
+    db.commit()
+
+    assert read_cache.version() != before[0]
+    assert read_cache.version(novel.id) != before[1]
+
+
+@pytest.mark.filterwarnings("ignore::sqlalchemy.exc.SAWarning")
+def test_rolled_back_savepoint_keeps_outer_writes_dirty(db):
+    novel = _novel(db)
+    before = read_cache.version(), read_cache.version(novel.id)
+
+    novel.title = "改名"
+    db.flush()
+    with pytest.raises(IntegrityError):
+        with db.begin_nested():
+            db.add(
+                Novel(
+                    id=novel.id,
+                    title="重复",
+                    genre="玄幻",
+                    target_chapter_count=1,
+                    status=NovelStatus.PLANNED,
+                )
+            )
+    db.commit()
+
+    assert read_cache.version() != before[0]
+    assert read_cache.version(novel.id) != before[1]
+
+
+def test_released_savepoint_does_not_bump_before_commit(db):
+    novel = _novel(db)
+    before = read_cache.version()
+
+    novel.title = "改名"
+    with db.begin_nested():
+        db.flush()
+    assert read_cache.version() == before
+
+    db.commit()
+    assert read_cache.version() != before
+
+
+def test_outer_rollback_discards_pending_writes(db):
+    novel = _novel(db)
+    before = read_cache.version(), read_cache.version(novel.id)
+
+    novel.title = "改名"
+    db.flush()
+    db.rollback()
+    # 回滚后不带写入的提交不应递增版本
+    db.commit()
+
+    assert read_cache.version() == before[0]
+    assert read_cache.version(novel.id) == before[1]
+
+
+def test_lease_only_update_does_not_invalidate(db):
+    novel = _novel(db)
+    before = read_cache.version()
+
+    novel.lease_owner = "worker"
+    db.commit()
+
+    assert read_cache.version() == before
+
+
+def test_respond_caches_and_honours_if_none_match():
+    cache = ReadCache(ttl_seconds=60, max_entries=8)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"value": "内容"}
+
+    first = cache.respond(_request(), "key", compute)
+    etag = first.headers["etag"]
+    second = cache.respond(_request({"If-None-Match": etag}), "key", compute)
+
+    assert first.status_code == 200
+    assert second.status_code == 304
+    assert len(calls) == 1
+
+    cache.bump(global_scope=True)
+    third = cache.respond(_request({"If-None-Match": etag}), "key", compute)
+    # 版本变化后重新计算，但内容未变时 ETag 不变
+    assert len(calls) == 2
+    assert third.status_code == 304
+
+
+def test_respond_gzips_large_bodies():
+    cache = ReadCache(ttl_seconds=60, max_entries=8)
+    response = cache.respond(
+        _request({"Accept-Encoding": "gzip"}),
+        "large",
+        lambda: {"text": "字" * 10000},
+    )
+
+    assert response.headers["content-encoding"] == "gzip"
@@ -0,0 +1,43 @@
+from app.services.response_cache import ResponseCache
+
+
+def test_round_trip_and_hit(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "cache.sqlite3"), max_bytes=1 << 20)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return "结果", {"usage": {"total_tokens": 3}}
+
+    first = cache.get_or_compute("key", "extract", compute)
+    second = cache.get_or_compute("key", "extract", compute)
+
+    assert first == ("结果", {"usage": {"total_tokens": 3}})
+    assert second[1]["response_cache"] == "hit"
+    assert len(calls) == 1
+
+
+def test_corrupt_cache_file_is_treated_as_miss(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    path.write_bytes(b"not a sqlite database" * 100)
+    cache = ResponseCache(path=str(path), max_bytes=1 << 20)
+
+    assert cache.get("key") is None
+    assert cache.get_or_compute("key", "audit", lambda: ("结果", {})) == ("结果", {})
+
+
+def test_leader_rechecks_cache_before_computing(tmp_path, monkeypatch):
+    cache = ResponseCache(path=str(tmp_path / "cache.sqlite3"), max_bytes=1 << 20)
+    cache.put("key", "audit", "已写入", {})
+    lookups = iter([None])
+    real_get = cache.get
+    # 第一次查询发生在其他执行者写入之前
+    monkeypatch.setattr(cache, "get", lambda key: next(lookups, None) or real_get(key))
+
+    def compute():
+        raise AssertionError("不应重复调用")
+
+    content, meta = cache.get_or_compute("key", "audit", compute)
+
+    assert content == "已写入"
+    assert meta["response_cache"] == "hit"
@@ -0,0 +1,121 @@
+from datetime import date
+
+from app.models import (
+    Chapter,
+    ChapterStatus,
+    Novel,
+    NovelStatus,
+    StoryFact,
+    StoryFactImportance,
+)
+from app.services.retrieval import NovelRetrievalIndex, RetrievalIndexRegistry
+
+
+def _index():
+    index = NovelRetrievalIndex(1)
+    index.add_chapter(1, "林晚在青云山下拜师学剑。")
+    index.add_chapter(2, "沈舟夜探藏经阁，发现了失传的剑谱。")
+    index.add_chapter(3, "林晚与沈舟在藏经阁外比剑，剑谱的秘密被揭开。")
+    index.add("fact", 7, 2, "藏经阁由长老韩松看守")
+    return index
+
+
+def test_search_ranks_passages_by_relevance():
+    index = _index()
+
+    hits = index.search("藏经阁的剑谱", 3)
+
+    assert [p.chapter_index for _, p in hits][:2] == [2, 3]
+    assert hits[0][0] >= hits[1][0] > 0
+    assert all(p.chapter_index != 1 for _, p in hits)
+
+
+def test_search_filters_by_kind_and_chapter():
+    index = _index()
+
+    facts = index.search("藏经阁", 5, kinds=("fact",))
+    assert [(p.kind, p.ref_id) for _, p in facts] == [("fact", 7)]
+
+    earlier = index.search("藏经阁", 5, kinds=("chapter",), before_chapter=3)
+    assert [p.chapter_index for _, p in earlier] == [2]
+
+    index.remove_fact(7)
+    assert index.search("韩松", 5) == []
+
+
+def test_empty_index_and_unmatched_queries_return_nothing():
+    empty = NovelRetrievalIndex(1)
+    assert len(empty) == 0
+    assert empty.search("林晚", 5) == []
+
+    index = _index()
+    assert index.search("宇宙飞船", 5) == []
+    assert index.search("林晚", 0) == []
+
+
+def _novel(db, chapters):
+    novel = Novel(
+        title="检索测试",
+        genre="仙侠",
+        target_chapter_count=len(chapters) + 2,
+        status=NovelStatus.WRITING,
+        planned_date=date.today(),
+    )
+    db.add(novel)
+    db.flush()
+    for index, content in enumerate(chapters, start=1):
+        chapter = Chapter(
+            novel_id=novel.id,
+            index=index,
+            title=f"第{index}章",
+            status=ChapterStatus.COMPLETED,
+        )
+        chapter.content = content
+        db.add(chapter)
+    db.commit()
+    return novel
+
+
+def test_committed_chapters_extend_the_cached_index(db):
+    novel = _novel(db, ["林晚拜师学剑。", "沈舟夜探藏经阁。"])
+    registry = RetrievalIndexRegistry(4)
+
+    index = registry.get_index(db, novel.id, 3)
+    assert index.covered_chapter_index == 2
+    assert len(index) == 2
+
+    fact = StoryFact(
+        id=1001,
+        novel_id=novel.id,
+        chapter_index=3,
+        content="剑谱藏在后山寒潭",
+        importance=StoryFactImportance.NORMAL,
+    )
+    registry.note_chapter_committed(novel.id, 3, "林晚在寒潭边练剑。", [fact])
+
+    assert registry.get_index(db, novel.id, 4) is index
+    assert index.covered_chapter_index == 3
+    hits = index.search("寒潭", 5)
+    assert sorted((p.kind, p.chapter_index) for _, p in hits) == [
+        ("chapter", 3),
+        ("fact", 3),
+    ]
+
+    # 不连续的章节不追加，等待下次按需补齐
+    registry.note_chapter_committed(novel.id, 5, "跳过的章节。", [])
+    assert index.covered_chapter_index == 3
+
+    registry.forget_facts(novel.id, [1001])
+    assert [p.kind for _, p in index.search("寒潭", 5)] == ["chapter"]
+
+
+def test_rewinding_rebuilds_the_index(db):
+    novel = _novel(db, ["林晚拜师学剑。", "沈舟夜探藏经阁。"])
+    registry = RetrievalIndexRegistry(4)
+    index = registry.get_index(db, novel.id, 3)
+
+    rebuilt = registry.get_index(db, novel.id, 2)
+
+    assert rebuilt is not index
+    assert rebuilt.covered_chapter_index == 1
+    assert rebuilt.search("藏经阁", 5) == []
@@ -0,0 +1,207 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from app.db import Base
+from app.services.schema_upgrade import upgrade_schema
+
+
+def _legacy_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}", future=True)
+    with engine.begin() as conn:
+        # 租约列加入之前的小说表
+        conn.execute(
+            text(
+                "CREATE TABLE novels ("
+                "id INTEGER PRIMARY KEY, title VARCHAR(255) NOT NULL, "
+                "genre VARCHAR(64) NOT NULL, description TEXT, "
+                "target_chapter_count INTEGER NOT NULL, "
+                "current_chapter_index INTEGER NOT NULL, "
+                "status VARCHAR(10) NOT NULL, planned_date DATE, "
+                "created_at DATETIME NOT NULL, updated_at DATETIME NOT NULL)"
+            )
+        )
+        conn.execute(
+            text(
+                "INSERT INTO novels VALUES (1, '旧小说', '玄幻', NULL, 10, 3, "
+                "'RUNNING', NULL, '2024-01-01 00:00:00', '2024-01-01 00:00:00')"
+            )
+        )
+        # 只有基础列的创作日志表
+        conn.execute(
+            text(
+                "CREATE TABLE creation_logs ("
+                "id INTEGER PRIMARY KEY, novel_id INTEGER NOT NULL, chapter_id INTEGER, "
+                "level VARCHAR(32) NOT NULL, message TEXT NOT NULL, "
+                "api_call_id VARCHAR(128), latency_ms FLOAT, "
+                "created_at DATETIME NOT NULL)"
+            )
+        )
+        # 没有日期唯一约束的每日统计表，并发写入留下了重复行
+        conn.execute(
+            text(
+                "CREATE TABLE generation_metrics ("
+                "id INTEGER PRIMARY KEY, date DATE NOT NULL, "
+                "novel_count INTEGER NOT NULL, chapter_count INTEGER NOT NULL, "
+                "word_count INTEGER NOT NULL, created_at DATETIME NOT NULL)"
+            )
+        )
+        conn.execute(
+            text(
+                "INSERT INTO generation_metrics VALUES "
+                "(1, '2024-01-01', 1, 2, 3000, '2024-01-01 00:00:00'), "
+                "(2, '2024-01-01', 0, 1, 1500, '2024-01-01 00:00:00'), "
+                "(3, '2024-01-02', 0, 1, 1000, '2024-01-02 00:00:00')"
+            )
+        )
+        # 事实压缩之前的事实表
+        conn.execute(
+            text(
+                "CREATE TABLE story_facts ("
+                "id INTEGER PRIMARY KEY, novel_id INTEGER NOT NULL, chapter_id INTEGER, "
+                "chapter_index INTEGER NOT NULL, category VARCHAR(64), "
+                "content TEXT NOT NULL, importance VARCHAR(8) NOT NULL, "
+                "created_at DATETIME NOT NULL)"
+            )
+        )
+        conn.execute(
+            text(
+                "INSERT INTO story_facts VALUES (1, 1, NULL, 1, NULL, '林晚是掌门之女', "
+                "'CRITICAL', '2024-01-01 00:00:00')"
+            )
+        )
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def _columns(engine, table_name):
+    return {column["name"] for column in inspect(engine).get_columns(table_name)}
+
+
+def test_upgrade_adds_lease_columns_and_index(tmp_path):
+    engine = _legacy_engine(tmp_path)
+
+    applied = upgrade_schema(engine)
+
+    assert applied
+    assert {"lease_owner", "lease_expires_at"} <= _columns(engine, "novels")
+    indexes = {index["name"] for index in inspect(engine).get_indexes("novels")}
+    assert "ix_novels_lease_expires_at" in indexes
+    with engine.connect() as conn:
+        row = conn.execute(text("SELECT lease_owner FROM novels WHERE id = 1")).one()
+    assert row.lease_owner is None
+
+
+def test_upgrade_is_idempotent(tmp_path):
+    engine = _legacy_engine(tmp_path)
+
+    upgrade_schema(engine)
+
+    assert upgrade_schema(engine) == []
+
+
+def test_fresh_schema_needs_no_upgrade(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}", future=True)
+    Base.metadata.create_all(bind=engine)
+
+    assert upgrade_schema(engine) == []
+
+
+def test_upgrade_marks_existing_facts_active(tmp_path):
+    engine = _legacy_engine(tmp_path)
+
+    upgrade_schema(engine)
+
+    assert {"is_active", "superseded_by_id"} <= _columns(engine, "story_facts")
+    with engine.connect() as conn:
+        row = conn.execute(
+            text("SELECT is_active, superseded_by_id FROM story_facts WHERE id = 1")
+        ).one()
+    assert row.is_active == 1
+    assert row.superseded_by_id is None
+
+
+def test_upgrade_adds_creation_log_metrics(tmp_path):
+    engine = _legacy_engine(tmp_path)
+
+    upgrade_schema(engine)
+
+    assert {
+        "ttft_ms",
+        "prompt_tokens_estimate",
+        "prompt_tokens",
+        "completion_tokens",
+        "prompt_cache_hit_tokens",
+        "prompt_cache_miss_tokens",
+    } <= _columns(engine, "creation_logs")
+
+
+def test_upgrade_adds_progress_counters_defaulting_to_zero(tmp_path):
+    engine = _legacy_engine(tmp_path)
+
+    upgrade_schema(engine)
+
+    with engine.connect() as conn:
+        row = conn.execute(
+            text(
+                "SELECT completed_chapter_count, total_word_count "
+                "FROM novels WHERE id = 1"
+            )
+        ).one()
+    assert (row.completed_chapter_count, row.total_word_count) == (0, 0)
+
+
+def test_upgrade_recomputes_progress_counters_from_chapters(tmp_path):
+    engine = _legacy_engine(tmp_path)
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO chapters (id, novel_id, \"index\", title, word_count, status, "
+                "created_at, updated_at) VALUES "
+                "(1, 1, 1, '第1章', 1200, 'COMPLETED', '2024-01-01', '2024-01-01'), "
+                "(2, 1, 2, '第2章', 800, 'COMPLETED', '2024-01-01', '2024-01-01'), "
+                "(3, 1, 3, '第3章', 0, 'PLANNED', '2024-01-01', '2024-01-01')"
+            )
+        )
+
+    applied = upgrade_schema(engine)
+
+    assert "重算 1 本小说的进度计数" in applied
+    with engine.connect() as conn:
+        novel = conn.execute(
+            text(
+                "SELECT completed_chapter_count, total_word_count "
+                "FROM novels WHERE id = 1"
+            )
+        ).one()
+        totals = conn.execute(
+            text("SELECT novel_count, chapter_count, word_count FROM dashboard_totals")
+        ).one()
+    assert tuple(novel) == (2, 2000)
+    assert tuple(totals) == (1, 3, 2000)
+
+
+def test_upgrade_merges_duplicate_daily_metrics_before_unique_index(tmp_path):
+    engine = _legacy_engine(tmp_path)
+
+    upgrade_schema(engine)
+
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text(
+                "SELECT id, date, novel_count, chapter_count, word_count "
+                "FROM generation_metrics ORDER BY id"
+            )
+        ).all()
+    assert [tuple(row) for row in rows] == [
+        (1, "2024-01-01", 1, 3, 4500),
+        (3, "2024-01-02", 0, 1, 1000),
+    ]
+    with pytest.raises(IntegrityError):
+        with engine.begin() as conn:
+            conn.execute(
+                text(
+                    "INSERT INTO generation_metrics VALUES "
+                    "(4, '2024-01-02', 0, 0, 0, '2024-01-02 00:00:00')"
+                )
+            )
@@ -0,0 +1,147 @@
+from datetime import date
+
+import pytest
+
+from app.config import settings
+from app.models import (
+    ArcSummary,
+    Chapter,
+    ChapterStatus,
+    Novel,
+    NovelStatus,
+    VolumeSummary,
+)
+from app.services import summary_tree
+from app.services.context_cache import context_cache
+from app.services.novel_service import _build_novel_context
+from app.services.summary_tree import load_summary_blocks, maintain_summary_tree
+
+
+@pytest.fixture(autouse=True)
+def small_tree(monkeypatch):
+    # 每弧 2 章、每卷 2 弧，摘要直接回显范围，不调用模型
+    monkeypatch.setattr(settings, "summary_arc_chapters", 2)
+    monkeypatch.setattr(settings, "summary_volume_arcs", 2)
+    monkeypatch.setattr(
+        summary_tree, "_summarize", lambda novel, scope, material: f"{scope}梗概"
+    )
+
+
+def _novel(db, completed, total=6):
+    novel = Novel(
+        title="摘要测试",
+        genre="仙侠",
+        target_chapter_count=total,
+        current_chapter_index=completed,
+        status=NovelStatus.WRITING,
+        planned_date=date.today(),
+    )
+    db.add(novel)
+    db.flush()
+    for index in range(1, total + 1):
+        db.add(
+            Chapter(
+                novel_id=novel.id,
+                index=index,
+                title=f"第{index}章",
+                outline=f"第{index}章小结",
+                status=ChapterStatus.COMPLETED
+                if index <= completed
+                else ChapterStatus.PLANNED,
+            )
+        )
+    db.commit()
+    return novel
+
+
+def _advance(db, novel, completed):
+    db.query(Chapter).filter(
+        Chapter.novel_id == novel.id, Chapter.index <= completed
+    ).update({Chapter.status: ChapterStatus.COMPLETED}, synchronize_session=False)
+    novel.current_chapter_index = completed
+    db.commit()
+
+
+def _arcs(db, novel):
+    return [
+        (row.arc_index, row.start_chapter, row.end_chapter)
+        for row in db.query(ArcSummary)
+        .filter(ArcSummary.novel_id == novel.id)
+        .order_by(ArcSummary.arc_index)
+    ]
+
+
+def _volumes(db, novel):
+    return [
+        (row.volume_index, row.start_chapter, row.end_chapter)
+        for row in db.query(VolumeSummary).filter(VolumeSummary.novel_id == novel.id)
+    ]
+
+
+def test_arcs_roll_up_at_arc_boundaries(db):
+    novel = _novel(db, completed=3)
+
+    assert maintain_summary_tree(db, novel.id) == 1
+    assert _arcs(db, novel) == [(1, 1, 2)]
+    assert _volumes(db, novel) == []
+
+    # 第二弧未写完前不会提前汇总
+    assert maintain_summary_tree(db, novel.id) == 0
+
+
+def test_volume_rolls_up_once_its_arcs_are_complete(db):
+    novel = _novel(db, completed=2)
+    maintain_summary_tree(db, novel.id)
+
+    _advance(db, novel, 4)
+
+    assert maintain_summary_tree(db, novel.id) == 2
+    assert _arcs(db, novel) == [(1, 1, 2), (2, 3, 4)]
+    assert _volumes(db, novel) == [(1, 1, 4)]
+    volume = db.query(VolumeSummary).filter(VolumeSummary.novel_id == novel.id).one()
+    assert volume.summary == "第1卷（第1-4章）梗概"
+
+
+def test_arc_with_an_unfinished_chapter_is_not_summarized(db):
+    novel = _novel(db, completed=4)
+    db.query(Chapter).filter(Chapter.novel_id == novel.id, Chapter.index == 2).update(
+        {Chapter.status: ChapterStatus.PLANNED}, synchronize_session=False
+    )
+    db.commit()
+
+    assert maintain_summary_tree(db, novel.id) == 0
+    assert _arcs(db, novel) == []
+
+
+def test_blocks_prefer_volumes_then_arcs(db):
+    novel = _novel(db, completed=6)
+    maintain_summary_tree(db, novel.id)
+
+    blocks = load_summary_blocks(db, novel.id, before_chapter=7)
+    assert [(b.level, b.start_chapter, b.end_chapter) for b in blocks] == [
+        ("volume", 1, 4),
+        ("arc", 5, 6),
+    ]
+    # 覆盖范围须完全早于待写章节
+    blocks = load_summary_blocks(db, novel.id, before_chapter=4)
+    assert [(b.level, b.start_chapter, b.end_chapter) for b in blocks] == [
+        ("arc", 1, 2),
+    ]
+
+
+def test_context_uses_summaries_for_older_chapters(db, monkeypatch):
+    monkeypatch.setattr(settings, "summary_tree_enabled", True)
+    monkeypatch.setattr(settings, "retrieval_enabled", False)
+    monkeypatch.setattr(settings, "entity_index_enabled", False)
+    monkeypatch.setattr(settings, "context_recent_chapters", 1)
+    novel = _novel(db, completed=5)
+    maintain_summary_tree(db, novel.id)
+    context_cache.invalidate(novel.id)
+
+    context = _build_novel_context(db, novel, 6)
+    text = f"{context.prefix}\n{context.body}"
+
+    assert "第1卷（第1-4章）概要：第1卷（第1-4章）梗概" in text
+    # 被卷摘要覆盖的章节不再逐章列出，未汇总的第 5 章保留小结
+    assert "第2章小结" not in text
+    assert "第5章小结" in text
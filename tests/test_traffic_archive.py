@@ -0,0 +1,77 @@
+import gzip
+
+from app.config import DeepSeekEndpoint, settings
+from app.services import novel_service
+from app.services.deepseek_client import (
+    DeepSeekClient,
+    endpoint_payload,
+    parse_completion,
+)
+from app.services.provider_pool import ProviderPool
+from app.services.response_cache import response_cache
+from app.services.traffic_archive import (
+    ReplayDeepSeekClient,
+    archive_files,
+    iter_archive,
+    replaying,
+    traffic_archive,
+)
+
+
+def _pool():
+    return ProviderPool(
+        [DeepSeekEndpoint(name="main", base_url="http://127.0.0.1:9", model="deepseek-v9")]
+    )
+
+
+def _fake_post(payload, endpoint):
+    payload = endpoint_payload(payload, endpoint)
+    prompt = payload["messages"][-1]["content"]
+    data = {
+        "id": f"req-{prompt}",
+        "choices": [{"message": {"content": f"{payload['model']}：{prompt}的回复"}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+    }
+    return parse_completion(data, 1.0)
+
+
+def test_recorded_traffic_replays_identically(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "traffic_archive_enabled", True)
+    monkeypatch.setattr(settings, "traffic_archive_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "extract_model", "")
+    monkeypatch.setattr(response_cache, "enabled_for", lambda stage: False)
+    client = DeepSeekClient(_pool())
+    monkeypatch.setattr(client, "_post_once", _fake_post)
+
+    calls = [
+        ([{"role": "user", "content": "第一章"}], "extract"),
+        ([{"role": "user", "content": "第二章"}], "extract"),
+    ]
+    recorded = []
+    for messages, stage in calls:
+        recorded.append(client.generate_text(messages, stage=stage)[0])
+        # 每次落盘追加一个 gzip 成员
+        traffic_archive.flush(5)
+
+    (path,) = archive_files()
+    with open(path, "rb") as fh:
+        assert fh.read().count(b"\x1f\x8b\x08") >= 2
+    with gzip.open(path, "rt", encoding="utf-8") as fh:
+        assert len(fh.readlines()) == 2
+    assert [item["request"]["model"] for item in iter_archive()] == [
+        "deepseek-v9",
+        "deepseek-v9",
+    ]
+    assert recorded[0] == "deepseek-v9：第一章的回复"
+
+    replay = ReplayDeepSeekClient(pool=_pool())
+    with replaying(replay):
+        replayed = [
+            novel_service.deepseek_client.generate_text(messages, stage=stage)
+            for messages, stage in calls
+        ]
+
+    assert [text for text, _ in replayed] == recorded
+    assert all(meta["replayed"] for _, meta in replayed)
+    assert replayed[0][1]["raw"]["id"] == "req-第一章"
+    assert (replay.hits, replay.misses) == (2, 0)
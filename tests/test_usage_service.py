@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+
+from app.models import LLMCall
+from app.services import usage_service
+from app.services.deepseek_client import DeepSeekAPIError
+from app.services.usage_service import stage_stats, usage_recorder
+
+
+def test_failed_call_records_attempts(db):
+    error = DeepSeekAPIError("DeepSeek API 调用失败: 500", attempts=3)
+
+    usage_recorder.record("attempts-test", model="deepseek-chat", error=error)
+    usage_recorder.flush(timeout=5)
+
+    row = db.query(LLMCall).filter(LLMCall.stage == "attempts-test").one()
+    assert row.success is False
+    assert row.attempts == 3
+
+
+def test_stage_latency_percentiles_use_recent_sample(db, monkeypatch):
+    monkeypatch.setattr(usage_service, "_LATENCY_SAMPLE_SIZE", 3)
+    now = datetime.utcnow()
+    # 较早的慢调用超出采样范围，不参与分位数
+    latencies = [9000.0, 9000.0, 100.0, 200.0, 300.0]
+    db.add_all(
+        LLMCall(
+            stage="sample-test",
+            latency_ms=latency,
+            success=True,
+            created_at=now - timedelta(minutes=len(latencies) - i),
+        )
+        for i, latency in enumerate(latencies)
+    )
+    db.commit()
+
+    stats = {item.stage: item for item in stage_stats(db, days=1)}["sample-test"]
+
+    assert stats.calls == 5
+    assert stats.latency_p50_ms == 200.0
+    assert stats.latency_p99_ms == 300.0